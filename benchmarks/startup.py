@@ -0,0 +1,33 @@
+import subprocess
+import sys
+import argparse
+
+# modules that should not be loaded by just importing hpat
+heavy_modules = ['h5py', 'pandas', 'hio', 'hpat.pio', 'hpat.hiframes']
+
+timer_code = """
+import sys, time
+t1 = time.time()
+import hpat
+t = time.time()-t1
+print(t)
+print(' '.join(m for m in {} if m in sys.modules))
+""".format(heavy_modules)
+
+def main():
+    parser = argparse.ArgumentParser(description='hpat import time.')
+    parser.add_argument('--runs', dest='runs', type=int, default=5)
+    args = parser.parse_args()
+
+    times = []
+    for i in range(args.runs):
+        # fresh interpreter each time to measure cold import
+        out = subprocess.check_output([sys.executable, '-c', timer_code])
+        lines = out.decode().split('\n')
+        times.append(float(lines[0]))
+        loaded = lines[1]
+    print("import hpat time (min/max):", min(times), max(times))
+    print("heavy modules loaded:", loaded if loaded else "none")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+import pandas as pd
+import numpy as np
+import hpat
+
+@hpat.jit
+def groupby_df(n):
+    df = pd.DataFrame({'A': np.arange(n) % 4, 'B': np.random.ranf(n)})
+    df1 = df.groupby('A').mean()
+    return df1.B.sum()
+
+n = 10
+print(groupby_df(n))
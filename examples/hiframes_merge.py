@@ -0,0 +1,13 @@
+import pandas as pd
+import numpy as np
+import hpat
+
+@hpat.jit
+def merge_df(n):
+    df1 = pd.DataFrame({'key': np.arange(n), 'A': np.random.ranf(n)})
+    df2 = pd.DataFrame({'key': np.arange(n) * 2, 'B': np.random.ranf(n)})
+    df3 = pd.merge(df1, df2, on='key')
+    return df3.B.sum()
+
+n = 10
+print(merge_df(n))
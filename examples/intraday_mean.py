@@ -20,7 +20,7 @@ def intraday_mean_revert():
     all_res = np.zeros(max_num_days)
 
     t1 = time.time()
-    for i in prange(nsyms):
+    for i in prange(nsyms, schedule='dynamic'):
         symbol = sym_list[i]
 
         s_open = f[symbol+'/Open'][:]
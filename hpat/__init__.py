@@ -1,10 +1,20 @@
 from __future__ import print_function, division, absolute_import
 
+import functools
+import os
+import warnings
+# sets Numba's thread pool size in hybrid mode, before Numba is imported
+import hpat.config
 import numba
 from numba import *
+from numba import sigutils
 import hpat.dict_ext
 from hpat.dict_ext import DictIntInt, dict_int_int_type
 import hpat.str_ext
+import hpat.dispatcher
+from hpat.distributed_api import rebalance_array as rebalance
+
+__version__ = '0.1.0'
 
 def jit(signature_or_function=None, **options):
     from .compiler import add_hpat_stages
@@ -12,4 +22,48 @@ def jit(signature_or_function=None, **options):
     if 'nopython' not in options:
         options['nopython'] = True
     options['parallel'] = True
-    return numba.jit(signature_or_function, user_pipeline_funcs=[add_hpat_stages], **options)
+    # time compiler stages and dump reports to this directory
+    profile_dir = options.pop('profile_compile', hpat.config.PROFILE_COMPILE)
+    # names of arguments (and 'ret' for return value) that are distributed
+    distributed_vars = set(options.pop('distributed', ()))
+    # names of 2D arrays to distribute in 2D blocks across a processor grid
+    distributed_2d_vars = set(options.pop('distributed_2d', ()))
+    # run local chunks of parfors on threads (hybrid MPI+threads mode)
+    hybrid = options.pop('hybrid', hpat.config.HYBRID)
+    if hybrid and 'NUMBA_NUM_THREADS' not in os.environ:
+        # the pool is sized on import with HPAT_HYBRID=1 only, otherwise all
+        # ranks of a node start a thread per core
+        warnings.warn("hybrid=True but Numba's thread pool size is not set, "
+            "set HPAT_HYBRID=1 or NUMBA_NUM_THREADS (cores per rank) before "
+            "importing hpat to avoid oversubscribing cores", RuntimeWarning)
+    hpat_stages = functools.partial(add_hpat_stages, profile_dir=profile_dir,
+                                    distributed_vars=distributed_vars,
+                                    distributed_2d_vars=distributed_2d_vars,
+                                    hybrid=hybrid)
+    # options that change generated code, part of cache index keys
+    hpat_options = (tuple(sorted(distributed_vars)),
+                    tuple(sorted(distributed_2d_vars)), bool(hybrid))
+    # signatures are compiled after options are set on the dispatcher
+    sigs = None
+    is_decorator = (signature_or_function is None
+                    or sigutils.is_signature(signature_or_function)
+                    or isinstance(signature_or_function, list))
+    if is_decorator and signature_or_function is not None:
+        sigs = signature_or_function
+        if not isinstance(sigs, list):
+            sigs = [sigs]
+
+    def wrapper(func):
+        # cache=True is handled by HPATDispatcher
+        disp = numba.jit(target='hpat', user_pipeline_funcs=[hpat_stages],
+                                                            **options)(func)
+        disp.hpat_options = hpat_options
+        if sigs is not None:
+            for sig in sigs:
+                disp.compile(sig)
+            disp.disable_compile()
+        return disp
+
+    if is_decorator:
+        return wrapper
+    return wrapper(signature_or_function)
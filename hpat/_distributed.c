@@ -1,4 +1,6 @@
 #include <stdbool.h>
+#include <limits.h>
+#include <math.h>
 #include "mpi.h"
 #include <Python.h>
 
@@ -9,28 +11,303 @@ int64_t hpat_dist_get_end(int64_t total, int64_t div_chunk, int num_pes,
 int64_t hpat_dist_get_node_portion(int64_t total, int64_t div_chunk,
                                     int num_pes, int node_id);
 double hpat_dist_get_time();
+int hpat_dist_barrier();
+int hpat_dist_bcast_bytes(char* buf, int64_t count);
 MPI_Datatype get_MPI_typ(int typ_enum);
 int get_elem_size(int type_enum);
-int hpat_dist_reduce_i4(int value);
-int64_t hpat_dist_reduce_i8(int64_t value);
-float hpat_dist_reduce_f4(float value);
-double hpat_dist_reduce_f8(double value);
+MPI_Op get_MPI_op(int op_enum);
+int hpat_dist_reduce_i4(int value, int op_enum);
+int64_t hpat_dist_reduce_i8(int64_t value, int op_enum);
+float hpat_dist_reduce_f4(float value, int op_enum);
+double hpat_dist_reduce_f8(double value, int op_enum);
+int64_t hpat_dist_argreduce(char* data, int64_t count, int64_t index,
+                    int64_t start, int op_enum, int type_enum);
+int hpat_dist_ireduce(void* buf, int64_t count, int op_enum, int type_enum);
+int hpat_dist_reduce_wait(int req);
+// identity of Sum/Prod/Min/Max reductions, used as exscan result on rank 0
+#define HPAT_OP_IDENTITY(op_enum, min_val, max_val) ((op_enum)==1 ? 1 : \
+        ((op_enum)==2 ? (max_val) : ((op_enum)==3 ? (min_val) : 0)))
+int hpat_dist_exscan_i4(int value, int op_enum);
+int64_t hpat_dist_exscan_i8(int64_t value, int op_enum);
+float hpat_dist_exscan_f4(float value, int op_enum);
+double hpat_dist_exscan_f8(double value, int op_enum);
 
-int hpat_dist_exscan_i4(int value);
-int64_t hpat_dist_exscan_i8(int64_t value);
-float hpat_dist_exscan_f4(float value);
-double hpat_dist_exscan_f8(double value);
-
-int hpat_dist_arr_reduce(void* out, int64_t* shapes, int ndims, int type_enum);
+int hpat_dist_arr_reduce(void* out, int64_t* shapes, int ndims, int op_enum,
+                                                                int type_enum);
+int hpat_dist_arr_reduce_root(void* out, int64_t* shapes, int ndims,
+                                                int op_enum, int type_enum);
 int hpat_dist_irecv(void* out, int size, int type_enum, int pe, int tag, bool cond);
 int hpat_dist_isend(void* out, int size, int type_enum, int pe, int tag, bool cond);
 int hpat_dist_wait(int req, bool cond);
 int64_t hpat_dist_get_item_pointer(int64_t ind, int64_t start, int64_t count);
+int hpat_dist_get_grid_rank(int dim);
+int hpat_dist_get_grid_size(int dim);
+int hpat_dist_dot_2d(char* A, int64_t a_s0, int64_t a_s1, char* B,
+                    int64_t b_s0, int64_t b_s1, char* C, int64_t m, int64_t n,
+                    int64_t K, int type_enum);
+int hpat_dist_transpose_2d(char* in, char* out, int64_t M, int64_t N,
+                    int type_enum);
+int hpat_dist_rebalance(char* in, char* out, int64_t in_rows, int64_t out_rows,
+                    int64_t row_size, int type_enum);
+int64_t hpat_dist_counter_create(int64_t total, int64_t chunk, bool guided);
+int64_t hpat_dist_counter_next(int64_t counter);
+int64_t hpat_dist_counter_end(int64_t counter);
+int hpat_dist_counter_free(int64_t counter);
+int64_t hpat_dist_halo_start(int n_arrs, char** data, int64_t* rows,
+                    int64_t* row_bytes, char** left_bufs, int64_t* left_rows,
+                    char** right_bufs, int64_t* right_rows);
+int hpat_dist_halo_wait(int64_t halo);
+int hpat_dist_halo_ghost(int n_arrs, char** ext, char** data, int64_t* n0,
+                    int64_t* n1, int64_t* elem_size, int l0, int r0, int l1,
+                    int r1, bool is_2d);
+int64_t hpat_dist_rma_create(char* data, int64_t count, int64_t elem_size);
+int hpat_dist_rma_get(int64_t win, int64_t ind, char* out);
+int hpat_dist_rma_put(int64_t win, int64_t ind, char* val);
+int hpat_dist_rma_free(int64_t win);
+int hpat_dist_gather_index(char* data, int64_t count, int64_t row_bytes,
+                    int64_t* inds, int64_t n_inds, char* out);
+int64_t hpat_dist_sort(char* data, int64_t n, int type_enum);
+int64_t hpat_dist_sort_count(int64_t sort);
+int hpat_dist_sort_finish(int64_t sort, char* out, bool is_argsort);
+int64_t hpat_dist_shuffle_start(char* keys, int64_t n_rows, int type_enum);
+int64_t hpat_dist_shuffle_count(int64_t shuffle);
+int hpat_dist_shuffle_finish(int64_t shuffle, int n_arrs, char** in_data,
+                    char** out_data, int64_t* row_bytes);
+int64_t hpat_dist_agg_start(char* keys, int64_t n_rows, int key_type,
+                    int n_in, char** in_data, int* in_types, int n_out,
+                    int64_t* ops, int64_t* in_cols, int64_t* aux_cols);
+int64_t hpat_dist_agg_count(int64_t agg);
+int hpat_dist_agg_finish(int64_t agg, char* out_keys, char** out_data,
+                    int* out_types);
+int64_t hpat_dist_join_start(char** keys, int64_t* n_rows, int* key_types,
+                    int* n_cols, char** data, int64_t* row_bytes,
+                    bool* is_parallel);
+int64_t hpat_dist_join_count(int64_t join);
+int hpat_dist_join_finish(int64_t join, char** keys, char** data,
+                    char* out_keys, char** out_data);
+double hpat_dist_quantile(char* data, int64_t n, int type_enum, double q,
+                    bool skipna);
+int hpat_dist_stats_num();
+const char* hpat_dist_stats_name(int id);
+int hpat_dist_stats_get(int64_t* calls, int64_t* bytes, double* times);
+int hpat_dist_stats_reset();
+void hpat_dist_stats_record(int id, int64_t bytes, double t0);
+int hpat_dist_trace_write(char* file_name);
 int hpat_dummy_ptr[64];
 void* hpat_get_dummy_ptr() {
     return hpat_dummy_ptr;
 }
 
+// Statistics of runtime primitives (calls, bytes of local data and wall time
+// per primitive on each rank) are collected if HPAT_STATS=1 is set in the
+// environment. If HPAT_TRACE=<file> is set, calls are also recorded as
+// events of a Chrome trace (chrome://tracing) timeline with one process per
+// rank, which is written (collectively) by hpat_dist_trace_write().
+// Statistics are kept in this runtime only, hio records h5 reads and writes
+// using hpat_dist_stats_record().
+
+#define HPAT_STAT_REDUCE 0
+#define HPAT_STAT_ARR_REDUCE 1
+#define HPAT_STAT_IREDUCE 2
+#define HPAT_STAT_REDUCE_WAIT 3
+#define HPAT_STAT_ARGREDUCE 4
+#define HPAT_STAT_EXSCAN 5
+#define HPAT_STAT_IRECV 6
+#define HPAT_STAT_ISEND 7
+#define HPAT_STAT_WAIT 8
+#define HPAT_STAT_BARRIER 9
+#define HPAT_STAT_REBALANCE 10
+#define HPAT_STAT_DOT_2D 11
+#define HPAT_STAT_TRANSPOSE_2D 12
+#define HPAT_STAT_HALO 13
+#define HPAT_STAT_HALO_WAIT 14
+#define HPAT_STAT_RMA 15
+#define HPAT_STAT_GATHER_INDEX 16
+#define HPAT_STAT_SORT 17
+#define HPAT_STAT_SHUFFLE 18
+#define HPAT_STAT_AGG 19
+#define HPAT_STAT_JOIN 20
+#define HPAT_STAT_QUANTILE 21
+// used by hio
+#define HPAT_STAT_H5_READ 22
+#define HPAT_STAT_H5_WRITE 23
+#define HPAT_N_STATS 24
+
+static const char* hpat_stat_names[HPAT_N_STATS] = {"reduce", "arr_reduce",
+    "ireduce", "reduce_wait", "argreduce", "exscan", "irecv", "isend", "wait",
+    "barrier", "rebalance", "dot_2d", "transpose_2d", "halo", "halo_wait",
+    "rma", "gather_index", "sort", "shuffle", "agg", "join", "quantile",
+    "h5_read", "h5_write"};
+
+typedef struct {
+    int id;
+    int64_t bytes;
+    double start;
+    double duration;
+} hpat_trace_event;
+
+// -1 if environment is not read yet
+static int hpat_stats_enabled = -1;
+static bool hpat_trace_enabled = false;
+static double hpat_stats_t_base = 0.0;
+static int64_t hpat_stats_calls[HPAT_N_STATS];
+static int64_t hpat_stats_bytes[HPAT_N_STATS];
+static double hpat_stats_times[HPAT_N_STATS];
+static hpat_trace_event* hpat_trace_events = NULL;
+static int64_t hpat_trace_n_events = 0;
+static int64_t hpat_trace_capacity = 0;
+
+static bool hpat_stats_on()
+{
+    if (hpat_stats_enabled==-1)
+    {
+        char* stats_env = getenv("HPAT_STATS");
+        char* trace_env = getenv("HPAT_TRACE");
+        hpat_trace_enabled = (trace_env!=NULL && trace_env[0]!='\0');
+        hpat_stats_enabled = hpat_trace_enabled || (stats_env!=NULL
+                            && stats_env[0]!='\0' && strcmp(stats_env, "0"));
+        hpat_stats_t_base = MPI_Wtime();
+    }
+    return hpat_stats_enabled;
+}
+
+// Take the trace time base of all ranks right after a barrier so events of
+// different ranks line up in the merged trace. Called on the first
+// hpat_dist_get_rank() of each rank, which all ranks reach together (at MPI
+// initialization or the start of the first jitted function).
+static void hpat_stats_sync_base()
+{
+    if (!hpat_stats_on())
+        return;
+    MPI_Barrier(MPI_COMM_WORLD);
+    hpat_stats_t_base = MPI_Wtime();
+}
+
+// start time of a primitive call, 0 if statistics are not collected
+static double hpat_stats_start()
+{
+    return hpat_stats_on() ? MPI_Wtime() : 0.0;
+}
+
+void hpat_dist_stats_record(int id, int64_t bytes, double t0)
+{
+    if (!hpat_stats_on())
+        return;
+    double duration = MPI_Wtime()-t0;
+    hpat_stats_calls[id]++;
+    hpat_stats_bytes[id] += bytes;
+    hpat_stats_times[id] += duration;
+    if (!hpat_trace_enabled)
+        return;
+    if (hpat_trace_n_events==hpat_trace_capacity)
+    {
+        hpat_trace_capacity = (hpat_trace_capacity==0) ? 1024
+                                                    : 2*hpat_trace_capacity;
+        hpat_trace_events = (hpat_trace_event*)realloc(hpat_trace_events,
+                                hpat_trace_capacity*sizeof(hpat_trace_event));
+    }
+    hpat_trace_event* event = &hpat_trace_events[hpat_trace_n_events++];
+    event->id = id;
+    event->bytes = bytes;
+    event->start = t0-hpat_stats_t_base;
+    event->duration = duration;
+}
+
+int hpat_dist_stats_num()
+{
+    return HPAT_N_STATS;
+}
+
+const char* hpat_dist_stats_name(int id)
+{
+    return hpat_stat_names[id];
+}
+
+int hpat_dist_stats_get(int64_t* calls, int64_t* bytes, double* times)
+{
+    memcpy(calls, hpat_stats_calls, HPAT_N_STATS*sizeof(int64_t));
+    memcpy(bytes, hpat_stats_bytes, HPAT_N_STATS*sizeof(int64_t));
+    memcpy(times, hpat_stats_times, HPAT_N_STATS*sizeof(double));
+    return 0;
+}
+
+int hpat_dist_stats_reset()
+{
+    memset(hpat_stats_calls, 0, HPAT_N_STATS*sizeof(int64_t));
+    memset(hpat_stats_bytes, 0, HPAT_N_STATS*sizeof(int64_t));
+    memset(hpat_stats_times, 0, HPAT_N_STATS*sizeof(double));
+    hpat_trace_n_events = 0;
+    return 0;
+}
+
+// gather trace events of all ranks and write them on rank 0
+int hpat_dist_trace_write(char* file_name)
+{
+    int i, rank, num_pes, is_initialized, is_finalized;
+    int64_t j;
+    MPI_Initialized(&is_initialized);
+    MPI_Finalized(&is_finalized);
+    if (!is_initialized || is_finalized)
+        return -1;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    int send_bytes = (int)(hpat_trace_n_events*sizeof(hpat_trace_event));
+    int* recv_counts = (int*)malloc(num_pes*sizeof(int));
+    int* displs = (int*)malloc(num_pes*sizeof(int));
+    MPI_Gather(&send_bytes, 1, MPI_INT, recv_counts, 1, MPI_INT, 0,
+                                                            MPI_COMM_WORLD);
+    int64_t total_bytes = 0;
+    if (rank==0)
+        for(i=0; i<num_pes; i++)
+        {
+            displs[i] = (int)total_bytes;
+            total_bytes += recv_counts[i];
+        }
+    hpat_trace_event* all_events = (hpat_trace_event*)malloc(
+                                            total_bytes>0 ? total_bytes : 1);
+    MPI_Gatherv(hpat_trace_events, send_bytes, MPI_BYTE, all_events,
+                        recv_counts, displs, MPI_BYTE, 0, MPI_COMM_WORLD);
+    int ret = 0;
+    if (rank==0)
+    {
+        FILE* f = fopen(file_name, "w");
+        if (f==NULL)
+        {
+            fprintf(stderr, "cannot open trace file %s\n", file_name);
+            ret = -1;
+        }
+        else
+        {
+            bool first = true;
+            fprintf(f, "{\"traceEvents\": [\n");
+            for(i=0; i<num_pes; i++)
+            {
+                hpat_trace_event* events = (hpat_trace_event*)(
+                                            (char*)all_events+displs[i]);
+                int64_t n_events = recv_counts[i]/sizeof(hpat_trace_event);
+                fprintf(f, "%s{\"name\": \"process_name\", \"ph\": \"M\", "
+                    "\"pid\": %d, \"args\": {\"name\": \"rank %d\"}}",
+                    first ? "" : ",\n", i, i);
+                first = false;
+                for(j=0; j<n_events; j++)
+                    fprintf(f, ",\n{\"name\": \"%s\", \"ph\": \"X\", "
+                        "\"pid\": %d, \"tid\": 0, \"ts\": %.3f, \"dur\": %.3f, "
+                        "\"args\": {\"bytes\": %lld}}",
+                        hpat_stat_names[events[j].id], i,
+                        events[j].start*1e6, events[j].duration*1e6,
+                        (long long)events[j].bytes);
+            }
+            fprintf(f, "\n]}\n");
+            fclose(f);
+        }
+    }
+    MPI_Bcast(&ret, 1, MPI_INT, 0, MPI_COMM_WORLD);
+    free(all_events);
+    free(recv_counts);
+    free(displs);
+    return ret;
+}
+
 PyMODINIT_FUNC PyInit_hdist(void) {
     PyObject *m;
     static struct PyModuleDef moduledef = {
@@ -49,6 +326,10 @@ PyMODINIT_FUNC PyInit_hdist(void) {
                             PyLong_FromVoidPtr((void*)(&hpat_dist_get_node_portion)));
     PyObject_SetAttrString(m, "hpat_dist_get_time",
                             PyLong_FromVoidPtr((void*)(&hpat_dist_get_time)));
+    PyObject_SetAttrString(m, "hpat_dist_barrier",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_barrier)));
+    PyObject_SetAttrString(m, "hpat_dist_bcast_bytes",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_bcast_bytes)));
 
     PyObject_SetAttrString(m, "hpat_dist_reduce_i4",
                             PyLong_FromVoidPtr((void*)(&hpat_dist_reduce_i4)));
@@ -68,8 +349,16 @@ PyMODINIT_FUNC PyInit_hdist(void) {
     PyObject_SetAttrString(m, "hpat_dist_exscan_f8",
                             PyLong_FromVoidPtr((void*)(&hpat_dist_exscan_f8)));
 
+    PyObject_SetAttrString(m, "hpat_dist_argreduce",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_argreduce)));
+    PyObject_SetAttrString(m, "hpat_dist_ireduce",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_ireduce)));
+    PyObject_SetAttrString(m, "hpat_dist_reduce_wait",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_reduce_wait)));
     PyObject_SetAttrString(m, "hpat_dist_arr_reduce",
                             PyLong_FromVoidPtr((void*)(&hpat_dist_arr_reduce)));
+    PyObject_SetAttrString(m, "hpat_dist_arr_reduce_root",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_arr_reduce_root)));
     PyObject_SetAttrString(m, "hpat_dist_irecv",
                             PyLong_FromVoidPtr((void*)(&hpat_dist_irecv)));
     PyObject_SetAttrString(m, "hpat_dist_isend",
@@ -80,12 +369,97 @@ PyMODINIT_FUNC PyInit_hdist(void) {
                             PyLong_FromVoidPtr((void*)(&hpat_dist_get_item_pointer)));
     PyObject_SetAttrString(m, "hpat_get_dummy_ptr",
                             PyLong_FromVoidPtr((void*)(&hpat_get_dummy_ptr)));
+    PyObject_SetAttrString(m, "hpat_dist_get_grid_rank",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_get_grid_rank)));
+    PyObject_SetAttrString(m, "hpat_dist_get_grid_size",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_get_grid_size)));
+    PyObject_SetAttrString(m, "hpat_dist_dot_2d",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_dot_2d)));
+    PyObject_SetAttrString(m, "hpat_dist_transpose_2d",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_transpose_2d)));
+    PyObject_SetAttrString(m, "hpat_dist_rebalance",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_rebalance)));
+    PyObject_SetAttrString(m, "hpat_dist_counter_create",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_counter_create)));
+    PyObject_SetAttrString(m, "hpat_dist_counter_next",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_counter_next)));
+    PyObject_SetAttrString(m, "hpat_dist_counter_end",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_counter_end)));
+    PyObject_SetAttrString(m, "hpat_dist_counter_free",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_counter_free)));
+    PyObject_SetAttrString(m, "hpat_dist_halo_start",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_halo_start)));
+    PyObject_SetAttrString(m, "hpat_dist_halo_wait",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_halo_wait)));
+    PyObject_SetAttrString(m, "hpat_dist_halo_ghost",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_halo_ghost)));
+    PyObject_SetAttrString(m, "hpat_dist_rma_create",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_rma_create)));
+    PyObject_SetAttrString(m, "hpat_dist_rma_get",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_rma_get)));
+    PyObject_SetAttrString(m, "hpat_dist_rma_put",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_rma_put)));
+    PyObject_SetAttrString(m, "hpat_dist_rma_free",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_rma_free)));
+    PyObject_SetAttrString(m, "hpat_dist_gather_index",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_gather_index)));
+    PyObject_SetAttrString(m, "hpat_dist_sort",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_sort)));
+    PyObject_SetAttrString(m, "hpat_dist_sort_count",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_sort_count)));
+    PyObject_SetAttrString(m, "hpat_dist_sort_finish",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_sort_finish)));
+    PyObject_SetAttrString(m, "hpat_dist_shuffle_start",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_shuffle_start)));
+    PyObject_SetAttrString(m, "hpat_dist_shuffle_count",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_shuffle_count)));
+    PyObject_SetAttrString(m, "hpat_dist_shuffle_finish",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_shuffle_finish)));
+    PyObject_SetAttrString(m, "hpat_dist_agg_start",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_agg_start)));
+    PyObject_SetAttrString(m, "hpat_dist_agg_count",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_agg_count)));
+    PyObject_SetAttrString(m, "hpat_dist_agg_finish",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_agg_finish)));
+    PyObject_SetAttrString(m, "hpat_dist_join_start",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_join_start)));
+    PyObject_SetAttrString(m, "hpat_dist_join_count",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_join_count)));
+    PyObject_SetAttrString(m, "hpat_dist_join_finish",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_join_finish)));
+    PyObject_SetAttrString(m, "hpat_dist_quantile",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_quantile)));
+    PyObject_SetAttrString(m, "hpat_dist_stats_num",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_stats_num)));
+    PyObject_SetAttrString(m, "hpat_dist_stats_name",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_stats_name)));
+    PyObject_SetAttrString(m, "hpat_dist_stats_get",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_stats_get)));
+    PyObject_SetAttrString(m, "hpat_dist_stats_reset",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_stats_reset)));
+    PyObject_SetAttrString(m, "hpat_dist_stats_record",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_stats_record)));
+    PyObject_SetAttrString(m, "hpat_dist_trace_write",
+                            PyLong_FromVoidPtr((void*)(&hpat_dist_trace_write)));
     return m;
 }
 
 int hpat_dist_get_rank()
 {
-    MPI_Init(NULL,NULL);
+    // rank may be queried several times (e.g. by the compilation cache
+    // before jitted code runs) so initialize MPI only once
+    static bool first_call = true;
+    int is_initialized, provided;
+    MPI_Initialized(&is_initialized);
+    // only the main thread calls MPI, parfors may run on other threads in
+    // hybrid MPI+threads mode
+    if (!is_initialized)
+        MPI_Init_thread(NULL, NULL, MPI_THREAD_FUNNELED, &provided);
+    if (first_call)
+    {
+        first_call = false;
+        hpat_stats_sync_base();
+    }
     int rank;
     MPI_Comm_rank(MPI_COMM_WORLD, &rank);
     // printf("my_rank:%d\n", rank);
@@ -122,41 +496,166 @@ double hpat_dist_get_time()
     return wtime;
 }
 
+int hpat_dist_barrier()
+{
+    double stats_t0 = hpat_stats_start();
+    MPI_Barrier(MPI_COMM_WORLD);
+    hpat_dist_stats_record(HPAT_STAT_BARRIER, 0, stats_t0);
+    return 0;
+}
+
+// broadcast bytes from rank 0, used by the compiler (e.g. cache keys)
+int hpat_dist_bcast_bytes(char* buf, int64_t count)
+{
+    MPI_Bcast(buf, (int)count, MPI_CHAR, 0, MPI_COMM_WORLD);
+    return 0;
+}
+
 
-int hpat_dist_reduce_i4(int value)
+int hpat_dist_reduce_i4(int value, int op_enum)
 {
-    // printf("sum value: %d\n", value);
+    double stats_t0 = hpat_stats_start();
+    // printf("reduce value: %d\n", value);
     int out=0;
-    MPI_Allreduce(&value, &out, 1, MPI_INT, MPI_SUM, MPI_COMM_WORLD);
+    MPI_Allreduce(&value, &out, 1, MPI_INT, get_MPI_op(op_enum), MPI_COMM_WORLD);
+    hpat_dist_stats_record(HPAT_STAT_REDUCE, sizeof(int), stats_t0);
     return out;
 }
 
-int64_t hpat_dist_reduce_i8(int64_t value)
+int64_t hpat_dist_reduce_i8(int64_t value, int op_enum)
 {
-    // printf("sum value: %lld\n", value);
+    double stats_t0 = hpat_stats_start();
+    // printf("reduce value: %lld\n", value);
     int64_t out=0;
-    MPI_Allreduce(&value, &out, 1, MPI_LONG_LONG_INT, MPI_SUM, MPI_COMM_WORLD);
+    MPI_Allreduce(&value, &out, 1, MPI_LONG_LONG_INT, get_MPI_op(op_enum), MPI_COMM_WORLD);
+    hpat_dist_stats_record(HPAT_STAT_REDUCE, sizeof(int64_t), stats_t0);
     return out;
 }
 
-float hpat_dist_reduce_f4(float value)
+float hpat_dist_reduce_f4(float value, int op_enum)
 {
-    // printf("sum value: %f\n", value);
+    double stats_t0 = hpat_stats_start();
+    // printf("reduce value: %f\n", value);
     float out=0;
-    MPI_Allreduce(&value, &out, 1, MPI_FLOAT, MPI_SUM, MPI_COMM_WORLD);
+    MPI_Allreduce(&value, &out, 1, MPI_FLOAT, get_MPI_op(op_enum), MPI_COMM_WORLD);
+    hpat_dist_stats_record(HPAT_STAT_REDUCE, sizeof(float), stats_t0);
     return out;
 }
 
-double hpat_dist_reduce_f8(double value)
+double hpat_dist_reduce_f8(double value, int op_enum)
 {
-    // printf("sum value: %lf\n", value);
+    double stats_t0 = hpat_stats_start();
+    // printf("reduce value: %lf\n", value);
     double out=0;
-    MPI_Allreduce(&value, &out, 1, MPI_DOUBLE, MPI_SUM, MPI_COMM_WORLD);
+    MPI_Allreduce(&value, &out, 1, MPI_DOUBLE, get_MPI_op(op_enum), MPI_COMM_WORLD);
+    hpat_dist_stats_record(HPAT_STAT_REDUCE, sizeof(double), stats_t0);
     return out;
 }
 
-int hpat_dist_arr_reduce(void* out, int64_t* shapes, int ndims, int type_enum)
+// Node-aware collectives: large array reductions are reduced in shared
+// memory of each node first, then across node leaders (node rank 0) and
+// broadcast in the node, which sends one copy per node over the network
+// instead of one per rank. Communicators are created on first use. Set
+// HPAT_HIER_COLL=0 to disable, HPAT_HIER_MIN_BYTES is the smallest array
+// reduced hierarchically.
+
+#ifndef HPAT_HIER_MIN_BYTES
+#define HPAT_HIER_MIN_BYTES 65536
+#endif
+
+// -1 if communicators are not created yet, 0 if not used
+static int hpat_hier_enabled = -1;
+static MPI_Comm hpat_node_comm = MPI_COMM_NULL;
+// MPI_COMM_NULL on ranks that are not node leaders
+static MPI_Comm hpat_leader_comm = MPI_COMM_NULL;
+static int hpat_node_rank = 0;
+
+static bool hpat_hier_init()
 {
+    if (hpat_hier_enabled!=-1)
+        return hpat_hier_enabled;
+    int rank, node_size, num_nodes = 0;
+    char* env = getenv("HPAT_HIER_COLL");
+    if (env!=NULL && !strcmp(env, "0"))
+    {
+        hpat_hier_enabled = 0;
+        return false;
+    }
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    // ranks are ordered as in MPI_COMM_WORLD so world rank 0 is a leader
+    MPI_Comm_split_type(MPI_COMM_WORLD, MPI_COMM_TYPE_SHARED, rank,
+                                            MPI_INFO_NULL, &hpat_node_comm);
+    MPI_Comm_rank(hpat_node_comm, &hpat_node_rank);
+    MPI_Comm_size(hpat_node_comm, &node_size);
+    MPI_Comm_split(MPI_COMM_WORLD, hpat_node_rank==0 ? 0 : MPI_UNDEFINED,
+                                                    rank, &hpat_leader_comm);
+    if (hpat_node_rank==0)
+        MPI_Comm_size(hpat_leader_comm, &num_nodes);
+    MPI_Bcast(&num_nodes, 1, MPI_INT, 0, hpat_node_comm);
+    // all ranks should take the same path
+    int use_hier = (num_nodes>1 && node_size>1), all_use_hier;
+    MPI_Allreduce(&use_hier, &all_use_hier, 1, MPI_INT, MPI_MIN,
+                                                            MPI_COMM_WORLD);
+    hpat_hier_enabled = all_use_hier;
+    return hpat_hier_enabled;
+}
+
+// hierarchical path is taken for large arrays on multiple multi-rank nodes,
+// all ranks reduce the same size so they agree on the path
+static bool hpat_use_hier(int count, MPI_Datatype mpi_typ)
+{
+    int typ_size;
+    MPI_Type_size(mpi_typ, &typ_size);
+    if ((int64_t)count*typ_size<HPAT_HIER_MIN_BYTES)
+        return false;
+    return hpat_hier_init();
+}
+
+static void hpat_hier_allreduce(void* buf, int count, MPI_Datatype mpi_typ,
+                                                                    MPI_Op op)
+{
+    if (hpat_node_rank==0)
+    {
+        MPI_Reduce(MPI_IN_PLACE, buf, count, mpi_typ, op, 0, hpat_node_comm);
+        MPI_Allreduce(MPI_IN_PLACE, buf, count, mpi_typ, op,
+                                                            hpat_leader_comm);
+    }
+    else
+        MPI_Reduce(buf, NULL, count, mpi_typ, op, 0, hpat_node_comm);
+    MPI_Bcast(buf, count, mpi_typ, 0, hpat_node_comm);
+}
+
+// reduce to world rank 0, which is the leader of its node and rank 0 of
+// leaders. Other leaders reduce their node into a temporary buffer since
+// data of other ranks should be unchanged.
+static void hpat_hier_reduce_root(void* buf, int count, MPI_Datatype mpi_typ,
+                                                                    MPI_Op op)
+{
+    int rank, typ_size;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    if (hpat_node_rank!=0)
+    {
+        MPI_Reduce(buf, NULL, count, mpi_typ, op, 0, hpat_node_comm);
+        return;
+    }
+    if (rank==0)
+    {
+        MPI_Reduce(MPI_IN_PLACE, buf, count, mpi_typ, op, 0, hpat_node_comm);
+        MPI_Reduce(MPI_IN_PLACE, buf, count, mpi_typ, op, 0, hpat_leader_comm);
+        return;
+    }
+    MPI_Type_size(mpi_typ, &typ_size);
+    char* tmp = (char*)malloc((int64_t)count*typ_size);
+    memcpy(tmp, buf, (int64_t)count*typ_size);
+    MPI_Reduce(MPI_IN_PLACE, tmp, count, mpi_typ, op, 0, hpat_node_comm);
+    MPI_Reduce(tmp, NULL, count, mpi_typ, op, 0, hpat_leader_comm);
+    free(tmp);
+}
+
+int hpat_dist_arr_reduce(void* out, int64_t* shapes, int ndims, int op_enum,
+                                                                int type_enum)
+{
+    double stats_t0 = hpat_stats_start();
     int i;
     // printf("ndims:%d shape: ", ndims);
     // for(i=0; i<ndims; i++)
@@ -167,49 +666,231 @@ int hpat_dist_arr_reduce(void* out, int64_t* shapes, int ndims, int type_enum)
     for(i=1; i<ndims; i++)
         total_size *= (int)shapes[i];
     MPI_Datatype mpi_typ = get_MPI_typ(type_enum);
-    int elem_size = get_elem_size(type_enum);
-    void* res_buf = malloc(total_size*elem_size);
-    MPI_Allreduce(out, res_buf, total_size, mpi_typ, MPI_SUM, MPI_COMM_WORLD);
-    memcpy(out, res_buf, total_size*elem_size);
-    free(res_buf);
+    if (hpat_use_hier(total_size, mpi_typ))
+        hpat_hier_allreduce(out, total_size, mpi_typ, get_MPI_op(op_enum));
+    else
+        MPI_Allreduce(MPI_IN_PLACE, out, total_size, mpi_typ,
+                                    get_MPI_op(op_enum), MPI_COMM_WORLD);
+    hpat_dist_stats_record(HPAT_STAT_ARR_REDUCE,
+                                total_size*get_elem_size(type_enum), stats_t0);
     return 0;
 }
 
+// reduce array to rank 0 only, data of other ranks is left unchanged
+int hpat_dist_arr_reduce_root(void* out, int64_t* shapes, int ndims,
+                                                int op_enum, int type_enum)
+{
+    double stats_t0 = hpat_stats_start();
+    int i, rank;
+    int total_size = (int)shapes[0];
+    for(i=1; i<ndims; i++)
+        total_size *= (int)shapes[i];
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Datatype mpi_typ = get_MPI_typ(type_enum);
+    if (hpat_use_hier(total_size, mpi_typ))
+        hpat_hier_reduce_root(out, total_size, mpi_typ, get_MPI_op(op_enum));
+    else if (rank==0)
+        MPI_Reduce(MPI_IN_PLACE, out, total_size, mpi_typ, get_MPI_op(op_enum),
+                                                        0, MPI_COMM_WORLD);
+    else
+        MPI_Reduce(out, NULL, total_size, mpi_typ, get_MPI_op(op_enum),
+                                                        0, MPI_COMM_WORLD);
+    hpat_dist_stats_record(HPAT_STAT_ARR_REDUCE,
+                                total_size*get_elem_size(type_enum), stats_t0);
+    return 0;
+}
 
-int hpat_dist_exscan_i4(int value)
+
+// non-blocking in-place reduction, buffer should not be accessed before
+// hpat_dist_reduce_wait() is called on the returned request. Requests are
+// returned as Fortran handles since MPI_Request is not an int in all MPIs.
+int hpat_dist_ireduce(void* buf, int64_t count, int op_enum, int type_enum)
 {
-    // printf("sum value: %d\n", value);
-    int out=0;
-    MPI_Exscan(&value, &out, 1, MPI_INT, MPI_SUM, MPI_COMM_WORLD);
+    double stats_t0 = hpat_stats_start();
+    MPI_Request req;
+    MPI_Datatype mpi_typ = get_MPI_typ(type_enum);
+    MPI_Iallreduce(MPI_IN_PLACE, buf, (int)count, mpi_typ, get_MPI_op(op_enum),
+                                                    MPI_COMM_WORLD, &req);
+    hpat_dist_stats_record(HPAT_STAT_IREDUCE,
+                                     count*get_elem_size(type_enum), stats_t0);
+    return (int)MPI_Request_c2f(req);
+}
+
+int hpat_dist_reduce_wait(int req_handle)
+{
+    double stats_t0 = hpat_stats_start();
+    MPI_Request req = MPI_Request_f2c((MPI_Fint)req_handle);
+    MPI_Wait(&req, MPI_STATUS_IGNORE);
+    hpat_dist_stats_record(HPAT_STAT_REDUCE_WAIT, 0, stats_t0);
+    return 0;
+}
+
+// Candidate of argmin/argmax reduction: value of the typed element (compared
+// in its own type so int64 values are exact), its global 64-bit index (-1 for
+// empty chunks) and the reduction, which a user-defined MPI op can't take as
+// a parameter.
+typedef struct {
+    union {
+        int8_t i1;
+        uint8_t u1;
+        int32_t i4;
+        int64_t i8;
+        float f4;
+        double f8;
+    } value;
+    int64_t index;
+    int32_t type_enum;
+    int32_t is_max;
+} hpat_argreduce_t;
+
+// compare values of a and b in their type, NaN is smaller than numbers
+static int hpat_argreduce_cmp(hpat_argreduce_t* a, hpat_argreduce_t* b)
+{
+    switch (a->type_enum)
+    {
+        case 0:
+            return (a->value.i1 > b->value.i1) - (a->value.i1 < b->value.i1);
+        case 1:
+            return (a->value.u1 > b->value.u1) - (a->value.u1 < b->value.u1);
+        case 2:
+            return (a->value.i4 > b->value.i4) - (a->value.i4 < b->value.i4);
+        case 3:
+            return (a->value.i8 > b->value.i8) - (a->value.i8 < b->value.i8);
+        case 4:
+            if (isnan(a->value.f4) || isnan(b->value.f4))
+                return isnan(b->value.f4) - isnan(a->value.f4);
+            return (a->value.f4 > b->value.f4) - (a->value.f4 < b->value.f4);
+        default:
+            if (isnan(a->value.f8) || isnan(b->value.f8))
+                return isnan(b->value.f8) - isnan(a->value.f8);
+            return (a->value.f8 > b->value.f8) - (a->value.f8 < b->value.f8);
+    }
+}
+
+// keep the min/max candidate in inout, the lowest index for ties (first
+// occurrence) and skip empty chunks. The comparison isn't flipped for max if
+// a NaN is involved, so NaN wins both argmin and argmax as in NumPy.
+static void hpat_argreduce_op(void* in, void* inout, int* len,
+                                                        MPI_Datatype* dtype)
+{
+    hpat_argreduce_t* a = (hpat_argreduce_t*)in;
+    hpat_argreduce_t* b = (hpat_argreduce_t*)inout;
+    for (int i=0; i<*len; i++)
+    {
+        if (a[i].index < 0)
+            continue;
+        if (b[i].index < 0)
+        {
+            b[i] = a[i];
+            continue;
+        }
+        int c = hpat_argreduce_cmp(&a[i], &b[i]);
+        int a_nan = (a[i].type_enum==4 && isnan(a[i].value.f4))
+                    || (a[i].type_enum==5 && isnan(a[i].value.f8));
+        int b_nan = (b[i].type_enum==4 && isnan(b[i].value.f4))
+                    || (b[i].type_enum==5 && isnan(b[i].value.f8));
+        if (a[i].is_max && !a_nan && !b_nan)
+            c = -c;
+        if (c < 0 || (c == 0 && a[i].index < b[i].index))
+            b[i] = a[i];
+    }
+}
+
+// global index of min/max value for argmin/argmax, index is the local index
+// of the min/max element of data (-1 for empty chunks) and start is the
+// global index of the first element of the chunk.
+int64_t hpat_dist_argreduce(char* data, int64_t count, int64_t index,
+                    int64_t start, int op_enum, int type_enum)
+{
+    double stats_t0 = hpat_stats_start();
+    static MPI_Datatype argreduce_typ = MPI_DATATYPE_NULL;
+    static MPI_Op argreduce_op = MPI_OP_NULL;
+    if (argreduce_typ == MPI_DATATYPE_NULL)
+    {
+        MPI_Type_contiguous(sizeof(hpat_argreduce_t), MPI_BYTE, &argreduce_typ);
+        MPI_Type_commit(&argreduce_typ);
+        MPI_Op_create(hpat_argreduce_op, 1, &argreduce_op);
+    }
+    hpat_argreduce_t in, out;
+    memset(&in, 0, sizeof(hpat_argreduce_t));
+    in.index = -1;
+    in.type_enum = type_enum;
+    in.is_max = (op_enum == 5);
+    if (count > 0 && index >= 0)
+    {
+        memcpy(&in.value, data+index*get_elem_size(type_enum),
+                                                get_elem_size(type_enum));
+        in.index = start + index;
+    }
+    MPI_Allreduce(&in, &out, 1, argreduce_typ, argreduce_op, MPI_COMM_WORLD);
+    hpat_dist_stats_record(HPAT_STAT_ARGREDUCE, sizeof(in), stats_t0);
+    return out.index;
+}
+
+
+int hpat_dist_exscan_i4(int value, int op_enum)
+{
+    double stats_t0 = hpat_stats_start();
+    // printf("exscan value: %d\n", value);
+    int rank;
+    int out = HPAT_OP_IDENTITY(op_enum, INT_MIN, INT_MAX);
+    MPI_Exscan(&value, &out, 1, MPI_INT, get_MPI_op(op_enum), MPI_COMM_WORLD);
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    // result is undefined on rank 0
+    if (rank==0)
+        out = HPAT_OP_IDENTITY(op_enum, INT_MIN, INT_MAX);
+    hpat_dist_stats_record(HPAT_STAT_EXSCAN, sizeof(int), stats_t0);
     return out;
 }
 
-int64_t hpat_dist_exscan_i8(int64_t value)
+int64_t hpat_dist_exscan_i8(int64_t value, int op_enum)
 {
-    // printf("sum value: %lld\n", value);
-    int64_t out=0;
-    MPI_Exscan(&value, &out, 1, MPI_LONG_LONG_INT, MPI_SUM, MPI_COMM_WORLD);
+    double stats_t0 = hpat_stats_start();
+    // printf("exscan value: %lld\n", value);
+    int rank;
+    int64_t out = HPAT_OP_IDENTITY(op_enum, INT64_MIN, INT64_MAX);
+    MPI_Exscan(&value, &out, 1, MPI_LONG_LONG_INT, get_MPI_op(op_enum), MPI_COMM_WORLD);
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    // result is undefined on rank 0
+    if (rank==0)
+        out = HPAT_OP_IDENTITY(op_enum, INT64_MIN, INT64_MAX);
+    hpat_dist_stats_record(HPAT_STAT_EXSCAN, sizeof(int64_t), stats_t0);
     return out;
 }
 
-float hpat_dist_exscan_f4(float value)
+float hpat_dist_exscan_f4(float value, int op_enum)
 {
-    // printf("sum value: %f\n", value);
-    float out=0;
-    MPI_Exscan(&value, &out, 1, MPI_FLOAT, MPI_SUM, MPI_COMM_WORLD);
+    double stats_t0 = hpat_stats_start();
+    // printf("exscan value: %f\n", value);
+    int rank;
+    float out = HPAT_OP_IDENTITY(op_enum, -INFINITY, INFINITY);
+    MPI_Exscan(&value, &out, 1, MPI_FLOAT, get_MPI_op(op_enum), MPI_COMM_WORLD);
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    // result is undefined on rank 0
+    if (rank==0)
+        out = HPAT_OP_IDENTITY(op_enum, -INFINITY, INFINITY);
+    hpat_dist_stats_record(HPAT_STAT_EXSCAN, sizeof(float), stats_t0);
     return out;
 }
 
-double hpat_dist_exscan_f8(double value)
+double hpat_dist_exscan_f8(double value, int op_enum)
 {
-    // printf("sum value: %lf\n", value);
-    double out=0;
-    MPI_Exscan(&value, &out, 1, MPI_DOUBLE, MPI_SUM, MPI_COMM_WORLD);
+    double stats_t0 = hpat_stats_start();
+    // printf("exscan value: %lf\n", value);
+    int rank;
+    double out = HPAT_OP_IDENTITY(op_enum, -INFINITY, INFINITY);
+    MPI_Exscan(&value, &out, 1, MPI_DOUBLE, get_MPI_op(op_enum), MPI_COMM_WORLD);
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    // result is undefined on rank 0
+    if (rank==0)
+        out = HPAT_OP_IDENTITY(op_enum, -INFINITY, INFINITY);
+    hpat_dist_stats_record(HPAT_STAT_EXSCAN, sizeof(double), stats_t0);
     return out;
 }
 
 int hpat_dist_irecv(void* out, int size, int type_enum, int pe, int tag, bool cond)
 {
+    double stats_t0 = hpat_stats_start();
     MPI_Request mpi_req_recv = -1;
     // printf("irecv size:%d pe:%d tag:%d, cond:%d\n", size, pe, tag, cond);
     // fflush(stdout);
@@ -220,11 +901,14 @@ int hpat_dist_irecv(void* out, int size, int type_enum, int pe, int tag, bool co
     }
     // printf("after irecv size:%d pe:%d tag:%d, cond:%d\n", size, pe, tag, cond);
     // fflush(stdout);
+    hpat_dist_stats_record(HPAT_STAT_IRECV,
+                           cond ? size*get_elem_size(type_enum) : 0, stats_t0);
     return mpi_req_recv;
 }
 
 int hpat_dist_isend(void* out, int size, int type_enum, int pe, int tag, bool cond)
 {
+    double stats_t0 = hpat_stats_start();
     MPI_Request mpi_req_recv = -1;
     // printf("isend size:%d pe:%d tag:%d, cond:%d\n", size, pe, tag, cond);
     // fflush(stdout);
@@ -235,13 +919,17 @@ int hpat_dist_isend(void* out, int size, int type_enum, int pe, int tag, bool co
     }
     // printf("after isend size:%d pe:%d tag:%d, cond:%d\n", size, pe, tag, cond);
     // fflush(stdout);
+    hpat_dist_stats_record(HPAT_STAT_ISEND,
+                           cond ? size*get_elem_size(type_enum) : 0, stats_t0);
     return mpi_req_recv;
 }
 
 int hpat_dist_wait(int req, bool cond)
 {
+    double stats_t0 = hpat_stats_start();
     if (cond)
         MPI_Wait(&req, MPI_STATUS_IGNORE);
+    hpat_dist_stats_record(HPAT_STAT_WAIT, 0, stats_t0);
     return 0;
 }
 
@@ -254,6 +942,35 @@ int hpat_dist_wait(int req, bool cond)
 //     float64:5
 //     }
 
+// reduction operator enums match distributed_api.Reduce_Type
+MPI_Op get_MPI_op(int op_enum)
+{
+    switch (op_enum)
+    {
+        case 0:
+            return MPI_SUM;
+        case 1:
+            return MPI_PROD;
+        case 2:
+            return MPI_MIN;
+        case 3:
+            return MPI_MAX;
+        case 4:
+            return MPI_MINLOC;
+        case 5:
+            return MPI_MAXLOC;
+        case 6:
+            return MPI_LOR;
+        case 7:
+            return MPI_LAND;
+        default:
+            // a wrong reduction silently corrupts results, so abort
+            fprintf(stderr, "Invalid MPI_Op %d\n", op_enum);
+            MPI_Abort(MPI_COMM_WORLD, 1);
+            return MPI_OP_NULL;
+    }
+}
+
 MPI_Datatype get_MPI_typ(int typ_enum)
 {
     // printf("h5 type enum:%d\n", typ_enum);
@@ -275,3 +992,1909 @@ int64_t hpat_dist_get_item_pointer(int64_t ind, int64_t start, int64_t count)
         return ind-start;
     return -1;
 }
+
+// Shared iteration counter for dynamic scheduling of parfors. The counter
+// lives in an MPI window on rank 0 and ranks claim chunks of iterations
+// with one-sided atomics, so no rank has to act as master.
+typedef struct {
+    MPI_Win win;
+    int64_t* buf;
+    int64_t total;
+    int64_t chunk;     // chunk size (minimum chunk size for guided)
+    int64_t last_end;  // end of chunk returned by last next() call
+    int num_pes;
+    bool guided;
+} hpat_dist_counter;
+
+int64_t hpat_dist_counter_create(int64_t total, int64_t chunk, bool guided)
+{
+    int rank;
+    hpat_dist_counter* counter = (hpat_dist_counter*)malloc(sizeof(hpat_dist_counter));
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &counter->num_pes);
+    counter->total = total;
+    counter->chunk = (chunk > 0) ? chunk : 1;
+    counter->last_end = 0;
+    counter->guided = guided;
+    MPI_Win_allocate((rank==0) ? sizeof(int64_t) : 0, sizeof(int64_t),
+            MPI_INFO_NULL, MPI_COMM_WORLD, &counter->buf, &counter->win);
+    MPI_Win_lock_all(0, counter->win);
+    if (rank==0)
+    {
+        *counter->buf = 0;
+        MPI_Win_sync(counter->win);
+    }
+    MPI_Barrier(MPI_COMM_WORLD);
+    return (int64_t)(intptr_t)counter;
+}
+
+// returns start of next chunk of iterations, or total if all are claimed
+int64_t hpat_dist_counter_next(int64_t counter_ptr)
+{
+    hpat_dist_counter* counter = (hpat_dist_counter*)(intptr_t)counter_ptr;
+    int64_t total = counter->total;
+    int64_t start;
+    if (!counter->guided)
+    {
+        MPI_Fetch_and_op(&counter->chunk, &start, MPI_LONG_LONG_INT, 0, 0,
+                                                    MPI_SUM, counter->win);
+        MPI_Win_flush(0, counter->win);
+        if (start >= total)
+            return total;
+        counter->last_end = (start+counter->chunk < total) ?
+                                            start+counter->chunk : total;
+        return start;
+    }
+    // guided: chunk is proportional to remaining iterations, which requires
+    // compare-and-swap since the increment depends on current value
+    int64_t cur, new_val;
+    MPI_Fetch_and_op(NULL, &cur, MPI_LONG_LONG_INT, 0, 0, MPI_NO_OP,
+                                                            counter->win);
+    MPI_Win_flush(0, counter->win);
+    while (cur < total)
+    {
+        int64_t chunk = (total-cur)/(2*counter->num_pes);
+        if (chunk < counter->chunk)
+            chunk = counter->chunk;
+        new_val = (cur+chunk < total) ? cur+chunk : total;
+        MPI_Compare_and_swap(&new_val, &cur, &start, MPI_LONG_LONG_INT, 0, 0,
+                                                            counter->win);
+        MPI_Win_flush(0, counter->win);
+        if (start==cur)
+        {
+            counter->last_end = new_val;
+            return cur;
+        }
+        cur = start;
+    }
+    return total;
+}
+
+int64_t hpat_dist_counter_end(int64_t counter_ptr)
+{
+    hpat_dist_counter* counter = (hpat_dist_counter*)(intptr_t)counter_ptr;
+    return counter->last_end;
+}
+
+int hpat_dist_counter_free(int64_t counter_ptr)
+{
+    hpat_dist_counter* counter = (hpat_dist_counter*)(intptr_t)counter_ptr;
+    MPI_Win_unlock_all(counter->win);
+    MPI_Win_free(&counter->win);
+    free(counter);
+    return 0;
+}
+
+// Move rows of a 1D_Var distributed array (e.g. output of filter) so that
+// each processor gets out_rows rows in order, which are the block chunks of
+// 1D distribution. Rows are contiguous so no packing is needed.
+int hpat_dist_rebalance(char* in, char* out, int64_t in_rows, int64_t out_rows,
+                    int64_t row_size, int type_enum)
+{
+    double stats_t0 = hpat_stats_start();
+    int rank, num_pes, pe;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    MPI_Datatype mpi_typ = get_MPI_typ(type_enum);
+
+    // row ranges of all processors before and after rebalance
+    int64_t* in_counts = (int64_t*)malloc(num_pes*sizeof(int64_t));
+    int64_t* out_counts = (int64_t*)malloc(num_pes*sizeof(int64_t));
+    MPI_Allgather(&in_rows, 1, MPI_LONG_LONG_INT, in_counts, 1,
+                                        MPI_LONG_LONG_INT, MPI_COMM_WORLD);
+    MPI_Allgather(&out_rows, 1, MPI_LONG_LONG_INT, out_counts, 1,
+                                        MPI_LONG_LONG_INT, MPI_COMM_WORLD);
+    int64_t in_start = 0, out_start = 0;
+    for(pe=0; pe<rank; pe++)
+    {
+        in_start += in_counts[pe];
+        out_start += out_counts[pe];
+    }
+
+    int* send_counts = (int*)malloc(num_pes*sizeof(int));
+    int* send_disps = (int*)malloc(num_pes*sizeof(int));
+    int* recv_counts = (int*)malloc(num_pes*sizeof(int));
+    int* recv_disps = (int*)malloc(num_pes*sizeof(int));
+    int64_t pe_in_start = 0, pe_out_start = 0;
+    for(pe=0; pe<num_pes; pe++)
+    {
+        // my input rows that go to pe
+        int64_t lo = (in_start > pe_out_start) ? in_start : pe_out_start;
+        int64_t hi = (in_start+in_rows < pe_out_start+out_counts[pe]) ?
+                            in_start+in_rows : pe_out_start+out_counts[pe];
+        send_counts[pe] = (hi>lo) ? (int)((hi-lo)*row_size) : 0;
+        send_disps[pe] = (hi>lo) ? (int)((lo-in_start)*row_size) : 0;
+        // pe's input rows that come to me
+        lo = (pe_in_start > out_start) ? pe_in_start : out_start;
+        hi = (pe_in_start+in_counts[pe] < out_start+out_rows) ?
+                            pe_in_start+in_counts[pe] : out_start+out_rows;
+        recv_counts[pe] = (hi>lo) ? (int)((hi-lo)*row_size) : 0;
+        recv_disps[pe] = (hi>lo) ? (int)((lo-out_start)*row_size) : 0;
+        pe_in_start += in_counts[pe];
+        pe_out_start += out_counts[pe];
+    }
+    MPI_Alltoallv(in, send_counts, send_disps, mpi_typ,
+                  out, recv_counts, recv_disps, mpi_typ, MPI_COMM_WORLD);
+    free(in_counts);
+    free(out_counts);
+    free(send_counts);
+    free(send_disps);
+    free(recv_counts);
+    free(recv_disps);
+    hpat_dist_stats_record(HPAT_STAT_REBALANCE,
+                          in_rows*row_size*get_elem_size(type_enum), stats_t0);
+    return 0;
+}
+
+// 2D block distribution: processors form a row-major grid of size
+// dims[0] x dims[1], and each matrix dimension is divided into chunks the
+// same way as 1D distribution (last chunk gets the remainder)
+
+static void get_grid_dims(int* dims)
+{
+    int size;
+    MPI_Comm_size(MPI_COMM_WORLD, &size);
+    dims[0] = 0;
+    dims[1] = 0;
+    MPI_Dims_create(size, 2, dims);
+}
+
+int hpat_dist_get_grid_size(int dim)
+{
+    int dims[2];
+    get_grid_dims(dims);
+    return dims[dim];
+}
+
+int hpat_dist_get_grid_rank(int dim)
+{
+    int rank, dims[2];
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    get_grid_dims(dims);
+    return (dim==0) ? rank/dims[1] : rank%dims[1];
+}
+
+static int64_t get_chunk_start(int64_t total, int num_pes, int node_id)
+{
+    return node_id*(total/num_pes);
+}
+
+static int64_t get_chunk_count(int64_t total, int num_pes, int node_id)
+{
+    return hpat_dist_get_node_portion(total, total/num_pes, num_pes, node_id);
+}
+
+static int get_chunk_owner(int64_t ind, int64_t total, int num_pes)
+{
+    int64_t div_chunk = total/num_pes;
+    if (div_chunk==0)
+        return num_pes-1;
+    int64_t owner = ind/div_chunk;
+    return (owner < num_pes) ? (int)owner : num_pes-1;
+}
+
+#define HPAT_GEMM_ACC(T) \
+    for(i=0; i<m; i++) \
+        for(kk=0; kk<w; kk++) { \
+            T a_val = ((T*)a_panel)[i*w+kk]; \
+            for(j=0; j<n; j++) \
+                ((T*)C)[i*n+j] += a_val*((T*)b_panel)[kk*n+j]; \
+        }
+
+// C = A*B using SUMMA: A (m x K) has columns divided across grid columns,
+// B (K x n) has rows divided across grid rows. Panels of A are broadcast
+// along processor rows and panels of B along processor columns, then
+// multiplied locally. A and B can have any strides (e.g. transposed views)
+// but C is contiguous.
+int hpat_dist_dot_2d(char* A, int64_t a_s0, int64_t a_s1, char* B,
+                    int64_t b_s0, int64_t b_s1, char* C, int64_t m, int64_t n,
+                    int64_t K, int type_enum)
+{
+    double stats_t0 = hpat_stats_start();
+    int rank, dims[2];
+    int64_t i, j, kk;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    get_grid_dims(dims);
+    int row = rank/dims[1];
+    int col = rank%dims[1];
+    // rank in row_comm is grid column, rank in col_comm is grid row
+    MPI_Comm row_comm, col_comm;
+    MPI_Comm_split(MPI_COMM_WORLD, row, col, &row_comm);
+    MPI_Comm_split(MPI_COMM_WORLD, col, row, &col_comm);
+    MPI_Datatype mpi_typ = get_MPI_typ(type_enum);
+    int elem_size = get_elem_size(type_enum);
+
+    // last chunk is the largest
+    int64_t max_w = get_chunk_count(K, dims[1], dims[1]-1);
+    int64_t b_max_w = get_chunk_count(K, dims[0], dims[0]-1);
+    if (b_max_w > max_w)
+        max_w = b_max_w;
+    char* a_panel = (char*)malloc(m*max_w*elem_size);
+    char* b_panel = (char*)malloc(max_w*n*elem_size);
+    memset(C, 0, m*n*elem_size);
+
+    // bytes of A and B panels broadcast to (or from) this rank
+    int64_t panel_bytes = 0;
+    int64_t k0 = 0;
+    while (k0 < K) {
+        // panel is the intersection of owner chunks of A columns and B rows
+        int a_owner = get_chunk_owner(k0, K, dims[1]);
+        int b_owner = get_chunk_owner(k0, K, dims[0]);
+        int64_t a_start = get_chunk_start(K, dims[1], a_owner);
+        int64_t b_start = get_chunk_start(K, dims[0], b_owner);
+        int64_t k1 = a_start + get_chunk_count(K, dims[1], a_owner);
+        int64_t b_end = b_start + get_chunk_count(K, dims[0], b_owner);
+        if (b_end < k1)
+            k1 = b_end;
+        int64_t w = k1-k0;
+
+        if (col==a_owner)
+            for(i=0; i<m; i++)
+                for(kk=0; kk<w; kk++)
+                    memcpy(a_panel+(i*w+kk)*elem_size,
+                            A+i*a_s0+(k0-a_start+kk)*a_s1, elem_size);
+        MPI_Bcast(a_panel, (int)(m*w), mpi_typ, a_owner, row_comm);
+        if (row==b_owner)
+            for(kk=0; kk<w; kk++)
+                for(j=0; j<n; j++)
+                    memcpy(b_panel+(kk*n+j)*elem_size,
+                            B+(k0-b_start+kk)*b_s0+j*b_s1, elem_size);
+        MPI_Bcast(b_panel, (int)(w*n), mpi_typ, b_owner, col_comm);
+        panel_bytes += (m*w+w*n)*elem_size;
+
+        switch (type_enum) {
+            case 0: HPAT_GEMM_ACC(char); break;
+            case 1: HPAT_GEMM_ACC(unsigned char); break;
+            case 2: HPAT_GEMM_ACC(int); break;
+            case 3: HPAT_GEMM_ACC(int64_t); break;
+            case 4: HPAT_GEMM_ACC(float); break;
+            case 5: HPAT_GEMM_ACC(double); break;
+        }
+        k0 = k1;
+    }
+    free(a_panel);
+    free(b_panel);
+    MPI_Comm_free(&row_comm);
+    MPI_Comm_free(&col_comm);
+    hpat_dist_stats_record(HPAT_STAT_DOT_2D, panel_bytes, stats_t0);
+    return 0;
+}
+
+// Redistribute M x N matrix from 2D block layout to the layout of the
+// transposed grid, i.e. processor (r,c) gets rows of chunk c over grid
+// columns and columns of chunk r over grid rows. This is the local data of
+// the transposed matrix (in transposed order) so X.T is a view of out.
+int hpat_dist_transpose_2d(char* in, char* out, int64_t M, int64_t N,
+                                                                int type_enum)
+{
+    double stats_t0 = hpat_stats_start();
+    int rank, num_pes, dims[2], pe;
+    int64_t i;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    get_grid_dims(dims);
+    int row = rank/dims[1];
+    int col = rank%dims[1];
+    MPI_Datatype mpi_typ = get_MPI_typ(type_enum);
+    int elem_size = get_elem_size(type_enum);
+    // my input block
+    int64_t in_r0 = get_chunk_start(M, dims[0], row);
+    int64_t in_nr = get_chunk_count(M, dims[0], row);
+    int64_t in_c0 = get_chunk_start(N, dims[1], col);
+    int64_t in_nc = get_chunk_count(N, dims[1], col);
+    // my output block
+    int64_t out_r0 = get_chunk_start(M, dims[1], col);
+    int64_t out_nr = get_chunk_count(M, dims[1], col);
+    int64_t out_c0 = get_chunk_start(N, dims[0], row);
+    int64_t out_nc = get_chunk_count(N, dims[0], row);
+
+    int* send_counts = (int*)malloc(num_pes*sizeof(int));
+    int* send_disps = (int*)malloc(num_pes*sizeof(int));
+    int* recv_counts = (int*)malloc(num_pes*sizeof(int));
+    int* recv_disps = (int*)malloc(num_pes*sizeof(int));
+    int64_t* send_rects = (int64_t*)malloc(4*num_pes*sizeof(int64_t));
+    int64_t* recv_rects = (int64_t*)malloc(4*num_pes*sizeof(int64_t));
+    int send_total = 0, recv_total = 0;
+    for(pe=0; pe<num_pes; pe++)
+    {
+        int pe_row = pe/dims[1];
+        int pe_col = pe%dims[1];
+        // intersection of my input block and pe's output block
+        int64_t r0 = get_chunk_start(M, dims[1], pe_col);
+        int64_t r1 = r0 + get_chunk_count(M, dims[1], pe_col);
+        int64_t c0 = get_chunk_start(N, dims[0], pe_row);
+        int64_t c1 = c0 + get_chunk_count(N, dims[0], pe_row);
+        int64_t* rect = send_rects+4*pe;
+        rect[0] = (r0 > in_r0) ? r0 : in_r0;
+        rect[1] = (r1 < in_r0+in_nr) ? r1 : in_r0+in_nr;
+        rect[2] = (c0 > in_c0) ? c0 : in_c0;
+        rect[3] = (c1 < in_c0+in_nc) ? c1 : in_c0+in_nc;
+        send_counts[pe] = (rect[1]>rect[0] && rect[3]>rect[2]) ?
+                            (int)((rect[1]-rect[0])*(rect[3]-rect[2])) : 0;
+        send_disps[pe] = send_total;
+        send_total += send_counts[pe];
+        // intersection of pe's input block and my output block
+        r0 = get_chunk_start(M, dims[0], pe_row);
+        r1 = r0 + get_chunk_count(M, dims[0], pe_row);
+        c0 = get_chunk_start(N, dims[1], pe_col);
+        c1 = c0 + get_chunk_count(N, dims[1], pe_col);
+        rect = recv_rects+4*pe;
+        rect[0] = (r0 > out_r0) ? r0 : out_r0;
+        rect[1] = (r1 < out_r0+out_nr) ? r1 : out_r0+out_nr;
+        rect[2] = (c0 > out_c0) ? c0 : out_c0;
+        rect[3] = (c1 < out_c0+out_nc) ? c1 : out_c0+out_nc;
+        recv_counts[pe] = (rect[1]>rect[0] && rect[3]>rect[2]) ?
+                            (int)((rect[1]-rect[0])*(rect[3]-rect[2])) : 0;
+        recv_disps[pe] = recv_total;
+        recv_total += recv_counts[pe];
+    }
+
+    // pack rectangles in row-major order
+    char* send_buf = (char*)malloc(send_total*elem_size);
+    char* recv_buf = (char*)malloc(recv_total*elem_size);
+    for(pe=0; pe<num_pes; pe++)
+    {
+        int64_t* rect = send_rects+4*pe;
+        char* buf = send_buf+send_disps[pe]*elem_size;
+        int64_t row_size = (rect[3]-rect[2])*elem_size;
+        if (send_counts[pe]==0)
+            continue;
+        for(i=rect[0]; i<rect[1]; i++)
+        {
+            memcpy(buf, in+((i-in_r0)*in_nc+rect[2]-in_c0)*elem_size, row_size);
+            buf += row_size;
+        }
+    }
+    MPI_Alltoallv(send_buf, send_counts, send_disps, mpi_typ,
+                  recv_buf, recv_counts, recv_disps, mpi_typ, MPI_COMM_WORLD);
+    for(pe=0; pe<num_pes; pe++)
+    {
+        int64_t* rect = recv_rects+4*pe;
+        char* buf = recv_buf+recv_disps[pe]*elem_size;
+        int64_t row_size = (rect[3]-rect[2])*elem_size;
+        if (recv_counts[pe]==0)
+            continue;
+        for(i=rect[0]; i<rect[1]; i++)
+        {
+            memcpy(out+((i-out_r0)*out_nc+rect[2]-out_c0)*elem_size, buf, row_size);
+            buf += row_size;
+        }
+    }
+    free(send_buf);
+    free(recv_buf);
+    free(send_counts);
+    free(send_disps);
+    free(recv_counts);
+    free(recv_disps);
+    free(send_rects);
+    free(recv_rects);
+    hpat_dist_stats_record(HPAT_STAT_TRANSPOSE_2D,
+                                       M*N*get_elem_size(type_enum), stats_t0);
+    return 0;
+}
+
+// Halo exchange of stencils. Halos of all arrays a stencil reads that go to
+// the same neighbor are packed into one message (arrays can have different
+// types so messages are in bytes).
+#define HPAT_HALO_TAG 22
+
+typedef struct {
+    int n_arrs;
+    char** left_bufs;
+    char** right_bufs;
+    int64_t* left_bytes;
+    int64_t* right_bytes;
+    int64_t left_total;
+    char* send_buf;
+    char* recv_buf;
+    MPI_Request reqs[4];
+} hpat_dist_halo;
+
+// Start exchange of halo rows of 1D distributed arrays: last left_rows[i]
+// rows of array i go to the next processor and its first right_rows[i] rows
+// go to the previous processor. Halos are written to left_bufs/right_bufs
+// in hpat_dist_halo_wait() so computation can overlap communication.
+int64_t hpat_dist_halo_start(int n_arrs, char** data, int64_t* rows,
+                    int64_t* row_bytes, char** left_bufs, int64_t* left_rows,
+                    char** right_bufs, int64_t* right_rows)
+{
+    double stats_t0 = hpat_stats_start();
+    int rank, num_pes, i;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    int prev = (rank>0) ? rank-1 : MPI_PROC_NULL;
+    int next = (rank<num_pes-1) ? rank+1 : MPI_PROC_NULL;
+
+    hpat_dist_halo* halo = (hpat_dist_halo*)malloc(sizeof(hpat_dist_halo));
+    halo->n_arrs = n_arrs;
+    halo->left_bufs = (char**)malloc(n_arrs*sizeof(char*));
+    halo->right_bufs = (char**)malloc(n_arrs*sizeof(char*));
+    halo->left_bytes = (int64_t*)malloc(n_arrs*sizeof(int64_t));
+    halo->right_bytes = (int64_t*)malloc(n_arrs*sizeof(int64_t));
+    int64_t left_total = 0, right_total = 0;
+    for(i=0; i<n_arrs; i++)
+    {
+        halo->left_bufs[i] = left_bufs[i];
+        halo->right_bufs[i] = right_bufs[i];
+        halo->left_bytes[i] = left_rows[i]*row_bytes[i];
+        halo->right_bytes[i] = right_rows[i]*row_bytes[i];
+        left_total += halo->left_bytes[i];
+        right_total += halo->right_bytes[i];
+    }
+    halo->left_total = left_total;
+    halo->send_buf = (char*)malloc(left_total+right_total);
+    halo->recv_buf = (char*)malloc(left_total+right_total);
+
+    // left halos of next processor, then right halos of previous processor
+    char* buf = halo->send_buf;
+    for(i=0; i<n_arrs; i++)
+    {
+        memcpy(buf, data[i]+(rows[i]-left_rows[i])*row_bytes[i],
+                                                        halo->left_bytes[i]);
+        buf += halo->left_bytes[i];
+    }
+    for(i=0; i<n_arrs; i++)
+    {
+        memcpy(buf, data[i], halo->right_bytes[i]);
+        buf += halo->right_bytes[i];
+    }
+    MPI_Irecv(halo->recv_buf, (int)left_total, MPI_BYTE, prev, HPAT_HALO_TAG,
+                                            MPI_COMM_WORLD, &halo->reqs[0]);
+    MPI_Irecv(halo->recv_buf+left_total, (int)right_total, MPI_BYTE, next,
+                            HPAT_HALO_TAG, MPI_COMM_WORLD, &halo->reqs[1]);
+    MPI_Isend(halo->send_buf, (int)left_total, MPI_BYTE, next, HPAT_HALO_TAG,
+                                            MPI_COMM_WORLD, &halo->reqs[2]);
+    MPI_Isend(halo->send_buf+left_total, (int)right_total, MPI_BYTE, prev,
+                            HPAT_HALO_TAG, MPI_COMM_WORLD, &halo->reqs[3]);
+    hpat_dist_stats_record(HPAT_STAT_HALO, left_total+right_total, stats_t0);
+    return (int64_t)(intptr_t)halo;
+}
+
+int hpat_dist_halo_wait(int64_t halo_ptr)
+{
+    double stats_t0 = hpat_stats_start();
+    int rank, num_pes, i;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    hpat_dist_halo* halo = (hpat_dist_halo*)(intptr_t)halo_ptr;
+    MPI_Waitall(4, halo->reqs, MPI_STATUSES_IGNORE);
+    // nothing is received on boundary processors, their buffers are kept
+    char* buf = halo->recv_buf;
+    for(i=0; i<halo->n_arrs; i++)
+    {
+        if (rank>0)
+            memcpy(halo->left_bufs[i], buf, halo->left_bytes[i]);
+        buf += halo->left_bytes[i];
+    }
+    for(i=0; i<halo->n_arrs; i++)
+    {
+        if (rank<num_pes-1)
+            memcpy(halo->right_bufs[i], buf, halo->right_bytes[i]);
+        buf += halo->right_bytes[i];
+    }
+    free(halo->left_bufs);
+    free(halo->right_bufs);
+    free(halo->left_bytes);
+    free(halo->right_bytes);
+    free(halo->send_buf);
+    free(halo->recv_buf);
+    free(halo);
+    hpat_dist_stats_record(HPAT_STAT_HALO_WAIT, 0, stats_t0);
+    return 0;
+}
+
+// copy rectangle [r0, r0+nr) x [c0, c0+nc) of row-major array with row width
+// w to/from contiguous buffer, returns end of data in buffer
+static char* halo_copy_rect(char* buf, char* arr, int64_t w, int64_t elem_size,
+                int64_t r0, int64_t nr, int64_t c0, int64_t nc, bool pack)
+{
+    int64_t i;
+    int64_t row_bytes = nc*elem_size;
+    // full rows are contiguous
+    if (nc==w)
+    {
+        row_bytes *= nr;
+        nr = (nr>0) ? 1 : 0;
+    }
+    for(i=r0; i<r0+nr; i++)
+    {
+        if (pack)
+            memcpy(buf, arr+(i*w+c0)*elem_size, row_bytes);
+        else
+            memcpy(arr+(i*w+c0)*elem_size, buf, row_bytes);
+        buf += row_bytes;
+    }
+    return buf;
+}
+
+// rectangles of ghost array (interior n0 x n1 with l0/r0 ghost rows and l1/r1
+// ghost columns) exchanged along dimension dim: [0] sent to next processor,
+// [1] sent to previous, [2] received from previous, [3] received from next.
+// Rows exchange full ghost width so corners are filled after columns.
+static void halo_rects(int64_t rects[4][4], int dim, int64_t n0, int64_t n1,
+                                            int l0, int r0, int l1, int r1)
+{
+    int i;
+    int64_t n = (dim==0) ? n0 : n1;
+    int64_t l = (dim==0) ? l0 : l1;
+    int64_t r = (dim==0) ? r0 : r1;
+    int64_t starts[4] = {n, l, 0, l+n};
+    int64_t counts[4] = {l, r, l, r};
+    for(i=0; i<4; i++)
+    {
+        rects[i][2*dim] = starts[i];
+        rects[i][2*dim+1] = counts[i];
+        if (dim==0)
+        {
+            rects[i][2] = 0;
+            rects[i][3] = n1+l1+r1;
+        }
+        else
+        {
+            rects[i][0] = l0;
+            rects[i][1] = n0;
+        }
+    }
+}
+
+static void halo_exchange_dim(int n_arrs, char** ext, int64_t* n0, int64_t* n1,
+        int64_t* elem_size, int l0, int r0, int l1, int r1, int dim, int prev,
+        int next)
+{
+    int i, j;
+    int64_t rects[4][4];
+    int64_t bytes[4] = {0, 0, 0, 0};
+    for(i=0; i<n_arrs; i++)
+    {
+        halo_rects(rects, dim, n0[i], n1[i], l0, r0, l1, r1);
+        for(j=0; j<4; j++)
+            bytes[j] += rects[j][1]*rects[j][3]*elem_size[i];
+    }
+    char* bufs[4];
+    for(j=0; j<4; j++)
+        bufs[j] = (char*)malloc(bytes[j]);
+    char* ptrs[4] = {bufs[0], bufs[1], bufs[2], bufs[3]};
+    for(i=0; i<n_arrs; i++)
+    {
+        int64_t w = n1[i]+l1+r1;
+        halo_rects(rects, dim, n0[i], n1[i], l0, r0, l1, r1);
+        for(j=0; j<2; j++)
+            ptrs[j] = halo_copy_rect(ptrs[j], ext[i], w, elem_size[i],
+                        rects[j][0], rects[j][1], rects[j][2], rects[j][3], true);
+    }
+    MPI_Request reqs[4];
+    MPI_Irecv(bufs[2], (int)bytes[2], MPI_BYTE, prev, HPAT_HALO_TAG,
+                                                MPI_COMM_WORLD, &reqs[0]);
+    MPI_Irecv(bufs[3], (int)bytes[3], MPI_BYTE, next, HPAT_HALO_TAG,
+                                                MPI_COMM_WORLD, &reqs[1]);
+    MPI_Isend(bufs[0], (int)bytes[0], MPI_BYTE, next, HPAT_HALO_TAG,
+                                                MPI_COMM_WORLD, &reqs[2]);
+    MPI_Isend(bufs[1], (int)bytes[1], MPI_BYTE, prev, HPAT_HALO_TAG,
+                                                MPI_COMM_WORLD, &reqs[3]);
+    MPI_Waitall(4, reqs, MPI_STATUSES_IGNORE);
+    for(i=0; i<n_arrs; i++)
+    {
+        int64_t w = n1[i]+l1+r1;
+        halo_rects(rects, dim, n0[i], n1[i], l0, r0, l1, r1);
+        for(j=2; j<4; j++)
+        {
+            // nothing received on boundaries of the domain
+            if ((j==2 && prev==MPI_PROC_NULL) || (j==3 && next==MPI_PROC_NULL))
+                continue;
+            ptrs[j] = halo_copy_rect(ptrs[j], ext[i], w, elem_size[i],
+                        rects[j][0], rects[j][1], rects[j][2], rects[j][3], false);
+        }
+    }
+    for(j=0; j<4; j++)
+        free(bufs[j]);
+}
+
+// Fill ghost arrays: copy local data (n0 rows of n1 elements) of each array
+// into interior of its ghost array and exchange ghost rows (and columns for
+// 2D distribution) with neighbor processors. Stencils read ghost arrays
+// directly, which supports any loop body and multi-dimensional offsets.
+int hpat_dist_halo_ghost(int n_arrs, char** ext, char** data, int64_t* n0,
+                    int64_t* n1, int64_t* elem_size, int l0, int r0, int l1,
+                    int r1, bool is_2d)
+{
+    int rank, num_pes, i;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    int prev0, next0, prev1 = MPI_PROC_NULL, next1 = MPI_PROC_NULL;
+    if (is_2d)
+    {
+        int dims[2];
+        get_grid_dims(dims);
+        int grid_row = rank/dims[1], grid_col = rank%dims[1];
+        prev0 = (grid_row>0) ? rank-dims[1] : MPI_PROC_NULL;
+        next0 = (grid_row<dims[0]-1) ? rank+dims[1] : MPI_PROC_NULL;
+        prev1 = (grid_col>0) ? rank-1 : MPI_PROC_NULL;
+        next1 = (grid_col<dims[1]-1) ? rank+1 : MPI_PROC_NULL;
+    }
+    else
+    {
+        prev0 = (rank>0) ? rank-1 : MPI_PROC_NULL;
+        next0 = (rank<num_pes-1) ? rank+1 : MPI_PROC_NULL;
+    }
+    for(i=0; i<n_arrs; i++)
+        halo_copy_rect(data[i], ext[i], n1[i]+l1+r1, elem_size[i], l0, n0[i],
+                                                        l1, n1[i], false);
+    if (l1!=0 || r1!=0)
+        halo_exchange_dim(n_arrs, ext, n0, n1, elem_size, l0, r0, l1, r1, 1,
+                                                                prev1, next1);
+    if (l0!=0 || r0!=0)
+        halo_exchange_dim(n_arrs, ext, n0, n1, elem_size, l0, r0, l1, r1, 0,
+                                                                prev0, next0);
+    return 0;
+}
+
+// Random access to 1D distributed arrays. Chunks can have any size (1D_Var)
+// so row ranges of all processors are gathered to find owners of indices.
+
+// starts[pe] is the first global row of processor pe, starts[num_pes] total
+static int64_t* get_chunk_starts(int64_t count, int num_pes)
+{
+    int pe;
+    int64_t* starts = (int64_t*)malloc((num_pes+1)*sizeof(int64_t));
+    MPI_Allgather(&count, 1, MPI_LONG_LONG_INT, starts+1, 1, MPI_LONG_LONG_INT,
+                                                            MPI_COMM_WORLD);
+    starts[0] = 0;
+    for(pe=0; pe<num_pes; pe++)
+        starts[pe+1] += starts[pe];
+    return starts;
+}
+
+// owner of global row ind (negative indices count from the end)
+static int find_owner(int64_t* starts, int num_pes, int64_t* ind)
+{
+    if (*ind<0)
+        *ind += starts[num_pes];
+    int lo = 0, hi = num_pes-1;
+    while (lo<hi)
+    {
+        int mid = (lo+hi+1)/2;
+        if (starts[mid]<=*ind)
+            lo = mid;
+        else
+            hi = mid-1;
+    }
+    return lo;
+}
+
+typedef struct {
+    MPI_Win win;
+    int64_t* starts;
+    int num_pes;
+    int rank;
+    int64_t elem_size;
+    char* data;
+} hpat_dist_rma;
+
+// expose local chunk of array in an MPI window for one-sided gets and puts
+// in parfors with data-dependent indices, collective
+int64_t hpat_dist_rma_create(char* data, int64_t count, int64_t elem_size)
+{
+    hpat_dist_rma* rma = (hpat_dist_rma*)malloc(sizeof(hpat_dist_rma));
+    MPI_Comm_rank(MPI_COMM_WORLD, &rma->rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &rma->num_pes);
+    rma->starts = get_chunk_starts(count, rma->num_pes);
+    rma->elem_size = elem_size;
+    rma->data = data;
+    MPI_Win_create(data, count*elem_size, (int)elem_size, MPI_INFO_NULL,
+                                                    MPI_COMM_WORLD, &rma->win);
+    MPI_Win_lock_all(0, rma->win);
+    return (int64_t)(intptr_t)rma;
+}
+
+int hpat_dist_rma_get(int64_t rma_ptr, int64_t ind, char* out)
+{
+    double stats_t0 = hpat_stats_start();
+    hpat_dist_rma* rma = (hpat_dist_rma*)(intptr_t)rma_ptr;
+    int owner = find_owner(rma->starts, rma->num_pes, &ind);
+    int64_t local_ind = ind-rma->starts[owner];
+    if (owner==rma->rank)
+    {
+        memcpy(out, rma->data+local_ind*rma->elem_size, rma->elem_size);
+        return 0;
+    }
+    MPI_Get(out, (int)rma->elem_size, MPI_BYTE, owner, (MPI_Aint)local_ind,
+                                (int)rma->elem_size, MPI_BYTE, rma->win);
+    MPI_Win_flush_local(owner, rma->win);
+    hpat_dist_stats_record(HPAT_STAT_RMA, rma->elem_size, stats_t0);
+    return 0;
+}
+
+// puts complete when the window is freed after the parfor
+int hpat_dist_rma_put(int64_t rma_ptr, int64_t ind, char* val)
+{
+    double stats_t0 = hpat_stats_start();
+    hpat_dist_rma* rma = (hpat_dist_rma*)(intptr_t)rma_ptr;
+    int owner = find_owner(rma->starts, rma->num_pes, &ind);
+    int64_t local_ind = ind-rma->starts[owner];
+    if (owner==rma->rank)
+    {
+        memcpy(rma->data+local_ind*rma->elem_size, val, rma->elem_size);
+        return 0;
+    }
+    MPI_Put(val, (int)rma->elem_size, MPI_BYTE, owner, (MPI_Aint)local_ind,
+                                (int)rma->elem_size, MPI_BYTE, rma->win);
+    MPI_Win_flush_local(owner, rma->win);
+    hpat_dist_stats_record(HPAT_STAT_RMA, rma->elem_size, stats_t0);
+    return 0;
+}
+
+int hpat_dist_rma_free(int64_t rma_ptr)
+{
+    hpat_dist_rma* rma = (hpat_dist_rma*)(intptr_t)rma_ptr;
+    MPI_Win_unlock_all(rma->win);
+    MPI_Win_free(&rma->win);
+    free(rma->starts);
+    free(rma);
+    return 0;
+}
+
+// out = A[inds] for 1D distributed A: indices are sent to their owners in
+// one batch per processor, which reply with the rows in the same order
+int hpat_dist_gather_index(char* data, int64_t count, int64_t row_bytes,
+                    int64_t* inds, int64_t n_inds, char* out)
+{
+    double stats_t0 = hpat_stats_start();
+    int rank, num_pes, pe;
+    int64_t i;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    int64_t* starts = get_chunk_starts(count, num_pes);
+
+    int* send_counts = (int*)calloc(num_pes, sizeof(int));
+    int* send_disps = (int*)malloc(num_pes*sizeof(int));
+    int* recv_counts = (int*)malloc(num_pes*sizeof(int));
+    int* recv_disps = (int*)malloc(num_pes*sizeof(int));
+    int* owners = (int*)malloc(n_inds*sizeof(int));
+    int64_t* local_inds = (int64_t*)malloc(n_inds*sizeof(int64_t));
+    for(i=0; i<n_inds; i++)
+    {
+        local_inds[i] = inds[i];
+        owners[i] = find_owner(starts, num_pes, &local_inds[i]);
+        local_inds[i] -= starts[owners[i]];
+        send_counts[owners[i]]++;
+    }
+    MPI_Alltoall(send_counts, 1, MPI_INT, recv_counts, 1, MPI_INT,
+                                                            MPI_COMM_WORLD);
+    int64_t n_recv = 0;
+    for(pe=0; pe<num_pes; pe++)
+    {
+        send_disps[pe] = (pe==0) ? 0 : send_disps[pe-1]+send_counts[pe-1];
+        recv_disps[pe] = (int)n_recv;
+        n_recv += recv_counts[pe];
+    }
+
+    // requested indices grouped by owner, keeping positions for the replies
+    int64_t* req_inds = (int64_t*)malloc(n_inds*sizeof(int64_t));
+    int64_t* positions = (int64_t*)malloc(n_inds*sizeof(int64_t));
+    int* offsets = (int*)malloc(num_pes*sizeof(int));
+    memcpy(offsets, send_disps, num_pes*sizeof(int));
+    for(i=0; i<n_inds; i++)
+    {
+        int64_t pos = offsets[owners[i]]++;
+        req_inds[pos] = local_inds[i];
+        positions[pos] = i;
+    }
+    int64_t* recv_inds = (int64_t*)malloc(n_recv*sizeof(int64_t));
+    MPI_Alltoallv(req_inds, send_counts, send_disps, MPI_LONG_LONG_INT,
+        recv_inds, recv_counts, recv_disps, MPI_LONG_LONG_INT, MPI_COMM_WORLD);
+
+    // reply with requested rows, counts are in rows of row_bytes
+    MPI_Datatype row_typ;
+    MPI_Type_contiguous((int)row_bytes, MPI_BYTE, &row_typ);
+    MPI_Type_commit(&row_typ);
+    char* reply = (char*)malloc(n_recv*row_bytes);
+    for(i=0; i<n_recv; i++)
+        memcpy(reply+i*row_bytes, data+recv_inds[i]*row_bytes, row_bytes);
+    char* rows = (char*)malloc(n_inds*row_bytes);
+    MPI_Alltoallv(reply, recv_counts, recv_disps, row_typ,
+                    rows, send_counts, send_disps, row_typ, MPI_COMM_WORLD);
+    for(i=0; i<n_inds; i++)
+        memcpy(out+positions[i]*row_bytes, rows+i*row_bytes, row_bytes);
+
+    MPI_Type_free(&row_typ);
+    free(starts);
+    free(send_counts);
+    free(send_disps);
+    free(recv_counts);
+    free(recv_disps);
+    free(owners);
+    free(local_inds);
+    free(req_inds);
+    free(positions);
+    free(offsets);
+    free(recv_inds);
+    free(reply);
+    free(rows);
+    hpat_dist_stats_record(HPAT_STAT_GATHER_INDEX, n_inds*row_bytes, stats_t0);
+    return 0;
+}
+
+// Parallel sample sort of 1D arrays. Records of (key, global index) are
+// sorted locally, regular samples of all processors select splitters,
+// records are exchanged with Alltoallv and the sorted runs received are
+// merged. Output chunk sizes depend on the data (1D_Var distribution).
+
+#define HPAT_SORT_CMP(typ, a, b) { typ x, y; memcpy(&x, a, sizeof(typ)); \
+        memcpy(&y, b, sizeof(typ)); return (x>y)-(x<y); }
+// NaNs are sorted last like NumPy
+#define HPAT_SORT_CMP_FLOAT(typ, a, b) { typ x, y; memcpy(&x, a, sizeof(typ)); \
+        memcpy(&y, b, sizeof(typ)); \
+        if (isnan(x) || isnan(y)) { return (isnan(x)!=0)-(isnan(y)!=0); } \
+        return (x>y)-(x<y); }
+
+static int sort_compare_keys(const char* a, const char* b, int type_enum)
+{
+    switch (type_enum) {
+        case 0: HPAT_SORT_CMP(int8_t, a, b)
+        case 1: HPAT_SORT_CMP(uint8_t, a, b)
+        case 2: HPAT_SORT_CMP(int32_t, a, b)
+        case 3: HPAT_SORT_CMP(int64_t, a, b)
+        case 4: HPAT_SORT_CMP_FLOAT(float, a, b)
+        case 5: HPAT_SORT_CMP_FLOAT(double, a, b)
+        default:
+            fprintf(stderr, "Invalid sort data type\n");
+    }
+    return 0;
+}
+
+// qsort doesn't pass context to comparators
+static int hpat_sort_type_enum;
+
+static int sort_compare_records(const void* a, const void* b)
+{
+    return sort_compare_keys((const char*)a, (const char*)b,
+                                                        hpat_sort_type_enum);
+}
+
+// merge sorted runs of records in place, runs[i] is the start of run i and
+// runs[n_runs] the end of the last run
+static void merge_runs(char* recs, int64_t* runs, int n_runs, int rec_size,
+                                                                int type_enum)
+{
+    char* tmp = (char*)malloc(runs[n_runs]*rec_size);
+    int width, i;
+    for(width=1; width<n_runs; width*=2)
+    {
+        for(i=0; i+width<n_runs; i+=2*width)
+        {
+            int64_t lo = runs[i], mid = runs[i+width];
+            int64_t hi = runs[(i+2*width<n_runs) ? i+2*width : n_runs];
+            int64_t l = lo, r = mid, k = lo;
+            while (l<mid && r<hi)
+            {
+                if (sort_compare_keys(recs+r*rec_size, recs+l*rec_size,
+                                                                type_enum)<0)
+                    memcpy(tmp+(k++)*rec_size, recs+(r++)*rec_size, rec_size);
+                else
+                    memcpy(tmp+(k++)*rec_size, recs+(l++)*rec_size, rec_size);
+            }
+            memcpy(tmp+k*rec_size, recs+l*rec_size, (mid-l)*rec_size);
+            k += mid-l;
+            memcpy(tmp+k*rec_size, recs+r*rec_size, (hi-r)*rec_size);
+            memcpy(recs+lo*rec_size, tmp+lo*rec_size, (hi-lo)*rec_size);
+        }
+    }
+    free(tmp);
+}
+
+typedef struct {
+    char* recs;
+    int64_t n;
+    int elem_size;
+} hpat_dist_sort_t;
+
+int64_t hpat_dist_sort(char* data, int64_t n, int type_enum)
+{
+    double stats_t0 = hpat_stats_start();
+    int rank, num_pes, pe;
+    int64_t i;
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    int elem_size = get_elem_size(type_enum);
+    int rec_size = elem_size + (int)sizeof(int64_t);
+
+    // local records with global indices
+    int64_t start = 0;
+    MPI_Exscan(&n, &start, 1, MPI_LONG_LONG_INT, MPI_SUM, MPI_COMM_WORLD);
+    if (rank==0)
+        start = 0;
+    char* recs = (char*)malloc((n+1)*rec_size);
+    for(i=0; i<n; i++)
+    {
+        int64_t ind = start + i;
+        memcpy(recs+i*rec_size, data+i*elem_size, elem_size);
+        memcpy(recs+i*rec_size+elem_size, &ind, sizeof(int64_t));
+    }
+    hpat_sort_type_enum = type_enum;
+    qsort(recs, n, rec_size, sort_compare_records);
+
+    // regular samples of local data
+    int n_samples = (n<num_pes-1) ? (int)n : num_pes-1;
+    char* samples = (char*)malloc((n_samples+1)*elem_size);
+    for(i=0; i<n_samples; i++)
+        memcpy(samples+i*elem_size, recs+((i+1)*n/(n_samples+1))*rec_size,
+                                                                    elem_size);
+    int* sample_counts = (int*)malloc(num_pes*sizeof(int));
+    int* sample_disps = (int*)malloc(num_pes*sizeof(int));
+    int sample_bytes = n_samples*elem_size;
+    MPI_Allgather(&sample_bytes, 1, MPI_INT, sample_counts, 1, MPI_INT,
+                                                            MPI_COMM_WORLD);
+    int all_bytes = 0;
+    for(pe=0; pe<num_pes; pe++)
+    {
+        sample_disps[pe] = all_bytes;
+        all_bytes += sample_counts[pe];
+    }
+    char* all_samples = (char*)malloc(all_bytes+elem_size);
+    MPI_Allgatherv(samples, sample_bytes, MPI_BYTE, all_samples,
+                    sample_counts, sample_disps, MPI_BYTE, MPI_COMM_WORLD);
+    int64_t n_all = all_bytes/elem_size;
+    qsort(all_samples, n_all, elem_size, sort_compare_records);
+
+    // processor pe receives keys in [splitter pe-1, splitter pe)
+    int* send_counts = (int*)calloc(num_pes, sizeof(int));
+    int* send_disps = (int*)malloc(num_pes*sizeof(int));
+    int* recv_counts = (int*)malloc(num_pes*sizeof(int));
+    int* recv_disps = (int*)malloc(num_pes*sizeof(int));
+    pe = 0;
+    for(i=0; i<n; i++)
+    {
+        while (pe<num_pes-1 && n_all>0 && sort_compare_keys(recs+i*rec_size,
+                all_samples+((pe+1)*n_all/num_pes)*elem_size, type_enum)>=0)
+            pe++;
+        send_counts[pe]++;
+    }
+    MPI_Alltoall(send_counts, 1, MPI_INT, recv_counts, 1, MPI_INT,
+                                                            MPI_COMM_WORLD);
+    int64_t* runs = (int64_t*)malloc((num_pes+1)*sizeof(int64_t));
+    int64_t n_recv = 0;
+    for(pe=0; pe<num_pes; pe++)
+    {
+        send_disps[pe] = (pe==0) ? 0 : send_disps[pe-1]+send_counts[pe-1];
+        recv_disps[pe] = (int)n_recv;
+        runs[pe] = n_recv;
+        n_recv += recv_counts[pe];
+    }
+    runs[num_pes] = n_recv;
+
+    MPI_Datatype rec_typ;
+    MPI_Type_contiguous(rec_size, MPI_BYTE, &rec_typ);
+    MPI_Type_commit(&rec_typ);
+    char* out_recs = (char*)malloc((n_recv+1)*rec_size);
+    MPI_Alltoallv(recs, send_counts, send_disps, rec_typ, out_recs,
+                    recv_counts, recv_disps, rec_typ, MPI_COMM_WORLD);
+    merge_runs(out_recs, runs, num_pes, rec_size, type_enum);
+
+    MPI_Type_free(&rec_typ);
+    free(recs);
+    free(samples);
+    free(sample_counts);
+    free(sample_disps);
+    free(all_samples);
+    free(send_counts);
+    free(send_disps);
+    free(recv_counts);
+    free(recv_disps);
+    free(runs);
+
+    hpat_dist_sort_t* sort = (hpat_dist_sort_t*)malloc(sizeof(hpat_dist_sort_t));
+    sort->recs = out_recs;
+    sort->n = n_recv;
+    sort->elem_size = elem_size;
+    hpat_dist_stats_record(HPAT_STAT_SORT,
+                                         n*get_elem_size(type_enum), stats_t0);
+    return (int64_t)(intptr_t)sort;
+}
+
+// number of local output elements, used to allocate output array
+int64_t hpat_dist_sort_count(int64_t sort_ptr)
+{
+    return ((hpat_dist_sort_t*)(intptr_t)sort_ptr)->n;
+}
+
+// copy sorted keys (or their global indices for argsort) to output
+int hpat_dist_sort_finish(int64_t sort_ptr, char* out, bool is_argsort)
+{
+    double stats_t0 = hpat_stats_start();
+    hpat_dist_sort_t* sort = (hpat_dist_sort_t*)(intptr_t)sort_ptr;
+    int elem_size = sort->elem_size;
+    int rec_size = elem_size + (int)sizeof(int64_t);
+    int64_t i;
+    for(i=0; i<sort->n; i++)
+    {
+        if (is_argsort)
+            memcpy(out+i*sizeof(int64_t), sort->recs+i*rec_size+elem_size,
+                                                            sizeof(int64_t));
+        else
+            memcpy(out+i*elem_size, sort->recs+i*rec_size, elem_size);
+    }
+    free(sort->recs);
+    free(sort);
+    hpat_dist_stats_record(HPAT_STAT_SORT, 0, stats_t0);
+    return 0;
+}
+
+// Hash partitioning of rows by key (shuffle), which sends rows with equal
+// keys to the same processor for groupby and join. Start computes the
+// destinations and exchanges counts so output arrays can be allocated,
+// finish packs and exchanges any number of columns.
+
+// value of integer (int64) or float (double) element
+static void read_value(const char* p, int type_enum, int64_t* i_val,
+                                                                double* f_val)
+{
+    switch (type_enum) {
+        case 0: { int8_t v; memcpy(&v, p, 1); *i_val = v; break; }
+        case 1: { uint8_t v; memcpy(&v, p, 1); *i_val = v; break; }
+        case 2: { int32_t v; memcpy(&v, p, 4); *i_val = v; break; }
+        case 3: memcpy(i_val, p, 8); break;
+        case 4: { float v; memcpy(&v, p, 4); *f_val = v; break; }
+        case 5: memcpy(f_val, p, 8); break;
+        default:
+            fprintf(stderr, "Invalid data type\n");
+    }
+}
+
+// keys are compared and hashed by value so equal int8/int32/int64 (or
+// float32/float64) keys of different arrays are the same
+static uint64_t key_bits(const char* key, int type_enum)
+{
+    uint64_t h = 0;
+    int64_t i_val = 0;
+    double f_val = 0.0;
+    read_value(key, type_enum, &i_val, &f_val);
+    if (type_enum<4)
+        return (uint64_t)i_val;
+    // all NaNs and both zeros are the same
+    if (isnan(f_val))
+        f_val = NAN;
+    if (f_val==0.0)
+        f_val = 0.0;
+    memcpy(&h, &f_val, 8);
+    return h;
+}
+
+static uint64_t hash_key(const char* key, int type_enum)
+{
+    uint64_t h = key_bits(key, type_enum);
+    // splitmix64 finalizer
+    h ^= h >> 30;
+    h *= 0xbf58476d1ce4e5b9ULL;
+    h ^= h >> 27;
+    h *= 0x94d049bb133111ebULL;
+    h ^= h >> 31;
+    return h;
+}
+
+typedef struct {
+    int64_t n_rows;
+    int64_t n_recv;
+    // position of each local row in send buffers
+    int64_t* send_pos;
+    int* send_counts;
+    int* send_disps;
+    int* recv_counts;
+    int* recv_disps;
+} hpat_dist_shuffle_t;
+
+int64_t hpat_dist_shuffle_start(char* keys, int64_t n_rows, int type_enum)
+{
+    double stats_t0 = hpat_stats_start();
+    int num_pes, pe;
+    int64_t i;
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    int elem_size = get_elem_size(type_enum);
+    hpat_dist_shuffle_t* shuffle = (hpat_dist_shuffle_t*)malloc(
+                                                sizeof(hpat_dist_shuffle_t));
+    shuffle->n_rows = n_rows;
+    shuffle->send_pos = (int64_t*)malloc((n_rows+1)*sizeof(int64_t));
+    shuffle->send_counts = (int*)calloc(num_pes, sizeof(int));
+    shuffle->send_disps = (int*)malloc(num_pes*sizeof(int));
+    shuffle->recv_counts = (int*)malloc(num_pes*sizeof(int));
+    shuffle->recv_disps = (int*)malloc(num_pes*sizeof(int));
+    int* dests = (int*)malloc((n_rows+1)*sizeof(int));
+
+    // count rows of each destination
+    for(i=0; i<n_rows; i++)
+    {
+        dests[i] = (int)(hash_key(keys+i*elem_size, type_enum)
+                                                        % (uint64_t)num_pes);
+        shuffle->send_counts[dests[i]]++;
+    }
+    MPI_Alltoall(shuffle->send_counts, 1, MPI_INT, shuffle->recv_counts, 1,
+                                                    MPI_INT, MPI_COMM_WORLD);
+    // exclusive scan of counts gives offsets in send and receive buffers
+    shuffle->n_recv = 0;
+    for(pe=0; pe<num_pes; pe++)
+    {
+        shuffle->send_disps[pe] = (pe==0) ? 0
+                    : shuffle->send_disps[pe-1]+shuffle->send_counts[pe-1];
+        shuffle->recv_disps[pe] = (int)shuffle->n_recv;
+        shuffle->n_recv += shuffle->recv_counts[pe];
+    }
+    int* offsets = (int*)malloc(num_pes*sizeof(int));
+    memcpy(offsets, shuffle->send_disps, num_pes*sizeof(int));
+    for(i=0; i<n_rows; i++)
+        shuffle->send_pos[i] = offsets[dests[i]]++;
+    free(offsets);
+    free(dests);
+    hpat_dist_stats_record(HPAT_STAT_SHUFFLE,
+                                    n_rows*get_elem_size(type_enum), stats_t0);
+    return (int64_t)(intptr_t)shuffle;
+}
+
+// number of rows received, used to allocate output arrays
+int64_t hpat_dist_shuffle_count(int64_t shuffle_ptr)
+{
+    return ((hpat_dist_shuffle_t*)(intptr_t)shuffle_ptr)->n_recv;
+}
+
+// pack rows of all arrays by destination and exchange them, frees shuffle
+int hpat_dist_shuffle_finish(int64_t shuffle_ptr, int n_arrs, char** in_data,
+                    char** out_data, int64_t* row_bytes)
+{
+    double stats_t0 = hpat_stats_start();
+    hpat_dist_shuffle_t* shuffle = (hpat_dist_shuffle_t*)(intptr_t)shuffle_ptr;
+    int64_t n_rows = shuffle->n_rows;
+    int64_t max_row_bytes = 0;
+    int64_t i;
+    int k;
+    for(k=0; k<n_arrs; k++)
+        if (row_bytes[k]>max_row_bytes)
+            max_row_bytes = row_bytes[k];
+    char* send_buf = (char*)malloc((n_rows+1)*max_row_bytes);
+
+    for(k=0; k<n_arrs; k++)
+    {
+        char* in = in_data[k];
+        int64_t rb = row_bytes[k];
+        // typed copies for common element sizes
+        if (rb==8)
+            for(i=0; i<n_rows; i++)
+                ((int64_t*)send_buf)[shuffle->send_pos[i]] = ((int64_t*)in)[i];
+        else if (rb==4)
+            for(i=0; i<n_rows; i++)
+                ((int32_t*)send_buf)[shuffle->send_pos[i]] = ((int32_t*)in)[i];
+        else
+            for(i=0; i<n_rows; i++)
+                memcpy(send_buf+shuffle->send_pos[i]*rb, in+i*rb, rb);
+        MPI_Datatype row_typ;
+        MPI_Type_contiguous((int)rb, MPI_BYTE, &row_typ);
+        MPI_Type_commit(&row_typ);
+        MPI_Alltoallv(send_buf, shuffle->send_counts, shuffle->send_disps,
+            row_typ, out_data[k], shuffle->recv_counts, shuffle->recv_disps,
+            row_typ, MPI_COMM_WORLD);
+        MPI_Type_free(&row_typ);
+    }
+
+    free(send_buf);
+    free(shuffle->send_pos);
+    free(shuffle->send_counts);
+    free(shuffle->send_disps);
+    free(shuffle->recv_counts);
+    free(shuffle->recv_disps);
+    free(shuffle);
+    hpat_dist_stats_record(HPAT_STAT_SHUFFLE, 0, stats_t0);
+    return 0;
+}
+
+// Hash aggregation of columns by key for groupby. Each output column
+// applies an operation to an input column (and an auxiliary column for
+// ratios). Rows with NaN keys are dropped and NaN values are skipped like
+// Pandas. Groups are sorted by key in output.
+
+#define HPAT_AGG_SUM 0
+#define HPAT_AGG_MIN 1
+#define HPAT_AGG_MAX 2
+#define HPAT_AGG_COUNT 3
+#define HPAT_AGG_MEAN 4
+// sum of column over sum of auxiliary column, merges partial means
+#define HPAT_AGG_RATIO 5
+
+typedef struct {
+    int64_t n_groups;
+    int key_type;
+    int n_out;
+    char* keys;
+    int64_t* ops;
+    // float accumulators are used for float inputs, means and ratios
+    bool* is_float;
+    int64_t** i_acc;
+    double** f_acc;
+    double** aux_acc;
+    int64_t** counts;
+} hpat_dist_agg_t;
+
+int64_t hpat_dist_agg_start(char* keys, int64_t n_rows, int key_type,
+                    int n_in, char** in_data, int* in_types, int n_out,
+                    int64_t* ops, int64_t* in_cols, int64_t* aux_cols)
+{
+    double stats_t0 = hpat_stats_start();
+    int64_t i, g;
+    int k;
+    int key_size = get_elem_size(key_type);
+    hpat_dist_agg_t* agg = (hpat_dist_agg_t*)malloc(sizeof(hpat_dist_agg_t));
+    agg->key_type = key_type;
+    agg->n_out = n_out;
+    agg->ops = (int64_t*)malloc(n_out*sizeof(int64_t));
+    memcpy(agg->ops, ops, n_out*sizeof(int64_t));
+    agg->is_float = (bool*)malloc(n_out*sizeof(bool));
+    agg->i_acc = (int64_t**)malloc(n_out*sizeof(int64_t*));
+    agg->f_acc = (double**)malloc(n_out*sizeof(double*));
+    agg->aux_acc = (double**)malloc(n_out*sizeof(double*));
+    agg->counts = (int64_t**)malloc(n_out*sizeof(int64_t*));
+    for(k=0; k<n_out; k++)
+    {
+        agg->is_float[k] = in_types[in_cols[k]]>=4 || ops[k]==HPAT_AGG_MEAN
+                                                    || ops[k]==HPAT_AGG_RATIO;
+        agg->i_acc[k] = (int64_t*)calloc(n_rows+1, sizeof(int64_t));
+        agg->f_acc[k] = (double*)calloc(n_rows+1, sizeof(double));
+        agg->aux_acc[k] = (double*)calloc(n_rows+1, sizeof(double));
+        agg->counts[k] = (int64_t*)calloc(n_rows+1, sizeof(int64_t));
+    }
+    agg->keys = (char*)malloc((n_rows+1)*key_size);
+
+    // open addressing table of group ids, capacity is a power of 2
+    int64_t capacity = 16;
+    while (capacity<2*n_rows)
+        capacity *= 2;
+    int64_t* table = (int64_t*)malloc(capacity*sizeof(int64_t));
+    for(i=0; i<capacity; i++)
+        table[i] = -1;
+    int64_t n_groups = 0;
+
+    for(i=0; i<n_rows; i++)
+    {
+        char* key = keys+i*key_size;
+        int64_t i_key = 0;
+        double f_key = 0.0;
+        read_value(key, key_type, &i_key, &f_key);
+        if (key_type>=4 && isnan(f_key))
+            continue;
+        uint64_t bits = key_bits(key, key_type);
+        int64_t slot = (int64_t)(hash_key(key, key_type) & (capacity-1));
+        while (table[slot]!=-1 && key_bits(agg->keys+table[slot]*key_size,
+                                                            key_type)!=bits)
+            slot = (slot+1) & (capacity-1);
+        if (table[slot]==-1)
+        {
+            table[slot] = n_groups;
+            memcpy(agg->keys+n_groups*key_size, key, key_size);
+            n_groups++;
+        }
+        g = table[slot];
+
+        for(k=0; k<n_out; k++)
+        {
+            int typ = in_types[in_cols[k]];
+            int64_t i_val = 0;
+            double f_val = 0.0;
+            read_value(in_data[in_cols[k]]+i*get_elem_size(typ), typ, &i_val,
+                                                                    &f_val);
+            bool is_float_in = typ>=4;
+            if (is_float_in && isnan(f_val))
+                continue;
+            if (!is_float_in)
+                f_val = (double)i_val;
+            int64_t cnt = agg->counts[k][g]++;
+            switch (ops[k]) {
+                case HPAT_AGG_SUM:
+                    agg->i_acc[k][g] += i_val;
+                    agg->f_acc[k][g] += f_val;
+                    break;
+                case HPAT_AGG_MIN:
+                    if (cnt==0 || i_val<agg->i_acc[k][g])
+                        agg->i_acc[k][g] = i_val;
+                    if (cnt==0 || f_val<agg->f_acc[k][g])
+                        agg->f_acc[k][g] = f_val;
+                    break;
+                case HPAT_AGG_MAX:
+                    if (cnt==0 || i_val>agg->i_acc[k][g])
+                        agg->i_acc[k][g] = i_val;
+                    if (cnt==0 || f_val>agg->f_acc[k][g])
+                        agg->f_acc[k][g] = f_val;
+                    break;
+                case HPAT_AGG_MEAN:
+                    agg->f_acc[k][g] += f_val;
+                    break;
+                case HPAT_AGG_RATIO:
+                {
+                    int aux_typ = in_types[aux_cols[k]];
+                    int64_t i_aux = 0;
+                    double f_aux = 0.0;
+                    read_value(in_data[aux_cols[k]]+i*get_elem_size(aux_typ),
+                                                    aux_typ, &i_aux, &f_aux);
+                    agg->f_acc[k][g] += f_val;
+                    agg->aux_acc[k][g] += (aux_typ>=4) ? f_aux : (double)i_aux;
+                    break;
+                }
+                default:
+                    break;
+            }
+        }
+    }
+    free(table);
+    agg->n_groups = n_groups;
+    hpat_dist_stats_record(HPAT_STAT_AGG,
+                                     n_rows*get_elem_size(key_type), stats_t0);
+    return (int64_t)(intptr_t)agg;
+}
+
+// number of groups, used to allocate output arrays
+int64_t hpat_dist_agg_count(int64_t agg_ptr)
+{
+    return ((hpat_dist_agg_t*)(intptr_t)agg_ptr)->n_groups;
+}
+
+static void write_value(char* p, int type_enum, int64_t i_val, double f_val,
+                                                                bool is_float)
+{
+    if (!is_float)
+        f_val = (double)i_val;
+    else if (type_enum<4)
+        i_val = (int64_t)f_val;
+    switch (type_enum) {
+        case 0: { int8_t v = (int8_t)i_val; memcpy(p, &v, 1); break; }
+        case 1: { uint8_t v = (uint8_t)i_val; memcpy(p, &v, 1); break; }
+        case 2: { int32_t v = (int32_t)i_val; memcpy(p, &v, 4); break; }
+        case 3: memcpy(p, &i_val, 8); break;
+        case 4: { float v = (float)f_val; memcpy(p, &v, 4); break; }
+        case 5: memcpy(p, &f_val, 8); break;
+        default:
+            fprintf(stderr, "Invalid data type\n");
+    }
+}
+
+// qsort doesn't pass context to comparators
+static char* hpat_agg_sort_keys;
+static int hpat_agg_key_type;
+
+static int agg_compare_groups(const void* a, const void* b)
+{
+    int key_size = get_elem_size(hpat_agg_key_type);
+    return sort_compare_keys(hpat_agg_sort_keys+(*(int64_t*)a)*key_size,
+        hpat_agg_sort_keys+(*(int64_t*)b)*key_size, hpat_agg_key_type);
+}
+
+// write keys and aggregated values of groups sorted by key, frees agg
+int hpat_dist_agg_finish(int64_t agg_ptr, char* out_keys, char** out_data,
+                    int* out_types)
+{
+    double stats_t0 = hpat_stats_start();
+    hpat_dist_agg_t* agg = (hpat_dist_agg_t*)(intptr_t)agg_ptr;
+    int64_t n_groups = agg->n_groups;
+    int key_size = get_elem_size(agg->key_type);
+    int64_t i;
+    int k;
+    int64_t* order = (int64_t*)malloc((n_groups+1)*sizeof(int64_t));
+    for(i=0; i<n_groups; i++)
+        order[i] = i;
+    hpat_agg_sort_keys = agg->keys;
+    hpat_agg_key_type = agg->key_type;
+    qsort(order, n_groups, sizeof(int64_t), agg_compare_groups);
+
+    for(i=0; i<n_groups; i++)
+    {
+        int64_t g = order[i];
+        memcpy(out_keys+i*key_size, agg->keys+g*key_size, key_size);
+        for(k=0; k<agg->n_out; k++)
+        {
+            char* p = out_data[k]+i*get_elem_size(out_types[k]);
+            int64_t cnt = agg->counts[k][g];
+            switch (agg->ops[k]) {
+                case HPAT_AGG_COUNT:
+                    write_value(p, out_types[k], cnt, 0.0, false);
+                    break;
+                case HPAT_AGG_MEAN:
+                    write_value(p, out_types[k], 0, (cnt==0) ? NAN
+                                        : agg->f_acc[k][g]/cnt, true);
+                    break;
+                case HPAT_AGG_RATIO:
+                    write_value(p, out_types[k], 0, (agg->aux_acc[k][g]==0.0)
+                        ? NAN : agg->f_acc[k][g]/agg->aux_acc[k][g], true);
+                    break;
+                case HPAT_AGG_MIN:
+                case HPAT_AGG_MAX:
+                    // min/max of all NaN values is NaN
+                    if (cnt==0 && agg->is_float[k])
+                    {
+                        write_value(p, out_types[k], 0, NAN, true);
+                        break;
+                    }
+                    // fall through
+                default:
+                    write_value(p, out_types[k], agg->i_acc[k][g],
+                                        agg->f_acc[k][g], agg->is_float[k]);
+            }
+        }
+    }
+
+    free(order);
+    for(k=0; k<agg->n_out; k++)
+    {
+        free(agg->i_acc[k]);
+        free(agg->f_acc[k]);
+        free(agg->aux_acc[k]);
+        free(agg->counts[k]);
+    }
+    free(agg->i_acc);
+    free(agg->f_acc);
+    free(agg->aux_acc);
+    free(agg->counts);
+    free(agg->is_float);
+    free(agg->ops);
+    free(agg->keys);
+    free(agg);
+    hpat_dist_stats_record(HPAT_STAT_AGG, 0, stats_t0);
+    return 0;
+}
+
+// Inner hash join of two tables on key columns for merge. Arguments are
+// arrays of two elements (left and right tables), data has the columns of
+// left table followed by the columns of right table. If both tables are
+// distributed, the smaller one is broadcast (allgathered) if it has less
+// than HPAT_BCAST_JOIN_ROWS rows, otherwise both are shuffled by key.
+// A distributed table can be joined with a replicated table locally.
+
+#ifndef HPAT_BCAST_JOIN_ROWS
+#define HPAT_BCAST_JOIN_ROWS 100000
+#endif
+
+typedef struct {
+    int64_t n_out;
+    // matching row pairs
+    int64_t* left_rows;
+    int64_t* right_rows;
+    int n_cols[2];
+    int64_t* row_bytes;
+    int key_sizes[2];
+    // tables after broadcast or shuffle, NULL if input tables are used
+    char* keys[2];
+    char** data[2];
+} hpat_dist_join_t;
+
+// allgather rows of array with row_bytes to all processors
+static char* join_allgather(char* data, int64_t n_rows, int64_t row_bytes,
+                                                                int num_pes)
+{
+    int pe;
+    int64_t* all_rows = (int64_t*)malloc(num_pes*sizeof(int64_t));
+    MPI_Allgather(&n_rows, 1, MPI_LONG_LONG_INT, all_rows, 1,
+                                            MPI_LONG_LONG_INT, MPI_COMM_WORLD);
+    int* counts = (int*)malloc(num_pes*sizeof(int));
+    int* disps = (int*)malloc(num_pes*sizeof(int));
+    int64_t total = 0;
+    for(pe=0; pe<num_pes; pe++)
+    {
+        counts[pe] = (int)all_rows[pe];
+        disps[pe] = (int)total;
+        total += all_rows[pe];
+    }
+    MPI_Datatype row_typ;
+    MPI_Type_contiguous((int)row_bytes, MPI_BYTE, &row_typ);
+    MPI_Type_commit(&row_typ);
+    char* out = (char*)malloc((total+1)*row_bytes);
+    MPI_Allgatherv(data, (int)n_rows, row_typ, out, counts, disps, row_typ,
+                                                            MPI_COMM_WORLD);
+    MPI_Type_free(&row_typ);
+    free(all_rows);
+    free(counts);
+    free(disps);
+    return out;
+}
+
+int64_t hpat_dist_join_start(char** keys, int64_t* n_rows, int* key_types,
+                    int* n_cols, char** data, int64_t* row_bytes,
+                    bool* is_parallel)
+{
+    double stats_t0 = hpat_stats_start();
+    int num_pes, t, k;
+    int64_t i;
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    hpat_dist_join_t* join = (hpat_dist_join_t*)malloc(sizeof(hpat_dist_join_t));
+    int n_all_cols = n_cols[0] + n_cols[1];
+    join->row_bytes = (int64_t*)malloc((n_all_cols+1)*sizeof(int64_t));
+    memcpy(join->row_bytes, row_bytes, n_all_cols*sizeof(int64_t));
+    char** tab_keys = keys;
+    char** tab_data[2] = {data, data+n_cols[0]};
+    int64_t tab_rows[2] = {n_rows[0], n_rows[1]};
+    for(t=0; t<2; t++)
+    {
+        join->n_cols[t] = n_cols[t];
+        join->key_sizes[t] = get_elem_size(key_types[t]);
+        join->keys[t] = NULL;
+        join->data[t] = NULL;
+    }
+
+    if (is_parallel[0] && is_parallel[1] && num_pes>1)
+    {
+        int64_t totals[2];
+        MPI_Allreduce(n_rows, totals, 2, MPI_LONG_LONG_INT, MPI_SUM,
+                                                            MPI_COMM_WORLD);
+        int small = (totals[0]<=totals[1]) ? 0 : 1;
+        for(t=0; t<2; t++)
+        {
+            if (totals[small]<HPAT_BCAST_JOIN_ROWS && t!=small)
+                continue;
+            int64_t* t_row_bytes = row_bytes + ((t==0) ? 0 : n_cols[0]);
+            join->data[t] = (char**)malloc((n_cols[t]+1)*sizeof(char*));
+            if (totals[small]<HPAT_BCAST_JOIN_ROWS)
+            {
+                // broadcast join: small table is replicated
+                join->keys[t] = join_allgather(keys[t], n_rows[t],
+                                            join->key_sizes[t], num_pes);
+                for(k=0; k<n_cols[t]; k++)
+                    join->data[t][k] = join_allgather(tab_data[t][k],
+                                    n_rows[t], t_row_bytes[k], num_pes);
+                tab_rows[t] = totals[t];
+            }
+            else
+            {
+                // shuffle join: matching keys are on the same processor
+                int64_t shuffle = hpat_dist_shuffle_start(keys[t], n_rows[t],
+                                                                key_types[t]);
+                int64_t n_recv = hpat_dist_shuffle_count(shuffle);
+                char** in_arrs = (char**)malloc((n_cols[t]+1)*sizeof(char*));
+                char** out_arrs = (char**)malloc((n_cols[t]+1)*sizeof(char*));
+                int64_t* arr_bytes = (int64_t*)malloc((n_cols[t]+1)
+                                                            *sizeof(int64_t));
+                in_arrs[0] = keys[t];
+                arr_bytes[0] = join->key_sizes[t];
+                for(k=0; k<n_cols[t]; k++)
+                {
+                    in_arrs[k+1] = tab_data[t][k];
+                    arr_bytes[k+1] = t_row_bytes[k];
+                }
+                for(k=0; k<n_cols[t]+1; k++)
+                    out_arrs[k] = (char*)malloc((n_recv+1)*arr_bytes[k]);
+                hpat_dist_shuffle_finish(shuffle, n_cols[t]+1, in_arrs,
+                                                        out_arrs, arr_bytes);
+                join->keys[t] = out_arrs[0];
+                for(k=0; k<n_cols[t]; k++)
+                    join->data[t][k] = out_arrs[k+1];
+                tab_rows[t] = n_recv;
+                free(in_arrs);
+                free(out_arrs);
+                free(arr_bytes);
+            }
+        }
+    }
+    char* tab_keys_used[2];
+    for(t=0; t<2; t++)
+        tab_keys_used[t] = (join->keys[t]!=NULL) ? join->keys[t] : tab_keys[t];
+
+    // hash table of right keys with chaining, rows with NaN keys don't match
+    int64_t capacity = 16;
+    while (capacity<2*tab_rows[1])
+        capacity *= 2;
+    int64_t* heads = (int64_t*)malloc(capacity*sizeof(int64_t));
+    int64_t* next = (int64_t*)malloc((tab_rows[1]+1)*sizeof(int64_t));
+    for(i=0; i<capacity; i++)
+        heads[i] = -1;
+    for(i=0; i<tab_rows[1]; i++)
+    {
+        char* key = tab_keys_used[1]+i*join->key_sizes[1];
+        int64_t slot = (int64_t)(hash_key(key, key_types[1]) & (capacity-1));
+        next[i] = heads[slot];
+        heads[slot] = i;
+    }
+
+    // probe with left keys
+    int64_t n_alloc = tab_rows[0]+16;
+    int64_t n_out = 0;
+    join->left_rows = (int64_t*)malloc(n_alloc*sizeof(int64_t));
+    join->right_rows = (int64_t*)malloc(n_alloc*sizeof(int64_t));
+    for(i=0; i<tab_rows[0]; i++)
+    {
+        char* key = tab_keys_used[0]+i*join->key_sizes[0];
+        int64_t i_val = 0;
+        double f_val = 0.0;
+        read_value(key, key_types[0], &i_val, &f_val);
+        if (key_types[0]>=4 && isnan(f_val))
+            continue;
+        uint64_t bits = key_bits(key, key_types[0]);
+        int64_t slot = (int64_t)(hash_key(key, key_types[0]) & (capacity-1));
+        int64_t r;
+        for(r=heads[slot]; r!=-1; r=next[r])
+        {
+            if (key_bits(tab_keys_used[1]+r*join->key_sizes[1],
+                                                    key_types[1])!=bits)
+                continue;
+            if (n_out==n_alloc)
+            {
+                n_alloc *= 2;
+                join->left_rows = (int64_t*)realloc(join->left_rows,
+                                                    n_alloc*sizeof(int64_t));
+                join->right_rows = (int64_t*)realloc(join->right_rows,
+                                                    n_alloc*sizeof(int64_t));
+            }
+            join->left_rows[n_out] = i;
+            join->right_rows[n_out] = r;
+            n_out++;
+        }
+    }
+    free(heads);
+    free(next);
+    join->n_out = n_out;
+    hpat_dist_stats_record(HPAT_STAT_JOIN,
+                  (n_rows[0]+n_rows[1])*get_elem_size(key_types[0]), stats_t0);
+    return (int64_t)(intptr_t)join;
+}
+
+// number of output rows, used to allocate output arrays
+int64_t hpat_dist_join_count(int64_t join_ptr)
+{
+    return ((hpat_dist_join_t*)(intptr_t)join_ptr)->n_out;
+}
+
+// write key and columns of matching rows, frees join. Input tables are
+// passed again since they are used if not broadcast or shuffled.
+int hpat_dist_join_finish(int64_t join_ptr, char** keys, char** data,
+                    char* out_keys, char** out_data)
+{
+    double stats_t0 = hpat_stats_start();
+    hpat_dist_join_t* join = (hpat_dist_join_t*)(intptr_t)join_ptr;
+    int t, k;
+    int64_t i;
+    char** tab_data[2] = {data, data+join->n_cols[0]};
+    int64_t* tab_rows[2] = {join->left_rows, join->right_rows};
+    char* left_keys = (join->keys[0]!=NULL) ? join->keys[0] : keys[0];
+    int key_size = join->key_sizes[0];
+    for(i=0; i<join->n_out; i++)
+        memcpy(out_keys+i*key_size, left_keys+join->left_rows[i]*key_size,
+                                                                    key_size);
+    int col = 0;
+    for(t=0; t<2; t++)
+    {
+        for(k=0; k<join->n_cols[t]; k++, col++)
+        {
+            char* in = (join->data[t]!=NULL) ? join->data[t][k]
+                                                        : tab_data[t][k];
+            int64_t rb = join->row_bytes[col];
+            for(i=0; i<join->n_out; i++)
+                memcpy(out_data[col]+i*rb, in+tab_rows[t][i]*rb, rb);
+            if (join->data[t]!=NULL)
+                free(join->data[t][k]);
+        }
+        if (join->data[t]!=NULL)
+        {
+            free(join->data[t]);
+            free(join->keys[t]);
+        }
+    }
+    free(join->left_rows);
+    free(join->right_rows);
+    free(join->row_bytes);
+    free(join);
+    hpat_dist_stats_record(HPAT_STAT_JOIN, 0, stats_t0);
+    return 0;
+}
+
+// Quantiles (median, percentile) by distributed selection without sorting or
+// gathering the data. Each round, processors find the median of their
+// remaining candidates, the weighted median of these medians is the pivot
+// and candidates on the side of the pivot that has the k-th element are
+// kept. At least a quarter of candidates is dropped every round, so there
+// are O(log n) rounds of small collectives until the candidates are few
+// enough to be gathered.
+
+#ifndef HPAT_SELECT_GATHER_SIZE
+#define HPAT_SELECT_GATHER_SIZE 1024
+#endif
+
+// k-th smallest of local array (reorders the array)
+static double select_local(double* vals, int64_t n, int64_t k)
+{
+    int64_t lo = 0, hi = n-1;
+    while (lo<hi)
+    {
+        double pivot = vals[lo+(hi-lo)/2];
+        int64_t i = lo, j = hi;
+        while (i<=j)
+        {
+            while (vals[i]<pivot) i++;
+            while (vals[j]>pivot) j--;
+            if (i<=j)
+            {
+                double tmp = vals[i];
+                vals[i] = vals[j];
+                vals[j] = tmp;
+                i++;
+                j--;
+            }
+        }
+        if (k<=j)
+            hi = j;
+        else if (k>=i)
+            lo = i;
+        else
+            break;
+    }
+    return vals[k];
+}
+
+// k-th smallest of all candidates on all processors, 'total' is the global
+// number of candidates (reorders and overwrites vals)
+static double dist_select(double* vals, int64_t n, int64_t total, int64_t k)
+{
+    int i, num_pes;
+    MPI_Comm_size(MPI_COMM_WORLD, &num_pes);
+    double* meds = (double*)malloc(num_pes*sizeof(double));
+    int64_t* counts = (int64_t*)malloc(num_pes*sizeof(int64_t));
+    while (total>HPAT_SELECT_GATHER_SIZE)
+    {
+        double med = (n>0) ? select_local(vals, n, n/2) : 0.0;
+        MPI_Allgather(&med, 1, MPI_DOUBLE, meds, 1, MPI_DOUBLE,
+                                                            MPI_COMM_WORLD);
+        MPI_Allgather(&n, 1, MPI_LONG_LONG_INT, counts, 1, MPI_LONG_LONG_INT,
+                                                            MPI_COMM_WORLD);
+        // weighted median of medians, each processor's median has weight of
+        // its number of candidates. At least half of the candidates of
+        // processors with medians not greater than the pivot are not
+        // greater than the pivot (and vice versa), which is a quarter of all
+        double pivot = 0.0;
+        for(i=0; i<num_pes; i++)
+        {
+            if (counts[i]==0)
+                continue;
+            // candidates of processors with medians ordered before this one
+            int64_t below = 0;
+            int j;
+            for(j=0; j<num_pes; j++)
+                if (counts[j]!=0 && (meds[j]<meds[i]
+                                            || (meds[j]==meds[i] && j<i)))
+                    below += counts[j];
+            if (2*below<=total && 2*(below+counts[i])>=total)
+            {
+                pivot = meds[i];
+                break;
+            }
+        }
+        // move candidates less than pivot to front and greater ones to back
+        int64_t n_less = 0, n_greater = 0, j;
+        for(j=0; j<n; j++)
+            if (vals[j]<pivot)
+            {
+                double tmp = vals[n_less];
+                vals[n_less++] = vals[j];
+                vals[j] = tmp;
+            }
+        for(j=n_less; j<n; j++)
+            if (vals[j]>pivot)
+                vals[n_less+n_greater++] = vals[j];
+        int64_t local_counts[2] = {n_less, n-n_less-n_greater};
+        int64_t global_counts[2];
+        MPI_Allreduce(local_counts, global_counts, 2, MPI_LONG_LONG_INT,
+                                                    MPI_SUM, MPI_COMM_WORLD);
+        if (k<global_counts[0])
+        {
+            n = n_less;
+            total = global_counts[0];
+        }
+        else if (k<global_counts[0]+global_counts[1])
+        {
+            free(meds);
+            free(counts);
+            return pivot;
+        }
+        else
+        {
+            memmove(vals, vals+n_less, n_greater*sizeof(double));
+            n = n_greater;
+            k -= global_counts[0]+global_counts[1];
+            total -= global_counts[0]+global_counts[1];
+        }
+    }
+    // few candidates left, gather on all processors and select locally
+    int* recv_counts = (int*)malloc(num_pes*sizeof(int));
+    int* displs = (int*)malloc(num_pes*sizeof(int));
+    int local_n = (int)n;
+    MPI_Allgather(&local_n, 1, MPI_INT, recv_counts, 1, MPI_INT,
+                                                            MPI_COMM_WORLD);
+    displs[0] = 0;
+    for(i=1; i<num_pes; i++)
+        displs[i] = displs[i-1]+recv_counts[i-1];
+    double* all_vals = (double*)malloc((total>0 ? total : 1)*sizeof(double));
+    MPI_Allgatherv(vals, local_n, MPI_DOUBLE, all_vals, recv_counts, displs,
+                                                MPI_DOUBLE, MPI_COMM_WORLD);
+    double res = select_local(all_vals, total, k);
+    free(all_vals);
+    free(recv_counts);
+    free(displs);
+    free(meds);
+    free(counts);
+    return res;
+}
+
+// q-th quantile (0<=q<=1) with linear interpolation like np.percentile, NaN
+// if input has any NaN values unless skipna (Series.quantile)
+double hpat_dist_quantile(char* data, int64_t n, int type_enum, double q,
+                                                                bool skipna)
+{
+    double stats_t0 = hpat_stats_start();
+    int64_t i, n_valid = 0;
+    int elem_size = get_elem_size(type_enum);
+    double* vals = (double*)malloc((n>0 ? n : 1)*sizeof(double));
+    for(i=0; i<n; i++)
+    {
+        int64_t i_val = 0;
+        double f_val = 0.0;
+        read_value(data+i*elem_size, type_enum, &i_val, &f_val);
+        if (type_enum<4)
+            f_val = (double)i_val;
+        if (!isnan(f_val))
+            vals[n_valid++] = f_val;
+    }
+    int64_t local_counts[2] = {n_valid, n-n_valid};
+    int64_t global_counts[2];
+    MPI_Allreduce(local_counts, global_counts, 2, MPI_LONG_LONG_INT, MPI_SUM,
+                                                            MPI_COMM_WORLD);
+    int64_t total = global_counts[0];
+    if (total==0 || (global_counts[1]!=0 && !skipna))
+    {
+        free(vals);
+        hpat_dist_stats_record(HPAT_STAT_QUANTILE,
+                                         n*get_elem_size(type_enum), stats_t0);
+        return NAN;
+    }
+    double pos = q*(total-1);
+    int64_t k = (int64_t)floor(pos);
+    if (k<0)
+        k = 0;
+    if (k>total-1)
+        k = total-1;
+    double frac = pos-k;
+    // selection overwrites its input, original values are needed for the
+    // next element
+    double* work = (double*)malloc((n_valid>0 ? n_valid : 1)*sizeof(double));
+    memcpy(work, vals, n_valid*sizeof(double));
+    double res = dist_select(work, n_valid, total, k);
+    free(work);
+    if (frac>0.0 && k+1<total)
+    {
+        // (k+1)-th element is either equal to k-th or smallest greater one
+        int64_t n_le = 0, g_n_le;
+        double next = INFINITY, g_next;
+        for(i=0; i<n_valid; i++)
+        {
+            if (vals[i]<=res)
+                n_le++;
+            else if (vals[i]<next)
+                next = vals[i];
+        }
+        MPI_Allreduce(&n_le, &g_n_le, 1, MPI_LONG_LONG_INT, MPI_SUM,
+                                                            MPI_COMM_WORLD);
+        MPI_Allreduce(&next, &g_next, 1, MPI_DOUBLE, MPI_MIN, MPI_COMM_WORLD);
+        if (g_n_le<k+2)
+            res = res+frac*(g_next-res);
+    }
+    free(vals);
+    hpat_dist_stats_record(HPAT_STAT_QUANTILE,
+                                         n*get_elem_size(type_enum), stats_t0);
+    return res;
+}
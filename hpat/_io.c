@@ -19,6 +19,14 @@ hid_t get_h5_typ(int typ_enum);
 int h5g_get_num_objs(hid_t file_id);
 void* h5g_get_objname_by_idx(hid_t file_id, int ind);
 
+// statistics of h5 reads/writes are recorded in hdist runtime (see
+// _distributed.c, ids should match)
+#define HPAT_STAT_H5_READ 22
+#define HPAT_STAT_H5_WRITE 23
+typedef void (*hpat_stats_record_t)(int id, int64_t bytes, double t0);
+static hpat_stats_record_t hpat_stats_record = NULL;
+static int64_t h5_nbytes(int ndims, int64_t* counts, int typ_enum);
+
 PyMODINIT_FUNC PyInit_hio(void) {
     PyObject *m;
     static struct PyModuleDef moduledef = {
@@ -47,6 +55,21 @@ PyMODINIT_FUNC PyInit_hio(void) {
                             PyLong_FromVoidPtr((void*)(&h5g_get_num_objs)));
     PyObject_SetAttrString(m, "h5g_get_objname_by_idx",
                             PyLong_FromVoidPtr((void*)(&h5g_get_objname_by_idx)));
+
+    PyObject* hdist = PyImport_ImportModule("hdist");
+    if (hdist != NULL)
+    {
+        PyObject* record = PyObject_GetAttrString(hdist,
+                                                    "hpat_dist_stats_record");
+        if (record != NULL)
+        {
+            hpat_stats_record = (hpat_stats_record_t)PyLong_AsVoidPtr(record);
+            Py_DECREF(record);
+        }
+        Py_DECREF(hdist);
+    }
+    // statistics are optional
+    PyErr_Clear();
     return m;
 }
 
@@ -112,6 +135,7 @@ int hpat_h5_read(hid_t file_id, char* dset_name, int ndims, int64_t* starts,
     //printf("dset_name:%s ndims:%d size:%d typ:%d\n", dset_name, ndims, counts[0], typ_enum);
     // fflush(stdout);
     // printf("start %lld end %lld\n", start_ind, end_ind);
+    double stats_t0 = MPI_Wtime();
     hid_t dataset_id;
     herr_t ret;
     dataset_id = H5Dopen2(file_id, dset_name, H5P_DEFAULT);
@@ -138,6 +162,9 @@ int hpat_h5_read(hid_t file_id, char* dset_name, int ndims, int64_t* starts,
     assert(ret != -1);
     // printf("out: %lf %lf ...\n", ((double*)out)[0], ((double*)out)[1]);
     H5Dclose(dataset_id);
+    if (hpat_stats_record != NULL)
+        hpat_stats_record(HPAT_STAT_H5_READ, h5_nbytes(ndims, counts, typ_enum),
+                                                                    stats_t0);
     return ret;
 }
 
@@ -226,6 +253,7 @@ int hpat_h5_write(hid_t file_id, hid_t dataset_id, int ndims, int64_t* starts,
 {
     //printf("dset_id:%s ndims:%d size:%d typ:%d\n", dset_id, ndims, counts[0], typ_enum);
     // fflush(stdout);
+    double stats_t0 = MPI_Wtime();
     herr_t ret;
     assert(dataset_id != -1);
     hid_t space_id = H5Dget_space(dataset_id);
@@ -249,9 +277,21 @@ int hpat_h5_write(hid_t file_id, hid_t dataset_id, int ndims, int64_t* starts,
     ret = H5Dwrite(dataset_id, h5_typ, mem_dataspace, space_id, xfer_plist_id, out);
     assert(ret != -1);
     H5Dclose(dataset_id);
+    if (hpat_stats_record != NULL)
+        hpat_stats_record(HPAT_STAT_H5_WRITE, h5_nbytes(ndims, counts, typ_enum),
+                                                                    stats_t0);
     return ret;
 }
 
+// size of local chunk that is read or written
+static int64_t h5_nbytes(int ndims, int64_t* counts, int typ_enum)
+{
+    int64_t n = H5Tget_size(get_h5_typ(typ_enum));
+    for(int i=0; i<ndims; i++)
+        n *= counts[i];
+    return n;
+}
+
 int h5g_get_num_objs(hid_t file_id)
 {
     H5G_info_t group_info;
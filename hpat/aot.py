@@ -0,0 +1,184 @@
+"""
+Ahead-of-time compilation of hpat functions into shared libraries or MPI
+executables, which start without Numba or LLVM initialization. The Python
+interpreter is initialized (without importing modules) since error paths of
+the generated code, such as raising exceptions, use the Python C API.
+
+The full hpat pipeline (including the distributed pass) is run through
+hpat.jit, then the generated code is emitted as a native object and linked
+with the Numba helper and NRT functions (compiled from Numba's C sources like
+numba.pycc does) and the hdist/hio runtimes.
+"""
+from __future__ import print_function, division, absolute_import
+
+import os
+import shutil
+import subprocess
+import sysconfig
+import tempfile
+
+from numba import types, sigutils
+from numba.runtime.nrtdynmod import create_nrt_module
+from numba.targets.codegen import AOTCPUCodegen
+import llvmlite.binding as ll
+
+import hpat
+
+_c_typ_table = {
+    types.boolean: 'bool',
+    types.int8: 'int8_t',
+    types.uint8: 'uint8_t',
+    types.int32: 'int32_t',
+    types.int64: 'int64_t',
+    types.float32: 'float',
+    types.float64: 'double',
+    types.none: 'void',
+    }
+
+_c_init_text = """
+#include <Python.h>
+#include <stdbool.h>
+#include <stdint.h>
+/* Numba helper and NRT functions built into the output from Numba's sources
+   (see _compile_numba_runtime) */
+typedef size_t (*NRT_atomic_inc_dec_func)(size_t *ptr);
+void NRT_MemSys_init(void);
+void NRT_MemSys_set_atomic_inc_dec(NRT_atomic_inc_dec_func inc,
+                                   NRT_atomic_inc_dec_func dec);
+void numba_rnd_ensure_global_init(void);
+/* LLVM-generated functions for atomic refcounting */
+extern void *nrt_atomic_add, *nrt_atomic_sub;
+{ret_typ} {wrapper_name}({arg_typs});
+
+/* initialize Numba runtime (and Python for error reporting if not loaded in
+   a Python process) like numba.pycc modules, has to be called before
+   {func_name} */
+void hpat_aot_init(void)
+{{
+    if (!Py_IsInitialized())
+        Py_Initialize();
+    numba_rnd_ensure_global_init();
+    NRT_MemSys_init();
+    NRT_MemSys_set_atomic_inc_dec((NRT_atomic_inc_dec_func) &nrt_atomic_add,
+                                  (NRT_atomic_inc_dec_func) &nrt_atomic_sub);
+}}
+
+{ret_typ} {func_name}({args})
+{{
+    {return_stmt}{wrapper_name}({arg_names});
+}}
+"""
+
+_c_main_text = """
+#include "mpi.h"
+
+int main(int argc, char** argv)
+{{
+    MPI_Init(&argc, &argv);
+    hpat_aot_init();
+    {func_name}();
+    Py_Finalize();
+    MPI_Finalize();
+    return 0;
+}}
+"""
+
+
+def compile(func, signature, output, executable=False):
+    """compile func with the given signature into a shared library (exporting
+    `hpat_aot_init()` and a C function with the same name as func), or an MPI
+    executable if executable=True (func should have no arguments).
+    Only scalar arguments and return values are supported.
+    """
+    if not isinstance(func, hpat.dispatcher.HPATDispatcher):
+        func = hpat.jit(func)
+    args, return_type = sigutils.normalize_signature(signature)
+    if executable and args:
+        raise ValueError("executable entry functions cannot have arguments")
+    for typ in list(args) + [return_type]:
+        if typ is not None and typ not in _c_typ_table:
+            raise NotImplementedError(
+                            "AOT compilation of {} not supported".format(typ))
+
+    func.compile(args)
+    cres = func.overloads[tuple(args)]
+    if return_type is None:
+        return_type = cres.signature.return_type
+    obj = _emit_object(cres)
+
+    func_name = func.py_func.__name__
+    c_arg_typs = [_c_typ_table[t] for t in args]
+    c_args = ["{} arg{}".format(t, i) for i, t in enumerate(c_arg_typs)]
+    init_text = _c_init_text.format(ret_typ=_c_typ_table[return_type],
+        return_stmt='' if return_type==types.none else 'return ',
+        wrapper_name=cres.fndesc.llvm_cfunc_wrapper_name,
+        arg_typs=', '.join(c_arg_typs) or 'void', func_name=func_name,
+        args=', '.join(c_args) or 'void',
+        arg_names=', '.join("arg{}".format(i) for i in range(len(args))))
+
+    build_dir = tempfile.mkdtemp(prefix='hpat_aot')
+    try:
+        obj_file = os.path.join(build_dir, func_name+'.o')
+        with open(obj_file, 'wb') as f:
+            f.write(obj)
+        c_file = os.path.join(build_dir, func_name+'_init.c')
+        with open(c_file, 'w') as f:
+            f.write(init_text)
+            if executable:
+                f.write(_c_main_text.format(func_name=func_name))
+        runtime = _compile_numba_runtime(func_name, build_dir)
+        _link([obj_file, c_file], runtime, output, executable)
+    finally:
+        shutil.rmtree(build_dir)
+    return output
+
+def _emit_object(cres):
+    """emit native object of compiled function, including its C wrapper and
+    Numba runtime functions (refcounting) which are normally provided by
+    the JIT"""
+    targetctx = cres.target_context
+    # JIT code is not position independent, regenerate with AOT codegen
+    codegen = AOTCPUCodegen(cres.fndesc.llvm_func_name+'_aot')
+    library = codegen.create_library(cres.fndesc.llvm_func_name+'_aot')
+    library.add_llvm_module(ll.parse_assembly(cres.library.get_llvm_str()))
+    nrt_module, _ = create_nrt_module(targetctx)
+    library.add_ir_module(nrt_module)
+    try:
+        cres.library.get_function(cres.fndesc.llvm_cfunc_wrapper_name)
+    except NameError:
+        targetctx.create_cfunc_wrapper(library, cres.fndesc, cres.environment,
+                                                            cres.call_helper)
+    library.finalize()
+    return library.emit_native_object()
+
+def _compile_numba_runtime(func_name, build_dir):
+    """compile Numba helper functions and NRT (modulemixin.c and the sources
+    it includes), which are not exported by Numba's extension modules, the
+    same way numba.pycc builds them into AOT compiled extensions. Returns
+    object files and their required libraries and library directories."""
+    from numba.pycc.cc import CC
+    cc = CC('hpat_aot_'+func_name, source_module=__name__)
+    objects = cc._compile_mixins(build_dir)
+    return (objects, cc._toolchain.get_python_libraries(),
+                                    cc._toolchain.get_python_library_dirs())
+
+def _link(sources, runtime, output, executable):
+    import hdist
+    import hio
+    runtime_objects, runtime_libs, runtime_lib_dirs = runtime
+    cc = os.environ.get('CC', 'mpicc')
+    cmd = [cc, '-O2', '-o', output] + sources + runtime_objects
+    cmd += ['-I'+sysconfig.get_paths()['include']]
+    if not executable:
+        cmd += ['-shared', '-fPIC']
+    # hpat runtime libraries are Python extension modules, link them directly
+    for ext in [hdist, hio]:
+        cmd += [ext.__file__,
+                '-Wl,-rpath,'+os.path.dirname(os.path.abspath(ext.__file__))]
+    lib_dir = sysconfig.get_config_var('LIBDIR')
+    py_lib = 'python' + sysconfig.get_config_var('LDVERSION')
+    cmd += ['-L'+lib_dir, '-Wl,-rpath,'+lib_dir, '-l'+py_lib]
+    cmd += ['-L'+d for d in runtime_lib_dirs]
+    cmd += ['-l'+l for l in runtime_libs if l != py_lib]
+    cmd += ['-lmpi', '-lm']
+    subprocess.check_call(cmd)
@@ -0,0 +1,178 @@
+from __future__ import print_function, division, absolute_import
+
+import os
+import sys
+import ctypes
+import hashlib
+
+from numba.caching import FunctionCache
+
+import hpat
+
+# file extensions considered HDF5 files when looking for constant file names
+_h5_file_exts = ('.h5', '.hdf5', '.hdf')
+# broadcast instead of the HDF5 schema key if rank 0 fails to read schemas
+_h5_schema_error = '<error>'
+
+
+class HPATFunctionCache(FunctionCache):
+    """on-disk cache for hpat.jit functions.
+
+    Besides the bytecode and signature that Numba uses, the index key includes
+    the hpat version, the user-specified `locals` types, hpat.jit options
+    (distributed arguments, hybrid mode), HPAT_ASYNC_REDUCE, constants of the
+    function (e.g. prange schedules) and the schemas of HDF5 files read by the
+    function since they change the generated code. Rank 0 compiles and saves
+    while the other ranks wait and load the result.
+    """
+    def __init__(self, py_func, locals_types, dispatcher):
+        super(HPATFunctionCache, self).__init__(py_func)
+        self._locals_types = locals_types
+        self._dispatcher = dispatcher
+        self._rank, self._num_pes = _get_rank_size()
+        # HDF5 schema key, computed once on rank 0 and broadcast
+        self._h5_schema = None
+        # other ranks wait for rank 0 to compile after a miss
+        self._ranks_waiting = False
+
+    def _index_key(self, sig, codegen):
+        key = super(HPATFunctionCache, self)._index_key(sig, codegen)
+        locals_str = repr(sorted((name, str(typ))
+                                    for name, typ in self._locals_types.items()))
+        # hpat.jit options are set on the dispatcher after caching is enabled
+        options = (self._dispatcher.hpat_options, hpat.config.ASYNC_REDUCE)
+        # Numba hashes co_code only, but constants like prange schedule and
+        # chunk keywords change the generated code
+        consts = hashlib.sha256(repr(_get_consts(self._py_func.__code__)
+                                            ).encode('utf-8')).hexdigest()
+        return key + ((hpat.__version__, locals_str, options, consts,
+                                                    self._get_h5_schema()),)
+
+    def _get_h5_schema(self):
+        # set by _sync_h5_schema() on all ranks in load_overload, before
+        # save_overload and other collective calls
+        if self._h5_schema is None:
+            self._h5_schema = _get_h5_schema_key(self._py_func.__code__)
+        return self._h5_schema
+
+    def _sync_h5_schema(self):
+        """compute the HDF5 schema key on rank 0 (only rank 0 opens the files)
+        and broadcast it. Called first in load_overload on all ranks so that
+        collective calls are in the same order on all ranks."""
+        if self._h5_schema is not None:
+            return
+        schema = ''
+        error = None
+        if self._rank == 0:
+            try:
+                schema = _get_h5_schema_key(self._py_func.__code__)
+            except Exception as e:
+                # other ranks fail too instead of waiting for rank 0
+                error = e
+                schema = _h5_schema_error
+        schema = _bcast_str(schema)
+        if error is not None:
+            raise error
+        if schema == _h5_schema_error:
+            raise RuntimeError("reading HDF5 schemas of {} failed on rank 0"
+                                            .format(self._py_func.__name__))
+        self._h5_schema = schema
+
+    def load_overload(self, sig, target_context):
+        # cached code may call hio functions, which are registered lazily
+        # only when h5py is used
+        if 'h5py' in sys.modules:
+            import hpat.pio_lower
+        if self._num_pes == 1:
+            return super(HPATFunctionCache, self).load_overload(sig,
+                                                            target_context)
+        self._sync_h5_schema()
+        if self._rank != 0:
+            # wait for rank 0 to compile and save
+            _barrier()
+            return super(HPATFunctionCache, self).load_overload(sig,
+                                                            target_context)
+        # on a miss, rank 0 compiles first and releases others in save or in
+        # release() if compilation fails or nothing is saved. Others are
+        # released right away on a hit or if loading fails.
+        self._ranks_waiting = True
+        try:
+            cres = super(HPATFunctionCache, self).load_overload(sig,
+                                                            target_context)
+        except:
+            self.release()
+            raise
+        if cres is not None:
+            self.release()
+        return cres
+
+    def save_overload(self, sig, data):
+        # only rank 0 writes to avoid all ranks hitting the file system
+        if self._rank != 0:
+            return
+        try:
+            super(HPATFunctionCache, self).save_overload(sig, data)
+        finally:
+            self.release()
+
+    def release(self):
+        """release other ranks waiting for rank 0 to compile, called by the
+        dispatcher after compilation even if it fails"""
+        if self._ranks_waiting:
+            self._ranks_waiting = False
+            _barrier()
+
+
+def _get_rank_size():
+    import hdist
+    get_rank = ctypes.CFUNCTYPE(ctypes.c_int)(hdist.hpat_dist_get_rank)
+    get_size = ctypes.CFUNCTYPE(ctypes.c_int)(hdist.hpat_dist_get_size)
+    # get_rank initializes MPI so it has to be called first
+    rank = get_rank()
+    return rank, get_size()
+
+def _barrier():
+    import hdist
+    ctypes.CFUNCTYPE(ctypes.c_int)(hdist.hpat_dist_barrier)()
+
+def _bcast_str(value, max_len=256):
+    """broadcast string of rank 0 to all ranks"""
+    import hdist
+    bcast = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p, ctypes.c_int64)(
+                                                    hdist.hpat_dist_bcast_bytes)
+    buf = ctypes.create_string_buffer(value.encode('utf-8')[:max_len-1],
+                                                                    max_len)
+    bcast(buf, max_len)
+    return buf.value.decode('utf-8')
+
+def _get_h5_schema_key(code):
+    """hash dataset names, types and dimensions of HDF5 files that the
+    function refers to using constant file names"""
+    file_names = sorted(set(_get_h5_file_names(code)))
+    if not file_names:
+        return ''
+    import h5py
+    schema = []
+    for file_name in file_names:
+        def add_dset(name, obj):
+            if isinstance(obj, h5py.Dataset):
+                schema.append((file_name, name, obj.dtype.str, obj.ndim))
+        with h5py.File(file_name, "r") as f:
+            f.visititems(add_dset)
+    return hashlib.sha256(repr(schema).encode('utf-8')).hexdigest()
+
+def _get_consts(code):
+    """constants of code object and its inner functions (excluding code
+    objects, which have addresses in their repr)"""
+    return [_get_consts(c) if hasattr(c, 'co_consts') else c
+                                                    for c in code.co_consts]
+
+def _get_h5_file_names(code):
+    for const in code.co_consts:
+        if isinstance(const, str) and const.endswith(_h5_file_exts):
+            if os.path.isfile(const):
+                yield const
+        # constants of inner functions
+        if hasattr(const, 'co_consts'):
+            for file_name in _get_h5_file_names(const):
+                yield file_name
@@ -1,33 +1,53 @@
 from __future__ import print_function, division, absolute_import
 
-from .pio import PIO
+import types as pytypes  # avoid confusion with numba.types
+import copy
 from .distributed import DistributedPass
-from .hiframes import HiFrames
+from . import distributed_report
+from .profiler import CompileProfiler
 import numba
 import numba.compiler
-from numba import ir_utils, ir
+import hpat
+from numba import ir_utils, ir, config
 from numba.targets.registry import CPUDispatcher
 from numba.ir_utils import (mk_unique_var, add_offset_to_labels,
                             get_name_var_table, replace_vars)
 
+def global_deepcopy(self, memo):
+    return ir.Global(self.name, self.value, copy.deepcopy(self.loc))
+ir.Global.__deepcopy__ = global_deepcopy
+
 def stage_io_pass(pipeline):
     """
     Convert IO calls
     """
     # Ensure we have an IR and type information.
     assert pipeline.func_ir
+    # h5py typing and lowering are registered only if needed
+    if not _refers_to_module(pipeline.func_ir, 'h5py'):
+        return
+    from .pio import PIO
     io_pass = PIO(pipeline.func_ir, pipeline.locals)
     io_pass.run()
 
-def stage_distributed_pass(pipeline):
+def stage_distributed_pass(pipeline, distributed_vars, distributed_2d_vars,
+                                                                    hybrid):
     """
     parallelize for distributed-memory
     """
     # Ensure we have an IR and type information.
     assert pipeline.func_ir
     dist_pass = DistributedPass(pipeline.func_ir,
-        pipeline.type_annotation.typemap, pipeline.type_annotation.calltypes)
+        pipeline.type_annotation.typemap, pipeline.type_annotation.calltypes,
+        distributed_vars, distributed_2d_vars, hybrid)
     dist_pass.run()
+    report = dist_pass.get_report()
+    distributed_report.add_report(pipeline.func_ir.func_id.func,
+                                                pipeline.args, report)
+    if hpat.config.DIST_DEBUG:
+        from hpat.caching import _get_rank_size
+        if _get_rank_size()[0]==0:
+            print(report)
 
 def stage_df_pass(pipeline):
     """
@@ -35,6 +55,10 @@ def stage_df_pass(pipeline):
     """
     # Ensure we have an IR and type information.
     assert pipeline.func_ir
+    # pandas support is loaded only if needed
+    if not _refers_to_module(pipeline.func_ir, 'pandas'):
+        return
+    from .hiframes import HiFrames
     df_pass = HiFrames(pipeline.func_ir)
     df_pass.run()
 
@@ -45,8 +69,11 @@ def stage_inline_pass(pipeline):
     # Ensure we have an IR and type information.
     assert pipeline.func_ir
     inline_calls(pipeline.func_ir)
+    set_prange_schedules(pipeline.func_ir)
 
-def add_hpat_stages(pipeline_manager, pipeline):
+def add_hpat_stages(pipeline_manager, pipeline, profile_dir='',
+                            distributed_vars=(), distributed_2d_vars=(),
+                            hybrid=False):
     pp = pipeline_manager.pipeline_stages['nopython']
     new_pp = []
     for (func,desc) in pp:
@@ -55,13 +82,89 @@ def add_hpat_stages(pipeline_manager, pipeline):
             new_pp.append((lambda:stage_df_pass(pipeline), "convert DataFrames"))
             new_pp.append((lambda:stage_io_pass(pipeline), "replace IO calls"))
         if desc=='nopython mode backend':
-            new_pp.append((lambda:stage_distributed_pass(pipeline), "convert to distributed"))
+            new_pp.append((lambda:stage_distributed_pass(pipeline,
+                                distributed_vars, distributed_2d_vars, hybrid),
+                                "convert to distributed"))
         new_pp.append((func,desc))
+    if profile_dir:
+        new_pp = CompileProfiler(pipeline, profile_dir).wrap_stages(new_pp)
     pipeline_manager.pipeline_stages['nopython'] = new_pp
 
+def _refers_to_module(func_ir, module_name):
+    """
+    Check whether the IR refers to a module or its attributes (e.g. h5py or
+    h5py.File) through globals or freevars
+    """
+    for block in func_ir.blocks.values():
+        for stmt in block.body:
+            if (isinstance(stmt, ir.Assign)
+                    and isinstance(stmt.value, (ir.Global, ir.FreeVar))):
+                val = stmt.value.value
+                if isinstance(val, pytypes.ModuleType):
+                    name = val.__name__
+                else:
+                    name = getattr(val, '__module__', None)
+                if name and name.split('.')[0]==module_name:
+                    return True
+    return False
+
+def set_prange_schedules(func_ir):
+    """
+    Find schedule keyword arguments of prange calls, e.g.
+    prange(n, schedule='dynamic', chunk=4), and remove them since Numba's
+    prange does not accept keywords. The (schedule, chunk) pair is recorded
+    as `prange_schedule` attribute of the call's location, which becomes the
+    location of the parfor created for the loop and is used by distributed
+    pass. Supported schedules are 'static' (default), 'dynamic' and 'guided'.
+    """
+    call_table, _ = ir_utils.get_call_table(func_ir.blocks, {}, {})
+    const_table = {}
+    for block in func_ir.blocks.values():
+        for stmt in block.body:
+            if isinstance(stmt, ir.Assign) and isinstance(stmt.value, ir.Const):
+                const_table[stmt.target.name] = stmt.value.value
+
+    for block in func_ir.blocks.values():
+        for stmt in block.body:
+            if not (isinstance(stmt, ir.Assign)
+                    and isinstance(stmt.value, ir.Expr)
+                    and stmt.value.op=='call' and stmt.value.kws):
+                continue
+            call = call_table.get(stmt.value.func.name, [])
+            if not call or (call[0]!='prange'
+                                and call[0] is not numba.parfor.prange):
+                continue
+            kws = dict(stmt.value.kws)
+            schedule = const_table.get(kws.pop('schedule').name, None) \
+                                            if 'schedule' in kws else 'static'
+            chunk = const_table.get(kws.pop('chunk').name, None) \
+                                            if 'chunk' in kws else 1
+            if kws or schedule not in ('static', 'dynamic', 'guided'):
+                raise ValueError("invalid prange arguments, only constant "
+                    "schedule ('static', 'dynamic' or 'guided') and chunk "
+                    "keywords are supported")
+            if not isinstance(chunk, int) or chunk<1:
+                raise ValueError("prange chunk should be a positive constant")
+            stmt.value.kws = []
+            # private copy of location since statements can share them
+            loc = copy.copy(stmt.loc)
+            loc.prange_schedule = (schedule, chunk)
+            stmt.loc = stmt.value.loc = loc
+
 def inline_calls(func_ir):
-    call_table, _ = ir_utils.get_call_table(func_ir.blocks)
-    for label, block in func_ir.blocks.items():
+    """
+    Inline calls to jitted functions using a worklist of blocks. Caller blocks
+    are split at call sites and the remainder and inlined callee blocks are
+    added to the worklist, so nested calls are inlined in a single pass.
+    Returns number of inlined calls.
+    """
+    call_table, _ = ir_utils.get_call_table(func_ir.blocks, {}, {})
+    # py_func -> untyped callee IR, avoids running the frontend per call site
+    callee_ir_cache = {}
+    inline_counts = {}
+    work_list = list(func_ir.blocks.items())
+    while work_list:
+        label, block = work_list.pop()
         for i, stmt in enumerate(block.body):
             if isinstance(stmt, ir.Assign):
                 rhs = stmt.value
@@ -70,18 +173,37 @@ def inline_calls(func_ir):
                     if (func in call_table and call_table[func]
                             and isinstance(call_table[func][0], CPUDispatcher)):
                         py_func = call_table[func][0].py_func
-                        inline_calls_inner(func_ir, block, stmt, i, py_func)
-                        return  # inline_calls_inner will call back recursively
+                        new_blocks = inline_calls_inner(func_ir, block, stmt, i,
+                                                    py_func, callee_ir_cache)
+                        # update call table with new callee variables
+                        callee_call_table, _ = ir_utils.get_call_table(
+                                                        dict(new_blocks), {}, {})
+                        call_table.update(callee_call_table)
+                        work_list += new_blocks
+                        inline_counts[py_func.__name__] = inline_counts.get(
+                                                        py_func.__name__, 0) + 1
+                        # rest of block is moved to a new block in work_list
+                        break
 
-def inline_calls_inner(func_ir, block, stmt, i, py_func):
+    if config.DEBUG_ARRAY_OPT==1:
+        print("inlined calls: ", inline_counts)
+    return sum(inline_counts.values())
+
+def inline_calls_inner(func_ir, block, stmt, i, py_func, callee_ir_cache):
+    """
+    Inline py_func at call site stmt (index i of block). Returns a list of
+    (label, block) pairs of new blocks added to func_ir.
+    """
     call_expr = stmt.value
     scope = block.scope
-    callee_ir = numba.compiler.run_frontend(py_func)
+    if py_func not in callee_ir_cache:
+        callee_ir_cache[py_func] = numba.compiler.run_frontend(py_func)
+    callee_ir = callee_ir_cache[py_func]
 
-    # relabel callee_ir by adding an offset
+    # relabel copy of callee blocks by adding an offset
     max_label = max(func_ir.blocks.keys())
-    callee_blocks = add_offset_to_labels(callee_ir.blocks, max_label+1)
-    callee_ir.blocks = callee_blocks
+    callee_blocks = add_offset_to_labels(copy.deepcopy(callee_ir.blocks),
+                                                                max_label+1)
     min_label = min(callee_blocks.keys())
     max_label = max(callee_blocks.keys())
 
@@ -89,17 +211,16 @@ def inline_calls_inner(func_ir, block, stmt, i, py_func):
     ir_utils._max_label = max_label
 
     # rename all variables in callee blocks
-    var_table = get_name_var_table(callee_ir.blocks)
+    var_table = get_name_var_table(callee_blocks)
     new_var_dict = {}
     for name, var in var_table.items():
         new_var = scope.define(mk_unique_var(var.name), loc=var.loc)
         new_var_dict[name] = new_var
-    replace_vars(callee_ir.blocks, new_var_dict)
+    replace_vars(callee_blocks, new_var_dict)
 
     # replace callee arguments
-    args = list(call_expr.args)
-    # TODO: replace defaults (add to args)
-    _replace_args(callee_ir.blocks, args)
+    args = _get_callee_args(call_expr, py_func, callee_ir.arg_names, stmt.loc)
+    _replace_args(callee_blocks, args)
 
     # split caller blocks into two
     new_block = ir.Block(scope, block.loc)
@@ -110,15 +231,30 @@ def inline_calls_inner(func_ir, block, stmt, i, py_func):
     block.body.append(ir.Jump(min_label, stmt.loc))
 
     # replace Return with assignment to LHS
-    _replace_returns(callee_ir.blocks, stmt.target, new_label)
+    _replace_returns(callee_blocks, stmt.target, new_label)
 
     # insert all new blocks
-    for label, bl in callee_ir.blocks.items():
+    for label, bl in callee_blocks.items():
         func_ir.blocks[label] = bl
 
-    # run inline_calls recursively to transform other calls
-    inline_calls(func_ir)
-    return
+    return [(new_label, new_block)] + list(callee_blocks.items())
+
+def _get_callee_args(call_expr, py_func, arg_names, loc):
+    """
+    Get argument list of inlined call, filling keyword and default arguments
+    """
+    args = list(call_expr.args)
+    kws = dict(call_expr.kws)
+    defaults = py_func.__defaults__ or ()
+    first_default = len(arg_names) - len(defaults)
+    for i in range(len(args), len(arg_names)):
+        name = arg_names[i]
+        if name in kws:
+            args.append(kws[name])
+        else:
+            assert i >= first_default, "missing argument " + name
+            args.append(ir.Const(defaults[i - first_default], loc))
+    return args
 
 def _replace_args(blocks, args):
     """
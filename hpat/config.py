@@ -0,0 +1,43 @@
+from __future__ import print_function, division, absolute_import
+
+import os
+
+# Directory to dump per-function compile-time profiles to (JSON), set with
+# HPAT_PROFILE_COMPILE ('1' means current directory). Can also be enabled
+# per function with hpat.jit(profile_compile=...).
+PROFILE_COMPILE = os.environ.get('HPAT_PROFILE_COMPILE', '')
+
+# Print distribution report (hpat.distributed_report) of every compiled
+# function on rank 0, set with HPAT_DIST_DEBUG=1. Reports are also available
+# with func.distribution_report().
+DIST_DEBUG = os.environ.get('HPAT_DIST_DEBUG', '0')=='1'
+
+# Use non-blocking reductions (MPI_Iallreduce) for parfors and wait just
+# before the first use of reduced values, set with HPAT_ASYNC_REDUCE=1.
+ASYNC_REDUCE = os.environ.get('HPAT_ASYNC_REDUCE', '0')=='1'
+
+# Hybrid MPI+threads mode, set with HPAT_HYBRID=1 or hpat.jit(hybrid=True).
+# Each rank runs its chunk of distributed parfors on Numba's thread pool so
+# fewer ranks per node are needed. Parfors that call the distributed runtime
+# in their body (e.g. one-sided accesses) still run sequentially. The pool is
+# sized below only with HPAT_HYBRID=1, hpat.jit(hybrid=True) requires
+# NUMBA_NUM_THREADS to be set in the environment (warns otherwise).
+HYBRID = os.environ.get('HPAT_HYBRID', '0')=='1'
+
+def _get_ranks_per_node():
+    """number of ranks on this node as set by the MPI launcher, or None"""
+    for var in ['OMPI_COMM_WORLD_LOCAL_SIZE', 'MPI_LOCALNRANKS',
+                                                        'SLURM_NTASKS_PER_NODE']:
+        value = os.environ.get(var, '')
+        if value.isdigit() and int(value)>0:
+            return int(value)
+    return None
+
+# In hybrid mode, size of Numba's thread pool defaults to cores of the node
+# divided by ranks of the node. It is read when Numba is imported, so hpat
+# has to be imported first (or NUMBA_NUM_THREADS set explicitly).
+if HYBRID and 'NUMBA_NUM_THREADS' not in os.environ:
+    _ranks_per_node = _get_ranks_per_node()
+    if _ranks_per_node is not None:
+        os.environ['NUMBA_NUM_THREADS'] = str(
+                                max(1, (os.cpu_count() or 1)//_ranks_per_node))
@@ -0,0 +1,48 @@
+from __future__ import print_function, division, absolute_import
+
+from numba.targets.registry import CPUDispatcher, dispatcher_registry
+
+
+class HPATDispatcher(CPUDispatcher):
+    """dispatcher of hpat.jit functions, same as Numba's CPU dispatcher except
+    for hpat specific features such as caching"""
+
+    # options of hpat.jit that change generated code (distributed arguments,
+    # 2D distributed arguments, hybrid mode), set by hpat.jit
+    hpat_options = ()
+
+    def enable_caching(self):
+        from hpat.caching import HPATFunctionCache
+        self._cache = HPATFunctionCache(self.py_func, self.locals, self)
+
+    def compile(self, sig):
+        # other ranks wait for rank 0 to compile after a cache miss, they have
+        # to be released even if compilation fails or nothing is saved
+        try:
+            return super(HPATDispatcher, self).compile(sig)
+        finally:
+            release = getattr(self._cache, 'release', None)
+            if release is not None:
+                release()
+
+    def distribution_report(self, signature=None):
+        """return distributions of arrays and parfors, reasons for replicated
+        (REP) arrays and communication estimates of compiled signatures, or
+        the given signature only"""
+        from hpat.distributed_report import get_reports
+        reports = get_reports(self.py_func)
+        if signature is not None:
+            sigs = [tuple(signature)]
+        else:
+            sigs = [tuple(sig) for sig in self.signatures]
+        out = []
+        for sig in sigs:
+            if sig in reports:
+                out.append(str(reports[sig]))
+            else:
+                out.append("No distribution report for {}{} (not compiled "
+                           "or loaded from cache)".format(
+                            self.py_func.__name__, sig))
+        return "\n\n".join(out)
+
+dispatcher_registry['hpat'] = HPATDispatcher
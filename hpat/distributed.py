@@ -2,6 +2,7 @@ from __future__ import print_function, division, absolute_import
 
 import types as pytypes  # avoid confusion with numba.types
 import copy
+from collections import OrderedDict
 import numba
 from numba import (ir, types, typing, config, numpy_support,
                     ir_utils, postproc)
@@ -18,11 +19,20 @@ import numpy as np
 import hpat
 from hpat import (distributed_api,
                   distributed_lower)  # import lower for module initialization
+from hpat.distributed_api import Reduce_Type
+from hpat.distributed_report import DistributionReport
 
 from hpat.distributed_analysis import (Distribution,
                                        DistributedAnalysis,
-                                       get_stencil_accesses)
-import h5py
+                                       get_stencil_accesses,
+                                       is_rebalance_call,
+                                       get_stencil_halos,
+                                       get_array_reduce,
+                                       get_scan_call,
+                                       is_random_access,
+                                       is_gather_access,
+                                       get_sort_call,
+                                       get_quantile_call)
 import time
 # from mpi4py import MPI
 
@@ -31,19 +41,28 @@ distributed_run_extensions = {}
 
 class DistributedPass(object):
     """analyze program and transfrom to distributed"""
-    def __init__(self, func_ir, typemap, calltypes):
+    def __init__(self, func_ir, typemap, calltypes, distributed_vars=(),
+                                distributed_2d_vars=(), hybrid=False):
         self.func_ir = func_ir
         self.typemap = typemap
         self.calltypes = calltypes
+        self._distributed_vars = distributed_vars
+        self._distributed_2d_vars = distributed_2d_vars
+        # run parfors on threads of each rank (hybrid MPI+threads mode)
+        self._hybrid = hybrid
 
         self._call_table,_ = get_call_table(func_ir.blocks)
         self._tuple_table = get_tuple_table(func_ir.blocks)
 
         self._dist_analysis = None
         self._T_arrs = None  # set of transposed arrays (taken from analysis)
+        self._array_methods = {}  # reduction methods like A.min (from analysis)
 
         self._rank_var = None # will be set in run
         self._size_var = None
+        # processor grid sizes and indices for 2D distribution
+        self._grid_size_vars = None
+        self._grid_rank_vars = None
         self._g_dist_var = None
         self._set1_var = None # variable set to 1
         self._set0_var = None # variable set to 0
@@ -56,27 +75,99 @@ class DistributedPass(object):
         self._array_sizes = {}
         self._stencil_left_border = {}
         self._stencil_right_border = {}
+        # (variable, Reduce_Type) of scalar parfor reductions not generated yet
+        self._pending_reductions = []
+        # (variable names, wait nodes) of non-blocking reductions
+        self._pending_waits = []
+        # array -> id of only parfor using it, for arrays that are only
+        # printed otherwise (reduced to rank 0 only)
+        self._print_only_arrs = {}
+        # parfor id -> (counter, number of iterations, loop start) of
+        # dynamically scheduled parfors
+        self._dynamic_parfors = {}
+        # array -> one-sided access window of enclosing parfors
+        self._rma_wins = {}
+        # collectives generated, kept for distribution report
+        self._comms = []
+        self._dist_analysis_pass = None
 
     def run(self):
         remove_dels(self.func_ir.blocks)
         dprint_func_ir(self.func_ir, "starting distributed pass")
         dist_analysis_pass = DistributedAnalysis(self.func_ir, self.typemap,
-                                                                self.calltypes)
+                                        self.calltypes, self._distributed_vars,
+                                        self._distributed_2d_vars)
         self._dist_analysis = dist_analysis_pass.run()
+        self._dist_analysis_pass = dist_analysis_pass
         self._T_arrs = dist_analysis_pass._T_arrs
+        self._array_methods = dist_analysis_pass._array_methods
         self._parallel_accesses = dist_analysis_pass._parallel_accesses
         if config.DEBUG_ARRAY_OPT==1:
             print("distributions: ", self._dist_analysis)
 
+        self._print_only_arrs = self._get_print_only_arrs(self.func_ir.blocks)
         self._gen_dist_inits()
         self.func_ir.blocks = self._run_dist_pass(self.func_ir.blocks)
         self.func_ir.blocks = self._dist_prints(self.func_ir.blocks)
         remove_dead(self.func_ir.blocks, self.func_ir.arg_names, self.typemap)
         dprint_func_ir(self.func_ir, "after distributed pass")
-        lower_parfor_sequential(self.func_ir, self.typemap, self.calltypes)
+        if self._hybrid:
+            self._lower_unthreaded_parfors()
+        else:
+            lower_parfor_sequential(self.func_ir, self.typemap, self.calltypes)
         post_proc = postproc.PostProcessor(self.func_ir)
         post_proc.run()
 
+    def _lower_unthreaded_parfors(self):
+        """keep parfors that compute on local data only for Numba's threaded
+        parfor lowering, which combines reductions across threads before the
+        MPI reductions generated after parfors. Parfors that call the
+        distributed runtime in their body are lowered sequentially.
+        """
+        # registers threaded parfor lowering of Numba
+        import numba.npyufunc.parfor
+        # hide threaded parfors from sequential lowering
+        for block in self.func_ir.blocks.values():
+            for i, inst in enumerate(block.body):
+                if isinstance(inst, Parfor) and self._is_thread_safe_parfor(inst):
+                    # distributed pass adds variables used in parfor bodies
+                    # (e.g. chunk starts for index offsets)
+                    inst.params = get_parfor_params(inst)
+                    block.body[i] = _ThreadedParfor(inst)
+                    dprint("parfor {} runs on threads".format(inst.id))
+        lower_parfor_sequential(self.func_ir, self.typemap, self.calltypes)
+        for block in self.func_ir.blocks.values():
+            for i, inst in enumerate(block.body):
+                if isinstance(inst, _ThreadedParfor):
+                    block.body[i] = inst.parfor
+        return
+
+    def _is_thread_safe_parfor(self, parfor):
+        """parfor body (including nested parfors) does not call distributed
+        runtime functions, which use MPI and are not thread-safe"""
+        for block in parfor.loop_body.values():
+            for stmt in block.body:
+                if (isinstance(stmt, Parfor)
+                        and not self._is_thread_safe_parfor(stmt)):
+                    return False
+                if not isinstance(stmt, ir.Assign):
+                    continue
+                rhs = stmt.value
+                if (isinstance(rhs, ir.Expr) and rhs.op=='getattr'
+                        and rhs.value.name==self._g_dist_var.name):
+                    return False
+                if isinstance(rhs, ir.Global) and rhs.value is distributed_api:
+                    return False
+        return True
+
+    def get_report(self):
+        """distribution report of the function, see hpat.distributed_report"""
+        analysis = self._dist_analysis_pass
+        return DistributionReport(self.func_ir.func_id.func_name,
+            dict(self._dist_analysis.array_dists), analysis.rep_reasons,
+            self._dist_analysis.parfor_dists, analysis._parfor_locs,
+            self._comms)
+
     def _run_dist_pass(self, blocks):
         topo_order = find_topo_order(blocks)
         namevar_table = get_name_var_table(blocks)
@@ -84,16 +175,32 @@ class DistributedPass(object):
         for label in topo_order:
             new_body = []
             for inst in blocks[label].body:
+                # reductions of consecutive independent parfors are fused
+                if self._pending_reductions and (not isinstance(inst, Parfor)
+                        or self._uses_pending_reductions(inst)):
+                    new_body += self._gen_pending_reductions()
+                if self._pending_waits:
+                    new_body += self._gen_reduce_waits(inst)
                 if type(inst) in distributed_run_extensions:
                     f = distributed_run_extensions[type(inst)]
-                    new_body += f(inst, self.typemap, self.calltypes)
+                    new_body += f(inst, self.typemap, self.calltypes,
+                                            self._dist_analysis.array_dists)
                     continue
                 if isinstance(inst, Parfor):
+                    new_arrs = self._gen_rma_windows(inst, new_body)
                     new_body += self._run_parfor(inst, namevar_table)
                     # run dist pass recursively
+                    pending_reductions = self._pending_reductions
+                    pending_waits = self._pending_waits
+                    self._pending_reductions = []
+                    self._pending_waits = []
                     p_blocks = wrap_parfor_blocks(inst)
                     self._run_dist_pass(p_blocks)
                     unwrap_parfor_blocks(inst)
+                    self._pending_reductions = pending_reductions
+                    self._pending_waits = pending_waits
+                    for arr in new_arrs:
+                        self._gen_rma_free(self._rma_wins.pop(arr), new_body)
                     continue
                 if isinstance(inst, ir.Assign):
                     lhs = inst.target.name
@@ -107,9 +214,15 @@ class DistributedPass(object):
                                 rhs.index, rhs, inst)
                             continue
                         if (rhs.op=='getattr'
-                                and self._is_1D_arr(rhs.value.name)
+                                and (self._is_1D_arr(rhs.value.name)
+                                    or self._is_2D_arr(rhs.value.name))
                                 and rhs.attr=='shape'):
                             self._shape_attrs[lhs] = rhs.value.name
+                        if (rhs.op=='getattr'
+                                and self._is_2D_arr(rhs.value.name)
+                                and rhs.attr=='T'):
+                            new_body += self._run_transpose_2d(inst)
+                            continue
                         if (rhs.op=='getattr'
                                 and self._is_1D_arr(rhs.value.name)
                                 and rhs.attr=='T'):
@@ -134,7 +247,19 @@ class DistributedPass(object):
                             # last dimension of transposed arrays is partitioned
                             if arr in self._T_arrs and rhs.index==ndims-1:
                                 inst.value = sizes[rhs.index]
-                    if isinstance(rhs, ir.Var) and self._is_1D_arr(rhs.name):
+                            # all dimensions of 2D arrays are partitioned
+                            if self._is_2D_arr(arr):
+                                inst.value = sizes[rhs.index]
+                    if isinstance(rhs, ir.Arg) and self._is_1D_arr(lhs):
+                        new_body += self._run_arg(inst)
+                        continue
+                    if (isinstance(rhs, ir.Expr) and rhs.op=='cast'
+                            and 'ret' in self._distributed_vars
+                            and self._is_1D_Var_arr(rhs.value.name)):
+                        new_body += self._run_return_cast(inst)
+                        continue
+                    if isinstance(rhs, ir.Var) and (self._is_1D_arr(rhs.name)
+                                                or self._is_2D_arr(rhs.name)):
                         self._array_starts[lhs] = self._array_starts[rhs.name]
                         self._array_counts[lhs] = self._array_counts[rhs.name]
                         self._array_sizes[lhs] = self._array_sizes[rhs.name]
@@ -155,6 +280,9 @@ class DistributedPass(object):
         if self._stencil_right_border:
             blocks = self._add_stencil_border(blocks, self._stencil_right_border, is_left=False)
 
+        if self._dynamic_parfors:
+            blocks = self._add_dynamic_loops(blocks)
+
         return blocks
 
     def _add_stencil_border(self, blocks, border_dict, is_left):
@@ -204,6 +332,72 @@ class DistributedPass(object):
             new_blocks[block_label] = block
         return new_blocks
 
+    def _add_dynamic_loops(self, blocks):
+        """put dynamically scheduled parfors in a loop that claims chunks of
+        iterations from the shared counter until all are done:
+            header: s = next(counter); if s < n goto body else exit
+            body: e = counter_end(counter)
+                  parfor(s+offset, e+offset); goto header
+        where n is the number of iterations and offset is the original start
+        of the loop.
+        """
+        new_blocks = {}
+        for (block_label, block) in blocks.items():
+            scope = block.scope
+            i = 0
+            while i < len(block.body):
+                stmt = block.body[i]
+                if not isinstance(stmt, Parfor) or stmt.id not in self._dynamic_parfors:
+                    i += 1
+                    continue
+                counter_var, total_var, offset_var = self._dynamic_parfors.pop(
+                                                                    stmt.id)
+                loc = stmt.loc
+                start_var = stmt.loop_nests[0].start
+                end_var = stmt.loop_nests[0].stop
+                prev_block = ir.Block(scope, loc)
+                new_blocks[block_label] = prev_block
+                header_label = ir_utils.next_label()
+                body_label = ir_utils.next_label()
+                block_label = ir_utils.next_label()
+                prev_block.body = block.body[:i]
+                prev_block.body.append(ir.Jump(header_label, loc))
+
+                header_block = ir.Block(scope, loc)
+                chunk_start = ir.Var(scope, mk_unique_var("$chunk_start"), loc)
+                self.typemap[chunk_start.name] = types.int64
+                self._gen_dist_call('dist_counter_next', [counter_var],
+                                                chunk_start, header_block.body)
+                cond_var = ir.Var(scope, mk_unique_var("$dynamic_cond"), loc)
+                self.typemap[cond_var.name] = types.boolean
+                cond_expr = ir.Expr.binop('<', chunk_start, total_var, loc)
+                self.calltypes[cond_expr] = find_op_typ('<',
+                            [types.int64, self.typemap[total_var.name]])
+                header_block.body.append(ir.Assign(cond_expr, cond_var, loc))
+                header_block.body.append(ir.Branch(cond_var, body_label,
+                                                            block_label, loc))
+                new_blocks[header_label] = header_block
+
+                body_block = ir.Block(scope, loc)
+                chunk_end = ir.Var(scope, mk_unique_var("$chunk_end"), loc)
+                self.typemap[chunk_end.name] = types.int64
+                self._gen_dist_call('dist_counter_end', [counter_var],
+                                                    chunk_end, body_block.body)
+                for (chunk_var, loop_var) in [(chunk_start, start_var),
+                                                        (chunk_end, end_var)]:
+                    add_expr = ir.Expr.binop('+', chunk_var, offset_var, loc)
+                    self.calltypes[add_expr] = find_op_typ('+',
+                            [types.int64, self.typemap[offset_var.name]])
+                    body_block.body.append(ir.Assign(add_expr, loop_var, loc))
+                body_block.body.append(stmt)
+                body_block.body.append(ir.Jump(header_label, loc))
+                new_blocks[body_label] = body_block
+
+                block.body = block.body[i+1:]
+                i = 0
+            new_blocks[block_label] = block
+        return new_blocks
+
     def _gen_dist_inits(self):
         # add initializations
         topo_order = find_topo_order(self.func_ir.blocks)
@@ -257,8 +451,27 @@ class DistributedPass(object):
         size_assign = ir.Assign(size_call, size_var, loc)
         self._size_var = size_var
         out += [size_attr_assign, size_assign]
+        if Distribution.TwoD in self._dist_analysis.array_dists.values():
+            self._gen_grid_inits(scope, loc, out)
         first_block.body = out+first_block.body
 
+    def _gen_grid_inits(self, scope, loc, out):
+        """get processor grid sizes and indices for 2D distribution"""
+        self._grid_size_vars = []
+        self._grid_rank_vars = []
+        for dim in range(2):
+            dim_var = ir.Var(scope, mk_unique_var("$grid_dim"), loc)
+            self.typemap[dim_var.name] = types.intp
+            out.append(ir.Assign(ir.Const(dim, loc), dim_var, loc))
+            grid_size_var = ir.Var(scope, mk_unique_var("$grid_size"), loc)
+            self.typemap[grid_size_var.name] = types.int32
+            self._gen_dist_call('get_grid_size', [dim_var], grid_size_var, out)
+            self._grid_size_vars.append(grid_size_var)
+            grid_rank_var = ir.Var(scope, mk_unique_var("$grid_rank"), loc)
+            self.typemap[grid_rank_var.name] = types.int32
+            self._gen_dist_call('get_grid_rank', [dim_var], grid_rank_var, out)
+            self._grid_rank_vars.append(grid_rank_var)
+
     def _run_call(self, assign, block_body):
         lhs = assign.target.name
         rhs = assign.value
@@ -266,12 +479,18 @@ class DistributedPass(object):
         scope = assign.target.scope
         loc = assign.target.loc
         out = [assign]
+        array_reduce = get_array_reduce(func_var, rhs.args, self._call_table,
+                                                        self._array_methods)
+        if array_reduce is not None and not self._is_REP(array_reduce[0].name):
+            return self._run_array_reduce(assign, *array_reduce)
         # shortcut if we don't know the call
         if func_var not in self._call_table or not self._call_table[func_var]:
             return out
         call_list = self._call_table[func_var]
 
-        if self._is_call(func_var, [len]) and rhs.args and self._is_1D_arr(rhs.args[0].name):
+        if (self._is_call(func_var, [len]) and rhs.args
+                and (self._is_1D_arr(rhs.args[0].name)
+                    or self._is_2D_arr(rhs.args[0].name))):
             arr = rhs.args[0].name
             assign.value = self._array_sizes[arr][0]
 
@@ -306,8 +525,25 @@ class DistributedPass(object):
                 self._array_counts[lhs] = new_size_list
             out.append(assign)
 
+        # divide 2D alloc across processor grid
+        if self._is_2D_arr(lhs) and self._is_alloc_call(func_var):
+            size_var = rhs.args[0]
+            assert size_var.name in self._tuple_table
+            out, sizes, starts, counts = self._gen_2D_div(
+                self._tuple_table[size_var.name], scope, loc)
+            tuple_var = ir.Var(scope, mk_unique_var("$tuple_var"), loc)
+            self.typemap[tuple_var.name] = self.typemap[size_var.name]
+            tuple_call = ir.Expr.build_tuple(counts, loc)
+            out.append(ir.Assign(tuple_call, tuple_var, loc))
+            rhs.args[0] = tuple_var
+            self._array_sizes[lhs] = sizes
+            self._array_starts[lhs] = starts
+            self._array_counts[lhs] = counts
+            out.append(assign)
+
         if (self._is_h5_read_write_call(func_var)
-                and self._is_1D_arr(rhs.args[6].name)):
+                and (self._is_1D_arr(rhs.args[6].name)
+                    or self._is_2D_arr(rhs.args[6].name))):
             arr = rhs.args[6].name
             ndims = len(self._array_starts[arr])
             starts_var = ir.Var(scope, mk_unique_var("$h5_starts"), loc)
@@ -328,40 +564,33 @@ class DistributedPass(object):
 
 
         # output array has same properties (starts etc.) as input array
-        if (len(call_list)==2 and call_list[1]==np
+        if (((len(call_list)==2 and call_list[1]==np
                 and call_list[0] in ['cumsum', 'cumprod', 'empty_like',
-                    'zeros_like', 'ones_like', 'full_like', 'copy']
-                and not self._is_REP(rhs.args[0].name)):
+                    'zeros_like', 'ones_like', 'full_like', 'copy'])
+                or get_scan_call(call_list) is not None)
+                and rhs.args[0].name in self._array_starts):
             in_arr = rhs.args[0].name
             self._array_starts[lhs] = self._array_starts[in_arr]
             self._array_counts[lhs] = self._array_counts[in_arr]
             self._array_sizes[lhs] = self._array_sizes[in_arr]
 
-        if (len(call_list)==2 and call_list[1]==np
-                and call_list[0] in ['cumsum', 'cumprod']
-                and self._is_1D_arr(rhs.args[0].name)):
-            in_arr = rhs.args[0].name
-            in_arr_var = rhs.args[0]
-            lhs_var = assign.target
-            # allocate output array
-            # TODO: compute inplace if input array is dead
-            out = mk_alloc(self.typemap, self.calltypes, lhs_var,
-                            tuple(self._array_sizes[in_arr]),
-                            self.typemap[in_arr].dtype, scope, loc)
-            # generate distributed call
-            dist_attr_var = ir.Var(scope, mk_unique_var("$dist_attr"), loc)
-            dist_func_name = "dist_"+call_list[0]
-            dist_func = getattr(distributed_api, dist_func_name)
-            dist_attr_call = ir.Expr.getattr(self._g_dist_var, dist_func_name, loc)
-            self.typemap[dist_attr_var.name] = get_global_func_typ(dist_func)
-            dist_func_assign = ir.Assign(dist_attr_call, dist_attr_var, loc)
-            err_var = ir.Var(scope, mk_unique_var("$dist_err_var"), loc)
-            self.typemap[err_var.name] = types.int32
-            dist_call = ir.Expr.call(dist_attr_var, [in_arr_var, lhs_var], (), loc)
-            self.calltypes[dist_call] = self.typemap[dist_attr_var.name].get_call_type(
-                typing.Context(), [self.typemap[in_arr], self.typemap[lhs]], {})
-            dist_assign = ir.Assign(dist_call, err_var, loc)
-            return out+[dist_func_assign, dist_assign]
+        scan_name = get_scan_call(call_list)
+        if scan_name is not None and not self._is_REP(rhs.args[0].name):
+            return self._run_scan(assign, scan_name)
+
+        if is_rebalance_call(call_list) and self._is_1D_arr(lhs):
+            return self._run_rebalance(assign)
+
+        sort_name = get_sort_call(call_list)
+        if sort_name is not None and not self._is_REP(lhs):
+            return self._run_sort(assign, sort_name=='argsort')
+
+        quantile_name = get_quantile_call(call_list)
+        if quantile_name is not None and not self._is_REP(rhs.args[0].name):
+            return self._run_quantile(assign, quantile_name)
+
+        if self._is_call(func_var, ['dot', np]) and self._is_2D_arr(lhs):
+            return self._run_dot_2d(assign)
 
         if self._is_call(func_var, ['dot', np]):
             arg0 = rhs.args[0].name
@@ -393,11 +622,15 @@ class DistributedPass(object):
                 if ndim0==1 and ndim1==1:
                     err_var = assign.target
                 reduce_var = assign.target
-                reduce_call = ir.Expr.call(reduce_attr_var, [reduce_var], (), loc)
+                op_var = self._gen_reduce_op_var(Reduce_Type.Sum, scope, loc, out)
+                reduce_call = ir.Expr.call(reduce_attr_var, [reduce_var, op_var],
+                                                                    (), loc)
                 self.calltypes[reduce_call] = self.typemap[reduce_attr_var.name].get_call_type(
-                    typing.Context(), [self.typemap[reduce_var.name]], {})
+                    typing.Context(), [self.typemap[reduce_var.name], types.int32], {})
                 reduce_assign = ir.Assign(reduce_call, err_var, loc)
                 out.append(reduce_assign)
+                self._record_comm("allreduce", reduce_var,
+                                    "~2*{}".format(self._get_nbytes(reduce_var)))
 
             # assign starts/counts/sizes data structures for output array
             if ndim0==2 and ndim1==1 and not t0 and self._is_1D_arr(arg0):
@@ -422,9 +655,236 @@ class DistributedPass(object):
 
         return out
 
+    def _run_scan(self, assign, scan_name):
+        """distributed scan (cumsum etc.) of 1D or 1D_Var array"""
+        lhs = assign.target
+        in_arr = assign.value.args[0]
+        scope = lhs.scope
+        loc = lhs.loc
+        ndims = self.typemap[in_arr.name].ndim
+        out = []
+        # output has the same local shape as input
+        shape_var = ir.Var(scope, mk_unique_var("$scan_shape"), loc)
+        self.typemap[shape_var.name] = types.containers.UniTuple(types.intp,
+                                                                        ndims)
+        out.append(ir.Assign(ir.Expr.getattr(in_arr, 'shape', loc), shape_var,
+                                                                        loc))
+        sizes = []
+        for i in range(ndims):
+            size_var = ir.Var(scope, mk_unique_var("$scan_size"), loc)
+            self.typemap[size_var.name] = types.intp
+            out.append(ir.Assign(ir.Expr.static_getitem(shape_var, i, None,
+                                                        loc), size_var, loc))
+            sizes.append(size_var)
+        # TODO: compute inplace if input array is dead
+        out += mk_alloc(self.typemap, self.calltypes, lhs, tuple(sizes),
+                                    self.typemap[lhs.name].dtype, scope, loc)
+        err_var = ir.Var(scope, mk_unique_var("$dist_err_var"), loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call("dist_"+scan_name, [in_arr, lhs], err_var, out)
+        self._record_comm("exscan", in_arr, "{}*log2(num_pes) bytes".format(
+                        getattr(self.typemap[lhs.name].dtype, 'bitwidth', 64)//8))
+        return out
+
+    def _run_sort(self, assign, is_argsort):
+        """replace B = np.sort(A) or B = np.argsort(A) with parallel sample
+        sort, B is 1D_Var and argsort returns global indices into A"""
+        lhs = assign.target
+        in_arr = assign.value.args[0]
+        scope = lhs.scope
+        loc = lhs.loc
+        out = []
+        sort_var = ir.Var(scope, mk_unique_var("$sort_var"), loc)
+        self.typemap[sort_var.name] = types.int64
+        self._gen_dist_call('dist_sort', [in_arr], sort_var, out)
+        count_var = ir.Var(scope, mk_unique_var("$sort_count"), loc)
+        self.typemap[count_var.name] = types.intp
+        self._gen_dist_call('dist_sort_count', [sort_var], count_var, out)
+        out += mk_alloc(self.typemap, self.calltypes, lhs, (count_var,),
+                                    self.typemap[lhs.name].dtype, scope, loc)
+        is_argsort_var = ir.Var(scope, mk_unique_var("$is_argsort"), loc)
+        self.typemap[is_argsort_var.name] = types.boolean
+        out.append(ir.Assign(ir.Const(is_argsort, loc), is_argsort_var, loc))
+        err_var = ir.Var(scope, mk_unique_var("$sort_err_var"), loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call('dist_sort_finish', [sort_var, lhs,
+                                                is_argsort_var], err_var, out)
+        self._record_comm("allgatherv+alltoallv (sample sort)", in_arr,
+                            "~{} + 8*{}.size bytes".format(
+                            self._get_nbytes(in_arr), in_arr.name))
+        return out
+
+    def _run_quantile(self, assign, quantile_name):
+        """replace np.median(A), np.percentile(A, q) or Series quantile of
+        distributed vector with distributed selection"""
+        lhs = assign.target
+        in_arr = assign.value.args[0]
+        scope = lhs.scope
+        loc = lhs.loc
+        out = []
+        if quantile_name=='median':
+            q_var = ir.Var(scope, mk_unique_var("$median_q"), loc)
+            self.typemap[q_var.name] = types.float64
+            out.append(ir.Assign(ir.Const(50.0, loc), q_var, loc))
+        else:
+            q_var = assign.value.args[1]
+        func_name = ('dist_quantile' if quantile_name=='quantile'
+                                                        else 'dist_percentile')
+        # runtime returns float64, assignment casts to output type
+        res_var = ir.Var(scope, mk_unique_var("$quantile_var"), loc)
+        self.typemap[res_var.name] = types.float64
+        self._gen_dist_call(func_name, [in_arr, q_var], res_var, out)
+        out.append(ir.Assign(res_var, lhs, loc))
+        self._record_comm("allreduce (selection)", in_arr,
+                        "~16*log2({}.size) bytes".format(in_arr.name))
+        return out
+
+    def _run_rebalance(self, assign):
+        """replace B = rebalance_array(A) with allocation of B as 1D block
+        distributed array with same total size and moving rows of A"""
+        out = []
+        self._gen_rebalance(assign.value.args[0], assign.target, out)
+        return out
+
+    def _gen_rebalance(self, in_arr, lhs, out):
+        """allocate lhs as 1D block distributed array with the same total size
+        as 1D_Var array in_arr and move rows of in_arr to it"""
+        scope = lhs.scope
+        loc = lhs.loc
+        ndims = self.typemap[in_arr.name].ndim
+        # shape_var = A.shape
+        shape_var = ir.Var(scope, mk_unique_var("$rebalance_shape"), loc)
+        self.typemap[shape_var.name] = types.containers.UniTuple(types.intp,
+                                                                        ndims)
+        out.append(ir.Assign(ir.Expr.getattr(in_arr, 'shape', loc), shape_var,
+                                                                        loc))
+        sizes = []
+        for i in range(ndims):
+            size_var = ir.Var(scope, mk_unique_var("$rebalance_size"), loc)
+            self.typemap[size_var.name] = types.intp
+            out.append(ir.Assign(ir.Expr.static_getitem(shape_var, i, None,
+                                                        loc), size_var, loc))
+            sizes.append(size_var)
+        # total size is sum of local sizes
+        total_var = ir.Var(scope, mk_unique_var("$rebalance_total"), loc)
+        self.typemap[total_var.name] = types.intp
+        op_var = self._gen_reduce_op_var(Reduce_Type.Sum, scope, loc, out)
+        self._gen_dist_call('dist_reduce', [sizes[0], op_var], total_var, out)
+        div_nodes, start_var, count_var = self._gen_1D_div(total_var, scope,
+            loc, "$alloc", "get_node_portion", distributed_api.get_node_portion)
+        out += div_nodes
+        counts = [count_var] + sizes[1:]
+        out += mk_alloc(self.typemap, self.calltypes, lhs, tuple(counts),
+                                self.typemap[in_arr.name].dtype, scope, loc)
+        err_var = ir.Var(scope, mk_unique_var("$rebalance_err_var"), loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call('dist_rebalance', [in_arr, lhs], err_var, out)
+        self._record_comm("alltoallv", in_arr,
+                                "<= {}".format(self._get_nbytes(in_arr)))
+
+        self._array_sizes[lhs.name] = [total_var] + sizes[1:]
+        self._array_starts[lhs.name] = [start_var] + [self._set0_var]*(ndims-1)
+        self._array_counts[lhs.name] = counts
+        return
+
+    def _run_dot_2d(self, assign):
+        """replace C = np.dot(A, B) of 2D distributed matrices with allocation
+        of local block of C and SUMMA matrix multiply"""
+        lhs = assign.target
+        scope = lhs.scope
+        loc = lhs.loc
+        arg0, arg1 = assign.value.args
+        M, K = self._array_sizes[arg0.name]
+        N = self._array_sizes[arg1.name][1]
+        out, sizes, starts, counts = self._gen_2D_div([M, N], scope, loc)
+        out += mk_alloc(self.typemap, self.calltypes, lhs, tuple(counts),
+                                self.typemap[lhs.name].dtype, scope, loc)
+        self._array_sizes[lhs.name] = sizes
+        self._array_starts[lhs.name] = starts
+        self._array_counts[lhs.name] = counts
+        err_var = ir.Var(scope, mk_unique_var("$dot_err_var"), loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call('dist_dot_2d', [arg0, arg1, lhs, K], err_var, out)
+        self._record_comm("bcast (SUMMA)", lhs, "~{}*grid_cols+{}*grid_rows".format(
+                        self._get_nbytes(arg0), self._get_nbytes(arg1)))
+        dprint("run dot 2D AB:", arg0.name, arg1.name)
+        return out
+
+    def _run_transpose_2d(self, assign):
+        """replace X.T of 2D distributed matrix with redistribution of X to
+        transposed processor grid layout, which makes X.T a local view with
+        2D distribution"""
+        lhs = assign.target
+        in_arr = assign.value.value
+        scope = lhs.scope
+        loc = lhs.loc
+        M, N = self._array_sizes[in_arr.name]
+        out, _, starts, counts = self._gen_2D_div([M, N], scope, loc,
+                                                            transposed=True)
+        t_buff = ir.Var(scope, mk_unique_var("$transpose_buff"), loc)
+        self.typemap[t_buff.name] = self.typemap[in_arr.name].copy(layout='C')
+        out += mk_alloc(self.typemap, self.calltypes, t_buff, tuple(counts),
+                                self.typemap[in_arr.name].dtype, scope, loc)
+        err_var = ir.Var(scope, mk_unique_var("$transpose_err_var"), loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call('dist_transpose_2d', [in_arr, t_buff, M, N],
+                                                                err_var, out)
+        self._record_comm("alltoallv", in_arr,
+                                "<= {}".format(self._get_nbytes(in_arr)))
+        assign.value = ir.Expr.getattr(t_buff, 'T', loc)
+        out.append(assign)
+        self._array_sizes[lhs.name] = [N, M]
+        self._array_starts[lhs.name] = [starts[1], starts[0]]
+        self._array_counts[lhs.name] = [counts[1], counts[0]]
+        return out
+
+    def _run_arg(self, assign):
+        """rebalance distributed arguments on entry, since callers may pass
+        chunks of any size (e.g. 1D_Var outputs of other functions) but
+        parfors and accesses assume 1D block distribution"""
+        lhs = assign.target
+        chunk_var = ir.Var(lhs.scope, mk_unique_var("$arg_chunk"), lhs.loc)
+        self.typemap[chunk_var.name] = self.typemap[lhs.name]
+        assign.target = chunk_var
+        out = [assign]
+        self._gen_rebalance(chunk_var, lhs, out)
+        return out
+
+    def _run_return_cast(self, assign):
+        """rebalance 1D_Var array before returning it as chunk of a
+        distributed output ('ret' in distributed), so that callers always
+        get 1D block chunks"""
+        in_arr = assign.value.value
+        out_var = ir.Var(in_arr.scope, mk_unique_var("$ret_chunk"), in_arr.loc)
+        self.typemap[out_var.name] = self.typemap[in_arr.name].copy(layout='C')
+        out = []
+        self._gen_rebalance(in_arr, out_var, out)
+        assign.value.value = out_var
+        out.append(assign)
+        return out
+
+    def _record_comm(self, comm_name, var, volume):
+        self._comms.append((comm_name, var.name, var.loc, volume))
+
+    def _get_nbytes(self, var):
+        """string of data size of variable for communication estimates"""
+        typ = self.typemap[var.name]
+        if isinstance(typ, types.npytypes.Array):
+            typ = typ.dtype
+            return "{}.size*{} bytes".format(var.name,
+                                            getattr(typ, 'bitwidth', 64)//8)
+        return "{} bytes".format(getattr(typ, 'bitwidth', 64)//8)
+
+    def _gen_dist_call(self, func_name, args, out_var, out):
+        """generate out_var = distributed_api.func_name(*args)"""
+        gen_dist_call(func_name, args, out_var, self.typemap, self.calltypes,
+                                                    out, self._g_dist_var)
+        return
+
     def _run_getsetitem(self, arr, index_var, node, full_node):
         out = [full_node]
-        if self._is_1D_arr(arr.name) and (arr.name, index_var.name) in self._parallel_accesses:
+        if ((self._is_1D_arr(arr.name) or self._is_2D_arr(arr.name))
+                and (arr.name, index_var.name) in self._parallel_accesses):
             scope = index_var.scope
             loc = index_var.loc
             ndims = self.typemap[arr.name].ndim
@@ -435,10 +895,15 @@ class DistributedPass(object):
             else:
                 assert index_var.name in self._tuple_table
                 index_list = self._tuple_table[index_var.name]
-                sub_assign = self._get_ind_sub(index_list[0], self._array_starts[arr.name][0])
-                out = [sub_assign]
+                # only first dimension is partitioned in 1D distribution
+                dist_ndims = 2 if self._is_2D_arr(arr.name) else 1
+                out = []
                 new_index_list = copy.copy(index_list)
-                new_index_list[0] = sub_assign.target
+                for i in range(dist_ndims):
+                    sub_assign = self._get_ind_sub(index_list[i],
+                                                self._array_starts[arr.name][i])
+                    out.append(sub_assign)
+                    new_index_list[i] = sub_assign.target
                 tuple_var = ir.Var(scope, mk_unique_var("$tuple_var"), loc)
                 self.typemap[tuple_var.name] = self.typemap[index_var.name]
                 tuple_call = ir.Expr.build_tuple(new_index_list, loc)
@@ -448,6 +913,33 @@ class DistributedPass(object):
 
             out.append(full_node)
 
+        elif (arr.name in self._rma_wins
+                and isinstance(self.typemap[index_var.name], types.Integer)):
+            scope = index_var.scope
+            loc = index_var.loc
+            win_var = self._rma_wins[arr.name]
+            out = []
+            elem_bytes = getattr(self.typemap[arr.name].dtype, 'bitwidth',
+                                                                        64)//8
+            if isinstance(node, ir.Expr):
+                self._gen_dist_call('dist_rma_get', [win_var, arr, index_var],
+                                                        full_node.target, out)
+                self._record_comm("get (one-sided)", arr,
+                                "{} bytes per iteration".format(elem_bytes))
+            else:
+                err_var = ir.Var(scope, mk_unique_var("$rma_err_var"), loc)
+                self.typemap[err_var.name] = types.int32
+                self._gen_dist_call('dist_rma_put',
+                        [win_var, arr, index_var, node.value], err_var, out)
+                self._record_comm("put (one-sided)", arr,
+                                "{} bytes per iteration".format(elem_bytes))
+
+        elif (isinstance(node, ir.Expr) and is_gather_access(arr.name,
+                                            index_var.name, self.typemap)
+                and not (self._is_REP(arr.name)
+                        and self._is_REP(full_node.target.name))):
+            out = self._run_gather_index(arr, index_var, full_node)
+
         elif self._is_1D_arr(arr.name) and isinstance(node, (ir.StaticSetItem, ir.SetItem)):
             scope = index_var.scope
             loc = index_var.loc
@@ -472,9 +964,116 @@ class DistributedPass(object):
 
         return out
 
+    def _gen_rma_windows(self, parfor, out):
+        """create one-sided access windows for distributed arrays accessed
+        with data-dependent indices like A[B[i]] in parfor, returns arrays
+        of new windows"""
+        new_arrs = []
+        for arr_var in self._get_random_accesses(parfor):
+            arr = arr_var.name
+            if (arr in self._rma_wins or arr in new_arrs
+                    or not (self._is_1D_arr(arr) or self._is_1D_Var_arr(arr))):
+                continue
+            win_var = ir.Var(arr_var.scope, mk_unique_var("$rma_win"),
+                                                                parfor.loc)
+            self.typemap[win_var.name] = types.int64
+            self._gen_dist_call('dist_rma_create', [arr_var], win_var, out)
+            self._record_comm("allgather+win_create", arr_var,
+                                                "~8*num_pes bytes")
+            self._rma_wins[arr] = win_var
+            new_arrs.append(arr)
+        return new_arrs
+
+    def _get_random_accesses(self, parfor):
+        """arrays accessed with scalar indices that are not parallel in parfor
+        and nested parfors"""
+        accesses = []
+        blocks = wrap_parfor_blocks(parfor)
+        for block in blocks.values():
+            for stmt in block.body:
+                if isinstance(stmt, Parfor):
+                    accesses += self._get_random_accesses(stmt)
+                    continue
+                index = None
+                if (isinstance(stmt, ir.Assign)
+                        and isinstance(stmt.value, ir.Expr)
+                        and stmt.value.op=='getitem'):
+                    arr, index = stmt.value.value, stmt.value.index.name
+                if isinstance(stmt, ir.SetItem):
+                    arr, index = stmt.target, stmt.index.name
+                if (index is not None
+                        and (arr.name, index) not in self._parallel_accesses
+                        and is_random_access(arr.name, index, self.typemap)):
+                    accesses.append(arr)
+        unwrap_parfor_blocks(parfor)
+        return accesses
+
+    def _gen_rma_free(self, win_var, out):
+        err_var = ir.Var(win_var.scope, mk_unique_var("$rma_err_var"),
+                                                                win_var.loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call('dist_rma_free', [win_var], err_var, out)
+
+    def _run_gather_index(self, arr, index_var, assign):
+        """B = A[idx] with distributed A or idx, B has the local size of idx
+        and its rows are requested from owners in A in one batch"""
+        lhs = assign.target
+        scope = lhs.scope
+        loc = lhs.loc
+        out = []
+        ndims = self.typemap[arr.name].ndim
+        shape_var = ir.Var(scope, mk_unique_var("$gather_shape"), loc)
+        self.typemap[shape_var.name] = types.containers.UniTuple(types.intp,
+                                                                        ndims)
+        out.append(ir.Assign(ir.Expr.getattr(arr, 'shape', loc), shape_var,
+                                                                        loc))
+        sizes = []
+        for i in range(1, ndims):
+            size_var = ir.Var(scope, mk_unique_var("$gather_size"), loc)
+            self.typemap[size_var.name] = types.intp
+            out.append(ir.Assign(ir.Expr.static_getitem(shape_var, i, None,
+                                                        loc), size_var, loc))
+            sizes.append(size_var)
+        if self._is_REP(arr.name):
+            # local rows of idx can be gathered from replicated A locally
+            out.append(assign)
+        else:
+            n_var = ir.Var(scope, mk_unique_var("$gather_n"), loc)
+            self.typemap[n_var.name] = types.intp
+            out.append(ir.Assign(ir.Expr.getattr(index_var, 'size', loc),
+                                                                n_var, loc))
+            out += mk_alloc(self.typemap, self.calltypes, lhs,
+                tuple([n_var] + sizes), self.typemap[arr.name].dtype, scope,
+                                                                        loc)
+            err_var = ir.Var(scope, mk_unique_var("$gather_err_var"), loc)
+            self.typemap[err_var.name] = types.int32
+            self._gen_dist_call('dist_gather_index', [arr, index_var, lhs],
+                                                                err_var, out)
+            self._record_comm("alltoallv", arr,
+                "8*{0}.size bytes + {0}.size rows".format(index_var.name))
+
+        # output rows are distributed like indices
+        if index_var.name in self._array_starts:
+            self._array_starts[lhs.name] = (
+                self._array_starts[index_var.name][:1]
+                + [self._set0_var]*(ndims-1))
+            self._array_counts[lhs.name] = (
+                self._array_counts[index_var.name][:1] + sizes)
+            self._array_sizes[lhs.name] = (
+                self._array_sizes[index_var.name][:1] + sizes)
+        return out
+
     def _run_parfor(self, parfor, namevar_table):
+        inner_index_var = None
+        if len(parfor.loop_nests)>1:
+            inner_index_var = parfor.loop_nests[1].index_variable.name
         stencil_accesses, arrays_accessed = get_stencil_accesses(
-            parfor.loop_body, parfor.loop_nests[0].index_variable.name)
+            parfor.loop_body, parfor.loop_nests[0].index_variable.name,
+            inner_index_var)
+
+        if self._dist_analysis.parfor_dists[parfor.id]==Distribution.TwoD:
+            return self._run_parfor_2d(parfor, namevar_table,
+                                            stencil_accesses, arrays_accessed)
 
         if self._dist_analysis.parfor_dists[parfor.id]!=Distribution.OneD:
             # TODO: make sure loop index is not used for calculations in
@@ -488,21 +1087,22 @@ class DistributedPass(object):
         range_size = parfor.loop_nests[0].stop
         out = []
 
+        # set by compiler.set_prange_schedules() on prange call locations
+        schedule, chunk = getattr(parfor.loc, 'prange_schedule', ('static', 1))
+        if schedule!='static':
+            if not stencil_accesses and not self._has_dist_parallel_access(parfor):
+                return self._run_parfor_dynamic(parfor, namevar_table,
+                                                        schedule, chunk)
+            # iterations are tied to the data layout of distributed arrays
+            dprint("parfor {} uses static schedule since it accesses "
+                    "distributed arrays".format(parfor.id))
+
         # return range to original size of array
         if stencil_accesses:
-            right_length = max(stencil_accesses.values())
-            right_length = max(right_length, 0)  # avoid negative value
-            if right_length:
-                new_range_size = ir.Var(scope, mk_unique_var("new_range_size"), loc)
-                self.typemap[new_range_size.name] = types.intp
-                index_const = ir.Var(scope, mk_unique_var("index_const"), loc)
-                self.typemap[index_const.name] = types.intp
-                out.append(ir.Assign(ir.Const(right_length, loc), index_const, loc))
-                calc_call = ir.Expr.binop('+', range_size, index_const, loc)
-                self.calltypes[calc_call] = ir_utils.find_op_typ('+',
-                                                    [types.intp, types.intp])
-                out.append(ir.Assign(calc_call, new_range_size, loc))
-                range_size = new_range_size
+            halos = get_stencil_halos(stencil_accesses, 1)
+            range_size = self._gen_stencil_range(range_size, halos[0][1],
+                                                                scope, loc, out)
+        loop_bounds = [(parfor.loop_nests[0].start, parfor.loop_nests[0].stop)]
 
         div_nodes, start_var, end_var = self._gen_1D_div(range_size, scope, loc,
                                     "$loop", "get_end", distributed_api.get_end)
@@ -516,66 +1116,411 @@ class DistributedPass(object):
 
 
         if stencil_accesses:
-            # TODO assuming single array in stencil
-            arr_set = set(arrays_accessed.values())
-            arr = arr_set.pop()
-            assert not arr_set  # only one array
-            self._run_parfor_stencil(parfor, out, start_var, end_var,
-                                        stencil_accesses, namevar_table[arr])
+            arr_vars = self._get_stencil_arr_vars(parfor, arrays_accessed)
+            # halo buffers are read in border iterations that are copies of
+            # the loop body, which requires simple 1D stencils
+            if (len(parfor.loop_body)==1 and len(parfor.loop_nests)==1
+                    and all(self.typemap[v.name].ndim==1 for v in arr_vars)):
+                self._run_parfor_stencil(parfor, out, start_var, end_var,
+                                                            halos[0], arr_vars)
+            else:
+                self._run_parfor_ghost(parfor, out, [start_var], loop_bounds,
+                                halos, arr_vars, arrays_accessed, is_2d=False)
         else:
             out.append(parfor)
 
+        out += self._gen_parfor_reductions(parfor, namevar_table)
+        return out
+
+    def _run_parfor_dynamic(self, parfor, namevar_table, schedule, chunk):
+        """assign chunks of iterations to processors at runtime using a shared
+        counter, which balances parfors with uneven iteration costs. The loop
+        around the parfor is generated after the block is processed.
+        """
+        scope = parfor.init_block.scope
+        loc = parfor.init_block.loc
+        out = []
+        bound_vars = []
+        for bound in (parfor.loop_nests[0].start, parfor.loop_nests[0].stop):
+            if not isinstance(bound, ir.Var):
+                bound_var = ir.Var(scope, mk_unique_var("$loop_bound"), loc)
+                self.typemap[bound_var.name] = types.intp
+                out.append(ir.Assign(ir.Const(bound, loc), bound_var, loc))
+                bound = bound_var
+            bound_vars.append(bound)
+        offset_var, stop_var = bound_vars
+        # the counter covers [0, stop-start), claimed chunks are shifted by
+        # the original start of the loop
+        total_var = ir.Var(scope, mk_unique_var("$loop_total"), loc)
+        self.typemap[total_var.name] = types.intp
+        total_expr = ir.Expr.binop('-', stop_var, offset_var, loc)
+        self.calltypes[total_expr] = find_op_typ('-',
+            [self.typemap[stop_var.name], self.typemap[offset_var.name]])
+        out.append(ir.Assign(total_expr, total_var, loc))
+        chunk_var = ir.Var(scope, mk_unique_var("$loop_chunk"), loc)
+        self.typemap[chunk_var.name] = types.int64
+        out.append(ir.Assign(ir.Const(chunk, loc), chunk_var, loc))
+        guided_var = ir.Var(scope, mk_unique_var("$loop_guided"), loc)
+        self.typemap[guided_var.name] = types.boolean
+        out.append(ir.Assign(ir.Const(schedule=='guided', loc), guided_var, loc))
+        counter_var = ir.Var(scope, mk_unique_var("$loop_counter"), loc)
+        self.typemap[counter_var.name] = types.int64
+        self._gen_dist_call('dist_counter_create',
+                            [total_var, chunk_var, guided_var], counter_var, out)
+
+        start_var = ir.Var(scope, mk_unique_var("$loop_start"), loc)
+        self.typemap[start_var.name] = types.int64
+        end_var = ir.Var(scope, mk_unique_var("$loop_end"), loc)
+        self.typemap[end_var.name] = types.int64
+        parfor.loop_nests[0].start = start_var
+        parfor.loop_nests[0].stop = end_var
+        out.append(parfor)
+        self._dynamic_parfors[parfor.id] = (counter_var, total_var, offset_var)
+
+        err_var = ir.Var(scope, mk_unique_var("$counter_free_err"), loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call('dist_counter_free', [counter_var], err_var, out)
+        self._record_comm("fetch_and_op", counter_var,
+                    "~{}/{} * 8 bytes".format(total_var.name, chunk))
+        out += self._gen_parfor_reductions(parfor, namevar_table)
+        return out
+
+    def _has_dist_parallel_access(self, parfor):
+        """see if parfor accesses distributed arrays using its index"""
+        for arr, index in ir_utils.get_array_accesses(parfor.loop_body):
+            if ((self._is_1D_arr(arr) or self._is_2D_arr(arr))
+                    and (arr, index) in self._parallel_accesses):
+                return True
+        return False
+
+    def _run_parfor_2d(self, parfor, namevar_table, stencil_accesses,
+                                                            arrays_accessed):
+        """divide the first two loops of parfor across the processor grid"""
+        scope = parfor.init_block.scope
+        loc = parfor.init_block.loc
+        out = []
+        if stencil_accesses:
+            halos = get_stencil_halos(stencil_accesses, 2)
+        loop_bounds = []
+        start_vars = []
+        for dim in range(2):
+            loop_nest = parfor.loop_nests[dim]
+            loop_bounds.append((loop_nest.start, loop_nest.stop))
+            range_size = loop_nest.stop
+            if stencil_accesses:
+                range_size = self._gen_stencil_range(range_size, halos[dim][1],
+                                                                scope, loc, out)
+            div_nodes, start_var, end_var = self._gen_1D_div(range_size,
+                scope, loc, "$loop", "get_end", distributed_api.get_end,
+                self._grid_size_vars[dim], self._grid_rank_vars[dim])
+            out += div_nodes
+            loop_nest.start = start_var
+            loop_nest.stop = end_var
+            start_vars.append(start_var)
+
+        if stencil_accesses:
+            arr_vars = self._get_stencil_arr_vars(parfor, arrays_accessed)
+            self._run_parfor_ghost(parfor, out, start_vars, loop_bounds, halos,
+                                        arr_vars, arrays_accessed, is_2d=True)
+        else:
+            out.append(parfor)
+        out += self._gen_parfor_reductions(parfor, namevar_table)
+        return out
+
+    def _gen_parfor_reductions(self, parfor, namevar_table):
+        scope = parfor.init_block.scope
+        loc = parfor.init_block.loc
+        out = []
         _, reductions = get_parfor_reductions(parfor, parfor.params)
 
         for reduce_varname, (_, reduce_func, _) in reductions.items():
-            if self._isarray(reduce_varname):
-                reduce_attr_var = ir.Var(scope, mk_unique_var("$reduce_attr"), loc)
-                reduce_attr_call = ir.Expr.getattr(self._g_dist_var, "dist_arr_reduce", loc)
-                self.typemap[reduce_attr_var.name] = get_global_func_typ(
-                                                distributed_api.dist_arr_reduce)
-                reduce_assign = ir.Assign(reduce_attr_call, reduce_attr_var, loc)
-                out.append(reduce_assign)
-                reduce_var = namevar_table[reduce_varname]
-                reduce_call = ir.Expr.call(reduce_attr_var, [reduce_var], (), loc)
-                self.calltypes[reduce_call] = self.typemap[reduce_attr_var.name].get_call_type(
-                    typing.Context(), [self.typemap[reduce_varname]], {})
+            reduce_op = _get_parfor_reduce_op(reduce_func,
+                                                self.typemap[reduce_varname])
+            reduce_var = namevar_table[reduce_varname]
+            if not self._isarray(reduce_varname):
+                # scalar reductions are deferred to fuse them with reductions
+                # of following parfors
+                self._pending_reductions.append((reduce_var, reduce_op))
+                continue
+            op_var = self._gen_reduce_op_var(reduce_op, scope, loc, out)
+            if self._print_only_arrs.get(reduce_varname, None)==parfor.id:
+                # prints run on rank 0 only, which is the only one that needs
+                # the result
                 err_var = ir.Var(scope, mk_unique_var("$reduce_err_var"), loc)
                 self.typemap[err_var.name] = types.int32
-                reduce_assign = ir.Assign(reduce_call, err_var, loc)
-                out.append(reduce_assign)
+                self._gen_dist_call('dist_arr_reduce_root',
+                                            [reduce_var, op_var], err_var, out)
+                self._record_comm("reduce", reduce_var,
+                                    self._get_nbytes(reduce_var))
+                continue
+            if (hpat.config.ASYNC_REDUCE and self.typemap[reduce_varname].dtype
+                                        in distributed_lower._h5_typ_table):
+                self._gen_ireduce(reduce_var, op_var, [reduce_var], [], out)
+                self._record_comm("iallreduce", reduce_var,
+                                "~2*{}".format(self._get_nbytes(reduce_var)))
+                continue
+            reduce_attr_var = ir.Var(scope, mk_unique_var("$reduce_attr"), loc)
+            reduce_attr_call = ir.Expr.getattr(self._g_dist_var, "dist_arr_reduce", loc)
+            self.typemap[reduce_attr_var.name] = get_global_func_typ(
+                                            distributed_api.dist_arr_reduce)
+            reduce_assign = ir.Assign(reduce_attr_call, reduce_attr_var, loc)
+            out.append(reduce_assign)
+            reduce_call = ir.Expr.call(reduce_attr_var, [reduce_var, op_var],
+                                                                (), loc)
+            self.calltypes[reduce_call] = self.typemap[reduce_attr_var.name].get_call_type(
+                typing.Context(), [self.typemap[reduce_varname], types.int32], {})
+            err_var = ir.Var(scope, mk_unique_var("$reduce_err_var"), loc)
+            self.typemap[err_var.name] = types.int32
+            reduce_assign = ir.Assign(reduce_call, err_var, loc)
+            out.append(reduce_assign)
+            self._record_comm("allreduce", reduce_var,
+                                "~2*{}".format(self._get_nbytes(reduce_var)))
+
+        return out
+
+    def _get_print_only_arrs(self, blocks):
+        """find arrays that are used in a single top-level parfor and
+        otherwise only defined or printed. Returns array -> parfor id.
+        """
+        parfor_uses = {}
+        other_uses = set()
+        for block in blocks.values():
+            for stmt in block.body:
+                if isinstance(stmt, Parfor):
+                    for v in set(v.name for v in stmt.list_vars()):
+                        parfor_uses.setdefault(v, []).append(stmt.id)
+                elif isinstance(stmt, ir.Print):
+                    continue
+                elif isinstance(stmt, ir.Assign):
+                    rhs = stmt.value
+                    if isinstance(rhs, ir.Var):
+                        other_uses.add(rhs.name)
+                    elif isinstance(rhs, ir.Expr):
+                        other_uses |= set(v.name for v in rhs.list_vars())
+                    elif isinstance(rhs, ir.Arg):
+                        # caller may read argument arrays
+                        other_uses.add(stmt.target.name)
+                else:
+                    other_uses |= set(v.name for v in stmt.list_vars())
+
+        return {arr: ids[0] for arr, ids in parfor_uses.items()
+                if len(ids)==1 and arr not in other_uses and self._isarray(arr)}
+
+    def _gen_pending_reductions(self):
+        """generate deferred scalar reductions. Variables with the same
+        operator and type are packed in a buffer to use one collective.
+        """
+        out = []
+        groups = OrderedDict()
+        for reduce_var, reduce_op in self._pending_reductions:
+            key = (reduce_op, self.typemap[reduce_var.name])
+            groups.setdefault(key, []).append(reduce_var)
+        self._pending_reductions = []
+
+        for (reduce_op, typ), reduce_vars in groups.items():
+            scope = reduce_vars[0].scope
+            loc = reduce_vars[0].loc
+            op_var = self._gen_reduce_op_var(reduce_op, scope, loc, out)
+            # non-blocking reductions need a buffer even for one variable
+            if ((len(reduce_vars)==1 and not hpat.config.ASYNC_REDUCE)
+                    or typ not in distributed_lower._h5_typ_table):
+                for reduce_var in reduce_vars:
+                    self._gen_dist_call('dist_reduce', [reduce_var, op_var],
+                                                            reduce_var, out)
+                    self._record_comm("allreduce", reduce_var,
+                                "~2*{}".format(self._get_nbytes(reduce_var)))
+                continue
+
+            # buf = np.empty(k); buf[i] = var_i; reduce(buf); var_i = buf[i]
+            n_vars = len(reduce_vars)
+            buf_typ = types.npytypes.Array(typ, 1, 'C')
+            buf_var = ir.Var(scope, mk_unique_var("$reduce_buf"), loc)
+            self.typemap[buf_var.name] = buf_typ
+            size_var = ir.Var(scope, mk_unique_var("$reduce_buf_size"), loc)
+            self.typemap[size_var.name] = types.intp
+            out.append(ir.Assign(ir.Const(n_vars, loc), size_var, loc))
+            out += mk_alloc(self.typemap, self.calltypes, buf_var,
+                                                (size_var,), typ, scope, loc)
+            index_vars = []
+            for i, reduce_var in enumerate(reduce_vars):
+                index_var = ir.Var(scope, mk_unique_var("$reduce_buf_ind"), loc)
+                self.typemap[index_var.name] = types.intp
+                out.append(ir.Assign(ir.Const(i, loc), index_var, loc))
+                index_vars.append(index_var)
+                setitem_node = ir.SetItem(buf_var, index_var, reduce_var, loc)
+                self.calltypes[setitem_node] = signature(types.none, buf_typ,
+                                                            types.intp, typ)
+                out.append(setitem_node)
+            unpack_nodes = []
+            for reduce_var, index_var in zip(reduce_vars, index_vars):
+                getitem_call = ir.Expr.getitem(buf_var, index_var, loc)
+                self.calltypes[getitem_call] = signature(typ, buf_typ,
+                                                                types.intp)
+                unpack_nodes.append(ir.Assign(getitem_call, reduce_var, loc))
+            if hpat.config.ASYNC_REDUCE:
+                self._gen_ireduce(buf_var, op_var, reduce_vars, unpack_nodes,
+                                                                        out)
             else:
-                reduce_attr_var = ir.Var(scope, mk_unique_var("$reduce_attr"), loc)
-                reduce_attr_call = ir.Expr.getattr(self._g_dist_var, "dist_reduce", loc)
-                self.typemap[reduce_attr_var.name] = get_global_func_typ(
-                                                        distributed_api.dist_reduce)
-                reduce_assign = ir.Assign(reduce_attr_call, reduce_attr_var, loc)
-                out.append(reduce_assign)
-                reduce_var = namevar_table[reduce_varname]
-                reduce_call = ir.Expr.call(reduce_attr_var, [reduce_var], (), loc)
-                self.calltypes[reduce_call] = self.typemap[reduce_attr_var.name].get_call_type(
-                    typing.Context(), [self.typemap[reduce_varname]], {})
-                reduce_assign = ir.Assign(reduce_call, reduce_var, loc)
-                out.append(reduce_assign)
+                err_var = ir.Var(scope, mk_unique_var("$reduce_err_var"), loc)
+                self.typemap[err_var.name] = types.int32
+                self._gen_dist_call('dist_arr_reduce', [buf_var, op_var],
+                                                                err_var, out)
+                out += unpack_nodes
+            self._record_comm("allreduce", buf_var, "~2*{} bytes ({})".format(
+                                n_vars*getattr(typ, 'bitwidth', 64)//8,
+                                ", ".join(v.name for v in reduce_vars)))
 
         return out
 
-    def _run_parfor_stencil(self, parfor, out, start_var, end_var,
-                                                    stencil_accesses, arr_var):
-        #
+    def _gen_ireduce(self, buf_var, op_var, reduce_vars, after_nodes, out):
+        """generate non-blocking reduction of buf_var. The wait (followed by
+        after_nodes) is generated before first use of reduce_vars.
+        """
+        scope = buf_var.scope
+        loc = buf_var.loc
+        req_var = ir.Var(scope, mk_unique_var("$reduce_req"), loc)
+        self.typemap[req_var.name] = types.int32
+        self._gen_dist_call('dist_arr_ireduce', [buf_var, op_var], req_var,
+                                                                        out)
+        wait_nodes = []
+        err_var = ir.Var(scope, mk_unique_var("$reduce_wait_err"), loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call('dist_reduce_wait', [req_var], err_var, wait_nodes)
+        wait_nodes += after_nodes
+        names = set(v.name for v in reduce_vars)
+        names.add(buf_var.name)
+        self._pending_waits.append((names, wait_nodes))
+
+    def _gen_reduce_waits(self, inst):
+        """generate waits of non-blocking reductions whose variables are used
+        in inst. All reductions are completed before leaving the block."""
+        if isinstance(inst, (ir.Jump, ir.Branch, ir.Return, ir.Raise)):
+            inst_vars = None
+        else:
+            inst_vars = set(v.name for v in inst.list_vars())
+        out = []
+        pending_waits = []
+        for names, wait_nodes in self._pending_waits:
+            if inst_vars is None or names & inst_vars:
+                out += wait_nodes
+            else:
+                pending_waits.append((names, wait_nodes))
+        self._pending_waits = pending_waits
+        return out
+
+    def _uses_pending_reductions(self, parfor):
+        pending_names = set(v.name for v, _ in self._pending_reductions)
+        return any(v.name in pending_names for v in parfor.list_vars())
+
+    def _gen_reduce_op_var(self, reduce_op, scope, loc, out):
+        """generate variable with value of Reduce_Type enum for reduce calls"""
+        op_var = ir.Var(scope, mk_unique_var("$reduce_op"), loc)
+        self.typemap[op_var.name] = types.int32
+        out.append(ir.Assign(ir.Const(reduce_op.value, loc), op_var, loc))
+        return op_var
+
+    def _run_array_reduce(self, assign, arr, reduce_op):
+        """combine results of reductions like A.min() or np.argmax(A) that are
+        computed on local chunks"""
+        lhs = assign.target
+        scope = lhs.scope
+        loc = lhs.loc
+        out = []
+        op_var = self._gen_reduce_op_var(reduce_op, scope, loc, out)
+        # local reduction is replaced since NumPy's fails for empty chunks
+        if reduce_op not in (Reduce_Type.Argmin, Reduce_Type.Argmax):
+            self._gen_dist_call('dist_local_reduce', [arr, op_var], lhs, out)
+            self._gen_dist_call('dist_reduce', [lhs, op_var], lhs, out)
+            self._record_comm("allreduce", lhs,
+                                    "~2*{}".format(self._get_nbytes(lhs)))
+            return out
+
+        self._gen_dist_call('dist_local_argreduce', [arr, op_var], lhs, out)
+        if self._is_1D_arr(arr.name):
+            start_var = self._array_starts[arr.name][0]
+        else:
+            # start of 1D_Var chunk is prefix sum of chunk sizes
+            shape_var = ir.Var(scope, mk_unique_var("$argreduce_shape"), loc)
+            self.typemap[shape_var.name] = types.containers.UniTuple(
+                                        types.intp, self.typemap[arr.name].ndim)
+            out.append(ir.Assign(ir.Expr.getattr(arr, 'shape', loc),
+                                                            shape_var, loc))
+            size_var = ir.Var(scope, mk_unique_var("$argreduce_size"), loc)
+            self.typemap[size_var.name] = types.intp
+            out.append(ir.Assign(ir.Expr.static_getitem(shape_var, 0, None,
+                                                        loc), size_var, loc))
+            start_var = ir.Var(scope, mk_unique_var("$argreduce_start"), loc)
+            self.typemap[start_var.name] = types.intp
+            sum_op_var = self._gen_reduce_op_var(Reduce_Type.Sum, scope, loc,
+                                                                        out)
+            self._gen_dist_call('dist_exscan', [size_var, sum_op_var],
+                                                            start_var, out)
+
+        self._gen_dist_call('dist_argreduce', [arr, lhs, start_var, op_var],
+                                                                    lhs, out)
+        self._record_comm("allreduce", lhs, "~32 bytes")
+        return out
+
+    def _gen_stencil_range(self, range_size, right_length, scope, loc, out):
+        """stencil loops exclude right border, return size of array"""
+        if not right_length:
+            return range_size
+        return self._gen_add_const(range_size, right_length, scope, loc, out)
+
+    def _get_stencil_arr_vars(self, parfor, arrays_accessed):
+        """variables of arrays read by stencil, sorted by name so all
+        processors pack halos in the same order"""
+        arr_vars = {}
+        for block in parfor.loop_body.values():
+            for stmt in block.body:
+                if (isinstance(stmt, ir.Assign)
+                        and isinstance(stmt.value, ir.Expr)
+                        and stmt.value.op=='getitem'
+                        and stmt.value.index.name in arrays_accessed):
+                    arr_vars[stmt.value.value.name] = stmt.value.value
+        return [arr_vars[name] for name in sorted(arr_vars.keys())]
+
+    def _run_parfor_stencil(self, parfor, out, start_var, end_var, halo,
+                                                                    arr_vars):
+        """exchange halos of stencil arrays while the parfor computes interior
+        iterations, then compute border iterations from halo buffers"""
         scope = parfor.init_block.scope
         loc = parfor.init_block.loc
-        left_length = -min(stencil_accesses.values())
-        left_length = max(left_length, 0)  # avoid negative value
-        right_length = max(stencil_accesses.values())
-        right_length = max(right_length, 0)  # avoid negative value
-        dtype = self.typemap[arr_var.name].dtype
-
-        # post left send/receive
+        left_length, right_length = halo
+        # border iterations use local indices of the processor's chunk
+        count_var = ir.Var(scope, mk_unique_var("$stencil_count"), loc)
+        self.typemap[count_var.name] = types.intp
+        count_call = ir.Expr.binop('-', end_var, start_var, loc)
+        self.calltypes[count_call] = ir_utils.find_op_typ('-',
+                                                    [types.intp, types.intp])
+        out.append(ir.Assign(count_call, count_var, loc))
+
+        # halos of all arrays are packed into one message per neighbor
+        left_buffs = []
+        right_buffs = []
+        for arr_var in arr_vars:
+            dtype = self.typemap[arr_var.name].dtype
+            for (length, buffs) in [(left_length, left_buffs),
+                                                (right_length, right_buffs)]:
+                halo_recv_buff = ir.Var(scope, mk_unique_var("halo_recv_buff"),
+                                                                        loc)
+                self.typemap[halo_recv_buff.name] = self.typemap[arr_var.name]
+                out += mk_alloc(self.typemap, self.calltypes, halo_recv_buff,
+                                                (length,), dtype, scope, loc)
+                buffs.append(halo_recv_buff)
+        halo_var = ir.Var(scope, mk_unique_var("$halo"), loc)
+        self.typemap[halo_var.name] = types.int64
+        self._gen_dist_call('dist_halo_start',
+            [self._gen_tuple_var(arr_vars, out),
+            self._gen_tuple_var(left_buffs, out),
+            self._gen_tuple_var(right_buffs, out)], halo_var, out)
+        halo_bytes = sum(self.typemap[v.name].dtype.bitwidth//8
+                                                            for v in arr_vars)
+        self._record_comm("isend (halo)", arr_vars[0], "{} bytes".format(
+                                        (left_length+right_length)*halo_bytes))
+
+        # add stencil length to parfor start
         if left_length != 0:
-            left_recv_buff, left_recv_req, left_send_req = self._gen_stencil_halo(
-                            left_length, arr_var, out, is_left=True)
-
-            # add stencil length to parfor start
             index_const = ir.Var(scope, mk_unique_var("stencil_const_var"), loc)
             self.typemap[index_const.name] = types.intp
             const_assign = ir.Assign(ir.Const(left_length, loc),
@@ -590,12 +1535,8 @@ class DistributedPass(object):
             out.append(index_assign)
             parfor.loop_nests[0].start = start_ind
 
-        # post right send/receive
+        # subtract stencil length from parfor end
         if right_length != 0:
-            right_recv_buff, right_recv_req, right_send_req = self._gen_stencil_halo(
-                            right_length, arr_var, out, is_left=False)
-
-            # subtract stencil length from parfor end
             index_const = ir.Var(scope, mk_unique_var("stencil_const_var"), loc)
             self.typemap[index_const.name] = types.intp
             const_assign = ir.Assign(ir.Const(right_length, loc),
@@ -612,15 +1553,10 @@ class DistributedPass(object):
 
         out.append(parfor)
 
-        # wait on isend/irecv
-        if left_length != 0:
-            self._gen_stencil_wait(left_recv_req, out, is_left=True)
-            self._gen_stencil_wait(left_send_req, out, is_left=False)
-
-        if right_length != 0:
-            #
-            self._gen_stencil_wait(right_recv_req, out, is_left=False)
-            self._gen_stencil_wait(right_send_req, out, is_left=True)
+        # wait for halos, border blocks are inserted after this call
+        wait_err = ir.Var(scope, mk_unique_var("wait_err"), loc)
+        self.typemap[wait_err.name] = types.int32
+        self._gen_dist_call('dist_halo_wait', [halo_var], wait_err, out)
 
         # generate border blocks
         assert len(parfor.loop_body)==1  # only one block supported
@@ -630,24 +1566,27 @@ class DistributedPass(object):
         parfor_index = parfor.loop_nests[0].index_variable
         buff_index = ir.Var(scope, mk_unique_var("buff_index"), loc)
         self.typemap[buff_index.name] = types.intp
+        arr_names = [v.name for v in arr_vars]
 
         if left_length != 0:
             border_block_left = copy.copy(body_block)
-            border_block_left.body = self._gen_stencil_border(parfor_index, buff_index, body_block.body,
-                left_recv_buff, left_length, end_var, is_left=True)
+            border_block_left.body = self._gen_stencil_border(parfor_index,
+                buff_index, body_block.body, dict(zip(arr_names, left_buffs)),
+                left_length, count_var, is_left=True)
             self._stencil_left_border[parfor.id] = border_block_left
 
         if right_length != 0:
             border_block_right = copy.copy(body_block)
-            border_block_right.body = self._gen_stencil_border(parfor_index, buff_index, body_block.body,
-                right_recv_buff, right_length, end_var, is_left=False)
+            border_block_right.body = self._gen_stencil_border(parfor_index,
+                buff_index, body_block.body, dict(zip(arr_names, right_buffs)),
+                right_length, count_var, is_left=False)
             self._stencil_right_border[parfor.id] = border_block_right
 
 
         return
 
     def _gen_stencil_border(self, parfor_index, buff_index, body,
-                                halo_recv_buff, halo_length, end_var, is_left):
+                                halo_buffs, halo_length, count_var, is_left):
         scope = parfor_index.scope
         loc = parfor_index.loc
         new_body = []
@@ -659,41 +1598,46 @@ class DistributedPass(object):
                 index_const = ir.Var(scope, mk_unique_var("index_const"), loc)
                 self.typemap[index_const.name] = types.intp
                 new_body.append(ir.Assign(ir.Const(i+1, loc), index_const, loc))
-                calc_call = ir.Expr.binop('-', end_var, index_const, loc)
+                calc_call = ir.Expr.binop('-', count_var, index_const, loc)
                 self.calltypes[calc_call] = ir_utils.find_op_typ('-',
                                                     [types.intp, types.intp])
                 new_body.append(ir.Assign(calc_call, parfor_index, loc))
 
+            # access i+c is element halo_length+i+c of left halo and c-i-1 of
+            # right halo
             if is_left:
-                buff_index_start = halo_length-i
+                buff_index_start = halo_length+i
             else:
                 buff_index_start = -(i+1)
 
             new_body.append(ir.Assign(ir.Const(buff_index_start, loc), buff_index, loc))
-            # replace index calculations with halo constants with buff index
+            # replace index calculations with halo offsets with buff index
             # replace halo array accesses with buff access
             if is_left:
                 index_com = lambda a: a < -i
             else:
                 index_com = lambda a: a > i
 
-            halo_consts = set()
+            const_table = {}
             buff_indices = set()
             for st in body:
                 stmt = copy.deepcopy(st)
                 if isinstance(stmt, ir.Assign) and isinstance(stmt.value, ir.Const):
-                    value = stmt.value.value
-                    if isinstance(value, int) and index_com(value):
-                        halo_consts.add(stmt.target.name)
+                    const_table[stmt.target.name] = stmt.value.value
                 if isinstance(stmt, ir.Assign) and isinstance(stmt.value, ir.Expr):
                     expr = stmt.value
-                    if (expr.op == 'binop' and expr.fn == '+'
+                    if (expr.op == 'binop' and expr.fn in ('+', '-')
                             and expr.lhs.name == parfor_index.name
-                            and expr.rhs.name in halo_consts):
-                        expr.lhs = buff_index
-                        buff_indices = stmt.target.name
+                            and isinstance(const_table.get(expr.rhs.name, None),
+                                                                        int)):
+                        offset = const_table[expr.rhs.name]
+                        if expr.fn == '-':
+                            offset = -offset
+                        if index_com(offset):
+                            expr.lhs = buff_index
+                            buff_indices.add(stmt.target.name)
                     if expr.op == 'getitem' and expr.index.name in buff_indices:
-                        expr.value = halo_recv_buff
+                        expr.value = halo_buffs[expr.value.name]
                     if st.value in self.calltypes:
                         self.calltypes[expr] = self.calltypes[st.value]
                 if isinstance(stmt, ir.SetItem):
@@ -701,150 +1645,179 @@ class DistributedPass(object):
                 new_body.append(stmt)
         return new_body
 
-    def _gen_stencil_halo(self, halo_length, arr_var, out, is_left):
-        scope = arr_var.scope
-        loc = arr_var.loc
-        dtype = self.typemap[arr_var.name].dtype
-        # allocate halo tmp buffer for irecv
-        halo_recv_buff = ir.Var(scope, mk_unique_var("halo_recv_buff"), loc)
-        self.typemap[halo_recv_buff.name] = self.typemap[arr_var.name]
-        out += mk_alloc(self.typemap, self.calltypes, halo_recv_buff,
-                            (halo_length,), dtype, scope, loc)
-
-        # recv from halo
-        halo_recv_req = self._gen_stencil_comm(halo_recv_buff, halo_length,
-                                        out, is_left=is_left, is_send=False)
-
-        # send to match recv
-        if is_left:
-            # copy array's last elements to buffer
-            halo_send_buff = ir.Var(scope, mk_unique_var("halo_send_buff"), loc)
-            self.typemap[halo_send_buff.name] = self.typemap[arr_var.name]
-            # const = -size
-            const_msize = ir.Var(scope, mk_unique_var("const_msize"), loc)
-            self.typemap[const_msize.name] = types.intp
-            out.append(ir.Assign(ir.Const(-halo_length, loc), const_msize, loc))
-            # const = none
-            const_none = ir.Var(scope, mk_unique_var("const_none"), loc)
-            self.typemap[const_none.name] = types.none
-            out.append(ir.Assign(ir.Const(None, loc), const_none, loc))
-            # g_slice = Global(slice)
-            g_slice_var = ir.Var(scope, mk_unique_var("g_slice_var"), loc)
-            self.typemap[g_slice_var.name] = get_global_func_typ(slice)
-            out.append(ir.Assign(ir.Global('slice', slice, loc),
-                                                        g_slice_var, loc))
-            # slice_ind_out = slice(-size, none)
-            slice_ind_out = ir.Var(scope, mk_unique_var("slice_ind_out"), loc)
-            slice_call = ir.Expr.call(g_slice_var, [const_msize,
-                            const_none], (), loc)
-            self.calltypes[slice_call] = self.typemap[g_slice_var.name].get_call_type(typing.Context(),
-                                                        [types.intp, types.none], {})
-            self.typemap[slice_ind_out.name] = self.calltypes[slice_call].return_type
-            out.append(ir.Assign(slice_call, slice_ind_out, loc))
-            # halo_send_buff = A[slice]
-            getslice_call = ir.Expr.static_getitem(arr_var, slice(-halo_length, None, None),
-                                                                slice_ind_out, loc)
-            self.calltypes[getslice_call] = signature(
-                                self.typemap[halo_send_buff.name],
-                                self.typemap[arr_var.name],
-                                self.typemap[slice_ind_out.name])
-            out.append(ir.Assign(getslice_call, halo_send_buff, loc))
-        else:
-            halo_send_buff = arr_var
-
-        halo_send_req = self._gen_stencil_comm(halo_send_buff, halo_length, out,
-                                            is_left=(not is_left), is_send=True)
-        return halo_recv_buff, halo_recv_req, halo_send_req
+    def _run_parfor_ghost(self, parfor, out, start_vars, loop_bounds, halos,
+                                            arr_vars, arrays_accessed, is_2d):
+        """copy stencil arrays into ghost arrays that have halos from neighbor
+        processors around local data and read them in the parfor instead.
+        Supports any loop body, multi-dimensional arrays and 2D distribution
+        (column halos) at the cost of a local copy and no overlap.
+        """
+        scope = parfor.init_block.scope
+        loc = parfor.init_block.loc
+        dist_ndims = len(start_vars)
+        ghost_vars = []
+        ghost_map = {}
+        for arr_var in arr_vars:
+            arr_typ = self.typemap[arr_var.name]
+            ghost_var = ir.Var(scope, mk_unique_var("$ghost_arr"), loc)
+            self.typemap[ghost_var.name] = arr_typ.copy(layout='C')
+            # ghost_shape = local shape + halos in distributed dimensions
+            shape_var = ir.Var(scope, mk_unique_var("$ghost_shape"), loc)
+            self.typemap[shape_var.name] = types.containers.UniTuple(
+                                                    types.intp, arr_typ.ndim)
+            out.append(ir.Assign(ir.Expr.getattr(arr_var, 'shape', loc),
+                                                            shape_var, loc))
+            sizes = []
+            starts = []
+            for dim in range(arr_typ.ndim):
+                size_var = ir.Var(scope, mk_unique_var("$ghost_size"), loc)
+                self.typemap[size_var.name] = types.intp
+                out.append(ir.Assign(ir.Expr.static_getitem(shape_var, dim,
+                                                None, loc), size_var, loc))
+                start_var = self._set0_var
+                if dim < dist_ndims and sum(halos[dim]):
+                    size_var = self._gen_add_const(size_var, sum(halos[dim]),
+                                                            scope, loc, out)
+                if dim < dist_ndims:
+                    # global index i is i-start+left_halo in ghost array
+                    start_var = start_vars[dim]
+                    if halos[dim][0]:
+                        start_var = self._gen_add_const(start_var,
+                                            -halos[dim][0], scope, loc, out)
+                sizes.append(size_var)
+                starts.append(start_var)
+            out += mk_alloc(self.typemap, self.calltypes, ghost_var,
+                            tuple(sizes), arr_typ.dtype, scope, loc)
+            self._dist_analysis.array_dists[ghost_var.name] = (
+                            self._dist_analysis.array_dists[arr_var.name])
+            self._array_starts[ghost_var.name] = starts
+            self._array_counts[ghost_var.name] = sizes
+            ghost_vars.append(ghost_var)
+            ghost_map[arr_var.name] = ghost_var
+
+        halo_vars = []
+        for dim in range(2):
+            for length in (halos[dim] if dim < dist_ndims else (0, 0)):
+                halo_var = ir.Var(scope, mk_unique_var("$halo_len"), loc)
+                self.typemap[halo_var.name] = types.intp
+                out.append(ir.Assign(ir.Const(length, loc), halo_var, loc))
+                halo_vars.append(halo_var)
+        is_2d_var = ir.Var(scope, mk_unique_var("$halo_is_2d"), loc)
+        self.typemap[is_2d_var.name] = types.boolean
+        out.append(ir.Assign(ir.Const(is_2d, loc), is_2d_var, loc))
+        err_var = ir.Var(scope, mk_unique_var("$halo_err"), loc)
+        self.typemap[err_var.name] = types.int32
+        self._gen_dist_call('dist_halo_ghost',
+            [self._gen_tuple_var(ghost_vars, out),
+            self._gen_tuple_var(arr_vars, out)] + halo_vars + [is_2d_var],
+            err_var, out)
+        self._record_comm("isend (halo)", arr_vars[0],
+            "{} halo rows/columns of {} arrays".format(
+                                sum(sum(h) for h in halos), len(arr_vars)))
+
+        # read stencil arrays from ghost arrays
+        for block in parfor.loop_body.values():
+            for stmt in block.body:
+                if (isinstance(stmt, ir.Assign)
+                        and isinstance(stmt.value, ir.Expr)
+                        and stmt.value.op=='getitem'
+                        and stmt.value.index.name in arrays_accessed
+                        and stmt.value.value.name in ghost_map):
+                    expr = stmt.value
+                    ghost_var = ghost_map[expr.value.name]
+                    expr.value = ghost_var
+                    sig = self.calltypes[expr]
+                    self.calltypes[expr] = signature(sig.return_type,
+                                self.typemap[ghost_var.name], *sig.args[1:])
+                    self._parallel_accesses.add((ghost_var.name,
+                                                            expr.index.name))
+
+        # all iterations of chunk are computed, limited to original loop range
+        for dim in range(dist_ndims):
+            loop_nest = parfor.loop_nests[dim]
+            loop_nest.start = self._gen_minmax(max, loop_nest.start,
+                                        loop_bounds[dim][0], scope, loc, out)
+            loop_nest.stop = self._gen_minmax(min, loop_nest.stop,
+                                        loop_bounds[dim][1], scope, loc, out)
+        out.append(parfor)
+        return
 
-    def _gen_stencil_wait(self, req, out, is_left):
-        scope = req.scope
-        loc = req.loc
-        wait_cond = self._get_comm_cond(out, scope, loc, is_left)
-        # wait_err = wait(req)
-        wait_err = ir.Var(scope, mk_unique_var("wait_err"), loc)
-        self.typemap[wait_err.name] = types.int32
-        # attr call: wait_attr = getattr(g_dist_var, irecv)
-        wait_attr_call = ir.Expr.getattr(self._g_dist_var, "wait", loc)
-        wait_attr_var = ir.Var(scope, mk_unique_var("$get_wait_attr"), loc)
-        self.typemap[wait_attr_var.name] = get_global_func_typ(distributed_api.wait)
-        out.append(ir.Assign(wait_attr_call, wait_attr_var, loc))
-        wait_call = ir.Expr.call(wait_attr_var, [req, wait_cond], (), loc)
-        self.calltypes[wait_call] = self.typemap[wait_attr_var.name].get_call_type(
-            typing.Context(), [types.int32, types.boolean], {})
-        out.append(ir.Assign(wait_call, wait_err, loc))
-
-    def _gen_stencil_comm(self, buff, size, out, is_left, is_send):
-        scope = buff.scope
-        loc = buff.loc
-        rank_op = '+'
-        if is_left:
-            rank_op = '-'
-        comm_name = 'irecv'
-        comm_call = distributed_api.irecv
-        if is_send:
-            comm_name = 'isend'
-            comm_call = distributed_api.isend
-        comm_tag_const = 22
-
-        # comm_size = size
-        comm_size = ir.Var(scope, mk_unique_var("comm_size"), loc)
-        self.typemap[comm_size.name] = types.int32
-        out.append(ir.Assign(ir.Const(size, loc), comm_size, loc))
-
-        # comm_pe = rank +/- 1
-        comm_pe = ir.Var(scope, mk_unique_var("comm_pe"), loc)
-        self.typemap[comm_pe.name] = types.int32
-        comm_pe_call = ir.Expr.binop(rank_op, self._rank_var, self._set1_var, loc)
-        if comm_pe_call not in self.calltypes:
-            self.calltypes[comm_pe_call] = find_op_typ(rank_op, [types.int32, types.int64])
-        out.append(ir.Assign(comm_pe_call, comm_pe, loc))
-
-        # comm_tag = 22
-        comm_tag = ir.Var(scope, mk_unique_var("comm_tag"), loc)
-        self.typemap[comm_tag.name] = types.int32
-        out.append(ir.Assign(ir.Const(comm_tag_const, loc), comm_tag, loc))
-
-        comm_cond = self._get_comm_cond(out, scope, loc, is_left)
-
-        # comm_req = irecv()
-        comm_req = ir.Var(scope, mk_unique_var("comm_req"), loc)
-        self.typemap[comm_req.name] = types.int32
-        # attr call: icomm_attr = getattr(g_dist_var, irecv)
-        icomm_attr_call = ir.Expr.getattr(self._g_dist_var, comm_name, loc)
-        icomm_attr_var = ir.Var(scope, mk_unique_var("$get_"+comm_name+"_attr"), loc)
-        self.typemap[icomm_attr_var.name] = get_global_func_typ(comm_call)
-        out.append(ir.Assign(icomm_attr_call, icomm_attr_var, loc))
-        icomm_call = ir.Expr.call(icomm_attr_var, [buff, comm_size,
-            comm_pe, comm_tag, comm_cond], (), loc)
-        self.calltypes[icomm_call] = self.typemap[icomm_attr_var.name].get_call_type(
-            typing.Context(), [self.typemap[buff.name], types.int32,
-            types.int32, types.int32, types.boolean], {})
-        out.append(ir.Assign(icomm_call, comm_req, loc))
-        return comm_req
-
-    def _get_comm_cond(self, out, scope, loc, is_left):
-        if is_left:
-            last_pe = self._set0_var
-        else:
-            # last_pe = num_pes - 1
-            last_pe = ir.Var(scope, mk_unique_var("last_pe"), loc)
-            self.typemap[last_pe.name] = types.intp
-            last_pe_call = ir.Expr.binop('-', self._size_var, self._set1_var, loc)
-            if last_pe_call not in self.calltypes:
-                self.calltypes[last_pe_call] = find_op_typ('-', [types.int32, types.int64])
-            out.append(ir.Assign(last_pe_call, last_pe, loc))
-
-        # comm_cond = rank != 0
-        comm_cond = ir.Var(scope, mk_unique_var("comm_cond"), loc)
-        self.typemap[comm_cond.name] = types.boolean
-        comm_cond_call = ir.Expr.binop('!=', self._rank_var, last_pe, loc)
-        if comm_cond_call not in self.calltypes:
-            self.calltypes[comm_cond_call] = find_op_typ('!=', [types.int32, types.int64])
-        out.append(ir.Assign(comm_cond_call, comm_cond, loc))
-
-        return comm_cond
-
-    def _gen_1D_div(self, size_var, scope, loc, prefix, end_call_name, end_call):
+    def _gen_add_const(self, var, value, scope, loc, out):
+        """generate var+value for integer constant value"""
+        const_var = ir.Var(scope, mk_unique_var("$const_var"), loc)
+        self.typemap[const_var.name] = types.intp
+        out.append(ir.Assign(ir.Const(value, loc), const_var, loc))
+        res_var = ir.Var(scope, mk_unique_var("$add_var"), loc)
+        self.typemap[res_var.name] = types.intp
+        add_call = ir.Expr.binop('+', var, const_var, loc)
+        self.calltypes[add_call] = find_op_typ('+', [types.intp, types.intp])
+        out.append(ir.Assign(add_call, res_var, loc))
+        return res_var
+
+    def _gen_minmax(self, func, var1, var2, scope, loc, out):
+        """generate min/max(var1, var2) of integer variables or constants"""
+        args = []
+        for var in (var1, var2):
+            if isinstance(var, int):
+                const_var = ir.Var(scope, mk_unique_var("$const_var"), loc)
+                self.typemap[const_var.name] = types.intp
+                out.append(ir.Assign(ir.Const(var, loc), const_var, loc))
+                var = const_var
+            args.append(var)
+        g_var = ir.Var(scope, mk_unique_var("$"+func.__name__), loc)
+        self.typemap[g_var.name] = get_global_func_typ(func)
+        out.append(ir.Assign(ir.Global(func.__name__, func, loc), g_var, loc))
+        call = ir.Expr.call(g_var, args, (), loc)
+        self.calltypes[call] = self.typemap[g_var.name].get_call_type(
+            typing.Context(), [self.typemap[v.name] for v in args], {})
+        res_var = ir.Var(scope, mk_unique_var("$"+func.__name__+"_var"), loc)
+        self.typemap[res_var.name] = self.calltypes[call].return_type
+        out.append(ir.Assign(call, res_var, loc))
+        return res_var
+
+    def _gen_tuple_var(self, items, out):
+        """generate tuple of variables, e.g. arrays passed to halo exchange"""
+        scope = items[0].scope
+        loc = items[0].loc
+        tuple_var = ir.Var(scope, mk_unique_var("$tuple_var"), loc)
+        self.typemap[tuple_var.name] = types.BaseTuple.from_types(
+                                    [self.typemap[v.name] for v in items])
+        out.append(ir.Assign(ir.Expr.build_tuple(items, loc), tuple_var, loc))
+        return tuple_var
+
+    def _gen_2D_div(self, size_list, scope, loc, transposed=False):
+        """divide matrix dimensions across processor grid, dimension 0 is
+        divided across grid rows and dimension 1 across grid columns (or the
+        opposite if transposed)"""
+        out = []
+        sizes = []
+        starts = []
+        counts = []
+        for dim in range(2):
+            size_var = size_list[dim]
+            if isinstance(size_var, int):
+                new_size_var = ir.Var(scope, mk_unique_var("$alloc_size_var"), loc)
+                self.typemap[new_size_var.name] = types.int64
+                out.append(ir.Assign(ir.Const(size_var, loc), new_size_var, loc))
+                size_var = new_size_var
+            grid_dim = 1-dim if transposed else dim
+            div_nodes, start_var, count_var = self._gen_1D_div(size_var, scope,
+                loc, "$alloc", "get_node_portion",
+                distributed_api.get_node_portion,
+                self._grid_size_vars[grid_dim], self._grid_rank_vars[grid_dim])
+            out += div_nodes
+            sizes.append(size_var)
+            starts.append(start_var)
+            counts.append(count_var)
+        return out, sizes, starts, counts
+
+    def _gen_1D_div(self, size_var, scope, loc, prefix, end_call_name, end_call,
+                                            num_pes_var=None, rank_var=None):
+        # divide across all processors by default
+        if num_pes_var is None:
+            num_pes_var = self._size_var
+        if rank_var is None:
+            rank_var = self._rank_var
         div_nodes = []
         if isinstance(size_var, int):
             new_size_var = ir.Var(scope, mk_unique_var(prefix+"_size_var"), loc)
@@ -854,13 +1827,13 @@ class DistributedPass(object):
             size_var = new_size_var
         div_var = ir.Var(scope, mk_unique_var(prefix+"_div_var"), loc)
         self.typemap[div_var.name] = types.int64
-        div_expr = ir.Expr.binop('//', size_var, self._size_var, loc)
+        div_expr = ir.Expr.binop('//', size_var, num_pes_var, loc)
         self.calltypes[div_expr] = find_op_typ('//', [types.int64, types.int32])
         div_assign = ir.Assign(div_expr, div_var, loc)
 
         start_var = ir.Var(scope, mk_unique_var(prefix+"_start_var"), loc)
         self.typemap[start_var.name] = types.int64
-        start_expr = ir.Expr.binop('*', div_var, self._rank_var, loc)
+        start_expr = ir.Expr.binop('*', div_var, rank_var, loc)
         self.calltypes[start_expr] = find_op_typ('*', [types.int64, types.int32])
         start_assign = ir.Assign(start_expr, start_var, loc)
         # attr call: end_attr = getattr(g_dist_var, get_end)
@@ -872,7 +1845,7 @@ class DistributedPass(object):
         end_var = ir.Var(scope, mk_unique_var(prefix+"_end_var"), loc)
         self.typemap[end_var.name] = types.int64
         end_expr = ir.Expr.call(end_attr_var, [size_var, div_var,
-            self._size_var, self._rank_var], (), loc)
+            num_pes_var, rank_var], (), loc)
         self.calltypes[end_expr] = self.typemap[end_attr_var.name].get_call_type(
             typing.Context(), [types.int64, types.int64, types.int32, types.int32], {})
         end_assign = ir.Assign(end_expr, end_var, loc)
@@ -949,6 +1922,14 @@ class DistributedPass(object):
         return (arr_name in self._dist_analysis.array_dists and
                 self._dist_analysis.array_dists[arr_name]==Distribution.OneD)
 
+    def _is_1D_Var_arr(self, arr_name):
+        return (arr_name in self._dist_analysis.array_dists and
+            self._dist_analysis.array_dists[arr_name]==Distribution.OneD_Var)
+
+    def _is_2D_arr(self, arr_name):
+        return (arr_name in self._dist_analysis.array_dists and
+                self._dist_analysis.array_dists[arr_name]==Distribution.TwoD)
+
     def _is_REP(self, arr_name):
         return (arr_name not in self._dist_analysis.array_dists or
                 self._dist_analysis.array_dists[arr_name]==Distribution.REP)
@@ -961,8 +1942,10 @@ class DistributedPass(object):
     def _is_h5_read_write_call(self, func_var):
         if func_var not in self._call_table:
             return False
-        return (self._call_table[func_var]==['h5read', hpat.pio_api]
-                or self._call_table[func_var]==['h5write', hpat.pio_api])
+        # pio_api is imported only if the function uses h5py
+        call_list = self._call_table[func_var]
+        return (len(call_list)==2 and call_list[0] in ['h5read', 'h5write']
+                and getattr(call_list[1], '__name__', None)=='hpat.pio_api')
 
     def _is_call(self, func_var, call_list):
         if func_var not in self._call_table:
@@ -970,6 +1953,123 @@ class DistributedPass(object):
         return self._call_table[func_var]==call_list
 
 
+# parfor reduction operators (as given by get_parfor_reductions) -> Reduce_Type
+_parfor_reduce_ops = {
+    '+': Reduce_Type.Sum,
+    '*': Reduce_Type.Prod,
+    min: Reduce_Type.Min,
+    max: Reduce_Type.Max,
+}
+# logical operators are only supported for booleans
+_parfor_bool_reduce_ops = {
+    '&': Reduce_Type.And,
+    '|': Reduce_Type.Or,
+}
+
+def _get_parfor_reduce_op(reduce_func, typ):
+    if typ==types.boolean and reduce_func in _parfor_bool_reduce_ops:
+        return _parfor_bool_reduce_ops[reduce_func]
+    if reduce_func in _parfor_reduce_ops:
+        return _parfor_reduce_ops[reduce_func]
+    raise NotImplementedError("distributed reduction {} not supported".format(
+                                                                reduce_func))
+
+def gen_dist_call(func_name, args, out_var, typemap, calltypes, out,
+                                                            g_dist_var=None):
+    """generate out_var = distributed_api.func_name(*args). g_dist_var is an
+    existing distributed_api global variable, which is created if not given
+    (e.g. in distributed_run_extensions of IR nodes)"""
+    scope = out_var.scope
+    loc = out_var.loc
+    if g_dist_var is None:
+        g_dist_var = ir.Var(scope, mk_unique_var("$distributed_g_var"), loc)
+        typemap[g_dist_var.name] = types.misc.Module(distributed_api)
+        out.append(ir.Assign(ir.Global('distributed_api', distributed_api,
+                                                    loc), g_dist_var, loc))
+    func = getattr(distributed_api, func_name)
+    attr_var = ir.Var(scope, mk_unique_var("$"+func_name+"_attr"), loc)
+    typemap[attr_var.name] = get_global_func_typ(func)
+    out.append(ir.Assign(ir.Expr.getattr(g_dist_var, func_name, loc),
+                                                            attr_var, loc))
+    call = ir.Expr.call(attr_var, args, (), loc)
+    calltypes[call] = typemap[attr_var.name].get_call_type(
+        typing.Context(), [typemap[v.name] for v in args], {})
+    out.append(ir.Assign(call, out_var, loc))
+    return
+
+def gen_shuffle(key_var, in_vars, out_vars, typemap, calltypes):
+    """generate hash partitioning of 1D arrays in_vars by key_var, which
+    sends rows with equal keys to the same processor. Output arrays are
+    allocated with the number of rows received (1D_Var)."""
+    scope = key_var.scope
+    loc = key_var.loc
+    out = []
+    shuffle_var = ir.Var(scope, mk_unique_var("$shuffle_var"), loc)
+    typemap[shuffle_var.name] = types.int64
+    gen_dist_call('dist_shuffle_start', [key_var], shuffle_var, typemap,
+                                                            calltypes, out)
+    count_var = ir.Var(scope, mk_unique_var("$shuffle_count"), loc)
+    typemap[count_var.name] = types.intp
+    gen_dist_call('dist_shuffle_count', [shuffle_var], count_var, typemap,
+                                                            calltypes, out)
+    for out_var in out_vars:
+        out += mk_alloc(typemap, calltypes, out_var, (count_var,),
+                                    typemap[out_var.name].dtype, scope, loc)
+    tuple_vars = []
+    for arr_vars in (in_vars, out_vars):
+        tuple_var = ir.Var(scope, mk_unique_var("$shuffle_arrs"), loc)
+        typemap[tuple_var.name] = types.BaseTuple.from_types(
+                                        [typemap[v.name] for v in arr_vars])
+        out.append(ir.Assign(ir.Expr.build_tuple(arr_vars, loc), tuple_var,
+                                                                        loc))
+        tuple_vars.append(tuple_var)
+    err_var = ir.Var(scope, mk_unique_var("$shuffle_err"), loc)
+    typemap[err_var.name] = types.int32
+    gen_dist_call('dist_shuffle_finish', [shuffle_var] + tuple_vars, err_var,
+                                                    typemap, calltypes, out)
+    return out
+
+def gen_sort_by_key(key_var, in_vars, out_vars, typemap, calltypes):
+    """generate global sort of rows of 1D_Var arrays in_vars by key_var using
+    sample sort of keys (argsort) and gather of rows in sorted order. Output
+    arrays are allocated with the number of sorted rows (1D_Var)."""
+    scope = key_var.scope
+    loc = key_var.loc
+    out = []
+    sort_var = ir.Var(scope, mk_unique_var("$sort_var"), loc)
+    typemap[sort_var.name] = types.int64
+    gen_dist_call('dist_sort', [key_var], sort_var, typemap, calltypes, out)
+    count_var = ir.Var(scope, mk_unique_var("$sort_count"), loc)
+    typemap[count_var.name] = types.intp
+    gen_dist_call('dist_sort_count', [sort_var], count_var, typemap,
+                                                            calltypes, out)
+    perm_var = ir.Var(scope, mk_unique_var("$sort_perm"), loc)
+    typemap[perm_var.name] = types.npytypes.Array(types.int64, 1, 'C')
+    out += mk_alloc(typemap, calltypes, perm_var, (count_var,), types.int64,
+                                                                    scope, loc)
+    is_argsort_var = ir.Var(scope, mk_unique_var("$is_argsort"), loc)
+    typemap[is_argsort_var.name] = types.boolean
+    out.append(ir.Assign(ir.Const(True, loc), is_argsort_var, loc))
+    err_var = ir.Var(scope, mk_unique_var("$sort_err_var"), loc)
+    typemap[err_var.name] = types.int32
+    gen_dist_call('dist_sort_finish', [sort_var, perm_var, is_argsort_var],
+                                            err_var, typemap, calltypes, out)
+    for in_var, out_var in zip(in_vars, out_vars):
+        out += mk_alloc(typemap, calltypes, out_var, (count_var,),
+                                    typemap[out_var.name].dtype, scope, loc)
+        err_var = ir.Var(scope, mk_unique_var("$gather_err_var"), loc)
+        typemap[err_var.name] = types.int32
+        gen_dist_call('dist_gather_index', [in_var, perm_var, out_var],
+                                            err_var, typemap, calltypes, out)
+    return out
+
+class _ThreadedParfor(ir.Stmt):
+    """placeholder of parfor that is not lowered sequentially in hybrid
+    mode"""
+    def __init__(self, parfor):
+        self.parfor = parfor
+        self.loc = parfor.loc
+
 def _find_first_print(body):
     for (i, inst) in enumerate(body):
         if isinstance(inst, ir.Print):
@@ -10,6 +10,8 @@ from numba.parfor import wrap_parfor_blocks, unwrap_parfor_blocks
 
 import numpy as np
 import hpat
+from hpat import distributed_api
+from hpat.distributed_api import Reduce_Type
 
 from enum import Enum
 class Distribution(Enum):
@@ -23,35 +25,100 @@ _dist_analysis_result = namedtuple('dist_analysis_result', 'array_dists,parfor_d
 distributed_analysis_extensions = {}
 
 
+class _ArrayDists(dict):
+    """array name -> distribution table that remembers the statement being
+    analyzed when an array is set to REP for the first time (for reports)"""
+    def __init__(self):
+        super(_ArrayDists, self).__init__()
+        self.cur_inst = None
+        self.rep_reasons = {}
+
+    def __setitem__(self, key, value):
+        if value==Distribution.REP and key not in self.rep_reasons:
+            self.rep_reasons[key] = self.cur_inst
+        super(_ArrayDists, self).__setitem__(key, value)
+
+
 class DistributedAnalysis(object):
     """analyze program for to distributed transfromation"""
-    def __init__(self, func_ir, typemap, calltypes):
+    def __init__(self, func_ir, typemap, calltypes, distributed_vars=(),
+                                                    distributed_2d_vars=()):
         self.func_ir = func_ir
         self.typemap = typemap
         self.calltypes = calltypes
+        # argument names (and 'ret' for return) specified as distributed
+        self._distributed_vars = distributed_vars
+        # matrices specified to have 2D block distribution
+        self._distributed_2d_vars = distributed_2d_vars
         self._call_table,_ = get_call_table(func_ir.blocks)
         self._tuple_table = get_tuple_table(func_ir.blocks)
         self._parallel_accesses = set()
         self._T_arrs = set()
+        # method var -> (array var, method name) for reductions like A.min()
+        self._array_methods = {}
+        self._parfor_locs = {}
+        # array var -> argument name (or 'ret') specified as distributed
+        self._declared_arrs = {}
+        self.rep_reasons = {}
+        # number of enclosing parfors of statements being analyzed
+        self._parfor_depth = 0
+        # arrays accessed with data-dependent indices in parfors, which are
+        # one-sided accesses unless replicated
+        self._random_access_arrs = set()
+        # randomly accessed arrays that are replicated
+        self._random_access_rep_arrs = set()
 
     def run(self):
+        array_dists, parfor_dists = self._run_fixed_point()
+        # one-sided access costs communication per element, so randomly
+        # accessed arrays are replicated like other non-parallel accesses
+        # unless that replicates arrays specified as distributed. All arrays
+        # are tried first, then one at a time.
+        if self._random_access_arrs:
+            candidates = [sorted(self._random_access_arrs)]
+            if len(candidates[0])>1:
+                candidates += [[arr] for arr in candidates[0]]
+            for arrs in candidates:
+                self._random_access_rep_arrs.update(arrs)
+                new_dists = self._run_fixed_point()
+                if self._has_REP_declared(new_dists[0]):
+                    self._random_access_rep_arrs.difference_update(arrs)
+                else:
+                    array_dists, parfor_dists = new_dists
+                    if len(arrs)>1:
+                        break
+
+        self.rep_reasons = array_dists.rep_reasons
+        for arr, name in self._declared_arrs.items():
+            if array_dists.get(arr, None)==Distribution.REP:
+                reason = self.rep_reasons.get(arr, None)
+                raise ValueError("'{}' is specified as distributed but has to "
+                    "be replicated{}".format(name, "" if reason is None else
+                    " due to '{}' ({})".format(reason, reason.loc)))
+        return _dist_analysis_result(array_dists=array_dists, parfor_dists=parfor_dists)
+
+    def _run_fixed_point(self):
         blocks = self.func_ir.blocks
-        array_dists = {}
+        array_dists = _ArrayDists()
         parfor_dists = {}
         topo_order = find_topo_order(blocks)
         save_array_dists = {}
         save_parfor_dists = {1:1} # dummy value
         # fixed-point iteration
         while array_dists!=save_array_dists or parfor_dists!=save_parfor_dists:
-            save_array_dists = copy.copy(array_dists)
+            save_array_dists = dict(array_dists)
             save_parfor_dists = copy.copy(parfor_dists)
             for label in topo_order:
                 self._analyze_block(blocks[label], array_dists, parfor_dists)
+        return array_dists, parfor_dists
 
-        return _dist_analysis_result(array_dists=array_dists, parfor_dists=parfor_dists)
+    def _has_REP_declared(self, array_dists):
+        return any(array_dists.get(arr, None)==Distribution.REP
+                                            for arr in self._declared_arrs)
 
     def _analyze_block(self, block, array_dists, parfor_dists):
         for inst in block.body:
+            array_dists.cur_inst = inst
             if isinstance(inst, ir.Assign):
                 self._analyze_assign(inst, array_dists, parfor_dists)
             elif isinstance(inst, Parfor):
@@ -64,6 +131,16 @@ class DistributedAnalysis(object):
                 if ((inst.target.name, index) not in self._parallel_accesses):
                     # no parallel to parallel array set (TODO)
                     self._set_REP([inst.value], array_dists)
+                    # setitem bounds check only supports 1D distribution
+                    if (array_dists.get(inst.target.name, None)
+                            ==Distribution.TwoD):
+                        self._set_REP([inst.target], array_dists)
+            elif (isinstance(inst, ir.Return)
+                    and 'ret' in self._distributed_vars):
+                # returned array is the local chunk of a distributed array,
+                # 1D_Var arrays are rebalanced before return
+                if self._isarray(inst.value.name):
+                    self._declared_arrs[inst.value.name] = 'ret'
             elif type(inst) in distributed_analysis_extensions:
                 # let external calls handle stmt if type matches
                 f = distributed_analysis_extensions[type(inst)]
@@ -78,13 +155,47 @@ class DistributedAnalysis(object):
         if isinstance(rhs, ir.Expr) and rhs.op=='cast':
             rhs = rhs.value
 
+        # arguments are not split in 2D since callers pass whole arrays or
+        # 1D chunks
+        if (lhs in self._distributed_2d_vars and lhs not in array_dists
+                and not isinstance(rhs, ir.Arg) and self._isarray(lhs)
+                and self.typemap[lhs].ndim==2):
+            array_dists[lhs] = Distribution.TwoD
+
         if isinstance(rhs, ir.Var) and self._isarray(lhs):
             self._meet_array_dists(lhs, rhs.name, array_dists)
             return
 
+        elif (isinstance(rhs, ir.Arg) and rhs.name in self._distributed_vars
+                and self._isarray(lhs)):
+            # argument is a chunk of a distributed array, which is rebalanced
+            # to 1D block distribution on entry
+            self._declared_arrs[lhs] = rhs.name
+            if lhs not in array_dists:
+                array_dists[lhs] = Distribution.OneD
+            return
+
         elif (isinstance(rhs, ir.Expr) and rhs.op=='getitem'
                 and (rhs.value.name,rhs.index.name) in self._parallel_accesses):
             return
+        elif (isinstance(rhs, ir.Expr) and rhs.op=='getitem'
+                and self._parfor_depth>0
+                and rhs.value.name not in self._random_access_rep_arrs
+                and is_random_access(rhs.value.name, rhs.index.name,
+                                                            self.typemap)):
+            # A[k] in parfors with data-dependent k is a one-sided get from
+            # the owner of element k if replicating A would replicate arrays
+            # specified as distributed (see run())
+            self._random_access_arrs.add(rhs.value.name)
+            return
+        elif (isinstance(rhs, ir.Expr) and rhs.op=='getitem'
+                and self._parfor_depth==0
+                and is_gather_access(rhs.value.name, rhs.index.name,
+                                                            self.typemap)):
+            # A[idx] gathers elements from their owners in bulk, output has
+            # the distribution of the index array
+            self._meet_array_dists(lhs, rhs.index.name, array_dists)
+            return
         elif (isinstance(rhs, ir.Expr) and rhs.op=='getattr' and rhs.attr=='T'
                     and self._isarray(lhs)):
             # array and its transpose have same distributions
@@ -95,6 +206,11 @@ class DistributedAnalysis(object):
             return
         elif isinstance(rhs, ir.Expr) and rhs.op=='getattr' and rhs.attr=='shape':
             pass # X.shape doesn't affect X distribution
+        elif (isinstance(rhs, ir.Expr) and rhs.op=='getattr'
+                and rhs.attr in _array_reduce_calls
+                and self._isarray(rhs.value.name)):
+            # reduction method like A.min(), handled at call site
+            self._array_methods[lhs] = (rhs.value, rhs.attr)
         elif isinstance(rhs, ir.Expr) and rhs.op=='call':
             self._analyze_call(lhs, rhs.func.name, rhs.args, array_dists)
         else:
@@ -105,24 +221,40 @@ class DistributedAnalysis(object):
         if parfor.id not in parfor_dists:
             parfor_dists[parfor.id] = Distribution.OneD
 
+        self._parfor_locs[parfor.id] = parfor.loc
+
         # analyze init block first to see array definitions
         self._analyze_block(parfor.init_block, array_dists, parfor_dists)
+        array_dists.cur_inst = parfor
         out_dist = Distribution.OneD
 
         parfor_arrs = set() # arrays this parfor accesses in parallel
         array_accesses = ir_utils.get_array_accesses(parfor.loop_body)
         par_index_var = parfor.loop_nests[0].index_variable.name
-        stencil_accesses, _ = get_stencil_accesses(parfor.loop_body, par_index_var)
+        # 2D distribution requires all parallel accesses to be A[i,j] where
+        # i and j are the indices of the first two loops
+        inner_index_var = None
+        if len(parfor.loop_nests)==2:
+            inner_index_var = parfor.loop_nests[1].index_variable.name
+        is_2d_parfor = inner_index_var is not None
+        stencil_accesses, _ = get_stencil_accesses(parfor.loop_body,
+                                            par_index_var, inner_index_var)
         for (arr,index) in array_accesses:
-            if index==par_index_var or index in stencil_accesses:
+            if index==par_index_var or (index in stencil_accesses
+                                        and index not in self._tuple_table):
                 parfor_arrs.add(arr)
                 self._parallel_accesses.add((arr,index))
+                is_2d_parfor = False
             if index in self._tuple_table:
                 index_tuple = [(var.name if isinstance(var, ir.Var) else var)
                     for var in self._tuple_table[index]]
-                if index_tuple[0]==par_index_var:
+                if index_tuple[0]==par_index_var or index in stencil_accesses:
                     parfor_arrs.add(arr)
                     self._parallel_accesses.add((arr,index))
+                    # 2D stencils access A[i+c0,j+c1]
+                    if (index_tuple!=[par_index_var, inner_index_var]
+                            and len(stencil_accesses.get(index, ()))!=2):
+                        is_2d_parfor = False
                 if par_index_var in index_tuple[1:]:
                     out_dist = Distribution.REP
             # TODO: check for index dependency
@@ -130,6 +262,9 @@ class DistributedAnalysis(object):
         for arr in parfor_arrs:
             if arr in array_dists:
                 out_dist = Distribution(min(out_dist.value, array_dists[arr].value))
+        if out_dist==Distribution.TwoD and not is_2d_parfor:
+            dprint("dist setting 2D parfor REP {}".format(parfor.id))
+            out_dist = Distribution.REP
         parfor_dists[parfor.id] = out_dist
         for arr in parfor_arrs:
             if arr in array_dists:
@@ -137,12 +272,33 @@ class DistributedAnalysis(object):
 
         # run analysis recursively on parfor body
         blocks = wrap_parfor_blocks(parfor)
+        self._parfor_depth += 1
         for b in blocks.values():
             self._analyze_block(b, array_dists, parfor_dists)
+        self._parfor_depth -= 1
         unwrap_parfor_blocks(parfor)
         return
 
     def _analyze_call(self, lhs, func_var, args, array_dists):
+        array_reduce = get_array_reduce(func_var, args, self._call_table,
+                                                        self._array_methods)
+        if array_reduce is not None and self._isarray(array_reduce[0].name):
+            arr, reduce_op = array_reduce
+            # reductions of distributed arrays are computed on local chunks
+            # and combined, but global index of argmin/argmax is only known
+            # for 1D chunks of vectors
+            arr_typ = self.typemap[arr.name]
+            if (reduce_op in (Reduce_Type.Argmin, Reduce_Type.Argmax)
+                    and (arr_typ.ndim!=1
+                    or array_dists.get(arr.name, None)==Distribution.TwoD)):
+                self._set_REP([arr], array_dists)
+            # runtime supports min/max of these types only
+            if (reduce_op in (Reduce_Type.Min, Reduce_Type.Max)
+                    and arr_typ.dtype not in (numba.types.int32,
+                    numba.types.int64, numba.types.float32, numba.types.float64)):
+                self._set_REP([arr], array_dists)
+            return
+
         if func_var not in self._call_table or not self._call_table[func_var]:
             self._analyze_call_set_REP(lhs, func_var, args, array_dists)
             return
@@ -157,13 +313,61 @@ class DistributedAnalysis(object):
         if self._is_call(func_var, [len]):
             return
 
-        if (self._is_call(func_var, ['h5read', hpat.pio_api])
-                or self._is_call(func_var, ['h5write', hpat.pio_api])):
+        if is_rebalance_call(call_list):
+            in_arr = args[0].name
+            if in_arr not in array_dists:
+                array_dists[in_arr] = Distribution.OneD
+            # output is balanced even if input is 1D_Var
+            if lhs not in array_dists:
+                array_dists[lhs] = Distribution.OneD
+            # only 1D arrays can be rebalanced, otherwise both are replicated
+            if (array_dists[in_arr] in (Distribution.REP, Distribution.TwoD)
+                    or array_dists[lhs]==Distribution.REP):
+                array_dists[in_arr] = Distribution.REP
+                array_dists[lhs] = Distribution.REP
+            return
+
+        if get_sort_call(call_list) is not None:
+            in_arr = args[0].name
+            if in_arr not in array_dists:
+                array_dists[in_arr] = Distribution.OneD
+            # output chunk sizes depend on the data
+            if lhs not in array_dists:
+                array_dists[lhs] = Distribution.OneD_Var
+            array_dists[lhs] = Distribution(min(array_dists[lhs].value,
+                                            Distribution.OneD_Var.value))
+            # sample sort supports vectors of runtime types only, otherwise
+            # input and output are replicated
+            in_typ = self.typemap[in_arr]
+            if (in_typ.ndim!=1 or in_typ.dtype not in _sort_dtypes
+                    or array_dists[in_arr] in (Distribution.REP,
+                                                            Distribution.TwoD)
+                    or array_dists[lhs]==Distribution.REP):
+                self._set_REP([args[0]], array_dists)
+                array_dists[lhs] = Distribution.REP
             return
 
-        if (len(call_list)==2 and call_list[1]==np
+        quantile_name = get_quantile_call(call_list)
+        if quantile_name is not None:
+            # distributed selection supports vectors of runtime types with
+            # scalar quantiles, otherwise input is replicated
+            in_typ = self.typemap[args[0].name]
+            n_args = 1 if quantile_name=='median' else 2
+            if (in_typ.ndim!=1 or in_typ.dtype not in _sort_dtypes
+                    or len(args)!=n_args or (n_args==2 and not isinstance(
+                    self.typemap[args[1].name], numba.types.Number))):
+                self._set_REP(args, array_dists)
+            return
+
+        # pio_api is imported only if the function uses h5py
+        if (len(call_list)==2 and call_list[0] in ['h5read', 'h5write']
+                and getattr(call_list[1], '__name__', None)=='hpat.pio_api'):
+            return
+
+        if ((len(call_list)==2 and call_list[1]==np
                 and call_list[0] in ['cumsum', 'cumprod', 'empty_like',
-                    'zeros_like', 'ones_like', 'full_like', 'copy']):
+                    'zeros_like', 'ones_like', 'full_like', 'copy'])
+                or get_scan_call(call_list) is not None):
             in_arr = args[0].name
             self._meet_array_dists(lhs, in_arr, array_dists)
             return
@@ -178,6 +382,16 @@ class DistributedAnalysis(object):
             # Fortran layout is caused by X.T and means transpose
             t0 = arg0 in self._T_arrs
             t1 = arg1 in self._T_arrs
+            if (ndim0==2 and ndim1==2 and (dist0==Distribution.TwoD
+                    or dist1==Distribution.TwoD)):
+                # matrix multiply of 2D distributed matrices (transposes are
+                # redistributed so they are not special)
+                # A, B and output have same distribution
+                self._meet_array_dists(arg0, arg1, array_dists)
+                self._meet_array_dists(lhs, arg0, array_dists)
+                self._meet_array_dists(lhs, arg1, array_dists)
+                dprint("dot 2D AB:", arg0, arg1)
+                return
             if ndim0==1 and ndim1==1:
                 # vector dot, both vectors should have same layout
                 new_dist = Distribution(min(array_dists[arg0].value,
@@ -239,6 +453,10 @@ class DistributedAnalysis(object):
 
         new_dist = Distribution(min(array_dists[arr1].value,
                                             array_dists[arr2].value))
+        # 2D distribution is only supported for matrices
+        if new_dist==Distribution.TwoD and (self.typemap[arr1].ndim!=2
+                                            or self.typemap[arr2].ndim!=2):
+            new_dist = Distribution.REP
         array_dists[arr1] = new_dist
         array_dists[arr2] = new_dist
 
@@ -259,9 +477,112 @@ class DistributedAnalysis(object):
         return self._call_table[func_var]==call_list
 
 
-def get_stencil_accesses(body, par_index_var):
-    # TODO support recursive parfor, multi-D, mutiple body blocks
+def is_rebalance_call(call_list):
+    """check call list of get_call_table() for hpat.rebalance() or
+    distributed_api.rebalance_array()"""
+    if not call_list:
+        return False
+    func = call_list[-1]
+    try:
+        for attr in reversed(call_list[:-1]):
+            func = getattr(func, attr)
+    except (AttributeError, TypeError):
+        return False
+    return func is distributed_api.rebalance_array
+
+def get_scan_call(call_list):
+    """return name of scan for np.cumsum/np.cumprod and Series cummin/cummax
+    (hiframes_api) calls, or None"""
+    if not call_list or len(call_list)!=2:
+        return None
+    if call_list[1]==np and call_list[0] in ('cumsum', 'cumprod'):
+        return call_list[0]
+    # hiframes_api is imported only if the function uses pandas
+    if (call_list[0] in ('cummin', 'cummax')
+            and getattr(call_list[1], '__name__', None)=='hpat.hiframes_api'):
+        return call_list[0]
+    return None
+
+# element types supported by runtime sample sort
+_sort_dtypes = (numba.types.int8, numba.types.uint8, numba.types.int32,
+                numba.types.int64, numba.types.float32, numba.types.float64)
+
+def get_sort_call(call_list):
+    """return 'sort' or 'argsort' for np.sort/np.argsort calls, or None"""
+    if (call_list and len(call_list)==2 and call_list[1]==np
+            and call_list[0] in ('sort', 'argsort')):
+        return call_list[0]
+    return None
+
+def get_quantile_call(call_list):
+    """return 'median' or 'percentile' for np.median/np.percentile calls and
+    'quantile' for Series.quantile (hiframes_api) calls, or None"""
+    if not call_list or len(call_list)!=2:
+        return None
+    if call_list[1]==np and call_list[0] in ('median', 'percentile'):
+        return call_list[0]
+    # hiframes_api is imported only if the function uses pandas
+    if (call_list[0]=='quantile'
+            and getattr(call_list[1], '__name__', None)=='hpat.hiframes_api'):
+        return call_list[0]
+    return None
+
+# numpy reductions over all array elements that are distributed by computing
+# them on local chunks and combining the results
+_array_reduce_calls = {
+    'min': Reduce_Type.Min,
+    'amin': Reduce_Type.Min,
+    'max': Reduce_Type.Max,
+    'amax': Reduce_Type.Max,
+    'argmin': Reduce_Type.Argmin,
+    'argmax': Reduce_Type.Argmax,
+}
+
+def get_array_reduce(func_var, args, call_table, array_methods):
+    """check call for reductions like np.min(A) or A.argmax(), return
+    (array variable, Reduce_Type) or None"""
+    if func_var in array_methods:
+        if args:  # axis argument is not supported
+            return None
+        arr, method = array_methods[func_var]
+        return arr, _array_reduce_calls[method]
+    call_list = call_table.get(func_var, None)
+    if (call_list and len(call_list)==2 and call_list[1]==np
+            and call_list[0] in _array_reduce_calls and len(args)==1):
+        return args[0], _array_reduce_calls[call_list[0]]
+    return None
+
+def is_random_access(arr, index, typemap):
+    """A[k] of 1D array with scalar integer index"""
+    arr_typ = typemap.get(arr, None)
+    return (isinstance(arr_typ, numba.types.npytypes.Array) and arr_typ.ndim==1
+            and isinstance(typemap.get(index, None), numba.types.Integer))
+
+def is_gather_access(arr, index, typemap):
+    """A[idx] with 1D 64-bit integer index array"""
+    arr_typ = typemap.get(arr, None)
+    index_typ = typemap.get(index, None)
+    return (isinstance(arr_typ, numba.types.npytypes.Array)
+            and isinstance(index_typ, numba.types.npytypes.Array)
+            and index_typ.ndim==1
+            and isinstance(index_typ.dtype, numba.types.Integer)
+            and index_typ.dtype.bitwidth==64)
+
+def get_stencil_accesses(body, par_index_var, inner_index_var=None):
+    """find array accesses with constant offsets from parfor indices like
+    A[i+1] and A[i-1,j+1]. Returns index variable -> offsets in partitioned
+    loop dimensions (first loop, and second loop if inner_index_var is
+    given), and index variable -> array accessed.
+    """
+    # TODO support recursive parfor
+    index_vars = [par_index_var]
+    if inner_index_var is not None:
+        index_vars.append(inner_index_var)
+    ndims = len(index_vars)
     const_table = {}
+    # var -> (dimension, offset) for i+c and i-c expressions
+    dim_offsets = {}
+    tuple_items = {}
     stencil_accesses = {}
     arrays_accessed = {}
 
@@ -273,15 +594,57 @@ def get_stencil_accesses(body, par_index_var):
             if isinstance(stmt, ir.Assign) and isinstance(stmt.value, ir.Expr):
                 lhs = stmt.target.name
                 rhs = stmt.value
-                if (rhs.op == 'binop' and rhs.fn == '+' and
-                        rhs.lhs.name == par_index_var and
-                        rhs.rhs.name in const_table):
-                    stencil_accesses[lhs] = const_table[rhs.rhs.name]
+                if (rhs.op == 'binop' and rhs.fn in ('+', '-') and
+                        rhs.lhs.name in index_vars and
+                        isinstance(const_table.get(rhs.rhs.name, None), int)):
+                    offset = const_table[rhs.rhs.name]
+                    if rhs.fn == '-':
+                        offset = -offset
+                    dim = index_vars.index(rhs.lhs.name)
+                    dim_offsets[lhs] = (dim, offset)
+                    if dim == 0:
+                        stencil_accesses[lhs] = (offset,) + (0,)*(ndims-1)
+                if rhs.op == 'build_tuple':
+                    tuple_items[lhs] = [v.name for v in rhs.items]
                 if rhs.op == 'getitem' and rhs.index.name in stencil_accesses:
                     arrays_accessed[rhs.index.name] = rhs.value.name
+                if rhs.op == 'getitem' and rhs.index.name in tuple_items:
+                    offsets = _get_tuple_offsets(tuple_items[rhs.index.name],
+                                                    index_vars, dim_offsets)
+                    if offsets is not None:
+                        stencil_accesses[rhs.index.name] = offsets
+                        arrays_accessed[rhs.index.name] = rhs.value.name
 
     return stencil_accesses, arrays_accessed
 
+def _get_tuple_offsets(items, index_vars, dim_offsets):
+    """offsets of tuple index from loop indices, None if not a stencil access
+    """
+    if len(items) < len(index_vars):
+        return None
+    offsets = []
+    for dim, index_var in enumerate(index_vars):
+        item = items[dim]
+        if item == index_var:
+            offsets.append(0)
+        elif item in dim_offsets and dim_offsets[item][0] == dim:
+            offsets.append(dim_offsets[item][1])
+        else:
+            return None
+    if not any(offsets):
+        return None
+    return tuple(offsets)
+
+def get_stencil_halos(stencil_accesses, ndims):
+    """halo lengths (left, right) of stencil in each partitioned dimension"""
+    halos = []
+    for dim in range(ndims):
+        offsets = [o[dim] for o in stencil_accesses.values() if len(o) > dim]
+        left = -min(offsets+[0])
+        right = max(offsets+[0])
+        halos.append((left, right))
+    return halos
+
 def dprint(*s):
     if config.DEBUG_ARRAY_OPT==1:
         print(*s)
@@ -2,6 +2,55 @@ from numba import types
 from numba.typing.templates import infer_global, AbstractTemplate
 from numba.typing import signature
 import time
+import os
+import atexit
+import ctypes
+from enum import Enum
+
+class Reduce_Type(Enum):
+    """reduction operators, enum values are used in hdist runtime"""
+    Sum = 0
+    Prod = 1
+    Min = 2
+    Max = 3
+    Argmin = 4
+    Argmax = 5
+    Or = 6
+    And = 7
+
+def get_stats():
+    """statistics of hdist runtime primitives (and h5 reads/writes) on this
+    rank, collected if HPAT_STATS=1 or HPAT_TRACE is set in the environment:
+    {primitive: (calls, bytes of local data, wall time in seconds)}"""
+    import hdist
+    n = ctypes.CFUNCTYPE(ctypes.c_int)(hdist.hpat_dist_stats_num)()
+    get_name = ctypes.CFUNCTYPE(ctypes.c_char_p, ctypes.c_int)(
+                                                    hdist.hpat_dist_stats_name)
+    calls = (ctypes.c_int64*n)()
+    nbytes = (ctypes.c_int64*n)()
+    times = (ctypes.c_double*n)()
+    ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_int64),
+        ctypes.POINTER(ctypes.c_int64), ctypes.POINTER(ctypes.c_double))(
+        hdist.hpat_dist_stats_get)(calls, nbytes, times)
+    return {get_name(i).decode(): (calls[i], nbytes[i], times[i])
+                                            for i in range(n) if calls[i]}
+
+def reset_stats():
+    """clear statistics and trace events of this rank"""
+    import hdist
+    ctypes.CFUNCTYPE(ctypes.c_int)(hdist.hpat_dist_stats_reset)()
+
+def write_trace(file_name=None):
+    """write Chrome trace of runtime primitive calls of all ranks (collective),
+    file_name defaults to HPAT_TRACE environment variable"""
+    import hdist
+    if file_name is None:
+        file_name = os.environ['HPAT_TRACE']
+    return ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p)(
+                        hdist.hpat_dist_trace_write)(file_name.encode())
+
+if os.environ.get('HPAT_TRACE'):
+    atexit.register(write_trace)
 
 def get_rank():
     """dummy function for C mpi get_rank"""
@@ -19,14 +68,42 @@ def get_node_portion(total_size, div, pes, rank):
     """get portion of size for alloc division"""
     return total_size-div*rank if rank==pes-1 else div
 
-def dist_reduce(value):
+def dist_reduce(value, reduce_op):
     """dummy to implement simple reductions"""
     return value
 
-def dist_arr_reduce(arr):
+def dist_arr_reduce(arr, reduce_op):
     """dummy to implement array reductions"""
     return -1
 
+def dist_arr_reduce_root(arr, reduce_op):
+    """dummy to implement array reductions needed on rank 0 only"""
+    return -1
+
+def dist_arr_ireduce(arr, reduce_op):
+    """dummy to implement non-blocking in-place array reductions, returns
+    request for dist_reduce_wait"""
+    return 0
+
+def dist_reduce_wait(req):
+    """dummy to wait for non-blocking reductions"""
+    return 0
+
+def dist_local_reduce(arr, reduce_op):
+    """dummy to implement min/max of local chunk, returns identity of the
+    reduction for empty chunks"""
+    return 0
+
+def dist_local_argreduce(arr, reduce_op):
+    """dummy to implement argmin/argmax of local chunk, returns -1 for empty
+    chunks"""
+    return 0
+
+def dist_argreduce(arr, index, start, reduce_op):
+    """dummy to implement argmin/argmax, returns global index of min/max
+    value given local index of min/max value and start of chunk"""
+    return index
+
 def dist_cumsum(arr):
     """dummy to implement cumsum"""
     return arr
@@ -35,13 +112,153 @@ def dist_cumprod(arr):
     """dummy to implement cumprod"""
     return arr
 
-def dist_exscan(value):
+def dist_cummin(arr):
+    """dummy to implement cummin"""
+    return arr
+
+def dist_cummax(arr):
+    """dummy to implement cummax"""
+    return arr
+
+def dist_exscan(value, reduce_op):
     """dummy to implement simple exscan"""
     return value
 
 def dist_setitem(arr, index, val):
     return 0
 
+def get_grid_rank(dim):
+    """dummy function for processor grid index of 2D distribution"""
+    return 0
+
+def get_grid_size(dim):
+    """dummy function for processor grid size of 2D distribution"""
+    return 1
+
+def dist_dot_2d(A, B, C, K):
+    """dummy to implement distributed matrix multiply of 2D arrays"""
+    return 0
+
+def dist_transpose_2d(in_arr, out_arr, M, N):
+    """dummy to implement transpose of 2D arrays"""
+    return 0
+
+def rebalance_array(arr):
+    """redistribute rows of arr evenly across processors (e.g. after filter),
+    returns a copy in sequential execution. Available as hpat.rebalance(),
+    which also accepts DataFrames"""
+    return arr.copy()
+
+def dist_rebalance(in_arr, out_arr):
+    """dummy to implement rebalance of 1D_Var arrays"""
+    return 0
+
+def dist_counter_create(total, chunk, guided):
+    """dummy to create shared iteration counter for dynamic parfor schedule"""
+    return 0
+
+def dist_counter_next(counter):
+    """dummy to claim next chunk of iterations, returns its start"""
+    return 0
+
+def dist_counter_end(counter):
+    """dummy to get end of last claimed chunk of iterations"""
+    return 0
+
+def dist_counter_free(counter):
+    """dummy to free shared iteration counter"""
+    return 0
+
+def dist_halo_start(arrs, left_bufs, right_bufs):
+    """dummy to start packed exchange of stencil halos of arrays"""
+    return 0
+
+def dist_halo_wait(halo):
+    """dummy to wait for halo exchange and copy halos to buffers"""
+    return 0
+
+def dist_halo_ghost(ext_arrs, arrs, l0, r0, l1, r1, is_2d):
+    """dummy to fill ghost arrays of stencil with local data and halos"""
+    return 0
+
+def dist_rma_create(arr):
+    """dummy to expose local chunk of array for one-sided access"""
+    return 0
+
+def dist_rma_get(win, arr, ind):
+    """dummy to get element ind of distributed array from its owner"""
+    return 0
+
+def dist_rma_put(win, arr, ind, val):
+    """dummy to set element ind of distributed array on its owner"""
+    return 0
+
+def dist_rma_free(win):
+    """dummy to complete one-sided accesses and free window"""
+    return 0
+
+def dist_gather_index(arr, idx, out):
+    """dummy to gather rows arr[idx] of distributed array from their owners"""
+    return 0
+
+def dist_sort(arr):
+    """dummy to start sample sort of 1D array, returns handle"""
+    return 0
+
+def dist_sort_count(sort):
+    """dummy to get number of local elements of sort output"""
+    return 0
+
+def dist_sort_finish(sort, out, is_argsort):
+    """dummy to copy sorted values (or global indices for argsort) to out"""
+    return 0
+
+def dist_shuffle_start(keys):
+    """dummy to hash partition rows by keys, returns handle"""
+    return 0
+
+def dist_shuffle_count(shuffle):
+    """dummy to get number of rows received in shuffle"""
+    return 0
+
+def dist_shuffle_finish(shuffle, in_arrs, out_arrs):
+    """dummy to send rows of arrays to destinations of their keys"""
+    return 0
+
+def dist_agg_start(keys, in_arrs, ops, in_cols, aux_cols):
+    """dummy to aggregate columns by keys with hash table, returns handle"""
+    return 0
+
+def dist_agg_count(agg):
+    """dummy to get number of groups of aggregation"""
+    return 0
+
+def dist_agg_finish(agg, out_keys, out_arrs):
+    """dummy to write group keys and aggregated columns sorted by key"""
+    return 0
+
+def dist_join_start(left_key, right_key, left_arrs, right_arrs,
+                                            left_parallel, right_parallel):
+    """dummy to find matching rows of inner hash join, returns handle"""
+    return 0
+
+def dist_join_count(join):
+    """dummy to get number of output rows of join"""
+    return 0
+
+def dist_join_finish(join, left_key, right_key, left_arrs, right_arrs,
+                                                        out_key, out_arrs):
+    """dummy to write key and columns of matching rows of join"""
+    return 0
+
+def dist_percentile(arr, q):
+    """dummy for np.percentile of 1D array by distributed selection"""
+    return 0.0
+
+def dist_quantile(arr, q):
+    """dummy for Series.quantile of 1D array (skips NaN values)"""
+    return 0.0
+
 def irecv():
     return 0
 
@@ -83,21 +300,57 @@ class DistPortion(AbstractTemplate):
 class DistReduce(AbstractTemplate):
     def generic(self, args, kws):
         assert not kws
-        assert len(args)==1
+        assert len(args)==2
         return signature(args[0], *args)
 
+@infer_global(dist_arr_ireduce)
+class DistArrIReduce(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==2
+        return signature(types.int32, *args)
+
+@infer_global(dist_reduce_wait)
+class DistReduceWait(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(types.int32, *args)
+
+@infer_global(dist_local_reduce)
+class DistLocalReduce(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==2
+        return signature(args[0].dtype, *args)
+
+@infer_global(dist_local_argreduce)
+class DistLocalArgReduce(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==2
+        return signature(types.intp, *args)
+
+@infer_global(dist_argreduce)
+class DistArgReduce(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==4
+        return signature(types.int64, *args)
+
 @infer_global(dist_exscan)
 class DistExscan(AbstractTemplate):
     def generic(self, args, kws):
         assert not kws
-        assert len(args)==1
+        assert len(args)==2
         return signature(args[0], *args)
 
 @infer_global(dist_arr_reduce)
+@infer_global(dist_arr_reduce_root)
 class DistArrReduce(AbstractTemplate):
     def generic(self, args, kws):
         assert not kws
-        assert len(args)==1
+        assert len(args)==2
         return signature(types.int32, *args)
 
 @infer_global(time.time)
@@ -109,6 +362,8 @@ class DistTime(AbstractTemplate):
 
 @infer_global(dist_cumsum)
 @infer_global(dist_cumprod)
+@infer_global(dist_cummin)
+@infer_global(dist_cummax)
 class DistCumsumprod(AbstractTemplate):
     def generic(self, args, kws):
         assert not kws
@@ -136,3 +391,170 @@ class DistSetitem(AbstractTemplate):
         assert not kws
         assert len(args)==5
         return signature(types.int32, *args)
+
+@infer_global(get_grid_rank)
+@infer_global(get_grid_size)
+class DistGrid(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(types.int32, *args)
+
+@infer_global(dist_dot_2d)
+class DistDot2D(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==4
+        return signature(types.int32, *args)
+
+@infer_global(dist_transpose_2d)
+class DistTranspose2D(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==4
+        return signature(types.int32, *args)
+
+@infer_global(rebalance_array)
+class DistRebalanceArray(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(args[0].copy(layout='C'), *args)
+
+@infer_global(dist_rebalance)
+class DistRebalance(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==2
+        return signature(types.int32, *args)
+
+@infer_global(dist_counter_create)
+@infer_global(dist_counter_next)
+@infer_global(dist_counter_end)
+class DistCounter(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        return signature(types.int64, *args)
+
+@infer_global(dist_counter_free)
+class DistCounterFree(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(types.int32, *args)
+
+@infer_global(dist_halo_start)
+class DistHaloStart(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==3
+        return signature(types.int64, *args)
+
+@infer_global(dist_halo_wait)
+@infer_global(dist_halo_ghost)
+class DistHaloWait(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        return signature(types.int32, *args)
+
+@infer_global(dist_rma_create)
+class DistRmaCreate(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(types.int64, *args)
+
+@infer_global(dist_rma_get)
+class DistRmaGet(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==3
+        return signature(args[1].dtype, *args)
+
+@infer_global(dist_rma_put)
+@infer_global(dist_rma_free)
+@infer_global(dist_gather_index)
+class DistRmaPut(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        return signature(types.int32, *args)
+
+@infer_global(dist_sort)
+@infer_global(dist_sort_count)
+class DistSort(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(types.int64, *args)
+
+@infer_global(dist_sort_finish)
+class DistSortFinish(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==3
+        return signature(types.int32, *args)
+
+@infer_global(dist_shuffle_start)
+@infer_global(dist_shuffle_count)
+class DistShuffleStart(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(types.int64, *args)
+
+@infer_global(dist_shuffle_finish)
+class DistShuffleFinish(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==3
+        return signature(types.int32, *args)
+
+@infer_global(dist_agg_start)
+class DistAggStart(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==5
+        return signature(types.int64, *args)
+
+@infer_global(dist_agg_count)
+class DistAggCount(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(types.int64, *args)
+
+@infer_global(dist_agg_finish)
+class DistAggFinish(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==3
+        return signature(types.int32, *args)
+
+@infer_global(dist_join_start)
+class DistJoinStart(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==6
+        return signature(types.int64, *args)
+
+@infer_global(dist_join_count)
+class DistJoinCount(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(types.int64, *args)
+
+@infer_global(dist_join_finish)
+class DistJoinFinish(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==7
+        return signature(types.int32, *args)
+
+@infer_global(dist_percentile)
+@infer_global(dist_quantile)
+class DistQuantile(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==2
+        return signature(types.float64, *args)
@@ -19,6 +19,10 @@ ll.add_symbol('hpat_dist_reduce_i8', hdist.hpat_dist_reduce_i8)
 ll.add_symbol('hpat_dist_reduce_f4', hdist.hpat_dist_reduce_f4)
 ll.add_symbol('hpat_dist_reduce_f8', hdist.hpat_dist_reduce_f8)
 ll.add_symbol('hpat_dist_arr_reduce', hdist.hpat_dist_arr_reduce)
+ll.add_symbol('hpat_dist_arr_reduce_root', hdist.hpat_dist_arr_reduce_root)
+ll.add_symbol('hpat_dist_argreduce', hdist.hpat_dist_argreduce)
+ll.add_symbol('hpat_dist_ireduce', hdist.hpat_dist_ireduce)
+ll.add_symbol('hpat_dist_reduce_wait', hdist.hpat_dist_reduce_wait)
 ll.add_symbol('hpat_dist_exscan_i4', hdist.hpat_dist_exscan_i4)
 ll.add_symbol('hpat_dist_exscan_i8', hdist.hpat_dist_exscan_i8)
 ll.add_symbol('hpat_dist_exscan_f4', hdist.hpat_dist_exscan_f4)
@@ -28,6 +32,46 @@ ll.add_symbol('hpat_dist_isend', hdist.hpat_dist_isend)
 ll.add_symbol('hpat_dist_wait', hdist.hpat_dist_wait)
 ll.add_symbol('hpat_dist_get_item_pointer', hdist.hpat_dist_get_item_pointer)
 ll.add_symbol('hpat_get_dummy_ptr', hdist.hpat_get_dummy_ptr)
+ll.add_symbol('hpat_dist_get_grid_rank', hdist.hpat_dist_get_grid_rank)
+ll.add_symbol('hpat_dist_get_grid_size', hdist.hpat_dist_get_grid_size)
+ll.add_symbol('hpat_dist_dot_2d', hdist.hpat_dist_dot_2d)
+ll.add_symbol('hpat_dist_transpose_2d', hdist.hpat_dist_transpose_2d)
+ll.add_symbol('hpat_dist_rebalance', hdist.hpat_dist_rebalance)
+ll.add_symbol('hpat_dist_counter_create', hdist.hpat_dist_counter_create)
+ll.add_symbol('hpat_dist_counter_next', hdist.hpat_dist_counter_next)
+ll.add_symbol('hpat_dist_counter_end', hdist.hpat_dist_counter_end)
+ll.add_symbol('hpat_dist_counter_free', hdist.hpat_dist_counter_free)
+ll.add_symbol('hpat_dist_halo_start', hdist.hpat_dist_halo_start)
+ll.add_symbol('hpat_dist_halo_wait', hdist.hpat_dist_halo_wait)
+ll.add_symbol('hpat_dist_halo_ghost', hdist.hpat_dist_halo_ghost)
+ll.add_symbol('hpat_dist_rma_create', hdist.hpat_dist_rma_create)
+ll.add_symbol('hpat_dist_rma_get', hdist.hpat_dist_rma_get)
+ll.add_symbol('hpat_dist_rma_put', hdist.hpat_dist_rma_put)
+ll.add_symbol('hpat_dist_rma_free', hdist.hpat_dist_rma_free)
+ll.add_symbol('hpat_dist_gather_index', hdist.hpat_dist_gather_index)
+ll.add_symbol('hpat_dist_sort', hdist.hpat_dist_sort)
+ll.add_symbol('hpat_dist_sort_count', hdist.hpat_dist_sort_count)
+ll.add_symbol('hpat_dist_sort_finish', hdist.hpat_dist_sort_finish)
+ll.add_symbol('hpat_dist_shuffle_start', hdist.hpat_dist_shuffle_start)
+ll.add_symbol('hpat_dist_shuffle_count', hdist.hpat_dist_shuffle_count)
+ll.add_symbol('hpat_dist_shuffle_finish', hdist.hpat_dist_shuffle_finish)
+ll.add_symbol('hpat_dist_agg_start', hdist.hpat_dist_agg_start)
+ll.add_symbol('hpat_dist_agg_count', hdist.hpat_dist_agg_count)
+ll.add_symbol('hpat_dist_agg_finish', hdist.hpat_dist_agg_finish)
+ll.add_symbol('hpat_dist_join_start', hdist.hpat_dist_join_start)
+ll.add_symbol('hpat_dist_join_count', hdist.hpat_dist_join_count)
+ll.add_symbol('hpat_dist_join_finish', hdist.hpat_dist_join_finish)
+ll.add_symbol('hpat_dist_quantile', hdist.hpat_dist_quantile)
+
+# type enums shared by hdist and hio runtimes
+_h5_typ_table = {
+    types.int8:0,
+    types.uint8:1,
+    types.int32:2,
+    types.int64:3,
+    types.float32:4,
+    types.float64:5
+    }
 
 @lower_builtin(distributed_api.get_rank)
 def dist_get_rank(context, builder, sig, args):
@@ -55,22 +99,101 @@ def dist_get_portion(context, builder, sig, args):
     fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_get_node_portion")
     return builder.call(fn, [args[0], args[1], args[2], args[3]])
 
-@lower_builtin(distributed_api.dist_reduce, types.int64)
-@lower_builtin(distributed_api.dist_reduce, types.int32)
-@lower_builtin(distributed_api.dist_reduce, types.float32)
-@lower_builtin(distributed_api.dist_reduce, types.float64)
+@lower_builtin(distributed_api.get_grid_rank, types.intp)
+def dist_get_grid_rank(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(32), [lir.IntType(32)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_get_grid_rank")
+    return builder.call(fn, [builder.trunc(args[0], lir.IntType(32))])
+
+@lower_builtin(distributed_api.get_grid_size, types.intp)
+def dist_get_grid_size(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(32), [lir.IntType(32)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_get_grid_size")
+    return builder.call(fn, [builder.trunc(args[0], lir.IntType(32))])
+
+@lower_builtin(distributed_api.dist_reduce, types.int64, types.int32)
+@lower_builtin(distributed_api.dist_reduce, types.int32, types.int32)
+@lower_builtin(distributed_api.dist_reduce, types.float32, types.int32)
+@lower_builtin(distributed_api.dist_reduce, types.float64, types.int32)
 def lower_dist_reduce(context, builder, sig, args):
     ltyp = args[0].type
-    fnty = lir.FunctionType(ltyp, [ltyp])
+    fnty = lir.FunctionType(ltyp, [ltyp, lir.IntType(32)])
     typ_map = {types.int32:"i4", types.int64:"i8", types.float32:"f4", types.float64:"f8"}
     typ_str = typ_map[sig.args[0]]
     fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_reduce_{}".format(typ_str))
-    return builder.call(fn, [args[0]])
+    return builder.call(fn, [args[0], args[1]])
+
+@lower_builtin(distributed_api.dist_reduce, types.boolean, types.int32)
+def lower_dist_reduce_bool(context, builder, sig, args):
+    # logical and/or of booleans as int reduce
+    fnty = lir.FunctionType(lir.IntType(32), [lir.IntType(32), lir.IntType(32)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_reduce_i4")
+    val = builder.zext(args[0], lir.IntType(32))
+    res = builder.call(fn, [val, args[1]])
+    return builder.icmp_unsigned('!=', res, lir.Constant(lir.IntType(32), 0))
+
+@lower_builtin(distributed_api.dist_local_reduce, types.npytypes.Array,
+    types.int32)
+def lower_dist_local_reduce(context, builder, sig, args):
+    # empty chunks return the identity so they don't change the result
+    dtype = sig.args[0].dtype
+    min_init = _reduce_identity(distributed_api.Reduce_Type.Min, dtype)
+    max_init = _reduce_identity(distributed_api.Reduce_Type.Max, dtype)
+    min_op = distributed_api.Reduce_Type.Min.value
+    def local_reduce_impl(arr, reduce_op):
+        if reduce_op==min_op:
+            if arr.size==0:
+                return min_init
+            return arr.min()
+        if arr.size==0:
+            return max_init
+        return arr.max()
+    return context.compile_internal(builder, local_reduce_impl, sig, args)
+
+@lower_builtin(distributed_api.dist_local_argreduce, types.npytypes.Array,
+    types.int32)
+def lower_dist_local_argreduce(context, builder, sig, args):
+    argmin_op = distributed_api.Reduce_Type.Argmin.value
+    def local_argreduce_impl(arr, reduce_op):
+        if arr.size==0:
+            return -1
+        if reduce_op==argmin_op:
+            return arr.argmin()
+        return arr.argmax()
+    return context.compile_internal(builder, local_argreduce_impl, sig, args)
 
-@lower_builtin(distributed_api.dist_arr_reduce, types.npytypes.Array)
+@lower_builtin(distributed_api.dist_argreduce, types.npytypes.Array,
+    types.intp, types.intp, types.int32)
+def lower_dist_argreduce(context, builder, sig, args):
+    # values are compared in their own type in the runtime, start of 1D chunk
+    # is scaled to flat index of multi-dimensional arrays
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
+    arr = make_array(sig.args[0])(context, builder, args[0])
+    shapes = cgutils.unpack_tuple(builder, arr.shape, sig.args[0].ndim)
+    start = args[2]
+    for dim_size in shapes[1:]:
+        start = builder.mul(start, dim_size)
+    fnty = lir.FunctionType(lir.IntType(64), [lir.IntType(8).as_pointer(),
+            lir.IntType(64), lir.IntType(64), lir.IntType(64),
+            lir.IntType(32), lir.IntType(32)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_argreduce")
+    return builder.call(fn, [builder.bitcast(arr.data,
+                lir.IntType(8).as_pointer()), arr.nitems, args[1], start,
+                args[3], lir.Constant(lir.IntType(32), typ_enum)])
+
+@lower_builtin(distributed_api.dist_arr_reduce, types.npytypes.Array,
+    types.int32)
 def lower_dist_arr_reduce(context, builder, sig, args):
+    return _gen_arr_reduce_call(context, builder, sig, args, "hpat_dist_arr_reduce")
+
+@lower_builtin(distributed_api.dist_arr_reduce_root, types.npytypes.Array,
+    types.int32)
+def lower_dist_arr_reduce_root(context, builder, sig, args):
+    return _gen_arr_reduce_call(context, builder, sig, args, "hpat_dist_arr_reduce_root")
+
+def _gen_arr_reduce_call(context, builder, sig, args, func_name):
     # store an int to specify data type
-    typ_enum = hpat.pio_lower._h5_typ_table[sig.args[0].dtype]
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
     typ_arg = cgutils.alloca_once_value(builder, lir.Constant(lir.IntType(32), typ_enum))
     ndims = sig.args[0].ndim
 
@@ -82,15 +205,37 @@ def lower_dist_arr_reduce(context, builder, sig, args):
 
     ndim_arg = cgutils.alloca_once_value(builder, lir.Constant(lir.IntType(32), sig.args[0].ndim))
     call_args = [builder.bitcast(out.data, lir.IntType(8).as_pointer()),
-                size_arg, builder.load(ndim_arg), builder.load(typ_arg)]
+                size_arg, builder.load(ndim_arg), args[1], builder.load(typ_arg)]
 
-    # array, shape, ndim, extra last arg type for type enum
+    # array, shape, ndim, reduce op, extra last arg type for type enum
     arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(64).as_pointer(),
-        lir.IntType(32), lir.IntType(32)]
+        lir.IntType(32), lir.IntType(32), lir.IntType(32)]
     fnty = lir.FunctionType(lir.IntType(32), arg_typs)
-    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_arr_reduce")
+    fn = builder.module.get_or_insert_function(fnty, name=func_name)
     return builder.call(fn, call_args)
 
+@lower_builtin(distributed_api.dist_arr_ireduce, types.npytypes.Array,
+    types.int32)
+def lower_dist_arr_ireduce(context, builder, sig, args):
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
+    arr = make_array(sig.args[0])(context, builder, args[0])
+    count = lir.Constant(lir.IntType(64), 1)
+    for dim_size in cgutils.unpack_tuple(builder, arr.shape, sig.args[0].ndim):
+        count = builder.mul(count, dim_size)
+    call_args = [builder.bitcast(arr.data, lir.IntType(8).as_pointer()),
+        count, args[1], lir.Constant(lir.IntType(32), typ_enum)]
+    arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(64), lir.IntType(32),
+        lir.IntType(32)]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_ireduce")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_reduce_wait, types.int32)
+def lower_dist_reduce_wait(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(32), [lir.IntType(32)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_reduce_wait")
+    return builder.call(fn, args)
+
 @lower_builtin(time.time)
 def dist_get_time(context, builder, sig, args):
     fnty = lir.FunctionType(lir.DoubleType(), [])
@@ -99,44 +244,96 @@ def dist_get_time(context, builder, sig, args):
 
 @lower_builtin(distributed_api.dist_cumsum, types.npytypes.Array, types.npytypes.Array)
 def lower_dist_cumsum(context, builder, sig, args):
+    return _lower_dist_scan(context, builder, sig, args, 'cumsum')
 
-    dtype = sig.args[0].dtype
-    zero = dtype(0)
-
-    def cumsum_impl(in_arr, out_arr):
-        c = zero
-        for v in np.nditer(in_arr):
-            c += v.item()
-        prefix_var = distributed_api.dist_exscan(c)
-        for i in range(in_arr.size):
-            prefix_var += in_arr[i]
-            out_arr[i] = prefix_var
-        return 0
-
-    res = context.compile_internal(builder, cumsum_impl, sig, args,
-                                    locals=dict(c=dtype,
-                                    prefix_var=dtype))
-    return res
-
-
-@lower_builtin(distributed_api.dist_exscan, types.int64)
-@lower_builtin(distributed_api.dist_exscan, types.int32)
-@lower_builtin(distributed_api.dist_exscan, types.float32)
-@lower_builtin(distributed_api.dist_exscan, types.float64)
+@lower_builtin(distributed_api.dist_cumprod, types.npytypes.Array, types.npytypes.Array)
+def lower_dist_cumprod(context, builder, sig, args):
+    return _lower_dist_scan(context, builder, sig, args, 'cumprod')
+
+@lower_builtin(distributed_api.dist_cummin, types.npytypes.Array, types.npytypes.Array)
+def lower_dist_cummin(context, builder, sig, args):
+    return _lower_dist_scan(context, builder, sig, args, 'cummin')
+
+@lower_builtin(distributed_api.dist_cummax, types.npytypes.Array, types.npytypes.Array)
+def lower_dist_cummax(context, builder, sig, args):
+    return _lower_dist_scan(context, builder, sig, args, 'cummax')
+
+# scan -> (reduction of exscan, combine expression)
+_scan_ops = {
+    'cumsum': (distributed_api.Reduce_Type.Sum, 'c + v'),
+    'cumprod': (distributed_api.Reduce_Type.Prod, 'c * v'),
+    'cummin': (distributed_api.Reduce_Type.Min, 'min(c, v)'),
+    'cummax': (distributed_api.Reduce_Type.Max, 'max(c, v)'),
+}
+
+def _reduce_identity(reduce_op, dtype):
+    """identity value of Sum/Prod/Min/Max reduction for dtype"""
+    if reduce_op==distributed_api.Reduce_Type.Sum:
+        return dtype(0)
+    if reduce_op==distributed_api.Reduce_Type.Prod:
+        return dtype(1)
+    if isinstance(dtype, types.Float):
+        return dtype(np.inf if reduce_op==distributed_api.Reduce_Type.Min
+                                                                else -np.inf)
+    info = np.iinfo(numba.numpy_support.as_dtype(dtype))
+    return dtype(info.max if reduce_op==distributed_api.Reduce_Type.Min
+                                                                else info.min)
+
+def _lower_dist_scan(context, builder, sig, args, scan_name):
+    """scan of local chunk in a single pass, then fix-up with exscan of local
+    totals from previous processors (flattened in C order like NumPy)"""
+    dtype = sig.args[1].dtype
+    reduce_op, combine = _scan_ops[scan_name]
+    init = _reduce_identity(reduce_op, dtype)
+
+    func_text = "def scan_impl(in_arr, out_arr):\n"
+    func_text += "  A = in_arr.ravel()\n"
+    func_text += "  B = out_arr.ravel()\n"
+    func_text += "  c = init\n"
+    func_text += "  for i in range(len(A)):\n"
+    func_text += "    v = A[i]\n"
+    func_text += "    c = {}\n".format(combine)
+    func_text += "    B[i] = c\n"
+    func_text += "  prefix = distributed_api.dist_exscan(c, np.int32({}))\n".format(
+                                                            reduce_op.value)
+    func_text += "  if prefix != init:\n"
+    func_text += "    for i in range(len(B)):\n"
+    if scan_name in ('cumsum', 'cumprod'):
+        func_text += "      B[i] = prefix {} B[i]\n".format(
+                                        '+' if scan_name=='cumsum' else '*')
+    else:
+        # local scan is monotonic so fix-up ends at first unaffected value
+        func_text += "      if B[i] {} prefix:\n".format(
+                                        '<=' if scan_name=='cummin' else '>=')
+        func_text += "        break\n"
+        func_text += "      B[i] = prefix\n"
+    func_text += "  return 0\n"
+    glbls = {'np': np, 'distributed_api': distributed_api, 'init': init}
+    loc_vars = {}
+    exec(func_text, glbls, loc_vars)
+    scan_impl = loc_vars['scan_impl']
+    return context.compile_internal(builder, scan_impl, sig, args,
+                                        locals=dict(c=dtype, prefix=dtype))
+
+
+@lower_builtin(distributed_api.dist_exscan, types.int64, types.int32)
+@lower_builtin(distributed_api.dist_exscan, types.int32, types.int32)
+@lower_builtin(distributed_api.dist_exscan, types.float32, types.int32)
+@lower_builtin(distributed_api.dist_exscan, types.float64, types.int32)
 def lower_dist_exscan(context, builder, sig, args):
     ltyp = args[0].type
-    fnty = lir.FunctionType(ltyp, [ltyp])
+    fnty = lir.FunctionType(ltyp, [ltyp, lir.IntType(32)])
     typ_map = {types.int32:"i4", types.int64:"i8", types.float32:"f4", types.float64:"f8"}
     typ_str = typ_map[sig.args[0]]
     fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_exscan_{}".format(typ_str))
-    return builder.call(fn, [args[0]])
+    return builder.call(fn, [args[0], args[1]])
 
 
 @lower_builtin(distributed_api.irecv, types.npytypes.Array, types.int32,
 types.int32, types.int32, types.boolean)
 def lower_dist_irecv(context, builder, sig, args):
     # store an int to specify data type
-    typ_enum = hpat.pio_lower._h5_typ_table[sig.args[0].dtype]
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
     typ_arg = cgutils.alloca_once_value(builder, lir.Constant(lir.IntType(32), typ_enum))
 
     out = make_array(sig.args[0])(context, builder, args[0])
@@ -158,7 +355,7 @@ def lower_dist_irecv(context, builder, sig, args):
 types.int32, types.int32, types.boolean)
 def lower_dist_isend(context, builder, sig, args):
     # store an int to specify data type
-    typ_enum = hpat.pio_lower._h5_typ_table[sig.args[0].dtype]
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
     typ_arg = cgutils.alloca_once_value(builder, lir.Constant(lir.IntType(32), typ_enum))
 
     out = make_array(sig.args[0])(context, builder, args[0])
@@ -182,6 +379,462 @@ def lower_dist_wait(context, builder, sig, args):
     fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_wait")
     return builder.call(fn, args)
 
+@lower_builtin(distributed_api.dist_dot_2d, types.npytypes.Array,
+    types.npytypes.Array, types.npytypes.Array, types.intp)
+def lower_dist_dot_2d(context, builder, sig, args):
+    typ_enum = _h5_typ_table[sig.args[2].dtype]
+    typ_arg = cgutils.alloca_once_value(builder, lir.Constant(lir.IntType(32), typ_enum))
+    call_args = []
+    # input arrays can be transposed views so pass strides
+    for i in range(2):
+        in_arr = make_array(sig.args[i])(context, builder, args[i])
+        strides = cgutils.unpack_tuple(builder, in_arr.strides, 2)
+        call_args += [builder.bitcast(in_arr.data, lir.IntType(8).as_pointer()),
+                        strides[0], strides[1]]
+    out = make_array(sig.args[2])(context, builder, args[2])
+    shape = cgutils.unpack_tuple(builder, out.shape, 2)
+    call_args += [builder.bitcast(out.data, lir.IntType(8).as_pointer()),
+                shape[0], shape[1], args[3], builder.load(typ_arg)]
+
+    # A, A strides, B, B strides, C, C shape, K, type enum
+    arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(64), lir.IntType(64),
+        lir.IntType(8).as_pointer(), lir.IntType(64), lir.IntType(64),
+        lir.IntType(8).as_pointer(), lir.IntType(64), lir.IntType(64),
+        lir.IntType(64), lir.IntType(32)]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_dot_2d")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_transpose_2d, types.npytypes.Array,
+    types.npytypes.Array, types.intp, types.intp)
+def lower_dist_transpose_2d(context, builder, sig, args):
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
+    typ_arg = cgutils.alloca_once_value(builder, lir.Constant(lir.IntType(32), typ_enum))
+    in_arr = make_array(sig.args[0])(context, builder, args[0])
+    out = make_array(sig.args[1])(context, builder, args[1])
+    call_args = [builder.bitcast(in_arr.data, lir.IntType(8).as_pointer()),
+                builder.bitcast(out.data, lir.IntType(8).as_pointer()),
+                args[2], args[3], builder.load(typ_arg)]
+
+    arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(8).as_pointer(),
+        lir.IntType(64), lir.IntType(64), lir.IntType(32)]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_transpose_2d")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.rebalance_array, types.npytypes.Array)
+def lower_rebalance_array(context, builder, sig, args):
+    # replicated arrays are not rebalanced by distributed pass
+    def rebalance_impl(arr):
+        return arr.copy()
+
+    return context.compile_internal(builder, rebalance_impl, sig, args)
+
+@lower_builtin(distributed_api.dist_rebalance, types.npytypes.Array,
+    types.npytypes.Array)
+def lower_dist_rebalance(context, builder, sig, args):
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
+    typ_arg = cgutils.alloca_once_value(builder, lir.Constant(lir.IntType(32), typ_enum))
+    in_arr = make_array(sig.args[0])(context, builder, args[0])
+    out = make_array(sig.args[1])(context, builder, args[1])
+    in_shape = cgutils.unpack_tuple(builder, in_arr.shape, sig.args[0].ndim)
+    out_shape = cgutils.unpack_tuple(builder, out.shape, sig.args[1].ndim)
+    # number of elements in each row
+    row_size = lir.Constant(lir.IntType(64), 1)
+    for dim_size in in_shape[1:]:
+        row_size = builder.mul(row_size, dim_size)
+    call_args = [builder.bitcast(in_arr.data, lir.IntType(8).as_pointer()),
+                builder.bitcast(out.data, lir.IntType(8).as_pointer()),
+                in_shape[0], out_shape[0], row_size, builder.load(typ_arg)]
+
+    arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(8).as_pointer(),
+        lir.IntType(64), lir.IntType(64), lir.IntType(64), lir.IntType(32)]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_rebalance")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_counter_create, types.int64, types.int64,
+    types.boolean)
+def lower_dist_counter_create(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(64), [lir.IntType(64), lir.IntType(64),
+                                                                lir.IntType(1)])
+    fn = builder.module.get_or_insert_function(fnty,
+                                            name="hpat_dist_counter_create")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_counter_next, types.int64)
+def lower_dist_counter_next(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(64), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty,
+                                            name="hpat_dist_counter_next")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_counter_end, types.int64)
+def lower_dist_counter_end(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(64), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty,
+                                            name="hpat_dist_counter_end")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_counter_free, types.int64)
+def lower_dist_counter_free(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(32), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty,
+                                            name="hpat_dist_counter_free")
+    return builder.call(fn, args)
+
+def _get_arrs_info(context, builder, tup_typ, tup):
+    """data pointers, number of rows, elements in each row and element sizes
+    of arrays in tuple"""
+    arr_typs = tup_typ.types
+    datas, rows, row_sizes, elem_sizes = [], [], [], []
+    for arr_typ, arr_val in zip(arr_typs,
+                            cgutils.unpack_tuple(builder, tup, len(arr_typs))):
+        arr = make_array(arr_typ)(context, builder, arr_val)
+        shape = cgutils.unpack_tuple(builder, arr.shape, arr_typ.ndim)
+        row_size = lir.Constant(lir.IntType(64), 1)
+        for dim_size in shape[1:]:
+            row_size = builder.mul(row_size, dim_size)
+        datas.append(builder.bitcast(arr.data, lir.IntType(8).as_pointer()))
+        rows.append(shape[0])
+        row_sizes.append(row_size)
+        elem_sizes.append(lir.Constant(lir.IntType(64),
+            context.get_abi_sizeof(context.get_data_type(arr_typ.dtype))))
+    return datas, rows, row_sizes, elem_sizes
+
+def _make_c_array(builder, vals, ltyp):
+    """store values in a stack array to pass to C"""
+    ptr = cgutils.alloca_once(builder, ltyp,
+                                    size=lir.Constant(lir.IntType(64), len(vals)))
+    for i, val in enumerate(vals):
+        builder.store(val, builder.gep(ptr, [lir.Constant(lir.IntType(64), i)]))
+    return ptr
+
+@lower_builtin(distributed_api.dist_halo_start, types.BaseTuple,
+    types.BaseTuple, types.BaseTuple)
+def lower_dist_halo_start(context, builder, sig, args):
+    char_ptr = lir.IntType(8).as_pointer()
+    datas, rows, row_sizes, elem_sizes = _get_arrs_info(context, builder,
+                                                        sig.args[0], args[0])
+    row_bytes = [builder.mul(r, e) for r, e in zip(row_sizes, elem_sizes)]
+    left_datas, left_rows, _, _ = _get_arrs_info(context, builder,
+                                                        sig.args[1], args[1])
+    right_datas, right_rows, _, _ = _get_arrs_info(context, builder,
+                                                        sig.args[2], args[2])
+    call_args = [lir.Constant(lir.IntType(32), len(datas)),
+        _make_c_array(builder, datas, char_ptr),
+        _make_c_array(builder, rows, lir.IntType(64)),
+        _make_c_array(builder, row_bytes, lir.IntType(64)),
+        _make_c_array(builder, left_datas, char_ptr),
+        _make_c_array(builder, left_rows, lir.IntType(64)),
+        _make_c_array(builder, right_datas, char_ptr),
+        _make_c_array(builder, right_rows, lir.IntType(64))]
+
+    # number of arrays, arrays, rows, row bytes, left halos, right halos
+    arg_typs = [lir.IntType(32), char_ptr.as_pointer(),
+        lir.IntType(64).as_pointer(), lir.IntType(64).as_pointer(),
+        char_ptr.as_pointer(), lir.IntType(64).as_pointer(),
+        char_ptr.as_pointer(), lir.IntType(64).as_pointer()]
+    fnty = lir.FunctionType(lir.IntType(64), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_halo_start")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_halo_wait, types.int64)
+def lower_dist_halo_wait(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(32), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_halo_wait")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_halo_ghost, types.BaseTuple,
+    types.BaseTuple, types.intp, types.intp, types.intp, types.intp,
+    types.boolean)
+def lower_dist_halo_ghost(context, builder, sig, args):
+    char_ptr = lir.IntType(8).as_pointer()
+    ext_datas, _, _, _ = _get_arrs_info(context, builder, sig.args[0], args[0])
+    datas, rows, row_sizes, elem_sizes = _get_arrs_info(context, builder,
+                                                        sig.args[1], args[1])
+    halos = [builder.trunc(v, lir.IntType(32)) for v in args[2:6]]
+    call_args = [lir.Constant(lir.IntType(32), len(datas)),
+        _make_c_array(builder, ext_datas, char_ptr),
+        _make_c_array(builder, datas, char_ptr),
+        _make_c_array(builder, rows, lir.IntType(64)),
+        _make_c_array(builder, row_sizes, lir.IntType(64)),
+        _make_c_array(builder, elem_sizes, lir.IntType(64))] + halos + [args[6]]
+
+    # number of arrays, ghost arrays, arrays, rows, row sizes, element sizes,
+    # halo lengths, 2D distribution flag
+    arg_typs = [lir.IntType(32), char_ptr.as_pointer(), char_ptr.as_pointer(),
+        lir.IntType(64).as_pointer(), lir.IntType(64).as_pointer(),
+        lir.IntType(64).as_pointer(), lir.IntType(32), lir.IntType(32),
+        lir.IntType(32), lir.IntType(32), lir.IntType(1)]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_halo_ghost")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_rma_create, types.npytypes.Array)
+def lower_dist_rma_create(context, builder, sig, args):
+    arr = make_array(sig.args[0])(context, builder, args[0])
+    count = cgutils.unpack_tuple(builder, arr.shape, 1)[0]
+    elem_size = lir.Constant(lir.IntType(64),
+        context.get_abi_sizeof(context.get_data_type(sig.args[0].dtype)))
+    call_args = [builder.bitcast(arr.data, lir.IntType(8).as_pointer()),
+                                                            count, elem_size]
+    arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(64), lir.IntType(64)]
+    fnty = lir.FunctionType(lir.IntType(64), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_rma_create")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_rma_get, types.int64, types.npytypes.Array,
+    types.Integer)
+def lower_dist_rma_get(context, builder, sig, args):
+    out = cgutils.alloca_once(builder, context.get_data_type(sig.return_type))
+    ind = context.cast(builder, args[2], sig.args[2], types.int64)
+    arg_typs = [lir.IntType(64), lir.IntType(64), lir.IntType(8).as_pointer()]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_rma_get")
+    builder.call(fn, [args[0], ind,
+                            builder.bitcast(out, lir.IntType(8).as_pointer())])
+    return builder.load(out)
+
+@lower_builtin(distributed_api.dist_rma_put, types.int64, types.npytypes.Array,
+    types.Integer, types.Any)
+def lower_dist_rma_put(context, builder, sig, args):
+    dtype = sig.args[1].dtype
+    val = context.cast(builder, args[3], sig.args[3], dtype)
+    val_ptr = cgutils.alloca_once_value(builder, val)
+    ind = context.cast(builder, args[2], sig.args[2], types.int64)
+    arg_typs = [lir.IntType(64), lir.IntType(64), lir.IntType(8).as_pointer()]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_rma_put")
+    return builder.call(fn, [args[0], ind,
+                        builder.bitcast(val_ptr, lir.IntType(8).as_pointer())])
+
+@lower_builtin(distributed_api.dist_rma_free, types.int64)
+def lower_dist_rma_free(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(32), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_rma_free")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_gather_index, types.npytypes.Array,
+    types.npytypes.Array, types.npytypes.Array)
+def lower_dist_gather_index(context, builder, sig, args):
+    arr = make_array(sig.args[0])(context, builder, args[0])
+    idx = make_array(sig.args[1])(context, builder, args[1])
+    out = make_array(sig.args[2])(context, builder, args[2])
+    shape = cgutils.unpack_tuple(builder, arr.shape, sig.args[0].ndim)
+    n_inds = cgutils.unpack_tuple(builder, idx.shape, 1)[0]
+    row_bytes = lir.Constant(lir.IntType(64),
+        context.get_abi_sizeof(context.get_data_type(sig.args[0].dtype)))
+    for dim_size in shape[1:]:
+        row_bytes = builder.mul(row_bytes, dim_size)
+    char_ptr = lir.IntType(8).as_pointer()
+    call_args = [builder.bitcast(arr.data, char_ptr), shape[0], row_bytes,
+        builder.bitcast(idx.data, lir.IntType(64).as_pointer()), n_inds,
+        builder.bitcast(out.data, char_ptr)]
+
+    # array, rows, row bytes, indices, number of indices, output
+    arg_typs = [char_ptr, lir.IntType(64), lir.IntType(64),
+        lir.IntType(64).as_pointer(), lir.IntType(64), char_ptr]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_gather_index")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_sort, types.npytypes.Array)
+def lower_dist_sort(context, builder, sig, args):
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
+    arr = make_array(sig.args[0])(context, builder, args[0])
+    n = cgutils.unpack_tuple(builder, arr.shape, 1)[0]
+    call_args = [builder.bitcast(arr.data, lir.IntType(8).as_pointer()), n,
+                                    lir.Constant(lir.IntType(32), typ_enum)]
+    arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(64), lir.IntType(32)]
+    fnty = lir.FunctionType(lir.IntType(64), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_sort")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_sort_count, types.int64)
+def lower_dist_sort_count(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(64), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_sort_count")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_sort_finish, types.int64,
+    types.npytypes.Array, types.boolean)
+def lower_dist_sort_finish(context, builder, sig, args):
+    out = make_array(sig.args[1])(context, builder, args[1])
+    call_args = [args[0], builder.bitcast(out.data, lir.IntType(8).as_pointer()),
+                                                                    args[2]]
+    arg_typs = [lir.IntType(64), lir.IntType(8).as_pointer(), lir.IntType(1)]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_sort_finish")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_shuffle_start, types.npytypes.Array)
+def lower_dist_shuffle_start(context, builder, sig, args):
+    typ_enum = _h5_typ_table[sig.args[0].dtype]
+    arr = make_array(sig.args[0])(context, builder, args[0])
+    n = cgutils.unpack_tuple(builder, arr.shape, 1)[0]
+    call_args = [builder.bitcast(arr.data, lir.IntType(8).as_pointer()), n,
+                                    lir.Constant(lir.IntType(32), typ_enum)]
+    arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(64), lir.IntType(32)]
+    fnty = lir.FunctionType(lir.IntType(64), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty,
+                                            name="hpat_dist_shuffle_start")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_shuffle_count, types.int64)
+def lower_dist_shuffle_count(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(64), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty,
+                                            name="hpat_dist_shuffle_count")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_shuffle_finish, types.int64,
+    types.BaseTuple, types.BaseTuple)
+def lower_dist_shuffle_finish(context, builder, sig, args):
+    char_ptr = lir.IntType(8).as_pointer()
+    in_datas, _, row_sizes, elem_sizes = _get_arrs_info(context, builder,
+                                                        sig.args[1], args[1])
+    out_datas, _, _, _ = _get_arrs_info(context, builder, sig.args[2], args[2])
+    row_bytes = [builder.mul(r, e) for r, e in zip(row_sizes, elem_sizes)]
+    call_args = [args[0], lir.Constant(lir.IntType(32), len(in_datas)),
+        _make_c_array(builder, in_datas, char_ptr),
+        _make_c_array(builder, out_datas, char_ptr),
+        _make_c_array(builder, row_bytes, lir.IntType(64))]
+
+    # shuffle, number of arrays, input arrays, output arrays, row bytes
+    arg_typs = [lir.IntType(64), lir.IntType(32), char_ptr.as_pointer(),
+        char_ptr.as_pointer(), lir.IntType(64).as_pointer()]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty,
+                                            name="hpat_dist_shuffle_finish")
+    return builder.call(fn, call_args)
+
+def _get_typ_enums(tup_typ):
+    """runtime type enums of elements of arrays in tuple"""
+    return [lir.Constant(lir.IntType(32), _h5_typ_table[t.dtype])
+                                                    for t in tup_typ.types]
+
+@lower_builtin(distributed_api.dist_agg_start, types.npytypes.Array,
+    types.BaseTuple, types.BaseTuple, types.BaseTuple, types.BaseTuple)
+def lower_dist_agg_start(context, builder, sig, args):
+    char_ptr = lir.IntType(8).as_pointer()
+    keys = make_array(sig.args[0])(context, builder, args[0])
+    n_rows = cgutils.unpack_tuple(builder, keys.shape, 1)[0]
+    in_datas, _, _, _ = _get_arrs_info(context, builder, sig.args[1], args[1])
+    # operation, input column and auxiliary column of each output column
+    ops, in_cols, aux_cols = [cgutils.unpack_tuple(builder, args[i],
+                                len(sig.args[i].types)) for i in (2, 3, 4)]
+    call_args = [builder.bitcast(keys.data, char_ptr), n_rows,
+        lir.Constant(lir.IntType(32), _h5_typ_table[sig.args[0].dtype]),
+        lir.Constant(lir.IntType(32), len(in_datas)),
+        _make_c_array(builder, in_datas, char_ptr),
+        _make_c_array(builder, _get_typ_enums(sig.args[1]), lir.IntType(32)),
+        lir.Constant(lir.IntType(32), len(ops)),
+        _make_c_array(builder, ops, lir.IntType(64)),
+        _make_c_array(builder, in_cols, lir.IntType(64)),
+        _make_c_array(builder, aux_cols, lir.IntType(64))]
+
+    arg_typs = [char_ptr, lir.IntType(64), lir.IntType(32), lir.IntType(32),
+        char_ptr.as_pointer(), lir.IntType(32).as_pointer(), lir.IntType(32),
+        lir.IntType(64).as_pointer(), lir.IntType(64).as_pointer(),
+        lir.IntType(64).as_pointer()]
+    fnty = lir.FunctionType(lir.IntType(64), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_agg_start")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_agg_count, types.int64)
+def lower_dist_agg_count(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(64), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_agg_count")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_agg_finish, types.int64,
+    types.npytypes.Array, types.BaseTuple)
+def lower_dist_agg_finish(context, builder, sig, args):
+    char_ptr = lir.IntType(8).as_pointer()
+    keys = make_array(sig.args[1])(context, builder, args[1])
+    out_datas, _, _, _ = _get_arrs_info(context, builder, sig.args[2], args[2])
+    call_args = [args[0], builder.bitcast(keys.data, char_ptr),
+        _make_c_array(builder, out_datas, char_ptr),
+        _make_c_array(builder, _get_typ_enums(sig.args[2]), lir.IntType(32))]
+
+    arg_typs = [lir.IntType(64), char_ptr, char_ptr.as_pointer(),
+                                                lir.IntType(32).as_pointer()]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_agg_finish")
+    return builder.call(fn, call_args)
+
+def _get_join_tables(context, builder, arg_typs, args):
+    """data of keys and columns of left and right tables of join, arguments
+    are left key, right key, left columns and right columns"""
+    char_ptr = lir.IntType(8).as_pointer()
+    keys = [make_array(arg_typs[i])(context, builder, args[i]) for i in (0, 1)]
+    key_datas = [builder.bitcast(k.data, char_ptr) for k in keys]
+    n_rows = [cgutils.unpack_tuple(builder, k.shape, 1)[0] for k in keys]
+    datas, row_bytes = [], []
+    for i in (2, 3):
+        t_datas, _, row_sizes, elem_sizes = _get_arrs_info(context, builder,
+                                                        arg_typs[i], args[i])
+        datas += t_datas
+        row_bytes += [builder.mul(r, e) for r, e in zip(row_sizes, elem_sizes)]
+    return key_datas, n_rows, datas, row_bytes
+
+@lower_builtin(distributed_api.dist_join_start, types.npytypes.Array,
+    types.npytypes.Array, types.BaseTuple, types.BaseTuple, types.boolean,
+    types.boolean)
+def lower_dist_join_start(context, builder, sig, args):
+    char_ptr = lir.IntType(8).as_pointer()
+    key_datas, n_rows, datas, row_bytes = _get_join_tables(context, builder,
+                                                                sig.args, args)
+    key_typs = [lir.Constant(lir.IntType(32), _h5_typ_table[sig.args[i].dtype])
+                                                                for i in (0, 1)]
+    n_cols = [lir.Constant(lir.IntType(32), len(sig.args[i].types))
+                                                                for i in (2, 3)]
+    call_args = [_make_c_array(builder, key_datas, char_ptr),
+        _make_c_array(builder, n_rows, lir.IntType(64)),
+        _make_c_array(builder, key_typs, lir.IntType(32)),
+        _make_c_array(builder, n_cols, lir.IntType(32)),
+        _make_c_array(builder, datas, char_ptr),
+        _make_c_array(builder, row_bytes, lir.IntType(64)),
+        _make_c_array(builder, [builder.zext(a, lir.IntType(8))
+                                        for a in args[4:6]], lir.IntType(8))]
+
+    # keys, rows, key types, number of columns, columns, row bytes of
+    # columns and parallel flags of left and right tables
+    arg_typs = [char_ptr.as_pointer(), lir.IntType(64).as_pointer(),
+        lir.IntType(32).as_pointer(), lir.IntType(32).as_pointer(),
+        char_ptr.as_pointer(), lir.IntType(64).as_pointer(), char_ptr]
+    fnty = lir.FunctionType(lir.IntType(64), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_join_start")
+    return builder.call(fn, call_args)
+
+@lower_builtin(distributed_api.dist_join_count, types.int64)
+def lower_dist_join_count(context, builder, sig, args):
+    fnty = lir.FunctionType(lir.IntType(64), [lir.IntType(64)])
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_join_count")
+    return builder.call(fn, args)
+
+@lower_builtin(distributed_api.dist_join_finish, types.int64,
+    types.npytypes.Array, types.npytypes.Array, types.BaseTuple,
+    types.BaseTuple, types.npytypes.Array, types.BaseTuple)
+def lower_dist_join_finish(context, builder, sig, args):
+    char_ptr = lir.IntType(8).as_pointer()
+    # input tables start at first argument after handle
+    key_datas, _, datas, _ = _get_join_tables(context, builder, sig.args[1:],
+                                                                    args[1:])
+    out_key = make_array(sig.args[5])(context, builder, args[5])
+    out_datas, _, _, _ = _get_arrs_info(context, builder, sig.args[6], args[6])
+    call_args = [args[0], _make_c_array(builder, key_datas, char_ptr),
+        _make_c_array(builder, datas, char_ptr),
+        builder.bitcast(out_key.data, char_ptr),
+        _make_c_array(builder, out_datas, char_ptr)]
+
+    arg_typs = [lir.IntType(64), char_ptr.as_pointer(), char_ptr.as_pointer(),
+                                            char_ptr, char_ptr.as_pointer()]
+    fnty = lir.FunctionType(lir.IntType(32), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_join_finish")
+    return builder.call(fn, call_args)
+
 @lower_builtin(distributed_api.dist_setitem, types.Array, types.Any, types.Any,
     types.intp, types.intp)
 def dist_setitem_array(context, builder, sig, args):
@@ -220,3 +873,31 @@ def dist_setitem_array(context, builder, sig, args):
     numba.targets.arrayobj.setitem_array(context, builder, sig, args)
     cgutils.get_item_pointer2 = regular_get_item_pointer2
     return lir.Constant(lir.IntType(32), 0)
+
+@lower_builtin(distributed_api.dist_percentile, types.npytypes.Array,
+                                                                types.Number)
+def lower_dist_percentile(context, builder, sig, args):
+    # np.percentile takes percents and returns NaN if there are NaN values
+    q = context.cast(builder, args[1], sig.args[1], types.float64)
+    q = builder.fdiv(q, lir.Constant(lir.DoubleType(), 100.0))
+    return _gen_dist_quantile(context, builder, sig.args[0], args[0], q, False)
+
+@lower_builtin(distributed_api.dist_quantile, types.npytypes.Array,
+                                                                types.Number)
+def lower_dist_quantile(context, builder, sig, args):
+    # Series.quantile skips NaN values
+    q = context.cast(builder, args[1], sig.args[1], types.float64)
+    return _gen_dist_quantile(context, builder, sig.args[0], args[0], q, True)
+
+def _gen_dist_quantile(context, builder, arr_typ, arr_val, q, skipna):
+    typ_enum = _h5_typ_table[arr_typ.dtype]
+    arr = make_array(arr_typ)(context, builder, arr_val)
+    n = cgutils.unpack_tuple(builder, arr.shape, 1)[0]
+    call_args = [builder.bitcast(arr.data, lir.IntType(8).as_pointer()), n,
+                                lir.Constant(lir.IntType(32), typ_enum), q,
+                                lir.Constant(lir.IntType(1), skipna)]
+    arg_typs = [lir.IntType(8).as_pointer(), lir.IntType(64), lir.IntType(32),
+                                        lir.DoubleType(), lir.IntType(1)]
+    fnty = lir.FunctionType(lir.DoubleType(), arg_typs)
+    fn = builder.module.get_or_insert_function(fnty, name="hpat_dist_quantile")
+    return builder.call(fn, call_args)
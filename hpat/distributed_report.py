@@ -0,0 +1,56 @@
+from __future__ import print_function, division, absolute_import
+
+import linecache
+import weakref
+
+from hpat.distributed_analysis import Distribution
+
+# python function -> {signature args: DistributionReport}
+_reports = weakref.WeakKeyDictionary()
+
+
+class DistributionReport(object):
+    """distributions of arrays and parfors of a compiled function, statements
+    that made arrays replicated (REP), and collectives inserted by the
+    distributed pass with estimated communication volumes"""
+    def __init__(self, func_name, array_dists, rep_reasons, parfor_dists,
+                                                        parfor_locs, comms):
+        self.func_name = func_name
+        self.array_dists = array_dists
+        # array name -> IR statement that set REP first
+        self.rep_reasons = rep_reasons
+        self.parfor_dists = parfor_dists
+        self.parfor_locs = parfor_locs
+        # list of (collective, variable name, loc, volume estimate)
+        self.comms = comms
+
+    def __str__(self):
+        lines = ["Distribution report for {}".format(self.func_name)]
+        lines.append("Arrays:")
+        for name, dist in sorted(self.array_dists.items()):
+            lines.append("  {}: {}".format(name, dist.name))
+            inst = self.rep_reasons.get(name, None)
+            if dist==Distribution.REP and inst is not None:
+                lines.append("    REP due to: {}".format(inst))
+                lines.append("    " + _format_loc(inst.loc))
+        lines.append("Parfors:")
+        for parfor_id, dist in sorted(self.parfor_dists.items()):
+            lines.append("  parfor {}: {} ({})".format(parfor_id, dist.name,
+                                        _format_loc(self.parfor_locs[parfor_id])))
+        lines.append("Collectives:")
+        for comm_name, var_name, loc, volume in self.comms:
+            lines.append("  {} of {}: {} ({})".format(comm_name, var_name,
+                                                    volume, _format_loc(loc)))
+        return "\n".join(lines)
+
+def add_report(py_func, args, report):
+    _reports.setdefault(py_func, {})[tuple(args)] = report
+
+def get_reports(py_func):
+    return _reports.get(py_func, {})
+
+def _format_loc(loc):
+    if loc is None:
+        return "unknown location"
+    source_line = linecache.getline(loc.filename, loc.line).strip()
+    return "{}:{}: {}".format(loc.filename, loc.line, source_line)
@@ -8,15 +8,10 @@ from numba.ir_utils import (mk_unique_var, replace_vars_inner, find_topo_order,
                             dprint_func_ir, remove_dead, mk_alloc, remove_dels,
                             get_name_var_table, replace_var_names, add_offset_to_labels)
 import hpat
-from hpat import hiframes_api
+from hpat import hiframes_api, distributed_api
 import numpy as np
 import pandas
 
-import copy
-def global_deepcopy(self, memo):
-    return ir.Global(self.name, self.value, copy.deepcopy(self.loc))
-ir.Global.__deepcopy__ = global_deepcopy
-
 class HiFrames(object):
     """analyze and transform hiframes calls"""
     def __init__(self, func_ir):
@@ -44,6 +39,24 @@ class HiFrames(object):
         # arrays that are df columns actually (pd.Series)
         self.df_cols = set()
         self.df_col_calls = {}
+        # columns of filter outputs, which may not be balanced across
+        # processors and are rebalanced before stencil computations
+        self.filtered_cols = set()
+        # hpat module and hpat.rebalance variables
+        self.hpat_globals = []
+        self.rebalance_funcs = []
+        # df.sort_values varname -> df varname
+        self.df_sort_calls = {}
+        # df.groupby varname -> df varname
+        self.df_groupby_attrs = {}
+        # df.groupby('key') varname -> (df varname, key)
+        self.df_groupbys = {}
+        # df.groupby('key').sum varname -> (df varname, key, method)
+        self.groupby_calls = {}
+        # pd.merge varnames
+        self.pd_merge_calls = []
+        # df.merge varname -> df varname
+        self.df_merge_attrs = {}
 
     def run(self):
         dprint_func_ir(self.func_ir, "starting hiframes")
@@ -93,6 +106,12 @@ class HiFrames(object):
         if (isinstance(rhs, ir.Global) and isinstance(rhs.value, pytypes.ModuleType)
                     and rhs.value==pandas):
             self.pd_globals.append(lhs)
+        # lhs = hpat or lhs = hpat.rebalance
+        if isinstance(rhs, ir.Global) and rhs.value is hpat:
+            self.hpat_globals.append(lhs)
+        if (isinstance(rhs, ir.Global)
+                and rhs.value is distributed_api.rebalance_array):
+            self.rebalance_funcs.append(lhs)
 
         if isinstance(rhs, ir.Expr):
             # df_call = pd.DataFrame
@@ -111,12 +130,24 @@ class HiFrames(object):
                 # remove DataFrame call
                 return []
 
+            if (rhs.op=='getattr' and rhs.value.name in self.hpat_globals
+                    and rhs.attr=='rebalance'):
+                self.rebalance_funcs.append(lhs)
+
+            # df2 = hpat.rebalance(df)
+            if (rhs.op=='call' and rhs.func.name in self.rebalance_funcs
+                    and rhs.args[0].name in self.df_vars):
+                return self._gen_df_rebalance(assign.target,
+                                                rhs.args[0].name)
+
             # d = df['column']
             if (rhs.op == 'static_getitem' and rhs.value.name in self.df_vars
                                             and isinstance(rhs.index, str)):
                 df = rhs.value.name
                 assign.value = self.df_vars[df][rhs.index]
                 self.df_cols.add(lhs)  # save lhs as column
+                if assign.value.name in self.filtered_cols:
+                    self.filtered_cols.add(lhs)
 
             # df1 = df[df.A > .5]
             if (rhs.op == 'getitem' and rhs.value.name in self.df_vars):
@@ -128,9 +159,74 @@ class HiFrames(object):
                     self.df_vars[lhs][col] = ir.Var(scope, mk_unique_var(col),
                                                                             loc)
                 self._update_df_cols()
+                for col_var in self.df_vars[lhs].values():
+                    self.filtered_cols.add(col_var.name)
                 return [hiframes_api.Filter(lhs, rhs.value.name, rhs.index,
                                                         self.df_vars, rhs.loc)]
 
+            # df.sort_values
+            if (rhs.op=='getattr' and rhs.value.name in self.df_vars
+                    and rhs.attr=='sort_values'):
+                self.df_sort_calls[lhs] = rhs.value.name
+                return []  # remove node
+
+            # df2 = df.sort_values('A')
+            if rhs.op=='call' and rhs.func.name in self.df_sort_calls:
+                return self._gen_df_sort(assign.target,
+                    self.df_sort_calls[rhs.func.name], rhs.args, dict(rhs.kws))
+
+            # df.groupby
+            if (rhs.op=='getattr' and rhs.value.name in self.df_vars
+                    and rhs.attr=='groupby'):
+                self.df_groupby_attrs[lhs] = rhs.value.name
+                return []  # remove node
+
+            # g = df.groupby('A')
+            if rhs.op=='call' and rhs.func.name in self.df_groupby_attrs:
+                kws = dict(rhs.kws)
+                key_var = rhs.args[0] if rhs.args else kws['by']
+                self.df_groupbys[lhs] = (self.df_groupby_attrs[rhs.func.name],
+                                            self.const_table[key_var.name])
+                return []  # remove node
+
+            # g.sum
+            if rhs.op=='getattr' and rhs.value.name in self.df_groupbys:
+                assert rhs.attr in ['agg', 'aggregate', 'sum', 'mean',
+                    'count', 'min', 'max'], "groupby method not supported"
+                self.groupby_calls[lhs] = (self.df_groupbys[rhs.value.name]
+                                                                + (rhs.attr,))
+                return []  # remove node
+
+            # df2 = g.sum() or df2 = g.agg('sum')
+            if rhs.op=='call' and rhs.func.name in self.groupby_calls:
+                df, key, func = self.groupby_calls[rhs.func.name]
+                if func in ['agg', 'aggregate']:
+                    func = self.const_table[rhs.args[0].name]
+                return self._gen_groupby_agg(assign.target, df, key, func)
+
+            # merge_call = pd.merge
+            if (rhs.op=='getattr' and rhs.value.name in self.pd_globals
+                    and rhs.attr=='merge'):
+                self.pd_merge_calls.append(lhs)
+                return []  # remove node
+
+            # df.merge
+            if (rhs.op=='getattr' and rhs.value.name in self.df_vars
+                    and rhs.attr=='merge'):
+                self.df_merge_attrs[lhs] = rhs.value.name
+                return []  # remove node
+
+            # df3 = pd.merge(df1, df2, on='A') or df3 = df1.merge(df2, on='A')
+            if rhs.op=='call' and (rhs.func.name in self.pd_merge_calls
+                                    or rhs.func.name in self.df_merge_attrs):
+                kws = dict(rhs.kws)
+                args = [v.name for v in rhs.args]
+                if rhs.func.name in self.df_merge_attrs:
+                    args = [self.df_merge_attrs[rhs.func.name]] + args
+                left_df = args[0] if len(args)>0 else kws['left'].name
+                right_df = args[1] if len(args)>1 else kws['right'].name
+                return self._gen_merge(assign.target, left_df, right_df, kws)
+
             # d = df.column
             if rhs.op=='getattr' and rhs.value.name in self.df_vars:
                 df = rhs.value.name
@@ -138,16 +234,20 @@ class HiFrames(object):
                 assert rhs.attr in df_cols
                 assign.value = df_cols[rhs.attr]
                 self.df_cols.add(lhs)  # save lhs as column
+                if assign.value.name in self.filtered_cols:
+                    self.filtered_cols.add(lhs)
 
             # c = df.column.shift
             if (rhs.op=='getattr' and rhs.value.name in self.df_cols and
-                        rhs.attr in ['shift', 'pct_change', 'fillna', 'sum']):
+                        rhs.attr in ['shift', 'pct_change', 'fillna', 'sum',
+                            'cumsum', 'cumprod', 'cummin', 'cummax',
+                            'quantile']):
                 self.df_col_calls[lhs] = (rhs.value, rhs.attr)
 
             # A = df.column.shift(3)
             if rhs.op=='call' and rhs.func.name in self.df_col_calls:
                 return self._gen_column_call(assign.target, rhs.args,
-                                            *self.df_col_calls[rhs.func.name])
+                        *self.df_col_calls[rhs.func.name], kws=dict(rhs.kws))
 
             # d.rolling
             if rhs.op=='getattr' and rhs.value.name in self.df_cols:
@@ -194,6 +294,8 @@ class HiFrames(object):
             self.df_vars[lhs] = self.df_vars[rhs.name]
         if isinstance(rhs, ir.Var) and rhs.name in self.df_cols:
             self.df_cols.add(lhs)
+        if isinstance(rhs, ir.Var) and rhs.name in self.filtered_cols:
+            self.filtered_cols.add(lhs)
 
         if isinstance(rhs, ir.Const):
             self.const_table[lhs] = rhs.value
@@ -214,13 +316,17 @@ class HiFrames(object):
                 self.df_cols.add(col_var)
         return
 
-    def _gen_column_call(self, out_var, args, col_var, func):
-        if func is not 'sum':
-            self.df_cols.add(out_var.name) # output is Series except sum
+    def _gen_column_call(self, out_var, args, col_var, func, kws=None):
+        if func not in ('sum', 'quantile'):
+            self.df_cols.add(out_var.name) # output is Series except reductions
         if func == 'fillna':
             return self._gen_fillna(out_var, args, col_var)
         if func == 'sum':
             return self._gen_col_sum(out_var, args, col_var)
+        if func == 'quantile':
+            return self._gen_col_quantile(out_var, args, kws, col_var)
+        if func in ['cumsum', 'cumprod', 'cummin', 'cummax']:
+            return self._gen_col_scan(out_var, col_var, func)
         loc = col_var.loc
         if func == 'pct_change':
             shift_const = 1
@@ -238,7 +344,9 @@ class HiFrames(object):
         code_obj = loc_vars['g'].__code__
         code_expr = ir.Expr.make_function(None, code_obj, None, None, loc)
         index_offsets = [0]
-        return gen_stencil_call(col_var, out_var, code_expr, index_offsets)
+        rebalance_nodes, col_var = self._gen_stencil_rebalance(col_var)
+        return rebalance_nodes + gen_stencil_call(col_var, out_var, code_expr,
+                                                                index_offsets)
 
     def _gen_fillna(self, out_var, args, col_var):
         def f(A, B, fill):
@@ -272,6 +380,42 @@ class HiFrames(object):
         f_blocks[0].body.insert(0, ir.Assign(ir.Const(0.0, loc), out_var, loc))
         return f_blocks
 
+    def _gen_col_quantile(self, out_var, args, kws, col_var):
+        # distributed pass handles this call as a distributed selection
+        q_var = args[0] if args else (kws or {}).get('q', None)
+        if q_var is None:
+            def f(A, s):
+                s = hiframes_api.quantile(A, 0.5)
+        else:
+            def f(A, q, s):
+                s = hiframes_api.quantile(A, q)
+        f_blocks = get_inner_ir(f)
+        replace_var_names(f_blocks, {'A': col_var.name})
+        replace_var_names(f_blocks, {'s': out_var.name})
+        if q_var is not None:
+            replace_var_names(f_blocks, {'q': q_var.name})
+        return f_blocks
+
+    def _gen_col_scan(self, out_var, col_var, func):
+        # distributed pass handles these calls as parallel scans
+        if func == 'cumsum':
+            def f(A, B):
+                B = np.cumsum(A)
+        elif func == 'cumprod':
+            def f(A, B):
+                B = np.cumprod(A)
+        elif func == 'cummin':
+            def f(A, B):
+                B = hiframes_api.cummin(A)
+        else:
+            assert func == 'cummax'
+            def f(A, B):
+                B = hiframes_api.cummax(A)
+        f_blocks = get_inner_ir(f)
+        replace_var_names(f_blocks, {'A': col_var.name})
+        replace_var_names(f_blocks, {'B': out_var.name})
+        return f_blocks
+
     def _gen_rolling_call(self, args, col_var, win_size, center, func, out_var):
         loc = col_var.loc
         if func == 'apply':
@@ -292,7 +436,9 @@ class HiFrames(object):
         if center:
             index_offsets[0] += win_size//2
 
-        stencil_nodes = gen_stencil_call(col_var, out_var, code_expr, index_offsets)
+        rebalance_nodes, col_var = self._gen_stencil_rebalance(col_var)
+        stencil_nodes = rebalance_nodes + gen_stencil_call(col_var, out_var,
+                                                    code_expr, index_offsets)
 
         def f(A):
             A[:win_size-1] = np.nan
@@ -319,6 +465,120 @@ class HiFrames(object):
 
         return stencil_nodes + setitem_nodes
 
+    def _gen_stencil_rebalance(self, col_var):
+        """stencils on filtered columns need halos from neighbor processors,
+        which requires balanced 1D distribution. Returns rebalance nodes
+        and new column variable."""
+        if col_var.name not in self.filtered_cols:
+            return [], col_var
+        out_col = ir.Var(col_var.scope, mk_unique_var(col_var.name+"_bal"),
+                                                                col_var.loc)
+        self.df_cols.add(out_col.name)
+        return gen_rebalance_call(col_var, out_col), out_col
+
+    def _gen_df_rebalance(self, df_out, df_in):
+        """rebalance all columns of a dataframe"""
+        out = []
+        self.df_vars[df_out.name] = {}
+        for col, col_var in self.df_vars[df_in].items():
+            out_col = ir.Var(df_out.scope, mk_unique_var(col), df_out.loc)
+            out += gen_rebalance_call(col_var, out_col)
+            self.df_vars[df_out.name][col] = out_col
+        self._update_df_cols()
+        return out
+
+    def _gen_df_sort(self, df_out, df_in, args, kws):
+        """sort all columns of a dataframe by key column using argsort of
+        the key, which is a distributed sample sort that returns global
+        indices, and gathering rows of columns with the indices"""
+        if args:
+            key = self.const_table[args[0].name]
+        else:
+            key = self.const_table[kws['by'].name]
+        if 'ascending' in kws:
+            assert self.const_table[kws['ascending'].name], \
+                                        "only ascending sort_values supported"
+        cols = list(self.df_vars[df_in].keys())
+        assert key in cols
+        # sort output is not balanced across processors
+        self.df_vars[df_out.name] = {}
+        for col in cols:
+            out_col = ir.Var(df_out.scope, mk_unique_var(col), df_out.loc)
+            self.df_vars[df_out.name][col] = out_col
+            self.filtered_cols.add(out_col.name)
+        self._update_df_cols()
+
+        in_args = ['c{}'.format(i) for i in range(len(cols))]
+        out_args = ['o{}'.format(i) for i in range(len(cols))]
+        func_text = 'def f({}):\n'.format(', '.join(in_args + out_args))
+        func_text += '  perm = np.argsort(c{})\n'.format(cols.index(key))
+        for in_arg, out_arg in zip(in_args, out_args):
+            func_text += '  {} = {}[perm]\n'.format(out_arg, in_arg)
+        loc_vars = {}
+        exec(func_text, {'np': np}, loc_vars)
+        f_blocks = get_inner_ir(loc_vars['f'])
+        for i, col in enumerate(cols):
+            replace_var_names(f_blocks, {in_args[i]:
+                                            self.df_vars[df_in][col].name})
+            replace_var_names(f_blocks, {out_args[i]:
+                                        self.df_vars[df_out.name][col].name})
+        return f_blocks
+
+    def _gen_groupby_agg(self, df_out, df_in, key, agg_func):
+        """aggregate columns of dataframe by key column, the output has the
+        keys of groups (sorted) as a column like groupby(as_index=False)"""
+        assert agg_func in ['sum', 'mean', 'count', 'min', 'max'], \
+                                        "groupby aggregation not supported"
+        assert key in self.df_vars[df_in]
+        # number of groups on each processor is not balanced
+        self.df_vars[df_out.name] = {}
+        for col in self.df_vars[df_in].keys():
+            out_col = ir.Var(df_out.scope, mk_unique_var(col), df_out.loc)
+            self.df_vars[df_out.name][col] = out_col
+            self.filtered_cols.add(out_col.name)
+        self._update_df_cols()
+        return [hiframes_api.Aggregate(df_out.name, df_in, key, agg_func,
+                                                self.df_vars, df_out.loc)]
+
+    def _gen_merge(self, df_out, left_df, right_df, kws):
+        """inner join of two dataframes on a key column, the output has the
+        key column once and other columns of both tables (in this order)"""
+        assert left_df in self.df_vars and right_df in self.df_vars
+        key = self.const_table[kws['on'].name]
+        if 'how' in kws:
+            assert self.const_table[kws['how'].name]=='inner', \
+                                                "only inner merge supported"
+        left_cols = list(self.df_vars[left_df].keys())
+        right_cols = list(self.df_vars[right_df].keys())
+        assert key in left_cols and key in right_cols
+        left_out, right_out = hiframes_api.get_join_columns(left_cols,
+                                                            right_cols, key)
+        # join output is not balanced across processors
+        self.df_vars[df_out.name] = {}
+        for col in [key] + [c for c, _ in left_out + right_out]:
+            out_col = ir.Var(df_out.scope, mk_unique_var(col), df_out.loc)
+            self.df_vars[df_out.name][col] = out_col
+            self.filtered_cols.add(out_col.name)
+        self._update_df_cols()
+        return [hiframes_api.Join(df_out.name, left_df, right_df, key,
+                                                self.df_vars, df_out.loc)]
+
+def gen_rebalance_call(in_arr, out_arr):
+    scope = in_arr.scope
+    loc = in_arr.loc
+    # g_dist_var = Global(hpat.distributed_api)
+    g_dist_var = ir.Var(scope, mk_unique_var("$distributed_g_var"), loc)
+    g_dist = ir.Global('distributed_api', distributed_api, loc)
+    g_dist_assign = ir.Assign(g_dist, g_dist_var, loc)
+    # attr call: rebalance_attr = getattr(g_dist_var, rebalance_array)
+    rebalance_attr_call = ir.Expr.getattr(g_dist_var, "rebalance_array", loc)
+    attr_var = ir.Var(scope, mk_unique_var("$rebalance_attr"), loc)
+    attr_assign = ir.Assign(rebalance_attr_call, attr_var, loc)
+    # out_arr = rebalance_attr(in_arr)
+    rebalance_call = ir.Expr.call(attr_var, [in_arr], (), loc)
+    rebalance_assign = ir.Assign(rebalance_call, out_arr, loc)
+    return [g_dist_assign, attr_assign, rebalance_assign]
+
 def gen_empty_like(in_arr, out_arr):
     scope = in_arr.scope
     loc = in_arr.loc
@@ -1,10 +1,14 @@
 from __future__ import print_function, division, absolute_import
 
 import numba
-from numba import typeinfer, ir
+from numba import typeinfer, ir, types
+from numba.ir_utils import mk_unique_var
 from numba.typing import signature
+from numba.typing.templates import infer_global, AbstractTemplate
+from numba.targets.imputils import lower_builtin
 from hpat import distributed, distributed_analysis
 from hpat.distributed_analysis import Distribution
+import numpy as np
 
 class Filter(ir.Stmt):
     def __init__(self, df_out, df_in, bool_arr, df_vars, loc):
@@ -74,8 +78,8 @@ def filter_distributed_analysis(filter_node, array_dists):
 
 distributed_analysis.distributed_analysis_extensions[Filter] = filter_distributed_analysis
 
-def filter_distributed_run(filter_node, typemap, calltypes):
-    # TODO: rebalance if output distributions are 1D instead of 1D_Var
+def filter_distributed_run(filter_node, typemap, calltypes, array_dists):
+    # output is 1D_Var, HiFrames inserts rebalance calls if necessary
     df_vars = filter_node.df_vars
     df_in_vars = df_vars[filter_node.df_in]
     df_out_vars = df_vars[filter_node.df_out]
@@ -112,6 +116,445 @@ def filter_typeinfer(filter_node, typeinferer):
 typeinfer.typeinfer_extensions[Filter] = filter_typeinfer
 
 
+class Aggregate(ir.Stmt):
+    def __init__(self, df_out, df_in, key_name, agg_func, df_vars, loc):
+        self.df_out = df_out
+        self.df_in = df_in
+        self.key_name = key_name
+        # sum, mean, count, min or max
+        self.agg_func = agg_func
+        # needs df columns for type inference stage
+        self.df_vars = df_vars
+        self.loc = loc
+
+    def __repr__(self):
+        return "aggregate: {} = {}.groupby('{}').{}()".format(self.df_out,
+                                    self.df_in, self.key_name, self.agg_func)
+
+def aggregate_array_analysis(agg_node, array_analysis):
+    df_vars = agg_node.df_vars
+    df_in_vars = df_vars[agg_node.df_in]
+    df_out_vars = df_vars[agg_node.df_out]
+
+    # arrays of input df have same size in last dimension
+    c_in = array_analysis._get_next_class()
+    for _, col_var in df_in_vars.items():
+        c_in = array_analysis._merge_classes(c_in,
+                            array_analysis.array_shape_classes[col_var.name][0])
+
+    # create correlations for output arrays
+    for _, col_var in df_out_vars.items():
+        array_analysis._add_array_corr(col_var.name)
+
+    # arrays of output df have same size (number of groups)
+    c_out = array_analysis._get_next_class()
+    for _, col_var in df_out_vars.items():
+        c_out = array_analysis._merge_classes(c_out,
+                            array_analysis.array_shape_classes[col_var.name][0])
+
+    # gen size variable for an output column
+    out_col = list(df_out_vars.items())[0][1]
+    size_nodes = array_analysis._gen_size_call(out_col, 0)
+    size_var = size_nodes[-1].target
+    array_analysis.class_sizes[c_out] = [size_var]
+    return size_nodes
+
+numba.array_analysis.array_analysis_extensions[Aggregate] = aggregate_array_analysis
+
+def aggregate_distributed_analysis(agg_node, array_dists):
+    df_vars = agg_node.df_vars
+    df_in_vars = df_vars[agg_node.df_in]
+    df_out_vars = df_vars[agg_node.df_out]
+
+    # input columns have same distribution
+    in_dist = Distribution.OneD
+    for _, col_var in df_in_vars.items():
+        in_dist = Distribution(min(in_dist.value, array_dists[col_var.name].value))
+
+    # output columns have same distribution, number of groups on each
+    # processor depends on the data
+    out_dist = Distribution.OneD_Var
+    for _, col_var in df_out_vars.items():
+        # output dist might not be assigned yet
+        if col_var.name in array_dists:
+            out_dist = Distribution(min(out_dist.value, array_dists[col_var.name].value))
+
+    # groups of replicated input are computed locally
+    if in_dist==Distribution.REP or out_dist==Distribution.REP:
+        in_dist = out_dist = Distribution.REP
+    for _, col_var in df_in_vars.items():
+        array_dists[col_var.name] = in_dist
+    for _, col_var in df_out_vars.items():
+        array_dists[col_var.name] = out_dist
+
+    return
+
+distributed_analysis.distributed_analysis_extensions[Aggregate] = aggregate_distributed_analysis
+
+# operations of runtime aggregation (hpat_dist_agg_start)
+_AGG_SUM, _AGG_MIN, _AGG_MAX, _AGG_COUNT, _AGG_MEAN, _AGG_RATIO = range(6)
+
+_agg_ops = {'sum': _AGG_SUM, 'min': _AGG_MIN, 'max': _AGG_MAX,
+            'count': _AGG_COUNT, 'mean': _AGG_MEAN}
+
+def get_agg_dtype(agg_func, dtype):
+    """output element type of aggregation like Pandas"""
+    if agg_func=='count':
+        return types.int64
+    if agg_func=='mean':
+        return types.float64
+    if agg_func=='sum' and isinstance(dtype, types.Integer):
+        return types.int64
+    return dtype
+
+def aggregate_distributed_run(agg_node, typemap, calltypes, array_dists):
+    df_vars = agg_node.df_vars
+    df_in_vars = df_vars[agg_node.df_in]
+    df_out_vars = df_vars[agg_node.df_out]
+    key_name = agg_node.key_name
+    agg_func = agg_node.agg_func
+    col_names = [c for c in df_in_vars.keys() if c!=key_name]
+    in_key = df_in_vars[key_name]
+    in_vars = [df_in_vars[c] for c in col_names]
+    out_key = df_out_vars[key_name]
+    out_vars = [df_out_vars[c] for c in col_names]
+    op = _agg_ops[agg_func]
+
+    if array_dists[in_key.name]==Distribution.REP:
+        return _gen_agg(in_key, in_vars, [(op, i, 0) for i in range(
+                    len(in_vars))], out_key, out_vars, typemap, calltypes)
+
+    # aggregate local chunks, shuffle partial results by key, merge them and
+    # sort groups by key
+    scope = in_key.scope
+    loc = agg_node.loc
+    part_key = ir.Var(scope, mk_unique_var("$agg_part_key"), loc)
+    typemap[part_key.name] = typemap[in_key.name]
+    part_vars = []
+    local_specs = []
+    merge_specs = []
+    for i, in_var in enumerate(in_vars):
+        dtype = typemap[in_var.name].dtype
+        if agg_func=='mean':
+            # sums and counts of groups are merged to means
+            part_typs = [types.float64, types.int64]
+            local_specs += [(_AGG_SUM, i, 0), (_AGG_COUNT, i, 0)]
+            merge_specs.append((_AGG_RATIO, len(part_vars), len(part_vars)+1))
+        else:
+            part_typs = [get_agg_dtype(agg_func, dtype)]
+            local_specs.append((op, i, 0))
+            # partial counts are added
+            merge_op = _AGG_SUM if agg_func=='count' else op
+            merge_specs.append((merge_op, len(part_vars), 0))
+        for typ in part_typs:
+            part_var = ir.Var(scope, mk_unique_var("$agg_part"), loc)
+            typemap[part_var.name] = types.npytypes.Array(typ, 1, 'C')
+            part_vars.append(part_var)
+
+    out = _gen_agg(in_key, in_vars, local_specs, part_key, part_vars, typemap,
+                                                                    calltypes)
+    shuffle_key = ir.Var(scope, mk_unique_var("$agg_shuffle_key"), loc)
+    typemap[shuffle_key.name] = typemap[in_key.name]
+    shuffle_vars = []
+    for part_var in part_vars:
+        shuffle_var = ir.Var(scope, mk_unique_var("$agg_shuffle"), loc)
+        typemap[shuffle_var.name] = typemap[part_var.name]
+        shuffle_vars.append(shuffle_var)
+    out += distributed.gen_shuffle(part_key, [part_key]+part_vars,
+                            [shuffle_key]+shuffle_vars, typemap, calltypes)
+    merge_key = ir.Var(scope, mk_unique_var("$agg_merge_key"), loc)
+    typemap[merge_key.name] = typemap[out_key.name]
+    merge_vars = []
+    for out_var in out_vars:
+        merge_var = ir.Var(scope, mk_unique_var("$agg_merge"), loc)
+        typemap[merge_var.name] = typemap[out_var.name]
+        merge_vars.append(merge_var)
+    out += _gen_agg(shuffle_key, shuffle_vars, merge_specs, merge_key,
+                                            merge_vars, typemap, calltypes)
+    # groups are sorted on each processor only, sort them globally by key
+    # like the sequential version
+    out += distributed.gen_sort_by_key(merge_key, [merge_key]+merge_vars,
+                                    [out_key]+out_vars, typemap, calltypes)
+    return out
+
+def _gen_agg(key_var, in_vars, specs, out_key, out_vars, typemap, calltypes):
+    """generate runtime aggregation of in_vars by key_var, specs are
+    (operation, input column, auxiliary column) of output columns"""
+    scope = key_var.scope
+    loc = key_var.loc
+    out = []
+    # operations, input columns and auxiliary columns as tuples of constants
+    spec_vars = []
+    for vals in (zip(*specs) if specs else ((), (), ())):
+        const_vars = []
+        for val in vals:
+            const_var = ir.Var(scope, mk_unique_var("$agg_const"), loc)
+            typemap[const_var.name] = types.intp
+            out.append(ir.Assign(ir.Const(val, loc), const_var, loc))
+            const_vars.append(const_var)
+        spec_vars.append(_gen_tuple(const_vars, scope, loc, typemap, out))
+    agg_var = ir.Var(scope, mk_unique_var("$agg_var"), loc)
+    typemap[agg_var.name] = types.int64
+    in_tuple = _gen_tuple(in_vars, scope, loc, typemap, out)
+    distributed.gen_dist_call('dist_agg_start', [key_var, in_tuple]+spec_vars,
+                                            agg_var, typemap, calltypes, out)
+    count_var = ir.Var(scope, mk_unique_var("$agg_count"), loc)
+    typemap[count_var.name] = types.intp
+    distributed.gen_dist_call('dist_agg_count', [agg_var], count_var, typemap,
+                                                                calltypes, out)
+    for arr in [out_key] + out_vars:
+        out += numba.ir_utils.mk_alloc(typemap, calltypes, arr, (count_var,),
+                                        typemap[arr.name].dtype, scope, loc)
+    err_var = ir.Var(scope, mk_unique_var("$agg_err"), loc)
+    typemap[err_var.name] = types.int32
+    out_tuple = _gen_tuple(out_vars, scope, loc, typemap, out)
+    distributed.gen_dist_call('dist_agg_finish', [agg_var, out_key, out_tuple],
+                                            err_var, typemap, calltypes, out)
+    return out
+
+def _gen_tuple(items, scope, loc, typemap, out):
+    tuple_var = ir.Var(scope, mk_unique_var("$tuple_var"), loc)
+    typemap[tuple_var.name] = types.BaseTuple.from_types(
+                                            [typemap[v.name] for v in items])
+    out.append(ir.Assign(ir.Expr.build_tuple(items, loc), tuple_var, loc))
+    return tuple_var
+
+distributed.distributed_run_extensions[Aggregate] = aggregate_distributed_run
+
+class AggregateTyper(object):
+    """typing constraint of aggregated column, which has the output element
+    type of the aggregation"""
+    def __init__(self, out_var, in_var, agg_func, loc):
+        self.out_var = out_var
+        self.in_var = in_var
+        self.agg_func = agg_func
+        self.loc = loc
+
+    def __call__(self, typeinfer):
+        typevar = typeinfer.typevars[self.in_var]
+        if not typevar.defined:
+            return
+        in_typ = typevar.getone()
+        out_typ = in_typ.copy(dtype=get_agg_dtype(self.agg_func,
+                                            in_typ.dtype), layout='C')
+        typeinfer.add_type(self.out_var, out_typ, loc=self.loc)
+
+def aggregate_typeinfer(agg_node, typeinferer):
+    df_vars = agg_node.df_vars
+    df_in_vars = df_vars[agg_node.df_in]
+    df_out_vars = df_vars[agg_node.df_out]
+    for col_name, col_var in df_in_vars.items():
+        out_col_var = df_out_vars[col_name]
+        if col_name==agg_node.key_name:
+            typeinferer.constraints.append(typeinfer.Propagate(
+                dst=out_col_var.name, src=col_var.name, loc=agg_node.loc))
+        else:
+            typeinferer.constraints.append(AggregateTyper(out_col_var.name,
+                            col_var.name, agg_node.agg_func, agg_node.loc))
+    return
+
+typeinfer.typeinfer_extensions[Aggregate] = aggregate_typeinfer
+
+
+class Join(ir.Stmt):
+    def __init__(self, df_out, left_df, right_df, key, df_vars, loc):
+        self.df_out = df_out
+        self.left_df = left_df
+        self.right_df = right_df
+        self.key = key
+        # needs df columns for type inference stage
+        self.df_vars = df_vars
+        self.loc = loc
+
+    def __repr__(self):
+        return "join: {} = merge({}, {}, on='{}')".format(self.df_out,
+                                    self.left_df, self.right_df, self.key)
+
+def get_join_columns(left_cols, right_cols, key):
+    """(output name, input name) of non-key columns of left and right tables
+    of merge, names in both tables get _x and _y suffixes like Pandas"""
+    common = set(left_cols) & set(right_cols)
+    left = [(c+'_x' if c in common else c, c) for c in left_cols if c!=key]
+    right = [(c+'_y' if c in common else c, c) for c in right_cols if c!=key]
+    return left, right
+
+def _get_join_vars(join_node):
+    """key and column variables of left, right and output tables"""
+    df_vars = join_node.df_vars
+    left_vars = df_vars[join_node.left_df]
+    right_vars = df_vars[join_node.right_df]
+    out_vars = df_vars[join_node.df_out]
+    left_cols, right_cols = get_join_columns(left_vars.keys(),
+                                        right_vars.keys(), join_node.key)
+    key = join_node.key
+    return (left_vars[key], right_vars[key], out_vars[key],
+        [left_vars[c] for _, c in left_cols],
+        [right_vars[c] for _, c in right_cols],
+        [out_vars[o] for o, _ in left_cols+right_cols])
+
+def join_array_analysis(join_node, array_analysis):
+    df_vars = join_node.df_vars
+    df_out_vars = df_vars[join_node.df_out]
+
+    # arrays of each input df have same size in last dimension
+    for df in (join_node.left_df, join_node.right_df):
+        c_in = array_analysis._get_next_class()
+        for _, col_var in df_vars[df].items():
+            c_in = array_analysis._merge_classes(c_in,
+                            array_analysis.array_shape_classes[col_var.name][0])
+
+    # create correlations for output arrays
+    for _, col_var in df_out_vars.items():
+        array_analysis._add_array_corr(col_var.name)
+
+    # arrays of output df have same size in last dimension
+    c_out = array_analysis._get_next_class()
+    for _, col_var in df_out_vars.items():
+        c_out = array_analysis._merge_classes(c_out,
+                            array_analysis.array_shape_classes[col_var.name][0])
+
+    # gen size variable for an output column
+    out_col = list(df_out_vars.items())[0][1]
+    size_nodes = array_analysis._gen_size_call(out_col, 0)
+    size_var = size_nodes[-1].target
+    array_analysis.class_sizes[c_out] = [size_var]
+    return size_nodes
+
+numba.array_analysis.array_analysis_extensions[Join] = join_array_analysis
+
+def join_distributed_analysis(join_node, array_dists):
+    df_vars = join_node.df_vars
+    df_out_vars = df_vars[join_node.df_out]
+
+    # columns of each input table have same distribution
+    in_dists = []
+    for df in (join_node.left_df, join_node.right_df):
+        in_dist = Distribution.OneD
+        for _, col_var in df_vars[df].items():
+            in_dist = Distribution(min(in_dist.value, array_dists[col_var.name].value))
+        in_dists.append(in_dist)
+    left_dist, right_dist = in_dists
+
+    # output columns have same distribution
+    out_dist = Distribution.OneD_Var
+    for _, col_var in df_out_vars.items():
+        # output dist might not be assigned yet
+        if col_var.name in array_dists:
+            out_dist = Distribution(min(out_dist.value, array_dists[col_var.name].value))
+
+    # a distributed table can be joined with a replicated table but output
+    # of replicated tables is replicated
+    if out_dist==Distribution.REP:
+        left_dist = right_dist = Distribution.REP
+    if left_dist==Distribution.REP and right_dist==Distribution.REP:
+        out_dist = Distribution.REP
+
+    for df, in_dist in ((join_node.left_df, left_dist),
+                                            (join_node.right_df, right_dist)):
+        for _, col_var in df_vars[df].items():
+            array_dists[col_var.name] = in_dist
+    for _, col_var in df_out_vars.items():
+        array_dists[col_var.name] = out_dist
+
+    return
+
+distributed_analysis.distributed_analysis_extensions[Join] = join_distributed_analysis
+
+def join_distributed_run(join_node, typemap, calltypes, array_dists):
+    # output is 1D_Var, HiFrames inserts rebalance calls if necessary
+    (left_key, right_key, out_key, left_vars, right_vars,
+                                        out_vars) = _get_join_vars(join_node)
+    scope = left_key.scope
+    loc = join_node.loc
+    out = []
+    left_tuple = _gen_tuple(left_vars, scope, loc, typemap, out)
+    right_tuple = _gen_tuple(right_vars, scope, loc, typemap, out)
+    # runtime broadcasts or shuffles tables if both are distributed
+    parallel_vars = []
+    for key_var in (left_key, right_key):
+        parallel_var = ir.Var(scope, mk_unique_var("$join_parallel"), loc)
+        typemap[parallel_var.name] = types.boolean
+        out.append(ir.Assign(ir.Const(
+            array_dists[key_var.name]!=Distribution.REP, loc), parallel_var,
+                                                                        loc))
+        parallel_vars.append(parallel_var)
+    join_var = ir.Var(scope, mk_unique_var("$join_var"), loc)
+    typemap[join_var.name] = types.int64
+    distributed.gen_dist_call('dist_join_start', [left_key, right_key,
+            left_tuple, right_tuple]+parallel_vars, join_var, typemap,
+                                                                calltypes, out)
+    count_var = ir.Var(scope, mk_unique_var("$join_count"), loc)
+    typemap[count_var.name] = types.intp
+    distributed.gen_dist_call('dist_join_count', [join_var], count_var,
+                                                    typemap, calltypes, out)
+    for arr in [out_key] + out_vars:
+        out += numba.ir_utils.mk_alloc(typemap, calltypes, arr, (count_var,),
+                                        typemap[arr.name].dtype, scope, loc)
+    out_tuple = _gen_tuple(out_vars, scope, loc, typemap, out)
+    err_var = ir.Var(scope, mk_unique_var("$join_err"), loc)
+    typemap[err_var.name] = types.int32
+    distributed.gen_dist_call('dist_join_finish', [join_var, left_key,
+            right_key, left_tuple, right_tuple, out_key, out_tuple], err_var,
+                                                    typemap, calltypes, out)
+    return out
+
+distributed.distributed_run_extensions[Join] = join_distributed_run
+
+def join_typeinfer(join_node, typeinferer):
+    (left_key, _, out_key, left_vars, right_vars,
+                                        out_vars) = _get_join_vars(join_node)
+    for in_var, out_var in zip([left_key]+left_vars+right_vars,
+                                                        [out_key]+out_vars):
+        typeinferer.constraints.append(typeinfer.Propagate(dst=out_var.name,
+                                        src=in_var.name, loc=join_node.loc))
+    return
+
+typeinfer.typeinfer_extensions[Join] = join_typeinfer
+
+
+def cummin(arr):
+    """Series.cummin() of column array"""
+    return arr.copy()
+
+def cummax(arr):
+    """Series.cummax() of column array"""
+    return arr.copy()
+
+@infer_global(cummin)
+@infer_global(cummax)
+class CumMinMax(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==1
+        return signature(args[0].copy(layout='C'), *args)
+
+@lower_builtin(cummin, types.npytypes.Array)
+def lower_cummin(context, builder, sig, args):
+    def cummin_impl(arr):
+        out = np.empty_like(arr)
+        if len(arr)==0:
+            return out
+        c = arr[0]
+        for i in range(len(arr)):
+            c = min(c, arr[i])
+            out[i] = c
+        return out
+    return context.compile_internal(builder, cummin_impl, sig, args)
+
+@lower_builtin(cummax, types.npytypes.Array)
+def lower_cummax(context, builder, sig, args):
+    def cummax_impl(arr):
+        out = np.empty_like(arr)
+        if len(arr)==0:
+            return out
+        c = arr[0]
+        for i in range(len(arr)):
+            c = max(c, arr[i])
+            out[i] = c
+        return out
+    return context.compile_internal(builder, cummax_impl, sig, args)
+
+
 # from numba.typing.templates import infer_getattr, AttributeTemplate, bound_function
 # from numba import types
 #
@@ -124,3 +567,30 @@ typeinfer.typeinfer_extensions[Filter] = filter_typeinfer
 #         #assert not kws
 #         #assert not args
 #         return signature(ary.copy(layout='C'), types.intp)
+
+def quantile(arr, q):
+    """Series.quantile() of column array"""
+    return 0.0
+
+@infer_global(quantile)
+class QuantileType(AbstractTemplate):
+    def generic(self, args, kws):
+        assert not kws
+        assert len(args)==2
+        return signature(types.float64, *args)
+
+@lower_builtin(quantile, types.npytypes.Array, types.Number)
+def lower_quantile(context, builder, sig, args):
+    # distributed pass replaces calls on distributed arrays with selection
+    def quantile_impl(arr, q):
+        A = np.sort(arr[~np.isnan(arr)])
+        n = len(A)
+        if n==0:
+            return np.nan
+        pos = q*(n-1)
+        k = int(np.floor(pos))
+        res = float(A[k])
+        if k+1<n:
+            res += (pos-k)*(A[k+1]-res)
+        return res
+    return context.compile_internal(builder, quantile_impl, sig, args)
@@ -4,6 +4,7 @@ from numba.targets.arrayobj import make_array
 from hpat import pio_api
 from hpat.pio_api import h5file_type
 from hpat.str_ext import StringType
+from hpat.distributed_lower import _h5_typ_table
 import h5py
 from llvmlite import ir as lir
 import hio
@@ -79,15 +80,6 @@ def h5_close(context, builder, sig, args):
     fn = builder.module.get_or_insert_function(fnty, name="hpat_h5_close")
     return builder.call(fn, args)
 
-_h5_typ_table = {
-    types.int8:0,
-    types.uint8:1,
-    types.int32:2,
-    types.int64:3,
-    types.float32:4,
-    types.float64:5
-    }
-
 @lower_builtin(pio_api.h5create_dset, h5file_type, StringType,
     types.containers.UniTuple, StringType)
 def h5_create_dset(context, builder, sig, args):
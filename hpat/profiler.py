@@ -0,0 +1,81 @@
+from __future__ import print_function, division, absolute_import
+
+import os
+import json
+import time
+import itertools
+
+from numba import ir
+
+# number of reports dumped by this process
+_report_counter = itertools.count()
+
+
+class CompileProfiler(object):
+    """time compiler pipeline stages of a function and record its IR size
+    before and after each stage, then dump a JSON report"""
+    def __init__(self, pipeline, out_dir):
+        self.pipeline = pipeline
+        self.out_dir = '.' if out_dir in ('1', True) else out_dir
+        self.stages = []
+
+    def wrap_stages(self, stages):
+        """return new (func, desc) stage list with timed stages, the report is
+        dumped after the last stage or a stage that raises"""
+        n_stages = len(stages)
+        return [(self._wrap_stage(func, desc, i==n_stages-1), desc)
+                                        for i, (func, desc) in enumerate(stages)]
+
+    def _wrap_stage(self, func, desc, is_last):
+        def timed_stage():
+            ir_before = get_ir_stats(self.pipeline.func_ir)
+            t1 = time.time()
+            failed = True
+            try:
+                res = func()
+                failed = False
+            finally:
+                exec_time = time.time()-t1
+                stage = {'stage': desc, 'time': exec_time,
+                    'ir_before': ir_before,
+                    'ir_after': get_ir_stats(self.pipeline.func_ir)}
+                if failed:
+                    stage['failed'] = True
+                self.stages.append(stage)
+                if is_last or failed:
+                    self.dump()
+            return res
+        return timed_stage
+
+    def dump(self):
+        func_name = self.pipeline.func_ir.func_id.func_qualname
+        report = {'function': func_name,
+                  'args': [str(a) for a in self.pipeline.args],
+                  'total_time': sum(s['time'] for s in self.stages),
+                  'stages': self.stages}
+        # a function is compiled once per signature, number the reports
+        file_name = os.path.join(self.out_dir,
+                            "hpat_compile_{}_{}_{}.json".format(func_name,
+                            os.getpid(), next(_report_counter)))
+        with open(file_name, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+def get_ir_stats(func_ir):
+    """number of blocks, statements and parfors in function IR"""
+    if func_ir is None:
+        return None
+    stats = {'blocks': 0, 'stmts': 0, 'parfors': 0}
+    _add_block_stats(func_ir.blocks, stats)
+    return stats
+
+def _add_block_stats(blocks, stats):
+    from numba.parfor import Parfor
+    for block in blocks.values():
+        stats['blocks'] += 1
+        for stmt in block.body:
+            stats['stmts'] += 1
+            if isinstance(stmt, Parfor):
+                stats['parfors'] += 1
+                _add_block_stats({0: stmt.init_block}, stats)
+                _add_block_stats(stmt.loop_body, stats)
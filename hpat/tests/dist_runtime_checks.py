@@ -0,0 +1,387 @@
+"""
+Checks of the hdist runtime algorithms against NumPy/Pandas, run on each rank
+with `mpiexec -n <pes> python dist_runtime_checks.py <check>` (see
+test_dist_runtime.py). Every rank generates the same global data and passes
+its chunk to the runtime. Chunks are balanced, uneven with empty chunks, or
+all on the last rank. Outputs are gathered to all ranks with
+hpat_dist_gather_index and compared with the sequential result.
+
+This script uses only the hdist extension module (through ctypes like
+hpat.caching), so it doesn't depend on the compiler.
+"""
+from __future__ import print_function, division, absolute_import
+
+import sys
+import ctypes
+from ctypes import c_int, c_int64, c_double, c_bool, c_void_p
+
+import numpy as np
+import pandas as pd
+import hdist
+
+_typ_enums = {np.dtype(np.int8): 0, np.dtype(np.uint8): 1,
+              np.dtype(np.int32): 2, np.dtype(np.int64): 3,
+              np.dtype(np.float32): 4, np.dtype(np.float64): 5}
+
+# Reduce_Type values
+_SUM, _ARGMIN, _ARGMAX = 0, 4, 5
+# aggregation operations of hpat_dist_agg_start
+_AGG_SUM, _AGG_MIN, _AGG_MAX, _AGG_COUNT, _AGG_MEAN, _AGG_RATIO = range(6)
+
+_LAYOUTS = ('block', 'uneven', 'last')
+_SIZES = (0, 1, 7, 1000)
+
+
+def _func(name, restype, *argtypes):
+    return ctypes.CFUNCTYPE(restype, *argtypes)(getattr(hdist, name))
+
+get_rank = _func('hpat_dist_get_rank', c_int)
+get_size = _func('hpat_dist_get_size', c_int)
+get_node_portion = _func('hpat_dist_get_node_portion', c_int64, c_int64,
+                                                    c_int64, c_int, c_int)
+reduce_i8 = _func('hpat_dist_reduce_i8', c_int64, c_int64, c_int)
+argreduce = _func('hpat_dist_argreduce', c_int64, c_void_p, c_int64, c_int64,
+                                                    c_int64, c_int, c_int)
+rebalance = _func('hpat_dist_rebalance', c_int, c_void_p, c_void_p, c_int64,
+                                                    c_int64, c_int64, c_int)
+halo_start = _func('hpat_dist_halo_start', c_int64, c_int, c_void_p, c_void_p,
+                            c_void_p, c_void_p, c_void_p, c_void_p, c_void_p)
+halo_wait = _func('hpat_dist_halo_wait', c_int, c_int64)
+gather_index = _func('hpat_dist_gather_index', c_int, c_void_p, c_int64,
+                                        c_int64, c_void_p, c_int64, c_void_p)
+sort_start = _func('hpat_dist_sort', c_int64, c_void_p, c_int64, c_int)
+sort_count = _func('hpat_dist_sort_count', c_int64, c_int64)
+sort_finish = _func('hpat_dist_sort_finish', c_int, c_int64, c_void_p, c_bool)
+shuffle_start = _func('hpat_dist_shuffle_start', c_int64, c_void_p, c_int64,
+                                                                        c_int)
+shuffle_count = _func('hpat_dist_shuffle_count', c_int64, c_int64)
+shuffle_finish = _func('hpat_dist_shuffle_finish', c_int, c_int64, c_int,
+                                                c_void_p, c_void_p, c_void_p)
+agg_start = _func('hpat_dist_agg_start', c_int64, c_void_p, c_int64, c_int,
+                c_int, c_void_p, c_void_p, c_int, c_void_p, c_void_p, c_void_p)
+agg_count = _func('hpat_dist_agg_count', c_int64, c_int64)
+agg_finish = _func('hpat_dist_agg_finish', c_int, c_int64, c_void_p, c_void_p,
+                                                                    c_void_p)
+join_start = _func('hpat_dist_join_start', c_int64, c_void_p, c_void_p,
+                            c_void_p, c_void_p, c_void_p, c_void_p, c_void_p)
+join_count = _func('hpat_dist_join_count', c_int64, c_int64)
+join_finish = _func('hpat_dist_join_finish', c_int, c_int64, c_void_p,
+                                                c_void_p, c_void_p, c_void_p)
+quantile = _func('hpat_dist_quantile', c_double, c_void_p, c_int64, c_int,
+                                                            c_double, c_bool)
+
+
+def _ptr(arr):
+    return arr.ctypes.data
+
+def _ptrs(arrs):
+    return (c_void_p*len(arrs))(*[_ptr(a) for a in arrs])
+
+def _int64s(vals):
+    return (c_int64*len(vals))(*vals)
+
+def _ints(vals):
+    return (c_int*len(vals))(*vals)
+
+def _bounds(n_rows, layout, rank, n_pes):
+    """row range of rank's chunk: 'block' is balanced, 'uneven' has chunks of
+    different sizes with every third rank (starting from 1) empty and 'last'
+    has all rows on the last rank"""
+    if layout=='block':
+        weights = [1]*n_pes
+    elif layout=='uneven':
+        weights = [0 if pe%3==1 else pe+1 for pe in range(n_pes)]
+    else:
+        weights = [0]*(n_pes-1) + [1]
+    total = sum(weights)
+    starts = [n_rows*sum(weights[:pe])//total for pe in range(n_pes+1)]
+    return starts[rank], starts[rank+1]
+
+def _gen_data(n_rows, dtype, seed, n_keys=None, nan_frac=0.0):
+    """random global array, with values in [0, n_keys) if n_keys is given
+    (duplicates) and a fraction of NaN values for float types"""
+    rs = np.random.RandomState(seed)
+    high = n_keys if n_keys is not None else max(2*n_rows, 1)
+    arr = rs.randint(-high//2 if n_keys is None else 0, high,
+                                                        n_rows).astype(dtype)
+    if nan_frac and arr.dtype.kind=='f':
+        arr[rs.rand(n_rows)<nan_frac] = np.nan
+    return arr
+
+def allgather(arr):
+    """concatenation of chunks of all ranks, in rank order"""
+    arr = np.ascontiguousarray(arr)
+    total = reduce_i8(len(arr), _SUM)
+    out = np.empty((total,)+arr.shape[1:], arr.dtype)
+    inds = np.arange(total, dtype=np.int64)
+    row_bytes = arr.dtype.itemsize*int(np.prod(arr.shape[1:]))
+    gather_index(_ptr(arr), len(arr), row_bytes, _ptr(inds), total, _ptr(out))
+    return out
+
+
+def check_argreduce(rank, n_pes):
+    for dtype, nan_frac in ((np.float64, 0.0), (np.float64, 0.1),
+                            (np.int64, 0.0), (np.int32, 0.0)):
+        for n_rows in _SIZES:
+            glob = _gen_data(n_rows, dtype, n_rows, nan_frac=nan_frac)
+            if dtype==np.int64:
+                # values differ only beyond double precision
+                glob += 2**60
+            for layout in _LAYOUTS:
+                s, e = _bounds(n_rows, layout, rank, n_pes)
+                local = glob[s:e].copy()
+                for op, np_func in ((_ARGMIN, np.argmin), (_ARGMAX, np.argmax)):
+                    index = np_func(local) if len(local) else -1
+                    res = argreduce(_ptr(local), len(local), index, s, op,
+                                                    _typ_enums[local.dtype])
+                    expected = np_func(glob) if n_rows else -1
+                    assert res==expected, (dtype, n_rows, layout, op, res,
+                                                                    expected)
+
+def check_rebalance(rank, n_pes):
+    for n_rows in _SIZES:
+        for shape, dtype in (((), np.float64), ((3,), np.int8)):
+            glob = _gen_data(n_rows*int(np.prod(shape)), dtype, n_rows
+                                            ).reshape((n_rows,)+shape)
+            for layout in _LAYOUTS:
+                s, e = _bounds(n_rows, layout, rank, n_pes)
+                local = glob[s:e].copy()
+                div = n_rows//n_pes
+                out_rows = get_node_portion(n_rows, div, n_pes, rank)
+                out = np.empty((out_rows,)+shape, dtype)
+                rebalance(_ptr(local), _ptr(out), len(local), out_rows,
+                            int(np.prod(shape)), _typ_enums[np.dtype(dtype)])
+                np.testing.assert_array_equal(out,
+                                glob[rank*div:rank*div+out_rows])
+
+def check_halo(rank, n_pes):
+    # stencil chunks are at least as large as halos
+    left_rows = [2, 1]
+    right_rows = [1, 2]
+    for layout in ('block', 'increasing'):
+        n_rows = 30
+        if layout=='block':
+            s, e = _bounds(n_rows, 'block', rank, n_pes)
+        else:
+            total = n_pes*(n_pes+1)//2
+            s = n_rows*(rank*(rank+1)//2)//total
+            e = n_rows*((rank+1)*(rank+2)//2)//total
+        glob = [np.arange(n_rows, dtype=np.float64),
+                np.arange(2*n_rows, dtype=np.int32).reshape(n_rows, 2)]
+        data = [g[s:e].copy() for g in glob]
+        lefts = [np.full((l,)+g.shape[1:], -1, g.dtype)
+                                    for l, g in zip(left_rows, glob)]
+        rights = [np.full((r,)+g.shape[1:], -1, g.dtype)
+                                    for r, g in zip(right_rows, glob)]
+        row_bytes = [g.dtype.itemsize*int(np.prod(g.shape[1:])) for g in glob]
+        halo = halo_start(2, _ptrs(data), _int64s([len(d) for d in data]),
+                        _int64s(row_bytes), _ptrs(lefts), _int64s(left_rows),
+                        _ptrs(rights), _int64s(right_rows))
+        halo_wait(halo)
+        for g, l, r, left, right in zip(glob, left_rows, right_rows, lefts,
+                                                                    rights):
+            # buffers of boundary processors are not written
+            np.testing.assert_array_equal(left,
+                                g[s-l:s] if rank>0 else np.full_like(left, -1))
+            np.testing.assert_array_equal(right,
+                        g[e:e+r] if rank<n_pes-1 else np.full_like(right, -1))
+
+def check_sort(rank, n_pes):
+    for dtype, nan_frac in ((np.int64, 0.0), (np.int32, 0.0),
+                            (np.float64, 0.1), (np.float32, 0.0)):
+        for n_rows in _SIZES:
+            # duplicate keys
+            glob = _gen_data(n_rows, dtype, n_rows, n_keys=max(n_rows//4, 1),
+                                                            nan_frac=nan_frac)
+            expected = np.sort(glob)
+            for layout in _LAYOUTS:
+                s, e = _bounds(n_rows, layout, rank, n_pes)
+                local = glob[s:e].copy()
+                for is_argsort in (False, True):
+                    sort = sort_start(_ptr(local), len(local),
+                                                    _typ_enums[local.dtype])
+                    count = sort_count(sort)
+                    out = np.empty(count, np.int64 if is_argsort else dtype)
+                    sort_finish(sort, _ptr(out), is_argsort)
+                    res = allgather(out)
+                    if is_argsort:
+                        np.testing.assert_array_equal(np.sort(res),
+                                                            np.arange(n_rows))
+                        res = glob[res]
+                    # NaNs are last like NumPy
+                    np.testing.assert_array_equal(res, expected)
+
+def check_shuffle(rank, n_pes):
+    for dtype, nan_frac in ((np.int64, 0.0), (np.float64, 0.1),
+                                                            (np.int32, 0.0)):
+        for n_rows in _SIZES:
+            keys = _gen_data(n_rows, dtype, n_rows, n_keys=max(n_rows//3, 1),
+                                                            nan_frac=nan_frac)
+            # row ids, 4-byte and 3-byte rows
+            cols = [np.arange(n_rows, dtype=np.int64),
+                    np.arange(n_rows, dtype=np.float32),
+                    np.arange(3*n_rows, dtype=np.int8).reshape(n_rows, 3)]
+            for layout in _LAYOUTS:
+                s, e = _bounds(n_rows, layout, rank, n_pes)
+                in_arrs = [keys[s:e].copy()] + [c[s:e].copy() for c in cols]
+                shuffle = shuffle_start(_ptr(in_arrs[0]), e-s,
+                                                    _typ_enums[keys.dtype])
+                count = shuffle_count(shuffle)
+                out_arrs = [np.empty((count,)+a.shape[1:], a.dtype)
+                                                            for a in in_arrs]
+                row_bytes = [a.dtype.itemsize*int(np.prod(a.shape[1:]))
+                                                            for a in in_arrs]
+                shuffle_finish(shuffle, len(in_arrs), _ptrs(in_arrs),
+                                        _ptrs(out_arrs), _int64s(row_bytes))
+                ids = allgather(out_arrs[1])
+                # every row is received once with all its columns
+                np.testing.assert_array_equal(np.sort(ids), np.arange(n_rows))
+                np.testing.assert_array_equal(allgather(out_arrs[0]),
+                                                                    keys[ids])
+                for col, out in zip(cols, out_arrs[1:]):
+                    np.testing.assert_array_equal(allgather(out), col[ids])
+                # rows with equal keys are on the same processor
+                owners = allgather(np.full(count, rank, np.int64))
+                df = pd.DataFrame({'k': keys[ids], 'o': owners})
+                assert (df.groupby('k', dropna=False)['o'].nunique()<=1).all()
+
+
+def _agg(keys, in_arrs, specs, out_dtypes):
+    """hash aggregation with hpat_dist_agg_*, specs are (op, column, aux)"""
+    ops, in_cols, aux_cols = zip(*specs)
+    agg = agg_start(_ptr(keys), len(keys), _typ_enums[keys.dtype],
+                    len(in_arrs), _ptrs(in_arrs),
+                    _ints([_typ_enums[a.dtype] for a in in_arrs]), len(specs),
+                    _int64s(ops), _int64s(in_cols), _int64s(aux_cols))
+    count = agg_count(agg)
+    out_keys = np.empty(count, keys.dtype)
+    outs = [np.empty(count, dtype) for dtype in out_dtypes]
+    agg_finish(agg, _ptr(out_keys), _ptrs(outs),
+                            _ints([_typ_enums[np.dtype(d)] for d in out_dtypes]))
+    return out_keys, outs
+
+def check_agg(rank, n_pes):
+    """groupby like hiframes_api.aggregate_distributed_run: aggregate local
+    chunks, shuffle partial results by key and merge them"""
+    for key_dtype, nan_frac in ((np.int64, 0.0), (np.float64, 0.1)):
+        for n_rows in _SIZES:
+            keys = _gen_data(n_rows, key_dtype, n_rows,
+                                n_keys=max(n_rows//5, 1), nan_frac=nan_frac)
+            vals = _gen_data(n_rows, np.float64, n_rows+1, nan_frac=0.2)
+            ivals = _gen_data(n_rows, np.int32, n_rows+2)
+            local_specs = [(_AGG_SUM, 0, 0), (_AGG_MIN, 0, 0),
+                           (_AGG_MAX, 0, 0), (_AGG_COUNT, 0, 0),
+                           (_AGG_SUM, 1, 0), (_AGG_MIN, 1, 0)]
+            part_dtypes = [np.float64, np.float64, np.float64, np.int64,
+                           np.int64, np.int32]
+            merge_specs = [(_AGG_SUM, 0, 0), (_AGG_MIN, 1, 0),
+                           (_AGG_MAX, 2, 0), (_AGG_SUM, 3, 0),
+                           (_AGG_SUM, 4, 0), (_AGG_MIN, 5, 0),
+                           (_AGG_RATIO, 0, 3)]
+            out_dtypes = part_dtypes + [np.float64]
+            df = pd.DataFrame({'k': keys, 'v': vals, 'i': ivals})
+            grouped = df.groupby('k')
+            expected = [grouped['v'].sum(), grouped['v'].min(),
+                        grouped['v'].max(), grouped['v'].count(),
+                        grouped['i'].sum(), grouped['i'].min(),
+                        grouped['v'].mean()]
+            for layout in _LAYOUTS:
+                s, e = _bounds(n_rows, layout, rank, n_pes)
+                part_key, parts = _agg(keys[s:e].copy(),
+                    [vals[s:e].copy(), ivals[s:e].copy()], local_specs,
+                                                                part_dtypes)
+                shuffle = shuffle_start(_ptr(part_key), len(part_key),
+                                                _typ_enums[part_key.dtype])
+                count = shuffle_count(shuffle)
+                in_arrs = [part_key] + parts
+                shuffled = [np.empty(count, a.dtype) for a in in_arrs]
+                shuffle_finish(shuffle, len(in_arrs), _ptrs(in_arrs),
+                    _ptrs(shuffled), _int64s([a.itemsize for a in in_arrs]))
+                out_key, outs = _agg(shuffled[0], shuffled[1:], merge_specs,
+                                                                out_dtypes)
+                all_keys = allgather(out_key)
+                order = np.argsort(all_keys)
+                # groups are sorted on each processor, NaN keys are dropped
+                np.testing.assert_array_equal(out_key, np.sort(out_key))
+                np.testing.assert_array_equal(all_keys[order],
+                                                    expected[0].index.values)
+                for out, exp in zip(outs, expected):
+                    np.testing.assert_allclose(allgather(out)[order],
+                                    exp.values.astype(out.dtype), rtol=1e-12)
+
+
+def _join(left_key, right_key, left_col, right_col, is_parallel):
+    keys = _ptrs([left_key, right_key])
+    data = _ptrs([left_col, right_col])
+    join = join_start(keys, _int64s([len(left_key), len(right_key)]),
+        _ints([_typ_enums[left_key.dtype], _typ_enums[right_key.dtype]]),
+        _ints([1, 1]), data, _int64s([left_col.itemsize, right_col.itemsize]),
+        (c_bool*2)(*is_parallel))
+    count = join_count(join)
+    out_key = np.empty(count, left_key.dtype)
+    outs = [np.empty(count, left_col.dtype), np.empty(count, right_col.dtype)]
+    join_finish(join, keys, data, _ptr(out_key), _ptrs(outs))
+    return out_key, outs
+
+def check_join(rank, n_pes):
+    # small tables are broadcast, large ones are shuffled
+    cases = [(n, n+3, np.int64, 0.0) for n in _SIZES]
+    cases += [(60, 40, np.float64, 0.2), (120000, 110000, np.int64, 0.0)]
+    for n_left, n_right, dtype, nan_frac in cases:
+        n_keys = max(2*max(n_left, n_right), 1)
+        left_key = _gen_data(n_left, dtype, n_left, n_keys=n_keys,
+                                                            nan_frac=nan_frac)
+        right_key = _gen_data(n_right, dtype, n_right+1, n_keys=n_keys,
+                                                            nan_frac=nan_frac)
+        # row ids of both tables
+        left_col = np.arange(n_left, dtype=np.int64)
+        right_col = np.arange(n_right, dtype=np.int32)
+        # NaN keys don't match
+        expected = pd.merge(
+            pd.DataFrame({'k': left_key, 'a': left_col}).dropna(),
+            pd.DataFrame({'k': right_key, 'b': right_col}).dropna(), on='k')
+        expected = expected.sort_values(['a', 'b'])
+        for layout in _LAYOUTS:
+            for right_parallel in (True, False):
+                s, e = _bounds(n_left, layout, rank, n_pes)
+                rs, re = _bounds(n_right, layout, rank, n_pes)
+                if not right_parallel:
+                    rs, re = 0, n_right
+                out_key, (out_a, out_b) = _join(left_key[s:e].copy(),
+                    right_key[rs:re].copy(), left_col[s:e].copy(),
+                    right_col[rs:re].copy(), (True, right_parallel))
+                res = pd.DataFrame({'k': allgather(out_key),
+                    'a': allgather(out_a), 'b': allgather(out_b)})
+                res = res.sort_values(['a', 'b'])
+                for col in ('k', 'a', 'b'):
+                    np.testing.assert_array_equal(res[col].values,
+                                                        expected[col].values)
+
+
+def check_quantile(rank, n_pes):
+    for dtype, nan_frac in ((np.float64, 0.0), (np.float64, 0.1),
+                            (np.int32, 0.0), (np.float64, 1.0)):
+        for n_rows in _SIZES:
+            # duplicates make interpolation between equal values likely
+            glob = _gen_data(n_rows, dtype, n_rows, n_keys=max(n_rows//2, 1),
+                                                            nan_frac=nan_frac)
+            valid = glob[~np.isnan(glob)] if glob.dtype.kind=='f' else glob
+            for layout in _LAYOUTS:
+                s, e = _bounds(n_rows, layout, rank, n_pes)
+                local = glob[s:e].copy()
+                for q in (0.0, 0.1, 0.25, 0.5, 0.9, 1.0):
+                    for skipna in (False, True):
+                        res = quantile(_ptr(local), len(local),
+                                        _typ_enums[local.dtype], q, skipna)
+                        if len(valid)==0 or (len(valid)<n_rows and not skipna):
+                            assert np.isnan(res), (dtype, n_rows, q, res)
+                        else:
+                            np.testing.assert_allclose(res,
+                                        np.quantile(valid, q), rtol=1e-12)
+
+
+if __name__ == "__main__":
+    check = globals()['check_'+sys.argv[1]]
+    check(get_rank(), get_size())
+    # the runtime doesn't finalize MPI, which mpiexec reports as a failure
+    ctypes.CDLL(hdist.__file__).MPI_Finalize()
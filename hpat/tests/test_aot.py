@@ -0,0 +1,50 @@
+import os
+import shutil
+import ctypes
+import tempfile
+import subprocess
+import unittest
+import numpy as np
+import hpat
+import hpat.aot
+from hpat.tests.test_utils import get_size
+
+
+class TestAOT(unittest.TestCase):
+    def setUp(self):
+        self.build_dir = tempfile.mkdtemp(prefix='hpat_test_aot')
+
+    def tearDown(self):
+        shutil.rmtree(self.build_dir)
+
+    def test_shared_library(self):
+        def test_impl(n):
+            X = np.arange(n)
+            return X.sum()
+
+        lib_file = os.path.join(self.build_dir, 'libtest_impl.so')
+        hpat.aot.compile(test_impl, 'int64(int64)', lib_file)
+        lib = ctypes.CDLL(lib_file)
+        lib.test_impl.restype = ctypes.c_int64
+        lib.test_impl.argtypes = [ctypes.c_int64]
+        lib.hpat_aot_init()
+        n = 111
+        self.assertEqual(lib.test_impl(n), test_impl(n))
+
+    @unittest.skipIf(shutil.which('mpiexec') is None, "mpiexec is required")
+    def test_executable(self):
+        def test_impl():
+            X = np.arange(11.0)
+            print(X.sum())
+
+        if get_size() != 1:
+            self.skipTest("runs the executable with mpiexec")
+        exe_file = os.path.join(self.build_dir, 'test_impl')
+        hpat.aot.compile(test_impl, 'void()', exe_file, executable=True)
+        out = subprocess.check_output(['mpiexec', '-n', '2', exe_file])
+        # printed on rank 0 only
+        self.assertEqual(out.decode().split(), ['55.0'])
+
+
+if __name__ == "__main__":
+    unittest.main()
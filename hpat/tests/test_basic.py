@@ -0,0 +1,486 @@
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+import sys
+import warnings
+import unittest
+import numpy as np
+import numba
+import pandas as pd
+import hpat
+import hpat.compiler
+from hpat import prange
+from hpat.distributed_analysis import Distribution
+from hpat.tests.test_utils import (count_array_REPs, count_parfor_REPs,
+                    count_parfor_OneDs, count_comms, get_report, get_start_end,
+                    get_size)
+
+
+class TestBasic(unittest.TestCase):
+
+    def test_prange_dynamic_start(self):
+        def test_impl(n):
+            s = 0
+            for i in prange(2, n, schedule='dynamic', chunk=3):
+                s += i + 1
+            return s
+
+        hpat_func = hpat.jit(test_impl)
+        n = 101
+        self.assertEqual(hpat_func(n), sum(i + 1 for i in range(2, n)))
+        self.assertEqual(count_comms(hpat_func, 'fetch_and_op'), 1)
+
+    def test_prange_schedule_per_loop(self):
+        # loops of inlined functions at the same file and line
+        src = ("def f(n):\n"
+               "    s = 0\n"
+               "    for i in prange(n{}):\n"
+               "        s += i\n"
+               "    return s\n")
+        funcs = []
+        for kws in (", schedule='dynamic'", ""):
+            glbs = {'prange': prange}
+            exec(src.format(kws), glbs)
+            funcs.append(hpat.jit(glbs['f']))
+        f1, f2 = funcs
+
+        def test_impl(n):
+            # different sizes avoid parfor fusion
+            return f1(n) + f2(n+1)
+
+        hpat_func = hpat.jit(test_impl)
+        n = 101
+        self.assertEqual(hpat_func(n), sum(range(n)) + sum(range(n+1)))
+        self.assertEqual(count_comms(hpat_func, 'fetch_and_op'), 1)
+
+    def test_inner_loop_getitem_rep(self):
+        def test_impl(n, m):
+            A = np.ones(n)
+            B = np.arange(m)
+            s = 0.
+            for i in prange(n):
+                for j in range(m):
+                    s += A[i] * B[j]
+            return s
+
+        hpat_func = hpat.jit(test_impl)
+        n, m = 101, 13
+        self.assertEqual(hpat_func(n, m), test_impl(n, m))
+        # B is replicated instead of one-sided access per element
+        self.assertEqual(get_report(hpat_func).array_dists['B'],
+                                                        Distribution.REP)
+        self.assertEqual(count_comms(hpat_func, 'get (one-sided)'), 0)
+
+    def test_random_access_distributed_arg(self):
+        def test_impl(A, idx):
+            s = 0.
+            for i in prange(len(idx)):
+                s += A[idx[i]]
+            return s
+
+        hpat_func = hpat.jit(distributed=['A', 'idx'])(test_impl)
+        n = 101
+        A = np.arange(n, dtype=np.float64)
+        idx = (np.arange(n) * 7) % n
+        start, end = get_start_end(n)
+        self.assertEqual(hpat_func(A[start:end], idx[start:end]),
+                                                        test_impl(A, idx))
+        self.assertEqual(count_comms(hpat_func, 'get (one-sided)'), 1)
+
+    def test_inline_nested_default_args(self):
+        @hpat.jit
+        def scale(A, k=2):
+            return A.sum() * k
+
+        @hpat.jit
+        def inner(A):
+            return scale(A) + scale(A, k=3)
+
+        def test_impl(n):
+            A = np.ones(n)
+            return inner(A)
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        # inlined calls keep A distributed
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        func_ir = numba.compiler.run_frontend(test_impl)
+        self.assertEqual(hpat.compiler.inline_calls(func_ir), 3)
+
+    def test_profile_compile(self):
+        def test_impl(n):
+            A = np.ones(n)
+            return A.sum()
+
+        out_dir = tempfile.mkdtemp(prefix='hpat_test_profile')
+        try:
+            hpat_func = hpat.jit(profile_compile=out_dir)(test_impl)
+            n = 111
+            self.assertEqual(hpat_func(n), test_impl(n))
+            files = os.listdir(out_dir)
+            self.assertEqual(len(files), 1)
+            with open(os.path.join(out_dir, files[0])) as f:
+                report = json.load(f)
+        finally:
+            shutil.rmtree(out_dir)
+        self.assertEqual(report['function'], 'test_impl')
+        stages = {s['stage']: s for s in report['stages']}
+        for desc in ("inline funcs", "convert DataFrames", "replace IO calls",
+                            "convert to distributed", "nopython mode backend"):
+            self.assertIn(desc, stages)
+        # ones() and sum() are parfors after the parfor pass
+        self.assertGreater(stages["convert to distributed"]['ir_before']
+                                                                ['parfors'], 0)
+
+    def test_lazy_import(self):
+        code = ("import sys, hpat; print(' '.join(m for m in ['h5py', "
+                "'pandas', 'hio', 'hpat.pio', 'hpat.hiframes'] "
+                "if m in sys.modules))")
+        out = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(out.decode().strip(), '')
+
+        def test_impl(n):
+            A = np.ones(n)
+            return A.sum()
+
+        def test_impl_df(n):
+            df = pd.DataFrame({'A': np.ones(n)})
+            return df.A.sum()
+
+        # only functions that use pandas load HiFrames
+        self.assertFalse(hpat.compiler._refers_to_module(
+                        numba.compiler.run_frontend(test_impl), 'pandas'))
+        self.assertTrue(hpat.compiler._refers_to_module(
+                        numba.compiler.run_frontend(test_impl_df), 'pandas'))
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+
+    def test_distributed_arg_ret(self):
+        def test_impl(A):
+            return A[A > 50.]
+
+        def test_impl2(A):
+            return A.sum()
+
+        hpat_func = hpat.jit(distributed=['A', 'ret'])(test_impl)
+        hpat_func2 = hpat.jit(distributed=['A'])(test_impl2)
+        n = 111
+        A = np.arange(n, dtype=np.float64)
+        start, end = get_start_end(n)
+        B = test_impl(A)
+        # filtered output is rebalanced to 1D block chunks
+        B_chunk = hpat_func(A[start:end])
+        start_b, end_b = get_start_end(len(B))
+        np.testing.assert_array_equal(B_chunk, B[start_b:end_b])
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        # chunks are passed to another function without gathering
+        self.assertEqual(hpat_func2(B_chunk), test_impl2(B))
+        self.assertEqual(count_array_REPs(hpat_func2), 0)
+
+    def test_dot_2d(self):
+        def test_impl(m, k, n):
+            X = np.ones((m, k))
+            W = np.ones((n, k))
+            C = np.dot(X * 2.0, W.T)
+            return C.sum()
+
+        hpat_func = hpat.jit(distributed_2d=['X', 'W'])(test_impl)
+        m, k, n = 13, 7, 11
+        self.assertEqual(hpat_func(m, k, n), test_impl(m, k, n))
+        report = get_report(hpat_func)
+        for arr in ('X', 'W', 'C'):
+            self.assertEqual(report.array_dists[arr], Distribution.TwoD)
+        self.assertEqual(count_comms(hpat_func, 'bcast (SUMMA)'), 1)
+
+    def test_distribution_report(self):
+        def test_impl(n):
+            X = np.ones((n, 3))
+            Y = np.ones(n)
+            w = np.dot(Y, X)
+            return w.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        report = get_report(hpat_func)
+        self.assertEqual(report.array_dists['X'], Distribution.OneD)
+        self.assertEqual(report.array_dists['w'], Distribution.REP)
+        # reason and source line of REP arrays are listed
+        report_str = hpat_func.distribution_report()
+        self.assertIn("w: REP", report_str)
+        self.assertIn("w = np.dot(Y, X)", report_str)
+        self.assertGreater(count_comms(hpat_func, 'allreduce'), 0)
+
+    def test_prange_min_max_prod(self):
+        def test_impl(n):
+            A = np.cos(np.arange(n))
+            m1 = np.inf
+            m2 = -np.inf
+            p = 1.0
+            for i in prange(n):
+                m1 = min(m1, A[i])
+                m2 = max(m2, A[i])
+                p *= 1.0 + A[i] / n
+            return m1 + m2 + p
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertAlmostEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_parfor_REPs(hpat_func), 0)
+
+    def test_argmin_argmax(self):
+        def test_impl(n):
+            A = np.cos(np.arange(n))
+            return A.argmax() + 1000 * np.argmin(A)
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+
+    def test_fused_reductions(self):
+        def test_impl(n):
+            A = np.arange(n) * 1.0
+            s1 = 0.0
+            s2 = 0.0
+            for i in prange(n):
+                s1 += A[i]
+                s2 += A[i] * A[i]
+            return s1 + s2
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        # both variables are reduced with a single collective
+        self.assertEqual(count_comms(hpat_func, 'allreduce'), 1)
+
+    def test_async_reduction(self):
+        def test_impl(n):
+            A = np.arange(n) * 1.0
+            s = 0.0
+            for i in prange(n):
+                s += A[i]
+            # independent parfor overlaps with the reduction
+            B = np.ones(n) * 2.0
+            return s + B.sum()
+
+        saved = hpat.config.ASYNC_REDUCE
+        hpat.config.ASYNC_REDUCE = True
+        try:
+            hpat_func = hpat.jit(test_impl)
+            n = 111
+            self.assertEqual(hpat_func(n), test_impl(n))
+        finally:
+            hpat.config.ASYNC_REDUCE = saved
+        self.assertGreater(count_comms(hpat_func, 'iallreduce'), 0)
+
+    def test_array_reduce(self):
+        def test_impl(n):
+            A = np.zeros(3)
+            B = np.arange(3) * 1.0
+            for i in prange(n):
+                A += B
+            return A
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        np.testing.assert_array_equal(hpat_func(n), test_impl(n))
+        self.assertEqual(count_comms(hpat_func, 'allreduce'), 1)
+
+    def test_array_reduce_print(self):
+        def test_impl(n):
+            A = np.zeros(3)
+            B = np.arange(3) * 1.0
+            for i in prange(n):
+                A += B
+            print(A)
+
+        hpat_func = hpat.jit(test_impl)
+        hpat_func(111)
+        # only rank 0 prints, so the array is reduced to rank 0
+        self.assertEqual(count_comms(hpat_func, 'reduce'), 1)
+        self.assertEqual(count_comms(hpat_func, 'allreduce'), 0)
+
+    def test_cumsum(self):
+        def test_impl(n):
+            A = np.arange(n) * 1.0
+            B = np.cumsum(A)
+            return B.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_comms(hpat_func, 'exscan'), 1)
+
+    def test_cumprod(self):
+        def test_impl(n):
+            A = 1.0 + np.arange(n) / n
+            B = np.cumprod(A)
+            return B.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertAlmostEqual(hpat_func(n) / test_impl(n), 1.0)
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+
+    def test_stencil_two_arrays(self):
+        @numba.stencil
+        def kernel(a, b):
+            return a[-1] + b[1]
+
+        def test_impl(n):
+            A = np.arange(n) * 1.0
+            B = np.arange(n) * 2.0
+            C = kernel(A, B)
+            return C.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        # halos of both arrays are packed in one message per neighbor
+        self.assertEqual(count_comms(hpat_func, 'isend (halo)'), 1)
+
+    def test_stencil_2d(self):
+        @numba.stencil
+        def kernel(a):
+            return a[-1, 0] + 2 * a[1, 0] + a[0, -1]
+
+        def test_impl(n, m):
+            A = np.ones((n, m))
+            B = kernel(A)
+            return B.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n, m = 111, 7
+        self.assertEqual(hpat_func(n, m), test_impl(n, m))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertGreater(count_comms(hpat_func, 'isend (halo)'), 0)
+
+    def test_sort(self):
+        def test_impl(A):
+            return np.sort(A)
+
+        hpat_func = hpat.jit(distributed=['A', 'ret'])(test_impl)
+        n = 111
+        # duplicate keys
+        A = np.random.RandomState(0).randint(0, 20, n).astype(np.float64)
+        start, end = get_start_end(n)
+        np.testing.assert_array_equal(hpat_func(A[start:end]),
+                                                test_impl(A)[start:end])
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_comms(hpat_func,
+                                    'allgatherv+alltoallv (sample sort)'), 1)
+
+    def test_argsort(self):
+        def test_impl(A):
+            return np.argsort(A)
+
+        hpat_func = hpat.jit(distributed=['A', 'ret'])(test_impl)
+        n = 111
+        # unique keys, output indices are global
+        A = np.random.RandomState(0).permutation(n).astype(np.int64)
+        start, end = get_start_end(n)
+        np.testing.assert_array_equal(hpat_func(A[start:end]),
+                                                test_impl(A)[start:end])
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+
+    def test_median(self):
+        def test_impl(n):
+            A = np.cos(np.arange(n))
+            return np.median(A)
+
+        hpat_func = hpat.jit(test_impl)
+        for n in (111, 112):
+            self.assertEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_comms(hpat_func, 'allreduce (selection)'), 1)
+
+    def test_percentile(self):
+        def test_impl(n, q):
+            A = np.arange(n) % 17
+            return np.percentile(A, q)
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        for q in (0.0, 12.5, 50.0, 90.0, 100.0):
+            self.assertAlmostEqual(hpat_func(n, q), test_impl(n, q))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+
+    @unittest.skipIf(shutil.which('mpiexec') is None, "mpiexec is required")
+    def test_stats_trace(self):
+        # MPI is finalized after the trace is written by the atexit handler
+        # that hpat registers
+        code = ("import atexit, ctypes, hdist\n"
+                "atexit.register(ctypes.CDLL(hdist.__file__).MPI_Finalize)\n"
+                "import numpy as np, hpat\n"
+                "from hpat.distributed_api import get_stats\n"
+                "f = hpat.jit(lambda n: np.arange(n).sum())\n"
+                "assert f(111) == 111*110//2\n"
+                "assert get_stats()['reduce'][0] >= 1\n")
+        if get_size() != 1:
+            self.skipTest("runs a script with mpiexec")
+        out_dir = tempfile.mkdtemp(prefix='hpat_test_trace')
+        trace_file = os.path.join(out_dir, 'trace.json')
+        env = dict(os.environ, HPAT_TRACE=trace_file)
+        try:
+            subprocess.check_call(['mpiexec', '-n', '2', sys.executable, '-c',
+                                                            code], env=env)
+            with open(trace_file) as f:
+                events = json.load(f)['traceEvents']
+        finally:
+            shutil.rmtree(out_dir)
+        # trace has reductions of both ranks
+        self.assertEqual(set(e['pid'] for e in events if e['name']=='reduce'),
+                                                                    {0, 1})
+
+    def test_large_array_reduce(self):
+        def test_impl(n, m):
+            A = np.zeros(m)
+            B = np.arange(m) * 1.0
+            for i in prange(n):
+                A += B
+            return A
+
+        hpat_func = hpat.jit(test_impl)
+        # arrays of at least 64KB are reduced across node leaders on
+        # multiple nodes
+        n, m = 11, 10000
+        np.testing.assert_array_equal(hpat_func(n, m), test_impl(n, m))
+        self.assertEqual(count_comms(hpat_func, 'allreduce'), 1)
+
+    def test_hybrid(self):
+        def test_impl(n):
+            A = np.arange(n) * 1.0
+            s = 0.0
+            m = np.inf
+            for i in prange(n):
+                s += A[i]
+                m = min(m, A[i] - 3.0)
+            return s + m
+
+        with warnings.catch_warnings():
+            # thread pool size is not set by tests
+            warnings.simplefilter('ignore', RuntimeWarning)
+            hpat_func = hpat.jit(hybrid=True)(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_parfor_REPs(hpat_func), 0)
+        # local chunks run on Numba's thread pool
+        llvm_ir = list(hpat_func.inspect_llvm().values())[0]
+        self.assertIn('do_scheduling', llvm_ir)
+        hpat_func2 = hpat.jit(test_impl)
+        self.assertEqual(hpat_func2(n), test_impl(n))
+        llvm_ir = list(hpat_func2.inspect_llvm().values())[0]
+        self.assertNotIn('do_scheduling', llvm_ir)
+
+
+if __name__ == "__main__":
+    unittest.main()
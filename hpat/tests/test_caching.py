@@ -0,0 +1,78 @@
+import os
+import sys
+import shutil
+import tempfile
+import importlib
+import unittest
+import numpy as np
+import hpat
+from hpat.caching import _bcast_str, _barrier
+from hpat.tests.test_utils import get_rank
+
+# Numba caches functions of source files only, test functions are written to
+# a module in a temporary directory so that every run starts with a cold cache
+_usecases_name = 'hpat_cache_usecases'
+_usecases_src = """
+import numpy as np
+from hpat import prange
+
+def test_impl(n):
+    A = np.arange(n)
+    s = 0
+    for i in prange(n):
+        s += A[i]
+    return s
+
+def test_impl_arg(A):
+    return A.sum()
+"""
+
+
+class TestCaching(unittest.TestCase):
+    def setUp(self):
+        # ranks share the cache, the directory is created by rank 0
+        tmp_dir = ''
+        if get_rank() == 0:
+            tmp_dir = tempfile.mkdtemp(prefix='hpat_test_cache')
+            src_file = os.path.join(tmp_dir, _usecases_name+'.py')
+            with open(src_file, 'w') as f:
+                f.write(_usecases_src)
+        self.cache_dir = _bcast_str(tmp_dir)
+        _barrier()
+        sys.path.insert(0, self.cache_dir)
+        self.mod = importlib.import_module(_usecases_name)
+
+    def tearDown(self):
+        sys.path.remove(self.cache_dir)
+        del sys.modules[_usecases_name]
+        _barrier()
+        if get_rank() == 0:
+            shutil.rmtree(self.cache_dir)
+
+    def test_cache_hit(self):
+        test_impl = self.mod.test_impl
+        n = 111
+        hpat_func1 = hpat.jit(cache=True)(test_impl)
+        self.assertEqual(hpat_func1(n), test_impl(n))
+        # a new dispatcher loads the code saved by rank 0
+        hpat_func2 = hpat.jit(cache=True)(test_impl)
+        self.assertEqual(hpat_func2(n), test_impl(n))
+        self.assertEqual(sum(hpat_func2.stats.cache_hits.values()), 1)
+        self.assertEqual(sum(hpat_func2.stats.cache_misses.values()), 0)
+
+    def test_cache_options_miss(self):
+        test_impl = self.mod.test_impl_arg
+        A = np.arange(11.0)
+        hpat_func1 = hpat.jit(cache=True)(test_impl)
+        self.assertEqual(hpat_func1(A), test_impl(A))
+        # distributed arguments change the generated code
+        hpat_func2 = hpat.jit(cache=True, distributed=['A'])(test_impl)
+        hpat_func2(A)
+        # other ranks load after rank 0 compiles and saves
+        if get_rank() == 0:
+            self.assertEqual(sum(hpat_func2.stats.cache_misses.values()), 1)
+            self.assertEqual(sum(hpat_func2.stats.cache_hits.values()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import shutil
+import subprocess
+import unittest
+
+try:
+    import hdist
+except ImportError:
+    hdist = None
+
+_checks_file = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                    'dist_runtime_checks.py')
+_mpiexec = shutil.which('mpiexec')
+_timeout = 600
+
+
+@unittest.skipIf(hdist is None or _mpiexec is None,
+                                            "hdist and mpiexec are required")
+class TestDistRuntime(unittest.TestCase):
+    """runs checks of dist_runtime_checks.py on 1, 2 and 3 processors"""
+
+    def _run_check(self, check):
+        for num_pes in (1, 2, 3):
+            cmd = [_mpiexec, '-n', str(num_pes), sys.executable, _checks_file,
+                                                                        check]
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                                    stderr=subprocess.STDOUT)
+            output = proc.communicate(timeout=_timeout)[0]
+            self.assertEqual(proc.returncode, 0, "{} on {} processors:\n{}"
+                            .format(check, num_pes, output.decode('utf-8')))
+
+    def test_argreduce(self):
+        self._run_check('argreduce')
+
+    def test_rebalance(self):
+        self._run_check('rebalance')
+
+    def test_halo(self):
+        self._run_check('halo')
+
+    def test_sort(self):
+        self._run_check('sort')
+
+    def test_shuffle(self):
+        self._run_check('shuffle')
+
+    def test_agg(self):
+        self._run_check('agg')
+
+    def test_join(self):
+        self._run_check('join')
+
+    def test_quantile(self):
+        self._run_check('quantile')
+
+
+if __name__ == "__main__":
+    unittest.main()
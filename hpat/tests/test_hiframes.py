@@ -0,0 +1,137 @@
+import unittest
+import pandas as pd
+import numpy as np
+import hpat
+from hpat.tests.test_utils import (count_array_REPs, count_parfor_REPs,
+                                                count_comms, get_start_end)
+
+
+class TestHiFrames(unittest.TestCase):
+
+    def test_rebalance(self):
+        def test_impl(n):
+            df = pd.DataFrame({'A': np.arange(n), 'B': np.arange(n) * 2.0})
+            df1 = df[df.A > 60]
+            df2 = hpat.rebalance(df1)
+            return df2.B.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_parfor_REPs(hpat_func), 0)
+        # rows are moved with MPI_Alltoallv
+        self.assertGreater(count_comms(hpat_func, 'alltoallv'), 0)
+
+    def test_cummin_cummax(self):
+        def test_impl(n):
+            df = pd.DataFrame({'A': np.cos(np.arange(n)),
+                               'B': np.sin(np.arange(n))})
+            return df.A.cummin().sum() + df.B.cummax().sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertAlmostEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_comms(hpat_func, 'exscan'), 2)
+
+    def test_sort_values(self):
+        def test_impl(n):
+            df = pd.DataFrame({'A': np.cos(np.arange(n)), 'B': np.arange(n)})
+            df2 = df.sort_values('A')
+            return df2.B
+
+        hpat_func = hpat.jit(distributed=['ret'])(test_impl)
+        n = 111
+        start, end = get_start_end(n)
+        np.testing.assert_array_equal(hpat_func(n),
+                                            test_impl(n).values[start:end])
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_parfor_REPs(hpat_func), 0)
+
+    def test_shuffle_multi_cols(self):
+        def test_impl(n):
+            df = pd.DataFrame({'A': np.arange(n) % 13,
+                               'B': np.arange(n, dtype=np.int32),
+                               'C': np.cos(np.arange(n)),
+                               'D': np.arange(n) * 3})
+            # partial results of all columns are shuffled by key together
+            df1 = df.groupby('A').sum()
+            return df1.B.sum() + df1.C.sum() + df1.D.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertAlmostEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_parfor_REPs(hpat_func), 0)
+
+    def test_groupby_agg(self):
+        def test_impl(n):
+            df = pd.DataFrame({'A': np.arange(n) % 7,
+                               'B': np.cos(np.arange(n))})
+            df1 = df.groupby('A').mean()
+            df2 = df.groupby('A').agg('max')
+            df3 = df.groupby('A').min()
+            df4 = df.groupby('A').count()
+            return df1.B.sum() + df2.B.sum() + df3.B.sum() + df4.B.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertAlmostEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_parfor_REPs(hpat_func), 0)
+
+    def test_groupby_keys_sorted(self):
+        def test_impl(n):
+            df = pd.DataFrame({'A': (np.arange(n) * 7) % 31, 'B': np.ones(n)})
+            df1 = df.groupby('A').sum()
+            # keys are an output column like as_index=False
+            return df1.A
+
+        hpat_func = hpat.jit(distributed=['ret'])(test_impl)
+        n = 111
+        keys = np.sort(np.unique((np.arange(n) * 7) % 31))
+        start, end = get_start_end(len(keys))
+        # group keys are sorted globally
+        np.testing.assert_array_equal(hpat_func(n), keys[start:end])
+
+    def test_merge(self):
+        def test_impl(n):
+            df1 = pd.DataFrame({'key1': np.arange(n) * 3,
+                                'A': np.cos(np.arange(n))})
+            df2 = pd.DataFrame({'key1': np.arange(n) * 2,
+                                'B': np.arange(n) * 1.5})
+            df3 = pd.merge(df1, df2, on='key1')
+            return df3.A.sum() + df3.B.sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertAlmostEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+        self.assertEqual(count_parfor_REPs(hpat_func), 0)
+
+    def test_merge_duplicate_keys(self):
+        def test_impl(n):
+            df1 = pd.DataFrame({'key1': np.arange(n) % 5, 'A': np.arange(n)})
+            df2 = pd.DataFrame({'key1': np.arange(n) % 3, 'B': np.arange(n)})
+            df3 = df1.merge(df2, on='key1')
+            return (df3.A * df3.B).sum()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+
+    def test_quantile(self):
+        def test_impl(n):
+            df = pd.DataFrame({'A': np.cos(np.arange(n))})
+            return df.A.quantile(0.25) + df.A.quantile()
+
+        hpat_func = hpat.jit(test_impl)
+        n = 111
+        self.assertAlmostEqual(hpat_func(n), test_impl(n))
+        self.assertEqual(count_array_REPs(hpat_func), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import numpy as np
+import hpat
+
+
+@hpat.jit
+def _get_rank_size():
+    return hpat.distributed_api.get_rank(), hpat.distributed_api.get_size()
+
+def get_rank():
+    return _get_rank_size()[0]
+
+def get_size():
+    return _get_rank_size()[1]
+
+def get_start_end(n):
+    """chunk of 1D distributed array of size n on this rank"""
+    rank, size = _get_rank_size()
+    div = n // size
+    start = rank * div
+    end = n if rank == size - 1 else start + div
+    return start, end
+
+def get_report(hpat_func):
+    """distribution report of the last compiled signature of hpat_func"""
+    reports = hpat.distributed_report.get_reports(hpat_func.py_func)
+    return reports[tuple(hpat_func.signatures[-1])]
+
+def count_array_REPs(hpat_func):
+    from hpat.distributed import Distribution
+    vals = get_report(hpat_func).array_dists.values()
+    return sum([v == Distribution.REP for v in vals])
+
+def count_array_OneDs(hpat_func):
+    from hpat.distributed import Distribution
+    vals = get_report(hpat_func).array_dists.values()
+    return sum([v == Distribution.OneD for v in vals])
+
+def count_parfor_REPs(hpat_func):
+    from hpat.distributed import Distribution
+    vals = get_report(hpat_func).parfor_dists.values()
+    return sum([v == Distribution.REP for v in vals])
+
+def count_parfor_OneDs(hpat_func):
+    from hpat.distributed import Distribution
+    vals = get_report(hpat_func).parfor_dists.values()
+    return sum([v == Distribution.OneD for v in vals])
+
+def count_comms(hpat_func, comm_name):
+    """number of communication calls generated by the distributed pass with
+    names starting with comm_name (e.g. 'allreduce')"""
+    return sum([c[0].startswith(comm_name) for c in get_report(hpat_func).comms])